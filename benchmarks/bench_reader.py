@@ -0,0 +1,152 @@
+"""
+Reader throughput benchmarks on synthetic runs (see hessio.synthetic)
+
+Not collected by the test suite, run them with pytest-benchmark:
+python -m pytest benchmarks/bench_reader.py --benchmark-autosave
+and compare a change with the last saved results, failing on a slowdown:
+python -m pytest benchmarks/bench_reader.py --benchmark-compare --benchmark-compare-fail=mean:10%
+
+Events/s and MB/s (of file read, or of arrays returned by the getters)
+are saved in the extra_info of each benchmark.
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+hessio = pytest.importorskip('hessio')
+
+# Getters of a telescope of the current event: name: arguments after telescope_id
+TELESCOPE_GETTERS = {
+    'get_num_channel': (),
+    'get_num_pixels': (),
+    'get_num_samples': (),
+    'get_mirror_area': (),
+    'get_mirror_number': (),
+    'get_optical_foclen': (),
+    'get_pixel_position': (),
+    'get_pixel_timing_threshold': (),
+    'get_pixel_timing_peak_global': (),
+    'get_pixel_timing_num_times_types': (),
+    'get_pixel_timing_timval': (),
+    'get_adc_sum': (0,),
+    'get_adc_sample': (0,),
+    'get_adc_sum_sparse': (0,),
+    'get_adc_sample_sparse': (0,),
+    'get_adc_sum_view': (),
+    'get_adc_sample_view': (),
+    'get_data_for_calibration': (),
+    'get_ref_shapes': (0,),
+    'get_tel_event_gps_time': (),
+    'get_telescope_config': (),
+    'get_calibrated_image': (),
+}
+
+# Getters of the current event
+EVENT_GETTERS = (
+    'get_telescope_with_data_list',
+    'get_teldata_list',
+    'get_central_event_teltrg_list',
+    'get_central_event_gps_time',
+    'get_mc_shower_energy',
+    'get_event',
+    'get_event_sparse',
+    'get_calibrated_images',
+)
+
+
+def _nbytes(value):
+    """ bytes of the arrays in a value returned by a getter """
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return np.asarray(value).nbytes
+
+
+def _throughput(benchmark, events, nbytes):
+    """ events/s and MB/s from the mean time of a round """
+    if benchmark.stats is None:  # --benchmark-disable
+        return
+    mean = benchmark.stats.stats.mean
+    benchmark.extra_info['events_per_s'] = events / mean
+    benchmark.extra_info['MB_per_s'] = nbytes / mean / 1e6
+
+
+@pytest.fixture(scope='module')
+def current_event(synthetic_runs):
+    """
+    File of the samples_gz run at its first event with 2 telescopes
+    or more, kept open for the getters
+    """
+    reader = hessio.HessioFile(synthetic_runs['samples_gz']['filename'])
+    events = reader.move_to_next_event()
+    for run_id, event_id in events:
+        if len(reader.get_telescope_with_data_list()) > 1:
+            break
+    yield reader
+    events.close()
+    reader.close_file()
+
+
+def _read_all(filename):
+    with hessio.HessioFile(filename) as reader:
+        for run_id, event_id in reader.move_to_next_event():
+            pass
+
+
+def test_move_to_next_event(benchmark, synthetic_run):
+    benchmark(_read_all, synthetic_run['filename'])
+    _throughput(benchmark, synthetic_run['events'], synthetic_run['size'])
+
+
+def _read_batches(filename, fields):
+    with hessio.HessioFile(filename) as reader:
+        for batch in reader.iter_batches(50, fields):
+            pass
+
+
+def test_iter_batches(benchmark, synthetic_run):
+    fields = ('adc_sums', 'adc_samples') if synthetic_run['samples'] else ('adc_sums',)
+    benchmark(_read_batches, synthetic_run['filename'], fields)
+    _throughput(benchmark, synthetic_run['events'], synthetic_run['size'])
+
+
+@pytest.mark.parametrize('name', sorted(TELESCOPE_GETTERS))
+def test_telescope_getter(benchmark, current_event, name):
+    getter = getattr(current_event, name)
+    arguments = TELESCOPE_GETTERS[name]
+    telescopes = current_event.get_telescope_with_data_list()
+
+    def get_all():
+        return [getter(tel_id, *arguments) for tel_id in telescopes]
+
+    nbytes = _nbytes(benchmark(get_all))
+    _throughput(benchmark, 1, nbytes)
+
+
+@pytest.mark.parametrize('name', EVENT_GETTERS)
+def test_event_getter(benchmark, current_event, name):
+    nbytes = _nbytes(benchmark(getattr(current_event, name)))
+    _throughput(benchmark, 1, nbytes)
+
+
+def _dl0_testbed(filename, samples):
+    """ the loop of DL0_testbed.py, without the histograms """
+    counts = np.zeros(3, dtype=int)
+    with hessio.HessioFile(filename) as reader:
+        for run_id, event_id in reader.move_to_next_event():
+            for tel_id in reader.get_telescope_with_data_list():
+                reader.get_mirror_area(tel_id)
+                adc_sums = reader.get_adc_sum(tel_id, 0)
+                tim_vals = reader.get_pixel_timing_timval(tel_id)
+                peak = reader.get_pixel_timing_peak_global(tel_id)
+                counts += ((adc_sums > 1000).sum(), (tim_vals[:, 5] > 4).sum(), peak > 0.)
+                if samples:
+                    reader.get_adc_sample(tel_id, 0)
+    return counts
+
+
+def test_dl0_testbed(benchmark, synthetic_run):
+    counts = benchmark(_dl0_testbed, synthetic_run['filename'], synthetic_run['samples'])
+    assert counts[0] > 0
+    _throughput(benchmark, synthetic_run['events'], synthetic_run['size'])
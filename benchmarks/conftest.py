@@ -0,0 +1,40 @@
+"""
+Synthetic runs of the reader benchmarks, written once per session
+"""
+import os
+
+import pytest
+
+hessio = pytest.importorskip('hessio')
+
+# name: (file name, options of hessio.synthetic.generate)
+SYNTHETIC_RUNS = {
+    'sums': ('sums.simtel', dict(events=200)),
+    'sums_gz': ('sums.simtel.gz', dict(events=200)),
+    'samples_gz': ('samples.simtel.gz', dict(events=50, samples=25)),
+    'zero_suppressed_gz': ('zero_suppressed.simtel.gz', dict(events=50, samples=25,
+                                                             zero_suppression=3.)),
+}
+
+
+@pytest.fixture(scope='session')
+def synthetic_runs(tmp_path_factory):
+    """
+    Write all synthetic runs, 4 telescopes of 1855 pixels with 2 gains
+
+    Returns
+    -------
+    dictionary of name: dict(filename, events, size, samples)
+    """
+    directory = tmp_path_factory.mktemp('synthetic')
+    runs = dict()
+    for name, (filename, options) in SYNTHETIC_RUNS.items():
+        path = str(directory / filename)
+        runs[name] = dict(filename=path, events=hessio.synthetic.generate(path, **options),
+                          size=os.path.getsize(path), samples=options.get('samples', 0))
+    return runs
+
+
+@pytest.fixture(params=sorted(SYNTHETIC_RUNS))
+def synthetic_run(request, synthetic_runs):
+    return synthetic_runs[request.param]
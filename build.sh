@@ -1,11 +1,18 @@
-OPTIONS="-DCTA -DCTA_MAX_SC -g -O2 -Wall -D_LARGEFILE64_SOURCE -fPIC -DPIC -lm"
+OPTIONS="-DCTA -DCTA_MAX_SC -D_REENTRANT -g -O2 -Wall -D_LARGEFILE64_SOURCE -fPIC -DPIC -pthread -lm"
 
 echo "build hessio library"
 cd hessioxxx
 mkdir bin out lib
-make  CDEBUGFLAGS="-g -O2" DEFINES="-DCTA -DCTA_MAX_SC"
+make  CDEBUGFLAGS="-g -O2" DEFINES="-DCTA -DCTA_MAX_SC -D_REENTRANT"
 cd ..
 
 echo "build pyhessio library"
-echo "gcc -o pyhessio.so -Ihessioxxx/include -I.  ${OPTIONS}  -shared pyhessio.c -L hessioxxx/lib -lhessio"
-gcc -o pyhessio.so -Ihessioxxx/include -I.  ${OPTIONS}  -shared pyhessio.c -L hessioxxx/lib -lhessio
+echo "gcc -o pyhessio.so -Ihessioxxx/include -I.  ${OPTIONS}  -shared pyhessio.c hessioxxx/src/rec_tools.c -L hessioxxx/lib -lhessio"
+gcc -o pyhessio.so -Ihessioxxx/include -I.  ${OPTIONS}  -shared pyhessio.c hessioxxx/src/rec_tools.c -L hessioxxx/lib -lhessio
+
+echo "build _pyhessio extension module (fast paths, optional)"
+PYTHON=${PYTHON:-python}
+EXT_SUFFIX=`${PYTHON} -c "import sysconfig; print(sysconfig.get_config_var('EXT_SUFFIX'))"`
+PY_INCLUDES=`${PYTHON} -c "import sysconfig, numpy; print('-I' + sysconfig.get_paths()['include'], '-I' + numpy.get_include())"`
+echo "gcc -o _pyhessio${EXT_SUFFIX} ${PY_INCLUDES} ${OPTIONS} -shared pyhessiomodule.c -L. -l:pyhessio.so -Wl,-rpath,'\$ORIGIN'"
+gcc -o _pyhessio${EXT_SUFFIX} ${PY_INCLUDES} ${OPTIONS} -shared pyhessiomodule.c -L. -l:pyhessio.so -Wl,-rpath,'$ORIGIN'
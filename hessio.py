@@ -1,6 +1,12 @@
 import numpy as np
 import os
 import ctypes
+import concurrent.futures
+import functools
+import threading
+import time
+import types
+import weakref
 
 __all__ = ['move_to_next_event','file_open','close_file',
            'get_global_event_count','get_run_number',
@@ -8,6 +14,8 @@ __all__ = ['move_to_next_event','file_open','close_file',
            'get_teldata_list',
            'get_num_teldata','get_num_channel','get_num_pixels',
            'get_num_samples','get_adc_sample','get_adc_sum',
+           'get_adc_sum_sparse','get_adc_sample_sparse','get_event_sparse',
+           'get_adc_sample_view','get_adc_sum_view',
            'get_data_for_calibration','get_pixel_position',
            'get_pixel_timing_timval','get_mirror_area',
            'get_pixel_timing_num_times_types',
@@ -19,7 +27,20 @@ __all__ = ['move_to_next_event','file_open','close_file',
            'get_tel_event_gps_time' ,'get_tel_event_gps_time','get_central_event_teltrg_list',
            'get_num_tel_trig' ,'get_central_event_gps_time',
            'get_mirror_number', 'get_optical_foclen', 'get_telescope_ids',
-           'HessioTelescopeIndexError','HessioGeneralError']
+           'get_event','RAWDATA_FLAG','RAWSUM_FLAG','TIME_FLAG',
+           'TRACKDATA_FLAG','IMAGE_FLAG','IMG_PIXTM_FLAG','ALL_FLAGS',
+           'scan_mc_truth','set_inprocess_decompression','set_readahead_chunks',
+           'set_compact_buffers','set_event_filter','EventFilter',
+           'set_telescope_selection','Skimmer',
+           'build_index','load_index','seek_event','INDEX_DTYPE',
+           'get_telescope_config','get_run_config','telescope_indices','iter_batches',
+           'get_neighbours','get_calibrated_image','get_calibrated_images',
+           'iter_calibrated_images','INTEGRATORS','CALIB_SCALE',
+           'get_neighbour_graph','get_image_parameters','iter_image_parameters',
+           'IMAGE_PARAMETERS','get_array_layout','reconstruct_showers',
+           'set_stats','reset_stats','stats',
+           'TEL_INDEX_NOT_VALID',
+           'HessioFile','AdcView','HessioTelescopeIndexError','HessioGeneralError']
 
 
 
@@ -27,79 +48,323 @@ __all__ = ['move_to_next_event','file_open','close_file',
 _path = os.path.dirname(__file__)
 lib = np.ctypeslib.load_library('pyhessio', _path)
 
+# Compiled fast paths of the per event and per telescope functions
+# (pyhessiomodule.c), used instead of ctypes when built
+try:
+    import _pyhessio as _fast
+except ImportError:
+    _fast = None
+
+lib.allocate_hessio_file.restype = ctypes.c_void_p
+lib.free_hessio_file.argtypes = [ctypes.c_void_p]
+lib.free_hessio_file.restype = None
+
 lib.close_file.restype = None
-lib.file_open.argtypes = [ctypes.c_char_p]
+lib.close_file.argtypes = [ctypes.c_void_p]
+lib.open_output_file.argtypes = [ctypes.c_char_p]
+lib.open_output_file.restype = ctypes.c_void_p
+lib.close_output_file.argtypes = [ctypes.c_void_p]
+lib.close_output_file.restype = ctypes.c_int
+lib.set_copy_output.argtypes = [ctypes.c_void_p,ctypes.c_void_p]
+lib.set_copy_output.restype = None
+lib.write_current_event.argtypes = [ctypes.c_void_p]
+lib.write_current_event.restype = ctypes.c_int
+lib.write_synthetic_run.argtypes = [ctypes.c_char_p,ctypes.c_int,ctypes.c_int,ctypes.c_int,ctypes.c_int,
+                                     ctypes.c_int,ctypes.c_int,ctypes.c_double,ctypes.c_double,
+                                     ctypes.c_ulong]
+lib.write_synthetic_run.restype = ctypes.c_int
+lib.file_open.argtypes = [ctypes.c_void_p,ctypes.c_char_p]
 lib.file_open.restype=ctypes.c_int
-lib.get_adc_sample.argtypes = [ctypes.c_int,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_uint16, flags="C_CONTIGUOUS")]
+lib.set_read_what.argtypes = [ctypes.c_void_p,ctypes.c_int]
+lib.set_read_what.restype = ctypes.c_int
+lib.set_event_filter.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,ctypes.c_double,ctypes.c_double,
+                                 ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.set_event_filter.restype = ctypes.c_int
+lib.set_telescope_selection.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.set_telescope_selection.restype = ctypes.c_int
+lib.get_adc_sample.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_uint16, flags="C_CONTIGUOUS")]
 lib.get_adc_sample.restype = ctypes.c_int
-lib.get_adc_sum.argtypes = [ctypes.c_int,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int32, flags="C_CONTIGUOUS")]
+lib.get_adc_sum.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int32, flags="C_CONTIGUOUS")]
 lib.get_adc_sum.restype = ctypes.c_int
-lib.get_data_for_calibration.argtypes=[ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+lib.get_num_significant.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int]
+lib.get_num_significant.restype = ctypes.c_int
+lib.get_significant_adc.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,ctypes.c_int,
+                                    np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                    np.ctypeslib.ndpointer(ctypes.c_uint32, flags="C_CONTIGUOUS"),
+                                    np.ctypeslib.ndpointer(ctypes.c_uint16, flags="C_CONTIGUOUS")]
+lib.get_significant_adc.restype = ctypes.c_int
+lib.get_significant_layout.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,
+                                       np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                       np.ctypeslib.ndpointer(ctypes.c_longlong, flags="C_CONTIGUOUS")]
+lib.get_significant_layout.restype = ctypes.c_int
+lib.get_significant_event.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,ctypes.c_int,
+                                      np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_longlong, flags="C_CONTIGUOUS"),
+                                      ctypes.c_int,
+                                      np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_uint32, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_uint16, flags="C_CONTIGUOUS")]
+lib.get_significant_event.restype = ctypes.c_int
+lib.get_adc_layout.argtypes = [np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_adc_layout.restype = ctypes.c_int
+lib.get_adc_sample_buffer.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.POINTER(ctypes.POINTER(ctypes.c_uint16))]
+lib.get_adc_sample_buffer.restype = ctypes.c_int
+lib.get_adc_sum_buffer.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.POINTER(ctypes.POINTER(ctypes.c_uint32))]
+lib.get_adc_sum_buffer.restype = ctypes.c_int
+lib.get_generation.argtypes = [ctypes.c_void_p]
+lib.get_generation.restype = ctypes.c_long
+lib.pin_buffers.argtypes = [ctypes.c_void_p,ctypes.c_void_p,ctypes.c_int]
+lib.pin_buffers.restype = ctypes.c_int
+lib.get_data_for_calibration.argtypes=[ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
                                         np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
 lib.get_data_for_calibration.restype=ctypes.c_int
 lib.get_global_event_count.restype = ctypes.c_int
-lib.get_mirror_area.argtypes = [ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
+lib.get_global_event_count.argtypes = [ctypes.c_void_p]
+lib.get_mirror_area.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
 lib.get_mirror_area.restype = ctypes.c_int
-lib.get_num_channel.argtypes = [ctypes.c_int]
+lib.get_num_channel.argtypes = [ctypes.c_void_p,ctypes.c_int]
 lib.get_num_channel.restype = ctypes.c_int
-lib.get_num_pixels.argtypes = [ctypes.c_int]
+lib.get_num_pixels.argtypes = [ctypes.c_void_p,ctypes.c_int]
 lib.get_num_pixels.restype = ctypes.c_int
-lib.get_num_samples.argtypes = [ctypes.c_int]
+lib.get_num_samples.argtypes = [ctypes.c_void_p,ctypes.c_int]
 lib.get_num_samples.restype = ctypes.c_int
 lib.get_num_teldata.restype = ctypes.c_int
+lib.get_num_teldata.argtypes = [ctypes.c_void_p]
 lib.get_num_telescope.restype = ctypes.c_int
+lib.get_num_telescope.argtypes = [ctypes.c_void_p]
 lib.get_num_tel_trig.restype = ctypes.c_int
-lib.get_pixel_timing_num_times_types.argtypes = [ctypes.c_int]
+lib.get_num_tel_trig.argtypes = [ctypes.c_void_p]
+lib.get_pixel_timing_num_times_types.argtypes = [ctypes.c_void_p,ctypes.c_int]
 lib.get_pixel_timing_num_times_types.restype = ctypes.c_int
-lib.get_pixel_position.argtypes=[ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+lib.get_pixel_position.argtypes=[ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
                                   np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
 lib.get_pixel_position.restype=ctypes.c_int
-lib.get_pixel_timing_peak_global.argtypes = [ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS")]
+lib.get_pixel_timing_peak_global.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS")]
 lib.get_pixel_timing_peak_global.restype = ctypes.c_int
-lib.get_pixel_timing_threshold.argtypes = [ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_pixel_timing_threshold.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
 lib.get_pixel_timing_threshold.restype = ctypes.c_int
-lib.get_pixel_timing_timval.argtypes = [ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS")]
+lib.get_pixel_timing_timval.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS")]
 lib.get_pixel_timing_timval.restype=ctypes.c_int
 lib.get_run_number.restype = ctypes.c_int
-lib.get_telescope_with_data_list.argtypes = [np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_run_number.argtypes = [ctypes.c_void_p]
+lib.get_telescope_with_data_list.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
 lib.get_telescope_with_data_list.restype = ctypes.c_int
-lib.move_to_next_event.argtypes = [np.ctypeslib.ndpointer(ctypes.c_int)]
+lib.move_to_next_event.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_int)]
 lib.move_to_next_event.restype = ctypes.c_int
+lib.move_to_next_mc_event.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                      ctypes.c_int]
+lib.move_to_next_mc_event.restype = ctypes.c_int
+lib.get_max_telescopes.restype = ctypes.c_int
 lib.get_mc_event_xcore.restype = ctypes.c_double
+lib.get_mc_event_xcore.argtypes = [ctypes.c_void_p]
 lib.get_mc_event_ycore.restype = ctypes.c_double
+lib.get_mc_event_ycore.argtypes = [ctypes.c_void_p]
 lib.get_mc_shower_energy.restype = ctypes.c_double
+lib.get_mc_shower_energy.argtypes = [ctypes.c_void_p]
 lib.get_mc_shower_azimuth.restype = ctypes.c_double
+lib.get_mc_shower_azimuth.argtypes = [ctypes.c_void_p]
 lib.get_mc_shower_altitude.restype = ctypes.c_double
+lib.get_mc_shower_altitude.argtypes = [ctypes.c_void_p]
 lib.get_adc_known.restype = ctypes.c_int  
-lib.get_adc_known.argtypes = [ctypes.c_int,ctypes.c_int,ctypes.c_int]
+lib.get_adc_known.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,ctypes.c_int]
 lib.get_ref_shape.restype = ctypes.c_double
-lib.get_ref_shape.argtypes =  [ctypes.c_int,ctypes.c_int,ctypes.c_int]
+lib.get_ref_shape.argtypes =  [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,ctypes.c_int]
 lib.get_time_slice.restype = ctypes.c_double  
-lib.get_time_slice.argtypes  =  [ctypes.c_int]
+lib.get_time_slice.argtypes  =  [ctypes.c_void_p,ctypes.c_int]
 lib.get_ref_step.restype = ctypes.c_double  
-lib.get_ref_step.argtypes  =  [ctypes.c_int]
+lib.get_ref_step.argtypes  =  [ctypes.c_void_p,ctypes.c_int]
 lib.get_ref_shapes.restypes = ctypes.c_int
-lib.get_ref_shapes.argtypes =[ctypes.c_int,ctypes.c_int, np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
+lib.get_ref_shapes.argtypes =[ctypes.c_void_p,ctypes.c_int,ctypes.c_int, np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
 lib.get_nrefshape.restypes = ctypes.c_int
-lib.get_nrefshape.argtypes = [ctypes.c_int]
+lib.get_nrefshape.argtypes = [ctypes.c_void_p,ctypes.c_int]
 lib.get_lrefshape.restypes = ctypes.c_int
-lib.get_lrefshape.argtypes = [ctypes.c_int]
+lib.get_lrefshape.argtypes = [ctypes.c_void_p,ctypes.c_int]
 lib.get_tel_event_gps_time.restype = ctypes.c_int 
-lib.get_tel_event_gps_time.argtypes = [ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS"), np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS")]
+lib.get_tel_event_gps_time.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS"), np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS")]
 lib.get_central_event_gps_time.restype = ctypes.c_int
-lib.get_central_event_gps_time.argtypes =  [np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS"), np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS")]
+lib.get_central_event_gps_time.argtypes =  [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS"), np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS")]
 lib.get_central_event_teltrg_list.restype = ctypes.c_int 
-lib.get_central_event_teltrg_list.argtypes = [np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
-lib.get_mirror_number.argtypes = [ctypes.c_int]
+lib.get_central_event_teltrg_list.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_mirror_number.argtypes = [ctypes.c_void_p,ctypes.c_int]
 lib.get_mirror_number.restype = ctypes.c_int
-lib.get_optical_foclen.argtypes = [ctypes.c_int]
+lib.get_optical_foclen.argtypes = [ctypes.c_void_p,ctypes.c_int]
 lib.get_optical_foclen.restype = ctypes.c_double
-lib.get_telescope_ids.argtypes = [np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_telescope_ids.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
 lib.get_telescope_ids.restype = ctypes.c_int
+lib.get_event_layout.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_event_layout.restype = ctypes.c_int
+lib.get_event.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                          np.ctypeslib.ndpointer(ctypes.c_uint32, flags="C_CONTIGUOUS"),
+                          np.ctypeslib.ndpointer(ctypes.c_uint16, flags="C_CONTIGUOUS"),
+                          np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS"),
+                          np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS"),
+                          np.ctypeslib.ndpointer(ctypes.c_long, flags="C_CONTIGUOUS"),
+                          np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
+lib.get_event.restype = ctypes.c_int
+lib.set_inprocess_decompression.argtypes = [ctypes.c_int]
+lib.set_inprocess_decompression.restype = None
+lib.set_readahead_chunks.argtypes = [ctypes.c_int]
+lib.set_readahead_chunks.restype = None
+lib.set_compact_buffers.argtypes = [ctypes.c_int]
+lib.set_compact_buffers.restype = None
+lib.set_stats.argtypes = [ctypes.c_int]
+lib.set_stats.restype = None
+lib.reset_stats.argtypes = []
+lib.reset_stats.restype = None
+lib.get_stats.argtypes = [ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_longlong, flags="C_CONTIGUOUS"),
+                          np.ctypeslib.ndpointer(ctypes.c_longlong, flags="C_CONTIGUOUS")]
+lib.get_stats.restype = ctypes.c_int
+lib.fill_hsdata.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.fill_hsdata.restype = ctypes.c_int
+lib.get_telescope_indices.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),ctypes.c_int,
+                                      np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_telescope_indices.restype = ctypes.c_int
+lib.peek_event.argtypes = [ctypes.c_void_p]
+lib.peek_event.restype = ctypes.c_int
+lib.get_batch_layout.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                 np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_batch_layout.restype = ctypes.c_int
+lib.read_batch.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,ctypes.c_int,
+                           np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                           np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                           np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                           np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS"),
+                           np.ctypeslib.ndpointer(ctypes.c_uint32, flags="C_CONTIGUOUS"),
+                           np.ctypeslib.ndpointer(ctypes.c_uint16, flags="C_CONTIGUOUS"),
+                           np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS"),
+                           np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS"),
+                           np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
+lib.read_batch.restype = ctypes.c_int
+lib.get_neighbours.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_neighbours.restype = ctypes.c_int
+lib.get_calibrated_image.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,
+                                     np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                     ctypes.c_double,ctypes.c_double,
+                                     np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                     np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS")]
+lib.get_calibrated_image.restype = ctypes.c_int
+lib.get_calibrated_event.argtypes = [ctypes.c_void_p,ctypes.c_int,
+                                     np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                     ctypes.c_double,ctypes.c_double,ctypes.c_int,
+                                     np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                     ctypes.c_int,
+                                     np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS"),
+                                     np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                     np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS")]
+lib.get_calibrated_event.restype = ctypes.c_int
+lib.read_calibrated_images.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,
+                                       np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                       ctypes.c_double,ctypes.c_double,ctypes.c_int,
+                                       np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                       ctypes.c_int,
+                                       np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                       np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS"),
+                                       np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                       np.ctypeslib.ndpointer(ctypes.c_float, flags="C_CONTIGUOUS")]
+lib.read_calibrated_images.restype = ctypes.c_int
+lib.get_image_parameters.argtypes = [ctypes.c_void_p,ctypes.c_int,
+                                     np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                     np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                     ctypes.c_int,
+                                     np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                     ctypes.c_int,
+                                     np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS"),
+                                     np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                     np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS"),
+                                     np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                     np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
+lib.get_image_parameters.restype = ctypes.c_int
+lib.read_image_parameters.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,
+                                      np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                      ctypes.c_int,
+                                      np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                      np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
+lib.read_image_parameters.restype = ctypes.c_int
+lib.get_array_layout.argtypes = [ctypes.c_void_p,ctypes.c_int,
+                                 np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
+                                 np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                 np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
+lib.get_array_layout.restype = ctypes.c_int
+lib.reconstruct_showers.argtypes = [ctypes.c_int,ctypes.c_int,
+                                    np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS"),
+                                    np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                    np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                    np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                    np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                    np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS"),
+                                    ctypes.c_int,
+                                    np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]
+lib.reconstruct_showers.restype = ctypes.c_int
+lib.get_config_layout.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_int, flags="C_CONTIGUOUS")]
+lib.get_config_layout.restype = ctypes.c_long
+lib.get_config.argtypes = [ctypes.c_void_p,ctypes.c_int]+[np.ctypeslib.ndpointer(ctypes.c_double, flags="C_CONTIGUOUS")]*6
+lib.get_config.restype = ctypes.c_int
+lib.get_file_position.argtypes = [ctypes.c_void_p]
+lib.get_file_position.restype = ctypes.c_longlong
+lib.seek_file.argtypes = [ctypes.c_void_p,ctypes.c_longlong]
+lib.seek_file.restype = ctypes.c_int
+lib.scan_blocks.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_longlong, flags="C_CONTIGUOUS"),ctypes.c_int]
+lib.scan_blocks.restype = ctypes.c_int
+lib.build_access_points.argtypes = [ctypes.c_void_p,ctypes.c_longlong]
+lib.build_access_points.restype = ctypes.c_int
+lib.get_access_points.argtypes = [ctypes.c_void_p,np.ctypeslib.ndpointer(ctypes.c_longlong, flags="C_CONTIGUOUS"),
+                                  np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS")]
+lib.get_access_points.restype = ctypes.c_int
+lib.set_access_points.argtypes = [ctypes.c_void_p,ctypes.c_int,np.ctypeslib.ndpointer(ctypes.c_longlong, flags="C_CONTIGUOUS"),
+                                  np.ctypeslib.ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS")]
+lib.set_access_points.restype = ctypes.c_int
 
 
 TEL_INDEX_NOT_VALID  =-2
 
+# Top-level block types (see io_hess.h)
+IO_TYPE_HESS_RUNHEADER = 2000
+IO_TYPE_HESS_EVENT     = 2010
+IO_TYPE_HESS_MC_SHOWER = 2020
+IO_TYPE_HESS_MC_EVENT  = 2021
+
+# Block index: one row per top-level block, see build_index
+INDEX_DTYPE = np.dtype([('offset',np.int64),('length',np.int64),('type',np.int64),
+                        ('ident',np.int64),('run',np.int64),('glob_count',np.int64)])
+_INDEX_VERSION = 1
+_GZ_WINDOW_SIZE = 32768
+
+
+# Flags selecting which parts of an event are read (see io_hess.h)
+RAWDATA_FLAG   = 0x01
+RAWSUM_FLAG    = 0x02
+TRACKDATA_FLAG = 0x04|0x08
+IMG_PIXTM_FLAG = 0x100
+IMAGE_FLAG     = 0x10|0x20|0x40|0x80|IMG_PIXTM_FLAG
+TIME_FLAG      = 0x200
+ALL_FLAGS      = -1
+
+# Integration schemes of get_calibrated_image, numbered as in reconstruct.c
+INTEGRATORS = {'sums': 0,          # sums recorded in the data
+               'simple': 1,        # fixed window
+               'global_peak': 2,   # window around the global peak of significant pixels
+               'local_peak': 3,    # window around the peak of each pixel
+               'nb_peak': 4,       # window around the peak of the neighbours
+               'nb_local_peak': 5} # same, with the pixel itself weighted 3 times
+# Scale from mean p.e. to peak p.e., as in reconstruct.c
+CALIB_SCALE = 0.92
+# Fewer showers per thread of reconstruct_showers are not worth a thread
+_MIN_SHOWERS_PER_THREAD = 4096
+# Image parameters of get_image_parameters, in this order in the C library
+IMAGE_PARAMETERS = ('amplitude','num_pixels','x','y','phi','width','length',
+                    'skewness','kurtosis')
+
+# Compiled-in dimensions of AdcData arrays: H_MAX_GAINS, H_MAX_PIX, H_MAX_SLICES
+_adc_layout = np.zeros(3,dtype=np.int32)
+lib.get_adc_layout(_adc_layout)
+H_MAX_GAINS, H_MAX_PIX, H_MAX_SLICES = (int(dim) for dim in _adc_layout)
+
 class HessioGeneralError(Exception):
     def __init__(self, value):
         self.value = value
@@ -118,818 +383,2750 @@ class HessioChannelIndexError(Exception):
     def __str__(self):
         return repr(self.value)
 
-def move_to_next_event(limit=0):
+class EventFilter(object):
     """
-    Read data form input file
-    and fill corresponding container
-    Data can be then access with 
-    other available functions in
-    this module
-    By default all events are computed
+    Selection of events by move_to_next_event, evaluated in the
+    C reader from the central trigger data and the last MC shower,
+    before telescope data is decoded
 
     Parameters
     ----------
-    limit: int,optional
-        limit allows to limit the number of event generated
-    """
-    result = np.zeros(1,dtype=np.int32)
-    res = 0
-    evt_num = 0
-    while  res >= 0 and ( limit == 0 or evt_num < limit): 
-        res = lib.move_to_next_event(result)
-        if res != -1:
-            yield res,result[0]
-            evt_num = evt_num + 1
-
-def file_open(filename):
-    """
-    Open input data file 
-    
+    min_teltrg: int,optional
+        minimum number of triggered telescopes
+    energy_range: (float, float),optional
+        range of MC shower energy [TeV], bounds included.
+        Data without MC showers have energy 0.
+    telescopes: sequence of int,optional
+        IDs of telescopes of which at least one must have triggered
+    """
+    def __init__(self,min_teltrg=0,energy_range=None,telescopes=None):
+        self.min_teltrg = min_teltrg
+        self.energy_range = energy_range
+        self.telescopes = telescopes
+
+    def __repr__(self):
+        return "EventFilter(min_teltrg={!r}, energy_range={!r}, telescopes={!r})".format(
+            self.min_teltrg,self.energy_range,self.telescopes)
+
+def set_inprocess_decompression(enable):
+    """
+    Select how .gz, .bz2, .xz and .lzma files opened afterwards
+    are decompressed: inside the process (default, if the hessio
+    library was built with zlib, libbz2 and liblzma) or through
+    a pipe from an external gzip, bzip2, xz or lzma program.
+
     Parameters
     ----------
-    filename: str
-    
-    Returns
-    --------
-    0 in case of success, otherwise -1
+    enable: bool
     """
-    b_filename = filename.encode('utf-8')
-    return lib.file_open(b_filename)
+    lib.set_inprocess_decompression(int(bool(enable)))
 
-def close_file():
-    """
-    Close opened iobuf 
+def set_readahead_chunks(chunks):
     """
-    lib.close_file()
+    Set how many 1 MB chunks of decompressed data a background
+    thread may read ahead for compressed files opened afterwards,
+    so that decompression overlaps with event processing.
+    Only used with in-process decompression; 0 disables the thread.
 
-def get_global_event_count():
+    Parameters
+    ----------
+    chunks: int
     """
-    Returns
-    -------
-    counter for system trigger 
+    lib.set_readahead_chunks(int(chunks))
+
+def set_compact_buffers(enable):
     """
-    return lib.get_global_event_count()
+    Select how the per-telescope event buffers of runs read afterwards
+    are allocated. They are dimensioned for the largest camera the
+    library supports (H_MAX_PIX pixels, H_MAX_SLICES samples), of
+    which a camera only uses num_pixels, num_gains and num_samples.
+
+    With enable (default), the buffers are mapped directly from the
+    system: only the pages the camera actually fills become resident,
+    and they are given back when the run or the file is closed.
+    Otherwise they come from calloc, which clears them entirely when
+    reusing memory of a previous run.
 
-def get_run_number():
+    Parameters
+    ----------
+    enable: bool
     """
-    Returns
-    -------
-    run number read in data file
-    or -1 if not available
-    
-    Raises
-    ------
-    HessioGeneralError
-    If hsdata->run_header.run is not available
+    lib.set_compact_buffers(int(bool(enable)))
+
+# Reader statistics: enabled flag and calls, bytes and
+# nanoseconds of the arrays allocated for results
+_stats_enabled = False
+_allocation_stats = [0,0,0]
+_allocation_lock = threading.Lock()
+
+def set_stats(enable):
     """
-    run =  lib.get_run_number()
-    if run > 0 : return run
-    else:
-        raise(HessioGeneralError("run number not available"))
-        
+    Enable or disable the reader statistics returned by stats(),
+    off by default. They are kept for the whole process, for all
+    HessioFile objects, and only cost a few clock readings per
+    block while enabled.
 
-def get_num_telescope():
+    Parameters
+    ----------
+    enable: bool
     """
-    Returns
-    -------
-    number of telescopes in current run.
+    global _stats_enabled
+    _stats_enabled = bool(enable)
+    lib.set_stats(int(_stats_enabled))
+    if _fast is not None:
+        _fast.set_stats(_stats_enabled)
 
-    Raises
-    ------
-    HessioGeneralError
-    If hsdata->event.num_tel is not available
+def reset_stats():
     """
-    number =  lib.get_num_telescope()
-    if number > 0 : return number
-    else:
-        raise(HessioGeneralError("number of telescopes in current run not available"))
+    Set all reader statistics to zero
+    """
+    lib.reset_stats()
+    if _fast is not None:
+        _fast.reset_stats()
+    with _allocation_lock:
+        _allocation_stats[:] = [0,0,0]
 
-def get_num_tel_trig():
+def stats():
     """
     Returns
     -------
-    number How many telescopes triggered in Central Event
-
-    Raises
-    ------
-    HessioGeneralError
-    If hsdata is not available
-    """
-    number =  lib.get_num_tel_trig()
-    if number > 0 : return number
-    else:
-        raise(HessioGeneralError("number of triggered telescopes in central event not available"))
-    
-    
-def get_mirror_area(telescope_id):
+    dictionary of the reader statistics counted since they were
+    enabled or last reset:
+
+    - enabled: bool
+    - blocks: for each block type (item_header.type, -1 for types of
+      4096 and more), a dictionary of
+      blocks: number of blocks found,
+      bytes: their length,
+      decoded: number of blocks decoded by their read_hess_* function,
+      skipped: number of blocks skipped, or events not selected by the
+      event filter,
+      decode_ns: nanoseconds spent decoding them
+    - find_io_block, read_io_block, skip_io_block: calls, bytes (not
+      for find_io_block) and ns spent in these functions, including
+      the reading and decompression of the data
+    - decompression: calls, bytes_in (compressed), bytes_out
+      (decompressed), ns and throughput in MB/s of decompressed data,
+      of in-process decompression only
+    - allocation: calls, bytes and ns of the arrays allocated for the
+      results of the getters, as get_adc_sum, and of the bulk methods,
+      as get_event or iter_batches
+    """
+    types = np.zeros((4097,6),dtype=np.longlong)
+    totals = np.zeros(12,dtype=np.longlong)
+    ntypes = lib.get_stats(len(types),types,totals)
+    result = {'enabled': _stats_enabled}
+    result['blocks'] = {int(row[0]): {'blocks': int(row[1]), 'bytes': int(row[2]),
+                                      'decoded': int(row[3]), 'skipped': int(row[4]),
+                                      'decode_ns': int(row[5])}
+                        for row in types[:ntypes]}
+    result['find_io_block'] = {'calls': int(totals[0]), 'ns': int(totals[1])}
+    result['read_io_block'] = {'calls': int(totals[2]), 'bytes': int(totals[3]), 'ns': int(totals[4])}
+    result['skip_io_block'] = {'calls': int(totals[5]), 'bytes': int(totals[6]), 'ns': int(totals[7])}
+    result['decompression'] = {'calls': int(totals[8]), 'bytes_in': int(totals[9]),
+                               'bytes_out': int(totals[10]), 'ns': int(totals[11]),
+                               'throughput': totals[10] * 1e3 / totals[11] if totals[11] > 0 else 0.}
+    with _allocation_lock:
+        calls, nbytes, ns = _allocation_stats
+    if _fast is not None:
+        # Result arrays of the compiled fast paths
+        calls, nbytes, ns = [value + fast for value,fast in
+                             zip((calls,nbytes,ns),_fast.get_allocation_stats())]
+    result['allocation'] = {'calls': calls, 'bytes': nbytes, 'ns': ns}
+    return result
+
+def _zeros(shape,dtype):
     """
     Returns
     -------
-    total area of individual mirrors corrected
-    for inclination [m^2].
+    np.zeros(shape,dtype), counted in the allocation statistics
+    if they are enabled
+    """
+    if not _stats_enabled:
+        return np.zeros(shape,dtype=dtype)
+    start = time.perf_counter_ns()
+    array = np.zeros(shape,dtype=dtype)
+    elapsed = time.perf_counter_ns() - start
+    with _allocation_lock:
+        _allocation_stats[0] += 1
+        _allocation_stats[1] += array.nbytes
+        _allocation_stats[2] += elapsed
+    return array
+
+class _EventBuffer(object):
+    """
+    Memory of a view of the current event (the base of AdcView): keeps
+    the reader alive, and the C buffer from being overwritten or freed,
+    as long as the view or any array taken from it exists
 
     Parameters
     ----------
-    telescope_id: int
-    
-    Raises
-    ------
-    HessioGeneralError
-    if hsdata->camera_set[itel].mirror_area not available
-
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    """
-    
-    data = np.zeros(1,dtype=np.double)
-    result = lib.get_mirror_area(telescope_id,data)
-    if result == 0:
-        return data[0]
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    raise(HessioGeneralError("hsdata->camera_set[itel].mirror_area not available"))
-
-def get_telescope_with_data_list():
+    reader: HessioFile
+    data: ctypes pointer
+        start of the C array
+    shape: tuple of int
+        shape of the C array
+    """
+    def __init__(self,reader,data,shape):
+        self.reader = reader
+        self.address = None
+        self.generation = lib.get_generation(reader._file)
+        if lib.pin_buffers(reader._file,ctypes.addressof(data.contents),1) < 0:
+            raise(HessioGeneralError("no event data at this address"))
+        self.address = ctypes.addressof(data.contents)
+        self.__array_interface__ = {'version': 3, 'shape': shape,
+                                    'typestr': np.dtype(data._type_).str,
+                                    'data': (self.address, True)}
+
+    def __del__(self):
+        if self.address is not None and getattr(self.reader,'_file',None):
+            lib.pin_buffers(self.reader._file,self.address,-1)
+
+    def is_current(self):
+        return lib.get_generation(self.reader._file) == self.generation
+
+def _current_array_method(name):
     """
     Returns
     -------
-    list of telescope with data for current event
+    method name of np.ndarray for AdcView, applied to the data
+    if the event is still current
+    """
+    method = getattr(np.ndarray,name)
+    @functools.wraps(method)
+    def function(self,*args,**kwargs):
+        return method(self._array(),*args,**kwargs)
+    return function
+
+class AdcView(np.ndarray):
+    """
+    Read-only view of the data of the current event, see
+    HessioFile.get_adc_sum_view. Once another event is read or the file
+    is closed, using it raises HessioGeneralError: copy() it before to
+    keep the data. Arrays computed from it are ordinary copies, and
+    plain arrays taken with np.asarray keep the data of its event.
+    """
+    def __array_finalize__(self,obj):
+        self._buffer = getattr(obj,'_buffer',None)
+
+    @property
+    def base(self):
+        """ the memory viewed: keeps the reader, as base.reader """
+        return self._buffer if self._buffer is not None else np.ndarray.base.__get__(self)
+
+    def is_current(self):
+        return self._buffer is None or self._buffer.is_current()
+
+    def _array(self):
+        """ this view as plain ndarray, if the event is still current """
+        if not self.is_current():
+            raise(HessioGeneralError("view of an event no longer current: "
+                                     "copy() it before reading another event"))
+        return self.view(np.ndarray)
+
+    def __getitem__(self,key):
+        result = self._array()[key]
+        if isinstance(result,np.ndarray):
+            result = result.view(AdcView)
+            result._buffer = self._buffer
+        return result
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def __array_ufunc__(self,ufunc,method,*inputs,**kwargs):
+        inputs = _plain_arrays(inputs)
+        if 'out' in kwargs:
+            kwargs['out'] = _plain_arrays(kwargs['out'])
+        return getattr(ufunc,method)(*inputs,**kwargs)
+
+    def __array_function__(self,func,types,args,kwargs):
+        return func(*_plain_arrays(args),**_plain_arrays(kwargs))
+
+    def __repr__(self):
+        if not self.is_current():
+            return "AdcView(<event no longer current>, shape={})".format(self.shape)
+        return repr(self._array())
 
-    Raises
-    ------
-    HessioGeneralError
-    if information is not available
-    """
+    def __str__(self):
+        return str(self._array()) if self.is_current() else repr(self)
 
-    try: 
-        return get_teldata_list()
-    except:
-        raise(HessioGeneralError("hsdata->event.teldata_list is not available"))
-        
+    def __reduce__(self):
+        return self.copy().__reduce__()
 
-def get_teldata_list():
+# Checked before numpy dispatches them, as numpy leaks the array
+# when __array_ufunc__ raises in a reduction
+for _name in ('all','any','argmax','argmin','astype','copy','cumprod','cumsum',
+              'item','max','mean','min','prod','std','sum','tobytes','tolist','var'):
+    setattr(AdcView,_name,_current_array_method(_name))
+del _name
+
+def _plain_arrays(value):
     """
     Returns
     -------
-    list of IDs of telescopes with data for current event
-
-    Raises
-    ------
-    HessioGeneralError
-    if information is not available
+    value with AdcView found in it, also in lists, tuples and
+    dictionaries, as plain ndarray
     """
-    num_teldata= get_num_teldata()
-    if num_teldata >= 0:
-        array = np.zeros(num_teldata,dtype=np.int32)
-        lib.get_telescope_with_data_list(array)
-        return array
-    else:
-        raise(HessioGeneralError("hsdata->event.num_teldata is not available"))
-
+    if isinstance(value,AdcView):
+        return value._array()
+    if isinstance(value,(list,tuple)):
+        return type(value)(_plain_arrays(item) for item in value)
+    if isinstance(value,dict):
+        return {key: _plain_arrays(item) for key,item in value.items()}
+    return value
 
-def get_num_teldata():
+def _event_view(reader,data,shape,view_shape):
     """
     Returns
     -------
-    number of telescopes for which we actually have data
-    
-    Raises
-    ------
-    HessioGeneralError
-        If hsdata->event.num_teldata is not available
+    read-only AdcView of the view_shape corner of the C array
+    of shape at data, in the current event of reader
     """
-      
-    number =  lib.get_num_teldata()
-    if number > 0:
-        return number
-    else:
-        raise(HessioGeneralError("hsdata->event.num_teldata is not available"))
+    buffer = _EventBuffer(reader,data,shape)
+    full = np.asarray(buffer)
+    view = full[tuple(slice(0,size) for size in view_shape)].view(AdcView)
+    view.flags.writeable = False
+    view._buffer = buffer
+    return view
 
-def get_num_channel(telescope_id):
+def _integration_params(integrator,window,offset,threshold,rescale):
     """
     Returns
     -------
-    type of channel used
-    HI_GAIN          0     /**< Index to high-gain channels in adc_sum, adc_sample, pedestal, ... */
-    LO_GAIN          1     /**< Index to low-gain channels in adc_sum, adc_sample, pedestal, ... */
-
-    Parameters
-    ----------
-    telescope_id: int
+    scheme number and int32 array of the parameters of get_calibrated_image
 
     Raises
     ------
     HessioGeneralError
-        If hsdata->event.teldata[itel].raw
-    HessioTelescopeIndexError 
-        if no telescope exist with this id
+    if the integrator is not known or the window is empty
     """
-    result =  lib.get_num_channel(telescope_id)
-    if result >= 0: return result
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError(" hsdata->event.teldata[itel].raw not available"))
-        
+    if integrator not in INTEGRATORS:
+        raise(HessioGeneralError("unknown integrator " + str(integrator)))
+    if INTEGRATORS[integrator] > 0 and window < 1:
+        raise(HessioGeneralError("integration window must be at least one sample"))
+    threshold_hg, threshold_lg = threshold
+    params = np.array([window,offset,threshold_hg,threshold_lg,int(bool(rescale))],dtype=np.int32)
+    return INTEGRATORS[integrator], params
 
-def get_num_pixels(telescope_id):
+def _calibration_options(integrator,options):
     """
     Returns
     -------
-    the number of pixels in the camera (as in configuration)
-
-    Parameters
-    ----------
-    telescope_id: int
+    integrator, parameters, calib_scale and clip_amp arguments of
+    get_calibrated_event for the options of get_calibrated_image
 
     Raises
     ------
     HessioGeneralError
-        If  hsdata->camera_set[itel].num_pixels
-
-    HessioTelescopeIndexError
-        if no telescope exist with this id
+    if an option or the integrator is not known
     """
-    result = lib.get_num_pixels(telescope_id)
-    if result >= 0 : return result
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("hsdata->camera_set[itel].num_pixels not available"))
-        
+    unknown = set(options).difference(('window','offset','threshold','rescale',
+                                       'calib_scale','clip_amp'))
+    if unknown:
+        raise(HessioGeneralError("unknown options " + ", ".join(sorted(unknown))))
+    scheme, params = _integration_params(integrator,options.get('window',7),
+                                         options.get('offset',3),options.get('threshold',(0,0)),
+                                         options.get('rescale',True))
+    return (scheme, params, options.get('calib_scale',CALIB_SCALE), options.get('clip_amp',0.))
 
-def get_pixel_timing_threshold(telescope_id):
+def _image_options(integrator,options):
     """
     Returns
     -------
-    PixelTiming threshold:
-    - Minimum base-to-peak raw amplitude difference applied in pixel selection
-
-    Parameters
-    ----------
-    telescope_id: int
+    integrator, parameters and cuts arguments of get_image_parameters
+    for the options of get_image_parameters
 
     Raises
     ------
     HessioGeneralError
-        If hsdata->event.teldata[itel].pixtm
-    HessioTelescopeIndexError
-        if no telescope exist with this id
+    if an option or the integrator is not known
     """
-    threshold = np.zeros(1,dtype=np.int32)
-    result = lib.get_pixel_timing_threshold(telescope_id,threshold)
-    if result == 0: return threshold[0]
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("hsdata->event.teldata[itel].pixtm not available"))
-       
+    options = dict(options)
+    cleaning = [options.pop(name,default) for name, default in
+                (('tailcut_low',5.),('tailcut_high',10.),('minfrac',0.),('lref',0))]
+    scheme, params, calib_scale, clip_amp = _calibration_options(integrator,options)
+    cuts = np.array([calib_scale,clip_amp] + cleaning,dtype=np.double)
+    return scheme, params, cuts
 
-def get_pixel_timing_peak_global(telescope_id):
-    
+def _image_parameter_columns(parameters):
     """
-    Returns 
+    Returns
     -------
-    PixelTiming peak_global:
-     - Camera-wide (mean) peak position [time slices]
+    dictionary of the columns of parameters (..., len(IMAGE_PARAMETERS))
+    by name of IMAGE_PARAMETERS, num_pixels as int32
+    """
+    columns = {name: parameters[...,position] for position, name in enumerate(IMAGE_PARAMETERS)}
+    columns['num_pixels'] = columns['num_pixels'].astype(np.int32)
+    return columns
+
+def reconstruct_showers(images,positions,direction,min_amplitude=80.,min_pixels=2,
+                        max_cog=np.inf,use_direction=False,workers=None):
+    """
+    Geometric reconstruction of the direction and core position of
+    many showers from their image parameters, by intersection of the
+    image axes as shower_reconstruct of reconstruct.c. Events are
+    split across worker threads, each reconstructing its share in a
+    single call into the C library.
 
     Parameters
     ----------
-    telescope_id: int
+    images: mapping
+        a batch of iter_image_parameters: mask, amplitude, num_pixels,
+        x, y, phi, width, length, tel_az and tel_alt, (nevt, ntel) arrays
+    positions: (ntel, 3) array
+        telescope positions [m], see get_array_layout
+    direction: (2) or (nevt, 2) array
+        nominal azimuth and altitude [rad], see get_array_layout
+    min_amplitude: float,optional
+        minimum amplitude of the images used [peak p.e.]
+    min_pixels: int,optional
+        minimum number of pixels of the images used
+    max_cog: float,optional
+        maximum distance of the image centre of gravity
+        from the camera centre [rad]
+    use_direction: bool,optional
+        derive the core position assuming the nominal direction
+        instead of the reconstructed direction
+    workers: int,optional
+        number of threads, by default the number of CPUs
+
+    Returns
+    -------
+    dictionary of (nevt) arrays:
+        - azimuth, altitude [rad]
+        - core_x, core_y [m]
+        - direction_error [rad], core_error [m]: with more than 2 images
+        - num_images: number of images used
+        - result_bits: 1 direction, 2 uncertainties, 4 core position
+    NaN for what could not be reconstructed
 
     Raises
     ------
     HessioGeneralError
-    If hsdata->event.teldata[itel].pixtm; not available
-
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    """
-    
-    peak = np.zeros(1,dtype=np.float32)
-    result = lib.get_pixel_timing_peak_global(telescope_id,peak)
-    if result == 0: return peak[0]
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+    if there are too many telescopes
+    """
+    mask = np.ascontiguousarray(images['mask'],dtype=np.uint8)
+    nevt, ntel = mask.shape
+    parameters = np.ascontiguousarray(np.stack([images[name] for name in IMAGE_PARAMETERS],axis=-1),
+                                      dtype=np.double)
+    pointing = np.ascontiguousarray(np.stack([images['tel_az'],images['tel_alt']],axis=-1),
+                                    dtype=np.double)
+    positions = np.ascontiguousarray(positions,dtype=np.double).reshape(ntel,3)
+    reference = np.ascontiguousarray(np.broadcast_to(np.asarray(direction,dtype=np.double),
+                                                     (nevt,2)))
+    cuts = np.array([min_amplitude,min_pixels,max_cog],dtype=np.double)
+    showers = _zeros((nevt,8),dtype=np.double)
+
+    def reconstruct(chunk):
+        return lib.reconstruct_showers(len(showers[chunk]),ntel,mask[chunk],parameters[chunk],
+                                       pointing[chunk],positions,reference[chunk],cuts,
+                                       int(bool(use_direction)),showers[chunk])
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    size = max(-(-nevt // workers),_MIN_SHOWERS_PER_THREAD)
+    chunks = [slice(start,start + size) for start in range(0,nevt,size)]
+    if len(chunks) > 1:
+        with concurrent.futures.ThreadPoolExecutor(len(chunks)) as executor:
+            results = list(executor.map(reconstruct,chunks))
     else:
-        raise(HessioGeneralError("hsdata->event.teldata[itel].pixtm; not available"))
-        
+        results = [reconstruct(chunk) for chunk in chunks]
+    if any(result < 0 for result in results):
+        raise(HessioGeneralError("too many telescopes"))
+    return {'azimuth': showers[:,0], 'altitude': showers[:,1],
+            'core_x': showers[:,2], 'core_y': showers[:,3],
+            'direction_error': showers[:,4], 'core_error': showers[:,5],
+            'num_images': showers[:,6].astype(np.int32),
+            'result_bits': showers[:,7].astype(np.int32)}
 
-def get_pixel_timing_num_times_types(telescope_id):
+class HessioFile(object):
     """
-    Returns
-    -------
-    how many different types of times can we store
+    Reader of one simtel/hessio data file
+
+    Every instance has its own reading state (run header,
+    current event, I/O buffer), so several files can be
+    read at the same time. The module-level functions work
+    on a default instance shared by all of them.
+
+    Calls into the C library release the GIL while blocks are
+    read and decoded, so files can be read in parallel threads,
+    e.g. with concurrent.futures.ThreadPoolExecutor, as long as
+    each thread uses its own HessioFile.
 
     Parameters
     ----------
-    telescope_id: int
+    filename: str,optional
+        data file to open at creation, see file_open
+    what: int,optional
+        parts of the events to decode, see file_open
+    telescopes: sequence of int,optional
+        telescopes whose data is decoded, see file_open
 
     Raises
     ------
     HessioGeneralError
-    If hsdata->event.teldata[itel].pixtm->num_types not available
+    if the reader can not be allocated or the file can not be opened
+    """
+    def __init__(self,filename=None,what=ALL_FLAGS,telescopes=None):
+        self._filename = None
+        self._index = None
+        self._config = dict()
+        self._neighbour_graphs = dict()
+        self._skimmer = None
+        self._file = lib.allocate_hessio_file()
+        if not self._file:
+            raise(HessioGeneralError("could not allocate hessio file"))
+        if filename is not None and self.file_open(filename,what,telescopes) != 0:
+            raise(HessioGeneralError("could not open " + filename))
+
+    def __del__(self):
+        if getattr(self,'_file',None):
+            lib.free_hessio_file(self._file)
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc_info):
+        self.close_file()
+
+    def set_event_filter(self,filter):
+        """
+        Select the events read afterwards by move_to_next_event
+        and iter_batches. Other events are skipped before their
+        telescope data is decoded.
+
+        Parameters
+        ----------
+        filter: EventFilter, dict of EventFilter arguments or None
+            None removes the selection
+
+        Raises
+        ------
+        HessioGeneralError
+        if there are too many telescopes
+        """
+        if filter is None:
+            lib.set_event_filter(self._file,0,0,0.,0.,0,np.zeros(0,dtype=np.int32))
+            return
+        if isinstance(filter,dict):
+            filter = EventFilter(**filter)
+        min_energy, max_energy = (-np.inf, np.inf) if filter.energy_range is None else filter.energy_range
+        if filter.telescopes is None:
+            tel_ids = np.zeros(0,dtype=np.int32)
+        else:
+            tel_ids = np.ascontiguousarray(filter.telescopes,dtype=np.int32)
+        if lib.set_event_filter(self._file,1,int(filter.min_teltrg),min_energy,max_energy,
+                                len(tel_ids),tel_ids) != 0:
+            raise(HessioGeneralError("too many telescopes in event filter"))
+
+    def move_to_next_event(self,limit=0,what=None,filter=None):
+        """
+        Read data form input file
+        and fill corresponding container
+        Data can be then access with 
+        other available functions in
+        this module
+        By default all events are computed
+
+        Parameters
+        ----------
+        limit: int,optional
+            limit allows to limit the number of event generated
+        what: int,optional
+            parts of the events to decode, a combination of
+            RAWDATA_FLAG, RAWSUM_FLAG, TRACKDATA_FLAG, IMAGE_FLAG,
+            IMG_PIXTM_FLAG and TIME_FLAG. Other parts are skipped.
+            By default the selection given to file_open is kept.
+        filter: EventFilter or dict,optional
+            events to select, see set_event_filter. It is kept for
+            the following reads; by default the current one is kept.
+        """
+        if what is not None:
+            lib.set_read_what(self._file,what)
+        if filter is not None:
+            self.set_event_filter(filter)
+        result = _zeros(1,dtype=np.int32)
+        res = 0
+        evt_num = 0
+        while  res >= 0 and ( limit == 0 or evt_num < limit): 
+            if _fast is not None:
+                res, event_id = _fast.move_to_next_event(self._file)
+            else:
+                res = lib.move_to_next_event(self._file,result)
+                event_id = result[0]
+            if res != -1:
+                yield res,event_id
+                evt_num = evt_num + 1
+
+    def iter_batches(self,batch_size,fields=('adc_sums',),telescopes=None,limit=0):
+        """
+        Read the events in batches, filled in a single call
+        per batch into arrays with an event and a telescope axis
+
+        The arrays are allocated once and filled again for every
+        batch: copy what has to be kept beyond the next iteration.
+        A batch holds events of one run only, so it can be shorter
+        than batch_size at the end of a run. Once a batch is returned,
+        the reader may already have read the next run: use the
+        configuration given with the batch.
+
+        Parameters
+        ----------
+        batch_size: int
+        fields: sequence of str,optional
+            among 'adc_sums', 'adc_samples', 'timval', 'peak_global'
+        telescopes: sequence of int,optional
+            IDs of the telescopes along the telescope axis,
+            by default all telescopes of the run
+        limit: int,optional
+            maximum number of events, by default all
+
+        Returns
+        -------
+        generator of dictionaries, for a batch of nevt events with ntel telescopes:
+            - run, event_id, glob_count, num_tel_trig: (nevt)
+            - mc_shower_energy, mc_shower_azimuth, mc_shower_altitude,
+              mc_event_xcore, mc_event_ycore: (nevt)
+            - tel_id: (ntel)
+            - config: (ntel) tuple of get_telescope_config of the run
+              of the batch, None for telescopes not in the run
+            - mask: (nevt, ntel), True for telescopes with data
+            - adc_sums: (nevt, ntel, max_gains, max_pixels)
+            - adc_samples: (nevt, ntel, max_gains, max_pixels, max_samples)
+            - timval: (nevt, ntel, max_pixels, max_times)
+            - peak_global: (nevt, ntel)
+        padded with zeros, for the fields asked for
+
+        Raises
+        ------
+        HessioGeneralError
+        if a field is not known
+        """
+        flags = {'adc_sums': RAWSUM_FLAG, 'adc_samples': RAWDATA_FLAG,
+                 'timval': TIME_FLAG, 'peak_global': TIME_FLAG}
+        what = 0
+        for field in fields:
+            if field not in flags:
+                raise(HessioGeneralError("unknown field " + str(field)))
+            what |= flags[field]
+
+        layout = _zeros(5,dtype=np.int32)
+        dims = None
+        tel_ids = None
+        nevents = 0
+        while limit == 0 or nevents < limit:
+            run = lib.peek_event(self._file)
+            if run < 0:
+                break
+            if telescopes is not None:
+                ids = np.ascontiguousarray(telescopes,dtype=np.int32)
+            else:
+                ids = self.get_telescope_ids()
+            lib.get_batch_layout(self._file,len(ids),ids,layout)
+            config = list()
+            for tel_id in ids:
+                try:
+                    config.append(self.get_telescope_config(int(tel_id)))
+                except HessioTelescopeIndexError:
+                    config.append(None)
+
+            # (Re)allocate only for other telescopes or larger events
+            if dims is None or not np.array_equal(ids,tel_ids) or np.any(layout > dims):
+                if dims is None or not np.array_equal(ids,tel_ids):
+                    dims = layout.copy()
+                else:
+                    dims = np.maximum(dims,layout)
+                tel_ids = ids
+                ntel, ngain, npix, nsamp, ntimes = (int(dim) for dim in dims)
+                event_info = _zeros((batch_size,4),dtype=np.int32)
+                mc_values = _zeros((batch_size,5),dtype=np.double)
+                mask = _zeros((batch_size,ntel),dtype=np.uint8)
+                adc_sums = _zeros((batch_size,ntel,ngain,npix) if what & RAWSUM_FLAG else 0,
+                                 dtype=np.uint32)
+                adc_samples = _zeros((batch_size,ntel,ngain,npix,nsamp) if what & RAWDATA_FLAG else 0,
+                                    dtype=np.uint16)
+                timval = _zeros((batch_size,ntel,npix,ntimes) if what & TIME_FLAG else 0,
+                               dtype=np.float32)
+                peak_global = _zeros((batch_size,ntel) if what & TIME_FLAG else 0,
+                                    dtype=np.float32)
+                buffers = {'adc_sums': adc_sums, 'adc_samples': adc_samples,
+                           'timval': timval, 'peak_global': peak_global}
+
+            size = batch_size if limit == 0 else min(batch_size,limit - nevents)
+            count = lib.read_batch(self._file,what,size,len(tel_ids),tel_ids,dims,
+                                   event_info,mask,adc_sums,adc_samples,timval,peak_global,
+                                   mc_values)
+            if count <= 0:
+                break
+            nevents += count
+            batch = {'run': event_info[:count,0],
+                     'event_id': event_info[:count,1],
+                     'glob_count': event_info[:count,2],
+                     'num_tel_trig': event_info[:count,3],
+                     'mc_shower_energy': mc_values[:count,0],
+                     'mc_shower_azimuth': mc_values[:count,1],
+                     'mc_shower_altitude': mc_values[:count,2],
+                     'mc_event_xcore': mc_values[:count,3],
+                     'mc_event_ycore': mc_values[:count,4],
+                     'tel_id': tel_ids,
+                     'config': tuple(config),
+                     'mask': mask[:count].view(np.bool_)}
+            for field in fields:
+                batch[field] = buffers[field][:count]
+            yield batch
+
+    def get_neighbours(self,telescope_id):
+        """
+        Returns
+        -------
+        (num_pixels, 8) array of int32: the neighbours of each pixel,
+        padded with -1, as used by the neighbour peak integration.
+        Pixels are neighbours if their distance is below 0.707 times
+        the sum of their sizes.
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+        if the camera settings are not available
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        npix = lib.get_neighbours(self._file,telescope_id,0,np.zeros(0,dtype=np.int32))
+        if npix == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope with id " + str(telescope_id)))
+        if npix < 0:
+            raise(HessioGeneralError("no camera settings for telescope " + str(telescope_id)))
+        neighbours = _zeros((npix,8),dtype=np.int32)
+        lib.get_neighbours(self._file,telescope_id,npix,neighbours)
+        return neighbours
+
+    def get_calibrated_image(self,telescope_id,integrator='sums',window=7,offset=3,
+                             threshold=(0,0),rescale=True,calib_scale=CALIB_SCALE,clip_amp=0.):
+        """
+        Calibrated image of a telescope of the current event, computed
+        as in reconstruct.c: sums integrated from the samples with one of
+        its schemes (or the recorded sums), pedestal subtracted and
+        multiplied by the laser calibration, from the high gain unless
+        it is saturated. The data read are left unchanged.
+        Without samples, the recorded sums are used whatever the integrator.
+        Without raw data, calibrated pixel data are used if available.
+
+        Parameters
+        ----------
+        telescope_id: int
+        integrator: str,optional
+            key of INTEGRATORS
+        window: int,optional
+            number of samples integrated
+        offset: int,optional
+            samples skipped by 'simple', samples before the peak else
+        threshold: (int,int),optional
+            high-gain and low-gain amplitudes [ADC counts above pedestal]
+            of a significant signal, for the peak finding schemes
+        rescale: bool,optional
+            correct for the part of the reference pulse outside the window
+        calib_scale: float,optional
+            scale applied to the calibrated amplitude
+        clip_amp: float,optional
+            upper limit of the amplitude before calib_scale if > 0
+
+        Returns
+        -------
+        image: array of float64 of num_pixels, amplitudes [peak p.e.],
+            0 for pixels without signal
+        peak_time: array of float32 of num_pixels, peak position
+            [time slices] from integration or pixel timing, -1 if not known
+
+        Raises
+        ------
+        HessioGeneralError
+        if the integrator is not known or there is no data for this telescope
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        scheme, params = _integration_params(integrator,window,offset,threshold,rescale)
+        npix = self.get_num_pixels(telescope_id)
+        image = _zeros(npix,dtype=np.double)
+        peak_time = _zeros(npix,dtype=np.float32)
+        result = lib.get_calibrated_image(self._file,telescope_id,scheme,params,calib_scale,
+                                          clip_amp,image,peak_time)
+        if result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope with id " + str(telescope_id)))
+        if result < 0:
+            raise(HessioGeneralError("no calibrated image for telescope " + str(telescope_id)))
+        return image, peak_time
+
+    def get_calibrated_images(self,integrator='sums',telescopes=None,**options):
+        """
+        Calibrated images of all telescopes of the current event,
+        filled in a single call, see get_calibrated_image
+
+        Parameters
+        ----------
+        integrator: str,optional
+            key of INTEGRATORS
+        telescopes: sequence of int,optional
+            IDs of the telescopes along the telescope axis,
+            by default all telescopes of the run
+        options:
+            window, offset, threshold, rescale, calib_scale and
+            clip_amp of get_calibrated_image
+
+        Returns
+        -------
+        dictionary, for ntel telescopes:
+            - tel_id: (ntel)
+            - mask: (ntel), True for telescopes with data
+            - image: (ntel, max_pixels), 0 for telescopes without data
+            - peak_time: (ntel, max_pixels), -1 if not known
+
+        Raises
+        ------
+        HessioGeneralError
+        if the integrator is not known or hsdata is not available
+        """
+        calibration = _calibration_options(integrator,options)
+        if telescopes is not None:
+            tel_ids = np.ascontiguousarray(telescopes,dtype=np.int32)
+        else:
+            tel_ids = self.get_telescope_ids()
+        layout = _zeros(5,dtype=np.int32)
+        lib.get_batch_layout(self._file,len(tel_ids),tel_ids,layout)
+        mask = _zeros(len(tel_ids),dtype=np.uint8)
+        image = _zeros((len(tel_ids),layout[2]),dtype=np.double)
+        peak_time = _zeros((len(tel_ids),layout[2]),dtype=np.float32)
+        result = lib.get_calibrated_event(self._file,*calibration,len(tel_ids),tel_ids,
+                                          int(layout[2]),mask,image,peak_time)
+        if result < 0:
+            raise(HessioGeneralError("hsdata is not available"))
+        return {'tel_id': tel_ids, 'mask': mask.view(np.bool_),
+                'image': image, 'peak_time': peak_time}
+
+    def iter_calibrated_images(self,batch_size,integrator='sums',telescopes=None,limit=0,
+                               **options):
+        """
+        Read the events in batches and calibrate the images of each
+        event in a single call, see get_calibrated_image
+
+        The arrays are allocated once and filled again for every
+        batch: copy what has to be kept beyond the next iteration.
+        A batch holds events of one run only, so it can be shorter
+        than batch_size at the end of a run.
+
+        Parameters
+        ----------
+        batch_size: int
+        integrator: str,optional
+            key of INTEGRATORS
+        telescopes: sequence of int,optional
+            IDs of the telescopes along the telescope axis,
+            by default all telescopes of the run
+        limit: int,optional
+            maximum number of events, by default all
+        options:
+            window, offset, threshold, rescale, calib_scale and
+            clip_amp of get_calibrated_image
+
+        Returns
+        -------
+        generator of dictionaries, for a batch of nevt events with ntel telescopes:
+            - run, event_id: (nevt)
+            - tel_id: (ntel)
+            - mask: (nevt, ntel), True for telescopes with data
+            - image: (nevt, ntel, max_pixels)
+            - peak_time: (nevt, ntel, max_pixels)
+
+        Raises
+        ------
+        HessioGeneralError
+        if the integrator is not known
+        """
+        calibration = _calibration_options(integrator,options)
+        layout = _zeros(5,dtype=np.int32)
+        tel_ids = None
+        npix = -1
+        nevents = 0
+        while limit == 0 or nevents < limit:
+            if lib.peek_event(self._file) < 0:
+                break
+            if telescopes is not None:
+                ids = np.ascontiguousarray(telescopes,dtype=np.int32)
+            else:
+                ids = self.get_telescope_ids()
+            lib.get_batch_layout(self._file,len(ids),ids,layout)
+
+            # (Re)allocate only for other telescopes or larger cameras
+            if tel_ids is None or not np.array_equal(ids,tel_ids) or layout[2] > npix:
+                tel_ids = ids
+                npix = int(layout[2])
+                event_info = _zeros((batch_size,2),dtype=np.int32)
+                mask = _zeros((batch_size,len(tel_ids)),dtype=np.uint8)
+                image = _zeros((batch_size,len(tel_ids),npix),dtype=np.double)
+                peak_time = _zeros((batch_size,len(tel_ids),npix),dtype=np.float32)
+
+            size = batch_size if limit == 0 else min(batch_size,limit - nevents)
+            count = lib.read_calibrated_images(self._file,size,*calibration,len(tel_ids),tel_ids,
+                                               npix,event_info,mask,image,peak_time)
+            if count < 0:
+                raise(HessioGeneralError("hsdata is not available"))
+            if count == 0:
+                break
+            nevents += count
+            yield {'run': event_info[:count,0],
+                   'event_id': event_info[:count,1],
+                   'tel_id': tel_ids,
+                   'mask': mask[:count].view(np.bool_),
+                   'image': image[:count],
+                   'peak_time': peak_time[:count]}
+
+    def get_neighbour_graph(self,telescope_id):
+        """
+        Neighbours of the pixels of a telescope as a sparse matrix,
+        as used by the image cleaning, see get_neighbours. Cached
+        as get_telescope_config.
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix of bool (num_pixels, num_pixels),
+        True for neighbours
+
+        Raises
+        ------
+        HessioGeneralError
+        if the camera settings are not available
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
 
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    """
-    result = lib.get_pixel_timing_num_times_types(telescope_id)
-    if result >= 0: return result
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("hsdata->event.teldata[itel].pixtm->num_types  not available"))
+        ImportError
+        if scipy is not installed
+        """
+        try:
+            import scipy.sparse
+        except ImportError as err:
+            raise ImportError("scipy is required for neighbour graphs: {}".format(err))
+        version = self.get_telescope_config(telescope_id)['version']
+        cached = self._neighbour_graphs.get(telescope_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        neighbours = self.get_neighbours(telescope_id)
+        valid = neighbours >= 0
+        indptr = _zeros(len(neighbours) + 1,dtype=np.int32)
+        np.cumsum(valid.sum(axis=1),out=indptr[1:])
+        graph = scipy.sparse.csr_matrix((np.ones(indptr[-1],dtype=np.bool_),neighbours[valid],indptr),
+                                        shape=(len(neighbours),len(neighbours)))
+        graph.sort_indices()
+        self._neighbour_graphs[telescope_id] = (version, graph)
+        return graph
+
+    def get_image_parameters(self,integrator='sums',telescopes=None,**options):
+        """
+        Calibrated images of all telescopes of the current event,
+        cleaned with dual-level tail cuts and parametrized with their
+        second moments (Hillas parameters), in a single call, as
+        clean_image_tailcut and second_moments of reconstruct.c
+
+        Image pixels are the pixels above tailcut_high with a neighbour
+        above tailcut_low and the pixels above tailcut_low with a
+        neighbour above tailcut_high.
+
+        Parameters
+        ----------
+        integrator: str,optional
+            key of INTEGRATORS
+        telescopes: sequence of int,optional
+            IDs of the telescopes along the telescope axis,
+            by default all telescopes of the run
+        options:
+            tailcut_low, tailcut_high: float, thresholds [peak p.e.],
+                by default 5 and 10
+            lref, minfrac: drop the pixels below minfrac times the
+                amplitude of the lref-th brightest pixel, if both > 0
+            window, offset, threshold, rescale, calib_scale and
+            clip_amp of get_calibrated_image
+
+        Returns
+        -------
+        dictionary, for ntel telescopes:
+            - tel_id: (ntel)
+            - mask: (ntel), True for telescopes with data
+            - image: (ntel, max_pixels), 0 for telescopes without data
+            - image_pixels: (ntel, max_pixels), True for pixels kept by the cleaning
+            - amplitude [peak p.e.], num_pixels: (ntel), of the cleaned image
+            - x, y, phi, width, length [rad], skewness, kurtosis: (ntel),
+              NaN for images of less than 2 pixels or 1 p.e.
+            - tel_az, tel_alt: (ntel), telescope pointing [rad], NaN if not known
+        x, y are the centre of gravity, phi the direction of the
+        major axis, all angles as seen from the telescope.
+
+        Raises
+        ------
+        HessioGeneralError
+        if an option or the integrator is not known or hsdata is not available
+        """
+        scheme, params, cuts = _image_options(integrator,options)
+        if telescopes is not None:
+            tel_ids = np.ascontiguousarray(telescopes,dtype=np.int32)
+        else:
+            tel_ids = self.get_telescope_ids()
+        layout = _zeros(5,dtype=np.int32)
+        lib.get_batch_layout(self._file,len(tel_ids),tel_ids,layout)
+        mask = _zeros(len(tel_ids),dtype=np.uint8)
+        image = _zeros((len(tel_ids),layout[2]),dtype=np.double)
+        image_pixels = _zeros((len(tel_ids),layout[2]),dtype=np.uint8)
+        parameters = _zeros((len(tel_ids),len(IMAGE_PARAMETERS)),dtype=np.double)
+        pointing = _zeros((len(tel_ids),2),dtype=np.double)
+        result = lib.get_image_parameters(self._file,scheme,params,cuts,len(tel_ids),tel_ids,
+                                          int(layout[2]),mask,image,image_pixels,parameters,
+                                          pointing)
+        if result < 0:
+            raise(HessioGeneralError("hsdata is not available"))
+        event = {'tel_id': tel_ids, 'mask': mask.view(np.bool_),
+                 'image': image, 'image_pixels': image_pixels.view(np.bool_),
+                 'tel_az': pointing[:,0], 'tel_alt': pointing[:,1]}
+        event.update(_image_parameter_columns(parameters))
+        return event
+
+    def iter_image_parameters(self,batch_size,integrator='sums',telescopes=None,limit=0,
+                              **options):
+        """
+        Read the events in batches and compute the image parameters
+        of every telescope of a whole batch in a single call,
+        see get_image_parameters
+
+        A batch holds events of one run only, so it can be shorter
+        than batch_size at the end of a run.
+
+        Parameters
+        ----------
+        batch_size: int
+        integrator: str,optional
+            key of INTEGRATORS
+        telescopes: sequence of int,optional
+            IDs of the telescopes along the telescope axis,
+            by default all telescopes of the run
+        limit: int,optional
+            maximum number of events, by default all
+        options:
+            see get_image_parameters
+
+        Returns
+        -------
+        generator of dictionaries, for a batch of nevt events with ntel telescopes:
+            - run, event_id: (nevt)
+            - tel_id: (ntel)
+            - mask: (nevt, ntel), True for telescopes with data
+            - amplitude, num_pixels, x, y, phi, width, length, skewness,
+              kurtosis, tel_az, tel_alt: (nevt, ntel)
+        as input of reconstruct_showers
+
+        Raises
+        ------
+        HessioGeneralError
+        if an option or the integrator is not known
+        """
+        scheme, params, cuts = _image_options(integrator,options)
+        nevents = 0
+        while limit == 0 or nevents < limit:
+            if lib.peek_event(self._file) < 0:
+                break
+            if telescopes is not None:
+                tel_ids = np.ascontiguousarray(telescopes,dtype=np.int32)
+            else:
+                tel_ids = self.get_telescope_ids()
+            size = batch_size if limit == 0 else min(batch_size,limit - nevents)
+            event_info = _zeros((size,2),dtype=np.int32)
+            mask = _zeros((size,len(tel_ids)),dtype=np.uint8)
+            parameters = _zeros((size,len(tel_ids),len(IMAGE_PARAMETERS)),dtype=np.double)
+            pointing = _zeros((size,len(tel_ids),2),dtype=np.double)
+            count = lib.read_image_parameters(self._file,size,scheme,params,cuts,len(tel_ids),
+                                              tel_ids,event_info,mask,parameters,pointing)
+            if count <= 0:
+                break
+            nevents += count
+            batch = {'run': event_info[:count,0],
+                     'event_id': event_info[:count,1],
+                     'tel_id': tel_ids,
+                     'mask': mask[:count].view(np.bool_),
+                     'tel_az': pointing[:count,:,0],
+                     'tel_alt': pointing[:count,:,1]}
+            batch.update(_image_parameter_columns(parameters[:count]))
+            yield batch
+
+    def get_array_layout(self,telescopes=None):
+        """
+        Parameters
+        ----------
+        telescopes: sequence of int,optional
+            IDs of the telescopes, by default all telescopes of the run
+
+        Returns
+        -------
+        dictionary with
+            - tel_id: (ntel)
+            - position: (ntel, 3), x, y, z of the telescopes [m],
+              NaN for unknown telescopes
+            - direction: nominal azimuth and altitude of the run [rad]
+        as input of reconstruct_showers
+
+        Raises
+        ------
+        HessioGeneralError
+        if no run header was read
+        """
+        if telescopes is not None:
+            tel_ids = np.ascontiguousarray(telescopes,dtype=np.int32)
+        else:
+            tel_ids = self.get_telescope_ids()
+        positions = _zeros((len(tel_ids),3),dtype=np.double)
+        direction = _zeros(2,dtype=np.double)
+        if lib.get_array_layout(self._file,len(tel_ids),tel_ids,positions,direction) != 0:
+            raise(HessioGeneralError("no run header available"))
+        return {'tel_id': tel_ids, 'position': positions, 'direction': direction}
+
+    def scan_mc_truth(self,limit=0):
+        """
+        Scan the opened input file and collect MC truth for
+        each event. Only MC shower, MC event and central trigger
+        data are decoded, all other data blocks are skipped.
+        The reader is at end of file (or after limit events) afterwards.
+
+        Parameters
+        ----------
+        limit: int,optional
+            limit allows to limit the number of event scanned
+
+        Returns
+        -------
+        dictionary of 1D arrays, one entry per event:
+            run, event_id, glob_count, mc_shower_energy [TeV],
+            mc_event_xcore [m], mc_event_ycore [m], mc_shower_altitude [rad],
+            mc_shower_azimuth [rad], num_tel_trig, named as in iter_batches.
+        teltrg_list holds the IDs of triggered telescopes of all events
+        concatenated; use num_tel_trig to split it per event.
+        """
+        max_tel = lib.get_max_telescopes()
+        event_info = _zeros(3,dtype=np.int32)
+        mc_values = _zeros(5,dtype=np.double)
+        teltrg = _zeros(max_tel,dtype=np.int32)
+
+        runs = list()
+        infos = list()
+        values = list()
+        teltrg_lists = list()
+        while limit == 0 or len(runs) < limit:
+            run = lib.move_to_next_mc_event(self._file,event_info,mc_values,teltrg,max_tel)
+            if run == -1:
+                break
+            runs.append(run)
+            infos.append(event_info.copy())
+            values.append(mc_values.copy())
+            teltrg_lists.append(teltrg[:event_info[2]].copy())
+
+        infos = np.array(infos,dtype=np.int32).reshape(-1,3)
+        values = np.array(values,dtype=np.double).reshape(-1,5)
+        if teltrg_lists:
+            teltrg_list = np.concatenate(teltrg_lists)
+        else:
+            teltrg_list = _zeros(0,dtype=np.int32)
+        return {'run': np.array(runs,dtype=np.int32),
+                'event_id': infos[:,0],
+                'glob_count': infos[:,1],
+                'num_tel_trig': infos[:,2],
+                'mc_shower_energy': values[:,0],
+                'mc_event_xcore': values[:,1],
+                'mc_event_ycore': values[:,2],
+                'mc_shower_altitude': values[:,3],
+                'mc_shower_azimuth': values[:,4],
+                'teltrg_list': teltrg_list}
+
+    def file_open(self,filename,what=ALL_FLAGS,telescopes=None):
+        """
+        Open input data file 
+
+        Parameters
+        ----------
+        filename: str
+        what: int,optional
+            parts of the events to decode, a combination of
+            RAWDATA_FLAG, RAWSUM_FLAG, TRACKDATA_FLAG, IMAGE_FLAG,
+            IMG_PIXTM_FLAG and TIME_FLAG. Other parts are skipped.
+            By default everything is decoded.
+        telescopes: sequence of int,optional
+            IDs of the telescopes whose data is decoded, see
+            set_telescope_selection. By default all telescopes.
+
+        Returns
+        --------
+        0 in case of success, otherwise -1
+        """
+        b_filename = filename.encode('utf-8')
+        lib.set_read_what(self._file,what)
+        self.set_telescope_selection(telescopes)
+        if filename != self._filename:
+            self._index = None
+        self._filename = filename
+        return lib.file_open(self._file,b_filename)
+
+    def set_telescope_selection(self,telescopes):
+        """
+        Select the telescopes whose data is decoded by the events read
+        afterwards. Data of other telescopes is skipped without being
+        decoded: they are not in get_telescope_with_data_list and have
+        no data, although they still are in the central trigger data.
+
+        Parameters
+        ----------
+        telescopes: sequence of int or None
+            IDs of the telescopes, None for all telescopes
+
+        Raises
+        ------
+        HessioGeneralError
+        if there are too many telescopes
+        """
+        if telescopes is None:
+            result = lib.set_telescope_selection(self._file,-1,np.zeros(0,dtype=np.int32))
+        else:
+            tel_ids = np.ascontiguousarray(telescopes,dtype=np.int32).ravel()
+            result = lib.set_telescope_selection(self._file,len(tel_ids),tel_ids)
+        if result != 0:
+            raise(HessioGeneralError("too many telescopes selected"))
+
+    def close_file(self):
+        """
+        Close opened iobuf 
+        """
+        lib.close_file(self._file)
+
+    def build_index(self,index_filename=None,span=4<<20):
+        """
+        Scan the opened data file for an index of its top-level
+        blocks and save it as sidecar file, for seek_event.
+        For gzip files, access points where decompression can be
+        resumed are saved as well, about every span bytes of data.
+        The reading position of this reader is not changed.
+
+        Parameters
+        ----------
+        index_filename: str,optional
+            by default the data file name followed by '.idx'
+        span: int,optional
+            distance of gzip access points in bytes of decompressed data
+
+        Returns
+        -------
+        array of INDEX_DTYPE with offset and length in the
+        (decompressed) data, type, ident, run and glob_count
+        (-1 if none) for each block
+
+        Raises
+        ------
+        HessioGeneralError
+        if no file is opened or it can not be scanned
+        """
+        if self._filename is None:
+            raise(HessioGeneralError("no file opened"))
+        scanner = HessioFile(self._filename)
+        rows = np.zeros((4096,6),dtype=np.int64)
+        chunks = list()
+        while True:
+            nblocks = lib.scan_blocks(scanner._file,rows,len(rows))
+            if nblocks < 0:
+                raise(HessioGeneralError("could not scan " + self._filename))
+            if nblocks == 0:
+                break
+            chunks.append(rows[:nblocks].copy())
+        blocks = np.concatenate(chunks) if chunks else np.zeros((0,6),dtype=np.int64)
+        blocks = blocks.view(INDEX_DTYPE).reshape(-1)
+
+        npoints = 0
+        if self._filename.endswith('.gz'):
+            npoints = max(lib.build_access_points(scanner._file,span),0)
+        points = np.zeros((npoints,4),dtype=np.int64)
+        windows = np.zeros((npoints,_GZ_WINDOW_SIZE),dtype=np.uint8)
+        if npoints > 0:
+            lib.get_access_points(scanner._file,points,windows)
+        lib.set_access_points(self._file,npoints,points,windows)
+
+        stat = os.stat(self._filename)
+        if index_filename is None:
+            index_filename = self._filename + '.idx'
+        try:
+            with open(index_filename,'wb') as index_file:
+                np.savez_compressed(index_file,version=_INDEX_VERSION,
+                                    size=stat.st_size,mtime=stat.st_mtime,
+                                    blocks=blocks,points=points,windows=windows)
+        except OSError:
+            pass # Read-only directory: index only kept in memory
+        self._set_index(blocks)
+        return blocks
+
+    def load_index(self,index_filename=None):
+        """
+        Load the sidecar index of the opened data file, as saved by
+        build_index, if it is still up to date
+
+        Parameters
+        ----------
+        index_filename: str,optional
+            by default the data file name followed by '.idx'
+
+        Returns
+        -------
+        array of INDEX_DTYPE as returned by build_index,
+        or None if there is no up to date index
+        """
+        if self._filename is None:
+            return None
+        if index_filename is None:
+            index_filename = self._filename + '.idx'
+        stat = os.stat(self._filename)
+        try:
+            with np.load(index_filename) as index:
+                if (index['version'] != _INDEX_VERSION or index['size'] != stat.st_size
+                    or index['mtime'] != stat.st_mtime):
+                    return None
+                blocks = index['blocks']
+                points = np.ascontiguousarray(index['points'],dtype=np.int64)
+                windows = np.ascontiguousarray(index['windows'],dtype=np.uint8)
+        except (OSError,KeyError,ValueError):
+            return None
+        lib.set_access_points(self._file,len(points),points,windows)
+        self._set_index(blocks)
+        return blocks
+
+    def _set_index(self,blocks):
+        events = np.flatnonzero(blocks['type'] == IO_TYPE_HESS_EVENT)
+        keys = blocks['run'][events] << 32 | (blocks['glob_count'][events] & 0xffffffff)
+        order = np.argsort(keys,kind='stable')
+        self._index = (blocks,keys[order],events[order])
+
+    def _decode_blocks(self,rows):
+        """
+        Decode the blocks of the index at rows, seeking where
+        they do not follow each other
+
+        Returns
+        -------
+        event id of the last block
+        """
+        blocks = self._index[0]
+        event_id = _zeros(1,dtype=np.int32)
+        for row in rows:
+            offset = blocks['offset'][row]
+            if lib.get_file_position(self._file) != offset:
+                if lib.seek_file(self._file,offset) != 0:
+                    raise(HessioGeneralError("could not seek in " + self._filename))
+            if lib.fill_hsdata(self._file,event_id) < 0:
+                raise(HessioGeneralError("could not decode block at offset %d" % offset))
+        return int(event_id[0])
+
+    def seek_event(self,run,glob_count):
+        """
+        Position the reader on the event of run with global count
+        glob_count, using the sidecar index of the data file
+        (built on first use). The run header, camera settings and
+        MC shower of the event are restored from the blocks found
+        in the index, then the event itself is read, as after
+        move_to_next_event, which continues with the events after it.
+
+        Uncompressed files are positioned directly, gzip files
+        resume decompression at the nearest saved access point.
+        Other compressed files are decompressed from their start.
+
+        Parameters
+        ----------
+        run: int
+        glob_count: int
+
+        Returns
+        -------
+        run number and event id of the event
+
+        Raises
+        ------
+        HessioGeneralError
+        if the event is not in the file or can not be read
+        """
+        if self._index is None and self.load_index() is None:
+            self.build_index()
+        blocks, keys, events = self._index
+        key = run << 32 | (glob_count & 0xffffffff)
+        found = np.searchsorted(keys,key)
+        if found == len(keys) or keys[found] != key:
+            raise(HessioGeneralError("no event with run %d and glob_count %d" % (run,glob_count)))
+        target = events[found]
+
+        types = blocks['type'][:target+1]
+        headers = np.flatnonzero(types == IO_TYPE_HESS_RUNHEADER)
+        if len(headers) == 0:
+            raise(HessioGeneralError("no run header before event"))
+        header = headers[-1]
+        in_event = np.isin(types[header:],(IO_TYPE_HESS_EVENT,IO_TYPE_HESS_MC_SHOWER,
+                                           IO_TYPE_HESS_MC_EVENT))
+        first_event = header + np.flatnonzero(in_event)[0]
+
+        # Run header and camera settings, unless this run is already loaded
+        if lib.get_run_number(self._file) != run:
+            self._decode_blocks(range(header,first_event))
+        # MC shower of the event, then the blocks following the previous event
+        rows = list()
+        showers = first_event + np.flatnonzero(types[first_event:target] == IO_TYPE_HESS_MC_SHOWER)
+        previous = first_event + np.flatnonzero(types[first_event:target] == IO_TYPE_HESS_EVENT)
+        start = first_event
+        if len(previous) > 0:
+            start = previous[-1] + 1
+        if len(showers) > 0:
+            if showers[-1] < start:
+                rows.append(showers[-1])
+            else:
+                start = showers[-1]
+        rows.extend(range(start,target+1))
+        event_id = self._decode_blocks(rows)
+        return run, event_id
+
+    def get_global_event_count(self):
+        """
+        Returns
+        -------
+        counter for system trigger 
+        """
+        return lib.get_global_event_count(self._file)
+
+    def get_run_number(self):
+        """
+        Returns
+        -------
+        run number read in data file
+        or -1 if not available
+
+        Raises
+        ------
+        HessioGeneralError
+        If hsdata->run_header.run is not available
+        """
+        run =  lib.get_run_number(self._file)
+        if run > 0 : return run
+        else:
+            raise(HessioGeneralError("run number not available"))
+
+
+    def get_num_telescope(self):
+        """
+        Returns
+        -------
+        number of telescopes in current run.
+
+        Raises
+        ------
+        HessioGeneralError
+        If hsdata->event.num_tel is not available
+        """
+        number =  lib.get_num_telescope(self._file)
+        if number > 0 : return number
+        else:
+            raise(HessioGeneralError("number of telescopes in current run not available"))
+
+    def get_num_tel_trig(self):
+        """
+        Returns
+        -------
+        number How many telescopes triggered in Central Event
+
+        Raises
+        ------
+        HessioGeneralError
+        If hsdata is not available
+        """
+        number =  lib.get_num_tel_trig(self._file)
+        if number > 0 : return number
+        else:
+            raise(HessioGeneralError("number of triggered telescopes in central event not available"))
 
-def get_num_samples(telescope_id):
-    """
-    Returns  
-    -------
-    the number of samples (time slices) recorded
 
-    Parameters
-    ----------
-    telescope_id: int
+    def get_mirror_area(self,telescope_id):
+        """
+        Returns
+        -------
+        total area of individual mirrors corrected
+        for inclination [m^2].
 
-    Raises
-    ------
-    HessioGeneralError
-    data->event.teldata[itel].raw->num->samples not available
+        Parameters
+        ----------
+        telescope_id: int
 
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    """
-    result = lib.get_num_samples(telescope_id)
-    if result >= 0: return result
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("ata->event.teldata[itel].raw->num->samples not available"))
-        
-        
+        Raises
+        ------
+        HessioGeneralError
+        if hsdata->camera_set[itel].mirror_area not available
 
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+
+        data = _zeros(1,dtype=np.double)
+        result = lib.get_mirror_area(self._file,telescope_id,data)
+        if result == 0:
+            return data[0]
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        raise(HessioGeneralError("hsdata->camera_set[itel].mirror_area not available"))
+
+    def get_telescope_with_data_list(self):
+        """
+        Returns
+        -------
+        list of telescope with data for current event
+
+        Raises
+        ------
+        HessioGeneralError
+        if information is not available
+        """
+
+        try: 
+            return self.get_teldata_list()
+        except:
+            raise(HessioGeneralError("hsdata->event.teldata_list is not available"))
+
+
+    def get_teldata_list(self):
+        """
+        Returns
+        -------
+        list of IDs of telescopes with data for current event
+
+        Raises
+        ------
+        HessioGeneralError
+        if information is not available
+        """
+        num_teldata= self.get_num_teldata()
+        if num_teldata >= 0:
+            array = _zeros(num_teldata,dtype=np.int32)
+            lib.get_telescope_with_data_list(self._file,array)
+            return array
+        else:
+            raise(HessioGeneralError("hsdata->event.num_teldata is not available"))
 
-def get_adc_sample(telescope_id,channel):
-    """
-    Returns
-    ------- 
-    pulses sampled
-   
-    Parameters
-    ----------
-    telescope_id: int
-    channel: int (0->HI_GAIN, 1->LOW_GAIN)
 
-    Raises
-    ------
-    HessioGeneralError
-    If information is not available
-
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    
-    HessioChannelIndexError
-    If channel does not exist for this telescope
-    """
-    if channel > get_num_channel(telescope_id)-1:
-        raise(HessioChannelIndexError("telescope " + str(telescope_id) + " has not channel " + str(channel)))
-
-    try:
-        npix = get_num_pixels(telescope_id)
-        ntimeslices = get_num_samples(telescope_id)
-        
-
-        if ( ntimeslices > 0):
-            data = np.zeros(npix*ntimeslices,dtype=np.uint16)
-            result = lib.get_adc_sample(telescope_id,channel ,data)
-            if result == 0:
-                d_data = data.reshape(npix,ntimeslices)
-                return d_data
-            elif result == TEL_INDEX_NOT_VALID:
-                raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-            else:
-                raise(HessioGeneralError("adc sample not available for telescope "+
-                                       str(telescope_id) +
-                                       " and channel " + str(channel)))
+    def get_num_teldata(self):
+        """
+        Returns
+        -------
+        number of telescopes for which we actually have data
+
+        Raises
+        ------
+        HessioGeneralError
+            If hsdata->event.num_teldata is not available
+        """
+
+        number =  lib.get_num_teldata(self._file)
+        if number > 0:
+            return number
+        else:
+            raise(HessioGeneralError("hsdata->event.num_teldata is not available"))
+
+    def get_num_channel(self,telescope_id):
+        """
+        Returns
+        -------
+        type of channel used
+        HI_GAIN          0     /**< Index to high-gain channels in adc_sum, adc_sample, pedestal, ... */
+        LO_GAIN          1     /**< Index to low-gain channels in adc_sum, adc_sample, pedestal, ... */
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+            If hsdata->event.teldata[itel].raw
+        HessioTelescopeIndexError 
+            if no telescope exist with this id
+        """
+        result =  lib.get_num_channel(self._file,telescope_id)
+        if result >= 0: return result
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
         else:
-            return np.zeros(0)
+            raise(HessioGeneralError(" hsdata->event.teldata[itel].raw not available"))
+
+
+    def get_num_pixels(self,telescope_id):
+        """
+        Returns
+        -------
+        the number of pixels in the camera (as in configuration)
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+            If  hsdata->camera_set[itel].num_pixels
+
+        HessioTelescopeIndexError
+            if no telescope exist with this id
+        """
+        result = lib.get_num_pixels(self._file,telescope_id)
+        if result >= 0 : return result
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("hsdata->camera_set[itel].num_pixels not available"))
+
+
+    def get_pixel_timing_threshold(self,telescope_id):
+        """
+        Returns
+        -------
+        PixelTiming threshold:
+        - Minimum base-to-peak raw amplitude difference applied in pixel selection
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+            If hsdata->event.teldata[itel].pixtm
+        HessioTelescopeIndexError
+            if no telescope exist with this id
+        """
+        threshold = _zeros(1,dtype=np.int32)
+        result = lib.get_pixel_timing_threshold(self._file,telescope_id,threshold)
+        if result == 0: return threshold[0]
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("hsdata->event.teldata[itel].pixtm not available"))
 
 
-    except HessioTelescopeIndexError: raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    except HessioGeneralError: raise (HessioGeneralError("adc sample not available for telescope "+
-                                   str(telescope_id) +
-                                   " and channel " + str(channel)))
-    
+    def get_pixel_timing_peak_global(self,telescope_id):
 
-def get_adc_sum(telescope_id,channel):
-    """
-    Returns 
-    -------
-    the sum of ADC values. 
-    
-    Parameters
-    ----------
-    telescope_id: int
-    channel: int (0->HI_GAIN, 1->LOW_GAIN)
+        """
+        Returns 
+        -------
+        PixelTiming peak_global:
+         - Camera-wide (mean) peak position [time slices]
 
-    Raises
-    ------
-    HessioGeneralError
-    If No adc_sum for telescope 
-
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    
-    HessioChannelIndexError
-    If channel does not exist for this telescope
-    
-    """
-    
-    if channel > get_num_channel(telescope_id)-1:
-        raise(HessioChannelIndexError("telescope " + str(telescope_id) + " has not channel " + str(channel)))
-    
-    npix = get_num_pixels(telescope_id)
-    data = np.zeros(npix,dtype=np.int32)
-    result = lib.get_adc_sum(telescope_id,channel ,data) 
-    if result == 0:
-        return data
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("No adc_sum for telescope "+ str(telescope_id)))
-        
+        Parameters
+        ----------
+        telescope_id: int
 
-def get_pixel_timing_timval(telescope_id):
-    """
-    Returns 
-    -------
-    PixelTiming.timval
-    
-    Parameters
-    ----------
-    telescope_id: int
+        Raises
+        ------
+        HessioGeneralError
+        If hsdata->event.teldata[itel].pixtm; not available
 
-    Raises
-    ------
-    HessioGeneralError
-    if hsdata->event.teldata[itel]->timval[ipix][itimes] not available
-
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-            
-    """
-    npix = get_num_pixels(telescope_id)
-    ntimes = get_pixel_timing_num_times_types(telescope_id)
-    data = np.zeros(npix*ntimes,dtype=np.float32)
-    result = lib.get_pixel_timing_timval(telescope_id,data)
-    if result == 0:
-        d_data = data.reshape(npix,ntimes)
-        return d_data
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("no pixel timing timval for telescope "
-                              + str(telescope_id)))
-        
-  
-def get_data_for_calibration(telescope_id):
-    """
-    Returns
-    ------- 
-    pedestal, calibration 2D array
-    
-    Parameters
-    ----------
-    telescope_id: int
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
 
-    Raises
-    ------
-    HessioGeneralError
-    if data not available for this telescope
+        peak = _zeros(1,dtype=np.float32)
+        result = lib.get_pixel_timing_peak_global(self._file,telescope_id,peak)
+        if result == 0: return peak[0]
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("hsdata->event.teldata[itel].pixtm; not available"))
 
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    """
-    npix = get_num_pixels(telescope_id)
 
-    ngain = 2 # LOW and HI Gain
-    pedestal = np.zeros(ngain*npix,dtype=np.double)
-    calibration = np.zeros(ngain*npix,dtype=np.double)
+    def get_pixel_timing_num_times_types(self,telescope_id):
+        """
+        Returns
+        -------
+        how many different types of times can we store
 
-    result = lib.get_data_for_calibration(telescope_id,pedestal,calibration)
-    if result == 0:
-        d_ped = pedestal.reshape(ngain,npix)
-        d_cal = calibration.reshape(ngain,npix)
-        return d_ped, d_cal
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("no calibration data for telescope "
-                              + str(telescope_id)))
+        Parameters
+        ----------
+        telescope_id: int
 
-  
-def get_pixel_position(telescope_id):
-    """
-    Returns
-    ------- 
-    pixels position for a telecsope id
+        Raises
+        ------
+        HessioGeneralError
+        If hsdata->event.teldata[itel].pixtm->num_types not available
 
-    Parameters
-    ----------
-    telescope_id: int
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        result = lib.get_pixel_timing_num_times_types(self._file,telescope_id)
+        if result >= 0: return result
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("hsdata->event.teldata[itel].pixtm->num_types  not available"))
 
-    Raises
-    ------
-    HessioGeneralError
-    if pixel position not available for this telescope
+    def get_num_samples(self,telescope_id):
+        """
+        Returns  
+        -------
+        the number of samples (time slices) recorded
 
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    """
-    npix = get_num_pixels(telescope_id)
+        Parameters
+        ----------
+        telescope_id: int
 
-    pos_x = np.zeros(npix,dtype=np.double)
-    pos_y = np.zeros(npix,dtype=np.double)
+        Raises
+        ------
+        HessioGeneralError
+        data->event.teldata[itel].raw->num->samples not available
 
-    result = lib.get_pixel_position(telescope_id,pos_x,pos_y)
-    if result == 0:
-        return pos_x, pos_y
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("no pixel position for telescope "
-                              + str(telescope_id)))
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        result = lib.get_num_samples(self._file,telescope_id)
+        if result >= 0: return result
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("ata->event.teldata[itel].raw->num->samples not available"))
 
 
 
-def get_mc_event_xcore():
-    """
-    Returns
-    ------- 
-    x core position w.r.t. array reference point [m],
-    x -> N
-    """
-    return  lib.get_mc_event_xcore()
 
+    def get_adc_sample(self,telescope_id,channel):
+        """
+        Returns
+        ------- 
+        pulses sampled
 
-def get_mc_event_ycore():
-    """
-    Returns
-    ------- 
-    y core position w.r.t. array reference point [m],
-    y -> W
-    """
-    return  lib.get_mc_event_ycore()
+        Parameters
+        ----------
+        telescope_id: int
+        channel: int (0->HI_GAIN, 1->LOW_GAIN)
 
-def get_mc_shower_energy():
-    """
-    Returns
-    ------- 
-    shower primary energy [TeV]
-    """
-    return  lib.get_mc_shower_energy()
+        Raises
+        ------
+        HessioGeneralError
+        If information is not available
 
-def get_mc_shower_azimuth():
-    """
-    Returns
-    ------- 
-    shower azimuth (N->E) [rad]
-    """
-    return  lib.get_mc_shower_azimuth()
+        HessioTelescopeIndexError
+        if no telescope exist with this id
 
-def get_mc_shower_altitude():
-    """
-    Returns
-    ------- 
-    shower altitude [rad]
-    """
-    return  lib.get_mc_shower_altitude()
+        HessioChannelIndexError
+        If channel does not exist for this telescope
+        """
+        if channel > self.get_num_channel(telescope_id)-1:
+            raise(HessioChannelIndexError("telescope " + str(telescope_id) + " has not channel " + str(channel)))
+
+        try:
+            npix = self.get_num_pixels(telescope_id)
+            ntimeslices = self.get_num_samples(telescope_id)
+
+
+            if ( ntimeslices > 0):
+                data = _zeros(npix*ntimeslices,dtype=np.uint16)
+                result = lib.get_adc_sample(self._file,telescope_id,channel ,data)
+                if result == 0:
+                    d_data = data.reshape(npix,ntimeslices)
+                    return d_data
+                elif result == TEL_INDEX_NOT_VALID:
+                    raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+                else:
+                    raise(HessioGeneralError("adc sample not available for telescope "+
+                                           str(telescope_id) +
+                                           " and channel " + str(channel)))
+            else:
+                return _zeros(0,dtype=np.double)
 
-def get_adc_known(telescope_id, channel, pixel_id):
-    """
-    Returns:
-    --------
-    individual channel recorded information ? 
-    Bit 0: sum, 1: samples, 2: ADC was in saturation.
-    Parameters
-    ----------
-    telescope_id: int
-    channel: int, HI_GAIN, LOW_GAIN
-    pixel_id, int
-    """
-    return lib.get_adc_known(telescope_id, channel, pixel_id)
 
-def get_ref_shape(telescope_id, channel, fshape):
-    """
-    Returns:
-    --------
-    Reference pulse shape(s)
-    If telescope_id, channel or fshape are not valid return 0.
-    Parameters
-    ----------
-    telescope_id: int
-    channel: int, HI_GAIN, LOW_GAIN
-    fshape, int
-    """
-    return lib.get_ref_shape(telescope_id, channel, fshape)
+        except HessioTelescopeIndexError: raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        except HessioGeneralError: raise (HessioGeneralError("adc sample not available for telescope "+
+                                       str(telescope_id) +
+                                       " and channel " + str(channel)))
 
 
-def get_ref_shapes(telescope_id,channel):
-    """
-    Returns:
-    --------
-    Array of Reference pulse shape(s).
-    0 if channel is not valid
-    TEL_INDEX_NOT_VALID if telescope index is not valid
-    Parameters
-    ----------
-    telescope_id: int
-    channel: int, HI_GAIN, LOW_GAIN
-    """
-    num_shapes= get_lrefshape(telescope_id)
-    if  num_shapes>= 0:
-        array = np.zeros(num_shapes,dtype=np.double)
-        lib.get_ref_shapes(telescope_id, channel, array)
-        return array
-    else:
-        raise(HessioGeneralError("PixelTimming pulse shape(s) not available"))
+    def get_adc_sum(self,telescope_id,channel):
+        """
+        Returns 
+        -------
+        the sum of ADC values. 
 
-def get_nrefshape(telescope_id):
-    """
-    Returns:
-    --------
-    Number of following reference pulse shapes (num_gains or 0)
-    TEL_INDEX_NOT_VALID if telescope index is not valid
-    Parameters
-    ----------
-    telescope_id: int
-    """
-    return lib.get_nrefshape(telescope_id)
+        Parameters
+        ----------
+        telescope_id: int
+        channel: int (0->HI_GAIN, 1->LOW_GAIN)
 
-def get_lrefshape(telescope_id):
-    """
-    Returns:
-    Length of following reference pulse shape(s).
-    TEL_INDEX_NOT_VALID if telescope index is not valid
-    --------
-    Parameters
-    ----------
-    telescope_id: int
-    """
-    return lib.get_lrefshape(telescope_id)
+        Raises
+        ------
+        HessioGeneralError
+        If No adc_sum for telescope 
 
-def get_ref_step(telescope_id):
-    """
-    Returns:
-    --------
-    If telescope_id, channel or fshape are not valid return 0.
-    Parameters
-    ----------
-    telescope_id: int
-    """
-    return lib.get_ref_step(telescope_id)
-    
-def get_time_slice(telescope_id):
-    """
-    Returns:
-    --------
-    Width of readout time slice (i.e. one sample) [ns].
-    If telescope_id is not valid return 0.
-    Parameters
-    ----------
-    telescope_id: int
-    """
-    return lib.get_time_slice(telescope_id)
+        HessioTelescopeIndexError
+        if no telescope exist with this id
 
+        HessioChannelIndexError
+        If channel does not exist for this telescope
 
+        """
 
-def  get_tel_event_gps_time(telescope_id):
-    """
-    Returns:
-    --------
-    telescope event gps tine in a 2D array:
-        -seconds
-        -nonosecond 
-    Parameters
-    ----------
-    telescope_id: int
-    """
-    seconds = np.zeros(1,dtype=np.long)
-    nanoseconds = np.zeros(1,dtype=np.long)
+        if channel > self.get_num_channel(telescope_id)-1:
+            raise(HessioChannelIndexError("telescope " + str(telescope_id) + " has not channel " + str(channel)))
 
-    result = lib.get_tel_event_gps_time(telescope_id,seconds,nanoseconds)
-    if result == 0:
-        return seconds[0], nanoseconds[0]
-    else:
-        raise(HessioGeneralError("no event gps time for telescope "))
-    
+        npix = self.get_num_pixels(telescope_id)
+        data = _zeros(npix,dtype=np.int32)
+        result = lib.get_adc_sum(self._file,telescope_id,channel ,data) 
+        if result == 0:
+            return data
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("No adc_sum for telescope "+ str(telescope_id)))
+
+    def _get_significant_adc(self,telescope_id,channel,what):
+        """
+        Returns
+        -------
+        pixel ids and sums or samples of the pixels recorded
+        for telescope and channel
+        """
+        if channel > self.get_num_channel(telescope_id)-1:
+            raise(HessioChannelIndexError("telescope " + str(telescope_id) + " has not channel " + str(channel)))
+
+        count = lib.get_num_significant(self._file,telescope_id,channel)
+        if count == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id)))
+        elif count < 0:
+            raise(HessioGeneralError("No adc data for telescope "+ str(telescope_id)))
+
+        pixel_ids = _zeros(count,dtype=np.int32)
+        sums = _zeros(count if what & RAWSUM_FLAG else 0,dtype=np.uint32)
+        if what & RAWDATA_FLAG:
+            samples = _zeros((count,self.get_num_samples(telescope_id)),dtype=np.uint16)
+        else:
+            samples = _zeros(0,dtype=np.uint16)
+        lib.get_significant_adc(self._file,telescope_id,channel,what,pixel_ids,sums,samples)
+        if what & RAWDATA_FLAG:
+            return pixel_ids, samples
+        return pixel_ids, sums
+
+    def get_adc_sum_sparse(self,telescope_id,channel):
+        """
+        Returns
+        -------
+        (pixel_ids, sums): the ADC sums of the pixels recorded for this
+        channel only, that is significant and with adc_known set.
+        With zero suppression this is much smaller than get_adc_sum.
+
+        Parameters
+        ----------
+        telescope_id: int
+        channel: int (0->HI_GAIN, 1->LOW_GAIN)
+
+        Raises
+        ------
+        HessioGeneralError
+        If No adc_sum for telescope
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
 
-def  get_central_event_gps_time():
-    """
-    Returns:
-    --------
-    telescope central envent gps tine in a 2D array:
-        -seconds
-        -nonosecond 
-    """
-    seconds = np.zeros(1,dtype=np.long)
-    nanoseconds = np.zeros(1,dtype=np.long)
+        HessioChannelIndexError
+        If channel does not exist for this telescope
+        """
+        return self._get_significant_adc(telescope_id,channel,RAWSUM_FLAG)
+
+    def get_adc_sample_sparse(self,telescope_id,channel):
+        """
+        Returns
+        -------
+        (pixel_ids, samples): the pulses sampled of the pixels recorded
+        for this channel, samples with shape (len(pixel_ids), num_samples)
+
+        Parameters
+        ----------
+        telescope_id: int
+        channel: int (0->HI_GAIN, 1->LOW_GAIN)
+
+        Raises
+        ------
+        HessioGeneralError
+        If No adc data for telescope
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
 
-    result = lib.get_central_event_gps_time(seconds,nanoseconds)
-    if result == 0:
-        return seconds[0], nanoseconds[0]
-    else:
-        raise(HessioGeneralError("no central event  gps time"))
-    
-    
-def get_central_event_teltrg_list():
-    """
-    Returns
-    -------
-    List of IDs of triggered telescopes
-    Raises
-    ------
-    HessioGeneralError if information is not available
-    """
-    num_teltrig= lib.get_num_tel_trig()
-    if num_teltrig >= 0:
-        array = np.zeros(num_teltrig,dtype=np.int32)
-        lib.get_central_event_teltrg_list(array)
-        return array
-    else:
-        raise(HessioGeneralError("hsdata is not available"))
+        HessioChannelIndexError
+        If channel does not exist for this telescope
+        """
+        return self._get_significant_adc(telescope_id,channel,RAWDATA_FLAG)
+
+    def get_event_sparse(self,what=RAWSUM_FLAG,channel=0,telescopes=None):
+        """
+        Returns
+        -------
+        dictionary with the pixels recorded for channel by several
+        telescopes, in compressed sparse row layout: the pixels of
+        tel_id[i] are pixel_id[indptr[i]:indptr[i+1]]
+            - tel_id: (ntel)
+            - indptr: (ntel+1)
+            - pixel_id: (nnz)
+            - adc_sums: (nnz) if what & RAWSUM_FLAG
+            - adc_samples: (nnz, max_samples) if what & RAWDATA_FLAG,
+              padded with zeros for telescopes with fewer samples
+        Telescopes without data or without this channel have no pixel.
+
+        Parameters
+        ----------
+        what: int, optional
+            combination of RAWSUM_FLAG and RAWDATA_FLAG
+        channel: int (0->HI_GAIN, 1->LOW_GAIN)
+        telescopes: sequence of int,optional
+            by default the telescopes with data
+
+        Raises
+        ------
+        HessioGeneralError
+        if hsdata is not available
+
+        HessioTelescopeIndexError
+        if no telescope exist with one of the ids
+        """
+        if telescopes is None:
+            tel_ids = np.asarray(self.get_telescope_with_data_list(),dtype=np.int32)
+        else:
+            tel_ids = np.ascontiguousarray(telescopes,dtype=np.int32)
+        indptr = _zeros(len(tel_ids)+1,dtype=np.longlong)
+        max_samples = lib.get_significant_layout(self._file,channel,len(tel_ids),tel_ids,indptr)
+        if max_samples == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope with one of the ids " + str(tel_ids.tolist())))
+        elif max_samples < 0:
+            raise(HessioGeneralError("hsdata is not available"))
+
+        nnz = int(indptr[-1])
+        pixel_id = _zeros(nnz,dtype=np.int32)
+        adc_sums = _zeros(nnz if what & RAWSUM_FLAG else 0,dtype=np.uint32)
+        adc_samples = _zeros((nnz,max_samples) if what & RAWDATA_FLAG else 0,dtype=np.uint16)
+        if lib.get_significant_event(self._file,channel,what,len(tel_ids),tel_ids,indptr,
+                                     max_samples,pixel_id,adc_sums,adc_samples) != 0:
+            raise(HessioGeneralError("hsdata is not available"))
+
+        event = {'tel_id': tel_ids, 'indptr': indptr, 'pixel_id': pixel_id}
+        if what & RAWSUM_FLAG:
+            event['adc_sums'] = adc_sums
+        if what & RAWDATA_FLAG:
+            event['adc_samples'] = adc_samples
+        return event
+
+
+    def get_adc_sample_view(self,telescope_id):
+        """
+        Returns
+        -------
+        read-only AdcView of pulses sampled for all channels, shape
+        (num_gains, num_pixels, num_samples). No data is copied:
+        the view is only valid until another event is read or the
+        file is closed, then using it raises HessioGeneralError.
+        Use view.copy() to keep data for later use.
+        Unlike get_adc_sample, non significant pixels are not removed.
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+        If information is not available
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        ngain = self.get_num_channel(telescope_id)
+        npix = self.get_num_pixels(telescope_id)
+        ntimeslices = self.get_num_samples(telescope_id)
+
+        data = ctypes.POINTER(ctypes.c_uint16)()
+        result = lib.get_adc_sample_buffer(self._file,telescope_id,ctypes.byref(data))
+        if result == 0:
+            return _event_view(self,data,(H_MAX_GAINS,H_MAX_PIX,H_MAX_SLICES),
+                               (ngain,npix,ntimeslices))
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id)))
+        else:
+            raise(HessioGeneralError("adc sample not available for telescope "
+                                     + str(telescope_id)))
+
+
+    def get_adc_sum_view(self,telescope_id):
+        """
+        Returns
+        -------
+        read-only AdcView of the sum of ADC values for all channels, shape
+        (num_gains, num_pixels). No data is copied:
+        the view is only valid until another event is read or the
+        file is closed, then using it raises HessioGeneralError.
+        Use view.copy() to keep data for later use.
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+        If No adc_sum for telescope
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        ngain = self.get_num_channel(telescope_id)
+        npix = self.get_num_pixels(telescope_id)
+
+        data = ctypes.POINTER(ctypes.c_uint32)()
+        result = lib.get_adc_sum_buffer(self._file,telescope_id,ctypes.byref(data))
+        if result == 0:
+            return _event_view(self,data,(H_MAX_GAINS,H_MAX_PIX),(ngain,npix))
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id)))
+        else:
+            raise(HessioGeneralError("No adc_sum for telescope "+ str(telescope_id)))
 
 
-def get_mirror_number(telescope_id):
-    
-    """
-    Returns
-    -------
-    total number of mirror tiles of a telescope
+    def get_pixel_timing_timval(self,telescope_id):
+        """
+        Returns 
+        -------
+        PixelTiming.timval
 
-    Parameters
-    ----------
-    telescope_id: int
-    
-    Raises
-    ------
-    HessioGeneralError
-    if hsdata->camera_set[itel].num_mirrors not available
+        Parameters
+        ----------
+        telescope_id: int
 
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    """
+        Raises
+        ------
+        HessioGeneralError
+        if hsdata->event.teldata[itel]->timval[ipix][itimes] not available
 
-    result = lib.get_mirror_number(telescope_id)
-    if result >= 0 : return result
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("hsdata->camera_set[itel].num_mirrors not available"))
+        HessioTelescopeIndexError
+        if no telescope exist with this id
 
+        """
+        npix = self.get_num_pixels(telescope_id)
+        ntimes = self.get_pixel_timing_num_times_types(telescope_id)
+        data = _zeros(npix*ntimes,dtype=np.float32)
+        result = lib.get_pixel_timing_timval(self._file,telescope_id,data)
+        if result == 0:
+            d_data = data.reshape(npix,ntimes)
+            return d_data
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("no pixel timing timval for telescope "
+                                  + str(telescope_id)))
 
-def get_optical_foclen(telescope_id):
-    
-    """
-    Returns
-    -------
-    focal length ofoptics of a telescope [m]
 
-    Parameters
-    ----------
-    telescope_id: int
-    
-    Raises
-    ------
-    HessioGeneralError
-    if hsdata->camera_set[itel].flen not available
+    def get_data_for_calibration(self,telescope_id):
+        """
+        Returns
+        ------- 
+        pedestal, calibration 2D array
 
-    HessioTelescopeIndexError
-    if no telescope exist with this id
-    """
+        Parameters
+        ----------
+        telescope_id: int
 
-    result = lib.get_optical_foclen(telescope_id)
-    if result >=0 : return result
-    elif result == TEL_INDEX_NOT_VALID:
-        raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
-    else:
-        raise(HessioGeneralError("hsdata->camera_set[itel].flen not available"))
+        Raises
+        ------
+        HessioGeneralError
+        if data not available for this telescope
 
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        npix = self.get_num_pixels(telescope_id)
+
+        ngain = 2 # LOW and HI Gain
+        pedestal = _zeros(ngain*npix,dtype=np.double)
+        calibration = _zeros(ngain*npix,dtype=np.double)
+
+        result = lib.get_data_for_calibration(self._file,telescope_id,pedestal,calibration)
+        if result == 0:
+            d_ped = pedestal.reshape(ngain,npix)
+            d_cal = calibration.reshape(ngain,npix)
+            return d_ped, d_cal
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("no calibration data for telescope "
+                                  + str(telescope_id)))
+
+    def get_telescope_config(self,telescope_id):
+        """
+        Configuration of a telescope in the current run, cached:
+        it is only copied again from the C library after a new
+        run header, camera settings, pixel settings, monitoring
+        or laser calibration block for this telescope.
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Returns
+        -------
+        read-only mapping with
+            version: changes whenever the configuration is replaced
+            mirror_area [m^2], optical_foclen [m], time_slice [ns], ref_step [ns]
+            pix_x, pix_y [m]: pixel positions
+            ref_shapes: reference pulse shapes, one row per gain
+            pedestal, calib: one row per gain (H_MAX_GAINS), one column per pixel
+        all arrays are read-only
+
+        Raises
+        ------
+        HessioGeneralError
+        if no run header was read
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        layout = _zeros(3,dtype=np.int32)
+        version = lib.get_config_layout(self._file,telescope_id,layout)
+        if version == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id)))
+        elif version < 0:
+            raise(HessioGeneralError("no configuration available"))
+        config = self._config.get(telescope_id)
+        if config is not None and config['version'] == version:
+            return config
+
+        npix, nrefshape, lrefshape = (int(dim) for dim in layout)
+        values = _zeros(4,dtype=np.double)
+        pix_x = _zeros(npix,dtype=np.double)
+        pix_y = _zeros(npix,dtype=np.double)
+        ref_shapes = _zeros((nrefshape,lrefshape),dtype=np.double)
+        pedestal = _zeros((H_MAX_GAINS,npix),dtype=np.double)
+        calib = _zeros((H_MAX_GAINS,npix),dtype=np.double)
+        lib.get_config(self._file,telescope_id,values,pix_x,pix_y,ref_shapes,pedestal,calib)
+        for array in (pix_x,pix_y,ref_shapes,pedestal,calib):
+            array.flags.writeable = False
+        config = types.MappingProxyType({'version': version,
+                                         'mirror_area': float(values[0]),
+                                         'optical_foclen': float(values[1]),
+                                         'time_slice': float(values[2]),
+                                         'ref_step': float(values[3]),
+                                         'pix_x': pix_x,
+                                         'pix_y': pix_y,
+                                         'ref_shapes': ref_shapes,
+                                         'pedestal': pedestal,
+                                         'calib': calib})
+        self._config[telescope_id] = config
+        return config
+
+    def get_run_config(self):
+        """
+        Returns
+        -------
+        dictionary of get_telescope_config results
+        for all telescopes in the current run, by telescope id
+
+        Raises
+        ------
+        HessioGeneralError
+        if no run header was read
+        """
+        return {int(tel_id): self.get_telescope_config(int(tel_id))
+                for tel_id in self.get_telescope_ids()}
+
+    def get_pixel_position(self,telescope_id):
+        """
+        Returns
+        ------- 
+        pixels position for a telecsope id
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+        if pixel position not available for this telescope
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+        npix = self.get_num_pixels(telescope_id)
 
-def get_telescope_ids():
-    """
-    Returns
-    -------
-    list of IDs of telescopes used in the run
+        pos_x = _zeros(npix,dtype=np.double)
+        pos_y = _zeros(npix,dtype=np.double)
+
+        result = lib.get_pixel_position(self._file,telescope_id,pos_x,pos_y)
+        if result == 0:
+            return pos_x, pos_y
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("no pixel position for telescope "
+                                  + str(telescope_id)))
+
+
+
+    def get_mc_event_xcore(self):
+        """
+        Returns
+        ------- 
+        x core position w.r.t. array reference point [m],
+        x -> N
+        """
+        return  lib.get_mc_event_xcore(self._file)
+
+
+    def get_mc_event_ycore(self):
+        """
+        Returns
+        ------- 
+        y core position w.r.t. array reference point [m],
+        y -> W
+        """
+        return  lib.get_mc_event_ycore(self._file)
+
+    def get_mc_shower_energy(self):
+        """
+        Returns
+        ------- 
+        shower primary energy [TeV]
+        """
+        return  lib.get_mc_shower_energy(self._file)
+
+    def get_mc_shower_azimuth(self):
+        """
+        Returns
+        ------- 
+        shower azimuth (N->E) [rad]
+        """
+        return  lib.get_mc_shower_azimuth(self._file)
+
+    def get_mc_shower_altitude(self):
+        """
+        Returns
+        ------- 
+        shower altitude [rad]
+        """
+        return  lib.get_mc_shower_altitude(self._file)
+
+    def get_adc_known(self,telescope_id, channel, pixel_id):
+        """
+        Returns:
+        --------
+        individual channel recorded information ? 
+        Bit 0: sum, 1: samples, 2: ADC was in saturation.
+        Parameters
+        ----------
+        telescope_id: int
+        channel: int, HI_GAIN, LOW_GAIN
+        pixel_id, int
+        """
+        return lib.get_adc_known(self._file,telescope_id, channel, pixel_id)
+
+    def get_ref_shape(self,telescope_id, channel, fshape):
+        """
+        Returns:
+        --------
+        Reference pulse shape(s)
+        If telescope_id, channel or fshape are not valid return 0.
+        Parameters
+        ----------
+        telescope_id: int
+        channel: int, HI_GAIN, LOW_GAIN
+        fshape, int
+        """
+        return lib.get_ref_shape(self._file,telescope_id, channel, fshape)
+
+
+    def get_ref_shapes(self,telescope_id,channel):
+        """
+        Returns:
+        --------
+        Array of Reference pulse shape(s).
+        0 if channel is not valid
+        TEL_INDEX_NOT_VALID if telescope index is not valid
+        Parameters
+        ----------
+        telescope_id: int
+        channel: int, HI_GAIN, LOW_GAIN
+        """
+        num_shapes= self.get_lrefshape(telescope_id)
+        if  num_shapes>= 0:
+            array = _zeros(num_shapes,dtype=np.double)
+            lib.get_ref_shapes(self._file,telescope_id, channel, array)
+            return array
+        else:
+            raise(HessioGeneralError("PixelTimming pulse shape(s) not available"))
+
+    def get_nrefshape(self,telescope_id):
+        """
+        Returns:
+        --------
+        Number of following reference pulse shapes (num_gains or 0)
+        TEL_INDEX_NOT_VALID if telescope index is not valid
+        Parameters
+        ----------
+        telescope_id: int
+        """
+        return lib.get_nrefshape(self._file,telescope_id)
+
+    def get_lrefshape(self,telescope_id):
+        """
+        Returns:
+        Length of following reference pulse shape(s).
+        TEL_INDEX_NOT_VALID if telescope index is not valid
+        --------
+        Parameters
+        ----------
+        telescope_id: int
+        """
+        return lib.get_lrefshape(self._file,telescope_id)
+
+    def get_ref_step(self,telescope_id):
+        """
+        Returns:
+        --------
+        If telescope_id, channel or fshape are not valid return 0.
+        Parameters
+        ----------
+        telescope_id: int
+        """
+        return lib.get_ref_step(self._file,telescope_id)
+
+    def get_time_slice(self,telescope_id):
+        """
+        Returns:
+        --------
+        Width of readout time slice (i.e. one sample) [ns].
+        If telescope_id is not valid return 0.
+        Parameters
+        ----------
+        telescope_id: int
+        """
+        return lib.get_time_slice(self._file,telescope_id)
+
+
+
+    def get_tel_event_gps_time(self,telescope_id):
+        """
+        Returns:
+        --------
+        telescope event gps tine in a 2D array:
+            -seconds
+            -nonosecond 
+        Parameters
+        ----------
+        telescope_id: int
+        """
+        seconds = _zeros(1,dtype=np.long)
+        nanoseconds = _zeros(1,dtype=np.long)
+
+        result = lib.get_tel_event_gps_time(self._file,telescope_id,seconds,nanoseconds)
+        if result == 0:
+            return seconds[0], nanoseconds[0]
+        else:
+            raise(HessioGeneralError("no event gps time for telescope "))
+
+
+    def get_central_event_gps_time(self):
+        """
+        Returns:
+        --------
+        telescope central envent gps tine in a 2D array:
+            -seconds
+            -nonosecond 
+        """
+        seconds = _zeros(1,dtype=np.long)
+        nanoseconds = _zeros(1,dtype=np.long)
+
+        result = lib.get_central_event_gps_time(self._file,seconds,nanoseconds)
+        if result == 0:
+            return seconds[0], nanoseconds[0]
+        else:
+            raise(HessioGeneralError("no central event  gps time"))
+
+
+    def get_central_event_teltrg_list(self):
+        """
+        Returns
+        -------
+        List of IDs of triggered telescopes
+        Raises
+        ------
+        HessioGeneralError if information is not available
+        """
+        num_teltrig= lib.get_num_tel_trig(self._file)
+        if num_teltrig >= 0:
+            array = _zeros(num_teltrig,dtype=np.int32)
+            lib.get_central_event_teltrg_list(self._file,array)
+            return array
+        else:
+            raise(HessioGeneralError("hsdata is not available"))
+
+
+    def get_mirror_number(self,telescope_id):
+
+        """
+        Returns
+        -------
+        total number of mirror tiles of a telescope
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+        if hsdata->camera_set[itel].num_mirrors not available
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+
+        result = lib.get_mirror_number(self._file,telescope_id)
+        if result >= 0 : return result
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("hsdata->camera_set[itel].num_mirrors not available"))
+
+
+    def get_optical_foclen(self,telescope_id):
+
+        """
+        Returns
+        -------
+        focal length ofoptics of a telescope [m]
+
+        Parameters
+        ----------
+        telescope_id: int
+
+        Raises
+        ------
+        HessioGeneralError
+        if hsdata->camera_set[itel].flen not available
+
+        HessioTelescopeIndexError
+        if no telescope exist with this id
+        """
+
+        result = lib.get_optical_foclen(self._file,telescope_id)
+        if result >=0 : return result
+        elif result == TEL_INDEX_NOT_VALID:
+            raise(HessioTelescopeIndexError("no telescope wth id " + str(telescope_id))) 
+        else:
+            raise(HessioGeneralError("hsdata->camera_set[itel].flen not available"))
+
+
+    def get_telescope_ids(self):
+        """
+        Returns
+        -------
+        list of IDs of telescopes used in the run
+
+        Raises
+        ------
+        HessioGeneralError
+        if information is not available
+        """
+        num_tel = self.get_num_telescope()
+        if num_tel >=0:
+            array = _zeros(num_tel,dtype=np.int32)
+            lib.get_telescope_ids(self._file,array)
+            return array
+        else:
+            raise(HessioGeneralError("hsdata->run_header.tel_id is not available"))
+
+    def telescope_indices(self,telescope_ids):
+        """
+        Map telescope IDs to their index in the run header,
+        i.e. in get_telescope_ids(), in a single call
+
+        Parameters
+        ----------
+        telescope_ids: array_like of int
+
+        Returns
+        -------
+        array of int32 with the same shape as telescope_ids,
+        TEL_INDEX_NOT_VALID for unknown IDs
+
+        Raises
+        ------
+        HessioGeneralError
+        if no run header was read
+        """
+        ids = np.ascontiguousarray(telescope_ids,dtype=np.int32)
+        indices = _zeros(ids.shape,dtype=np.int32)
+        if lib.get_telescope_indices(self._file,ids.reshape(-1),ids.size,indices.reshape(-1)) != 0:
+            raise(HessioGeneralError("no run header available"))
+        return indices
+
+    def get_event(self,what=RAWSUM_FLAG|TIME_FLAG):
+        """
+        Returns
+        -------
+        dictionary with the data of all telescopes with data
+        for the current event, filled in a single call:
+            - tel_id, num_gains, num_pixels, num_samples, num_times: 1D arrays
+            - adc_sums: (ntel, max_gains, max_pixels) if what & RAWSUM_FLAG
+            - adc_samples: (ntel, max_gains, max_pixels, max_samples) if what & RAWDATA_FLAG
+            - timval: (ntel, max_pixels, max_times) if what & TIME_FLAG
+            - peak_global: (ntel) if what & TIME_FLAG
+            - tel_gps_time: (ntel, 2) seconds and nanoseconds
+            - central_gps_time: seconds and nanoseconds
+            - mc_shower_energy, mc_shower_azimuth, mc_shower_altitude,
+              mc_event_xcore, mc_event_ycore
+        Arrays are padded with zeros up to the largest telescope.
+
+        Parameters
+        ----------
+        what: int, optional
+            combination of RAWSUM_FLAG, RAWDATA_FLAG and TIME_FLAG
+
+        Raises
+        ------
+        HessioGeneralError
+        if hsdata is not available
+        """
+        layout = _zeros(5,dtype=np.int32)
+        if lib.get_event_layout(self._file,layout) != 0:
+            raise(HessioGeneralError("hsdata is not available"))
+        ntel, ngain, npix, nsamp, ntimes = layout
+
+        tel_info = _zeros((ntel,5),dtype=np.int32)
+        if what & RAWSUM_FLAG:
+            adc_sums = _zeros((ntel,ngain,npix),dtype=np.uint32)
+        else:
+            adc_sums = _zeros(0,dtype=np.uint32)
+        if what & RAWDATA_FLAG:
+            adc_samples = _zeros((ntel,ngain,npix,nsamp),dtype=np.uint16)
+        else:
+            adc_samples = _zeros(0,dtype=np.uint16)
+        if what & TIME_FLAG:
+            timval = _zeros((ntel,npix,ntimes),dtype=np.float32)
+            peak_global = _zeros(ntel,dtype=np.float32)
+        else:
+            timval = _zeros(0,dtype=np.float32)
+            peak_global = _zeros(0,dtype=np.float32)
+        gps_time = _zeros((ntel+1,2),dtype=ctypes.c_long)
+        mc_values = _zeros(5,dtype=np.double)
+
+        result = lib.get_event(self._file,what,tel_info,adc_sums,adc_samples,timval,
+                               peak_global,gps_time,mc_values)
+        if result != 0:
+            raise(HessioGeneralError("hsdata is not available"))
+
+        event = {'tel_id': tel_info[:,0],
+                 'num_gains': tel_info[:,1],
+                 'num_pixels': tel_info[:,2],
+                 'num_samples': tel_info[:,3],
+                 'num_times': tel_info[:,4],
+                 'central_gps_time': (gps_time[0,0], gps_time[0,1]),
+                 'tel_gps_time': gps_time[1:],
+                 'mc_shower_energy': mc_values[0],
+                 'mc_shower_azimuth': mc_values[1],
+                 'mc_shower_altitude': mc_values[2],
+                 'mc_event_xcore': mc_values[3],
+                 'mc_event_ycore': mc_values[4]}
+        if what & RAWSUM_FLAG:
+            event['adc_sums'] = adc_sums
+        if what & RAWDATA_FLAG:
+            event['adc_samples'] = adc_samples
+        if what & TIME_FLAG:
+            event['timval'] = timval
+            event['peak_global'] = peak_global
+        return event
+
+
+class Skimmer(object):
+    """
+    Writer of a skim: a new data file with the run headers, the
+    configuration and the selected events of the files read, copied
+    block by block as they were read, without decoding and encoding.
+    Every event is byte for byte identical to the input.
+
+    Usage:
+        with Skimmer('skim.simtel.gz') as skimmer:
+            reader = HessioFile()
+            skimmer.attach(reader)
+            reader.file_open(filename)
+            for run_id, event_id in reader.move_to_next_event():
+                if reader.get_mc_shower_energy() > 1.:
+                    skimmer.write_event(reader)
+
+    All blocks other than events and their MC data (MC shower, MC
+    event, photo-electron sums and photons) are copied as
+    move_to_next_event reads them. The MC data of an event is only
+    written with it, an MC shower with the first event written of it.
+
+    Parameters
+    ----------
+    filename: str
+        output file, compressed by an external program
+        if it ends with .gz, .bz2, .xz, .lzma, .lzo or .lz4
 
     Raises
     ------
     HessioGeneralError
-    if information is not available
-    """
-    num_tel = get_num_telescope()
-    if num_tel >=0:
-        array = np.zeros(num_tel,dtype=np.int32)
-        lib.get_telescope_ids(array)
-        return array
-    else:
-        raise(HessioGeneralError("hsdata->run_header.tel_id is not available"))
+    if the file can not be opened
+    """
+    def __init__(self,filename):
+        self.filename = filename
+        self.num_events = 0
+        self._readers = weakref.WeakSet()
+        self._output = lib.open_output_file(filename.encode('utf-8'))
+        if not self._output:
+            raise(HessioGeneralError("could not open " + filename))
+
+    def __del__(self):
+        if getattr(self,'_output',None):
+            try:
+                self.close()
+            except HessioGeneralError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc_info):
+        self.close()
+
+    def attach(self,reader):
+        """
+        Copy the blocks reader reads from now on. Attach the reader
+        before it reads a file, so that its run header is copied.
+        A reader can be attached to one skimmer at a time.
+
+        Parameters
+        ----------
+        reader: HessioFile
+
+        Raises
+        ------
+        HessioGeneralError
+        if the skimmer is closed
+        """
+        if not self._output:
+            raise(HessioGeneralError("skimmer is closed"))
+        if reader._skimmer is not None:
+            reader._skimmer.detach(reader)
+        lib.set_copy_output(reader._file,self._output)
+        reader._skimmer = self
+        self._readers.add(reader)
+
+    def detach(self,reader):
+        """
+        Stop copying the blocks reader reads
+
+        Parameters
+        ----------
+        reader: HessioFile
+        """
+        if reader._skimmer is self:
+            lib.set_copy_output(reader._file,None)
+            reader._skimmer = None
+        self._readers.discard(reader)
+
+    def write_event(self,reader):
+        """
+        Write the event reader's move_to_next_event returned last,
+        with its MC data
+
+        Parameters
+        ----------
+        reader: HessioFile
+            attached to this skimmer
+
+        Raises
+        ------
+        HessioGeneralError
+        if reader is not attached, its current event was written
+        already or was not read by move_to_next_event
+        """
+        if reader._skimmer is not self:
+            raise(HessioGeneralError("reader is not attached to this skimmer"))
+        if lib.write_current_event(reader._file) != 0:
+            raise(HessioGeneralError("no event to write in " + self.filename))
+        self.num_events = self.num_events + 1
+
+    def close(self):
+        """
+        Detach all readers and close the output file
+
+        Raises
+        ------
+        HessioGeneralError
+        if the data could not be written completely
+        """
+        if not self._output:
+            return
+        for reader in list(self._readers):
+            self.detach(reader)
+        result = lib.close_output_file(self._output)
+        self._output = None
+        if result != 0:
+            raise(HessioGeneralError("could not write " + self.filename))
+
+
+def _fast_method(name):
+    method = getattr(HessioFile,name)
+    fast = getattr(_fast,name)
+    @functools.wraps(method)
+    def function(self,*args,**kwargs):
+        if kwargs:
+            return method(self,*args,**kwargs)
+        return fast(self._file,*args)
+    return function
+
+# Same methods, through the compiled fast paths
+if _fast is not None:
+    _fast.set_exceptions(HessioGeneralError,HessioTelescopeIndexError,HessioChannelIndexError)
+    for _name in ('get_num_teldata','get_teldata_list','get_telescope_with_data_list',
+                  'get_num_channel','get_num_pixels','get_num_samples',
+                  'get_pixel_timing_num_times_types','get_adc_sum','get_adc_sample',
+                  'get_pixel_timing_timval','get_pixel_timing_peak_global'):
+        setattr(HessioFile,_name,_fast_method(_name))
+    del _name
+
+_default_file = HessioFile()
+
+def _default_file_method(name):
+    method = getattr(HessioFile,name)
+    @functools.wraps(method)
+    def function(*args,**kwargs):
+        return method(_default_file,*args,**kwargs)
+    return function
+
+# Module-level functions read through the default HessioFile
+for _name in __all__:
+    if callable(getattr(HessioFile,_name,None)):
+        globals()[_name] = _default_file_method(_name)
+del _name
+
+# hessio.parallel: reading many files in worker processes
+import hessio_parallel as parallel
+
+# hessio.export: columnar export to HDF5 or Parquet
+import hessio_export as export
+
+# hessio.synthetic: reproducible synthetic simtel files
+import hessio_synthetic as synthetic
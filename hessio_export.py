@@ -0,0 +1,323 @@
+"""
+Columnar export of decoded events to HDF5 or Parquet
+
+Events are read in chunks with HessioFile.iter_batches, which fills
+the arrays of a whole chunk from the C structures in one call, and
+every chunk is appended to the output tables:
+
+- events: run, event_id, glob_count, num_tel_trig, num_tel_data
+- mc_truth: run, event_id, mc_shower_energy, mc_shower_azimuth,
+  mc_shower_altitude, mc_event_xcore, mc_event_ycore
+- telescopes: run, tel_id, type, num_pixels, mirror_area, optical_foclen
+- one table per telescope type, one row per telescope with data:
+  run, event_id, tel_id, adc_sums, adc_samples, timval, peak_global
+
+A telescope type is named after its number of pixels and its focal
+length, for instance tel_1855pix_28000mm. Pixel columns are cut to the
+number of pixels of the type and padded with zeros up to the largest
+number of gains, samples and times of the telescopes of the run.
+
+HDF5 files have one group per table and one dataset per column.
+Parquet output is a directory with one <table>.parquet file per table,
+pixel columns are stored as nested lists.
+
+h5py and pyarrow are only needed for the format written.
+
+Available as hessio.export, or from the command line:
+python -m hessio_export input.simtel.gz output.h5 --columns adc_sums peak_global
+"""
+import argparse
+import os
+
+import numpy as np
+
+import hessio
+
+__all__ = ['convert', 'COLUMNS', 'DEFAULT_COLUMNS']
+
+# Columns of each table, the first ones are always written
+_KEYS = {'events': ('run', 'event_id'),
+         'mc_truth': ('run', 'event_id'),
+         'telescopes': ('run', 'tel_id'),
+         'telescope': ('run', 'event_id', 'tel_id')}
+_EVENT_COLUMNS = ('glob_count', 'num_tel_trig', 'num_tel_data')
+_MC_COLUMNS = ('mc_shower_energy', 'mc_shower_azimuth', 'mc_shower_altitude',
+               'mc_event_xcore', 'mc_event_ycore')
+_PIXEL_COLUMNS = ('adc_sums', 'adc_samples', 'timval', 'peak_global')
+
+COLUMNS = _EVENT_COLUMNS + _MC_COLUMNS + _PIXEL_COLUMNS
+DEFAULT_COLUMNS = tuple(column for column in COLUMNS if column != 'adc_samples')
+
+# Upper limit of the bytes of one HDF5 storage chunk
+_CHUNK_BYTES = 1 << 22
+
+
+def _format_of(output):
+    """
+    Returns
+    -------
+    'hdf5' or 'parquet' guessed from the extension of output
+    """
+    extension = os.path.splitext(output)[1].lower()
+    if extension in ('.h5', '.hdf5', '.hdf'):
+        return 'hdf5'
+    if extension in ('.parquet', '.pq', ''):
+        return 'parquet'
+    raise(hessio.HessioGeneralError("can not guess the format of " + output))
+
+
+class _Hdf5Writer(object):
+    """
+    Append chunks of columns to resizable, chunked and compressed
+    datasets of an HDF5 file
+    """
+    def __init__(self, output, compression):
+        try:
+            import h5py
+        except ImportError as err:
+            raise ImportError("h5py is required to write HDF5 files: {}".format(err))
+        self._file = h5py.File(output, 'w')
+        self._compression = compression or 'gzip'
+
+    def append(self, table, columns):
+        group = self._file.require_group(table)
+        for name, values in columns.items():
+            if values.dtype.kind == 'U':
+                values = values.astype('S')
+            if name not in group:
+                row_bytes = max(1, values[:1].nbytes)
+                rows = max(1, min(len(values), _CHUNK_BYTES // row_bytes))
+                group.create_dataset(name, shape=(0,) + values.shape[1:],
+                                     maxshape=(None,) * values.ndim, dtype=values.dtype,
+                                     chunks=(rows,) + tuple(max(1, dim) for dim in values.shape[1:]),
+                                     compression=self._compression, shuffle=True)
+            dataset = group[name]
+            start = dataset.shape[0]
+            dataset.resize((start + len(values),) +
+                           tuple(max(old, new) for old, new in zip(dataset.shape[1:],
+                                                                   values.shape[1:])))
+            dataset[(slice(start, start + len(values)),) +
+                    tuple(slice(0, dim) for dim in values.shape[1:])] = values
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter(object):
+    """
+    Append chunks of columns as row groups of one Parquet file per table
+    """
+    def __init__(self, output, compression):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as err:
+            raise ImportError("pyarrow is required to write Parquet files: {}".format(err))
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._output = output
+        self._compression = compression or 'zstd'
+        self._writers = dict()
+        os.makedirs(output, exist_ok=True)
+
+    def _array(self, values):
+        """
+        Returns
+        -------
+        arrow array of values, nested lists for the axes after the first
+        """
+        array = self._pa.array(values.reshape(-1))
+        for axis in range(values.ndim - 1, 0, -1):
+            count = int(np.prod(values.shape[:axis]))
+            offsets = np.arange(count + 1, dtype=np.int32) * values.shape[axis]
+            array = self._pa.ListArray.from_arrays(offsets, array)
+        return array
+
+    def append(self, table, columns):
+        data = self._pa.table({name: self._array(values) for name, values in columns.items()})
+        writer = self._writers.get(table)
+        if writer is None:
+            writer = self._pq.ParquetWriter(os.path.join(self._output, table + '.parquet'),
+                                            data.schema, compression=self._compression)
+            self._writers[table] = writer
+        writer.write_table(data)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def _telescope_types(configs, run, tel_ids):
+    """
+    Returns
+    -------
+    dictionary with the telescope table of the run and, for
+    each telescope type, (positions in tel_ids, number of pixels),
+    from the configurations of tel_ids given with a batch
+    """
+    names = list()
+    num_pixels = np.zeros(len(tel_ids), dtype=np.int32)
+    mirror_area = np.zeros(len(tel_ids), dtype=np.double)
+    optical_foclen = np.zeros(len(tel_ids), dtype=np.double)
+    for position, config in enumerate(configs):
+        if config is None:
+            raise(hessio.HessioTelescopeIndexError("no telescope wth id " + str(tel_ids[position])))
+        num_pixels[position] = len(config['pix_x'])
+        mirror_area[position] = config['mirror_area']
+        optical_foclen[position] = config['optical_foclen']
+        names.append("tel_{}pix_{}mm".format(num_pixels[position],
+                                            int(round(optical_foclen[position] * 1000))))
+
+    types = dict()
+    for name in sorted(set(names)):
+        positions = np.array([position for position, other in enumerate(names) if other == name],
+                             dtype=np.intp)
+        types[name] = (positions, int(num_pixels[positions[0]]))
+    table = {'run': np.full(len(tel_ids), run, dtype=np.int32),
+             'tel_id': np.asarray(tel_ids, dtype=np.int32),
+             'type': np.array(names, dtype=str),
+             'num_pixels': num_pixels,
+             'mirror_area': mirror_area,
+             'optical_foclen': optical_foclen}
+    return table, types
+
+
+def _select(table, columns, kind):
+    """
+    Returns
+    -------
+    the key columns of table and those in columns, None if there is
+    no other column to write
+    """
+    keys = _KEYS[kind]
+    selected = {name: values for name, values in table.items()
+                if name in keys or name in columns}
+    if len(selected) == len(keys) and kind != 'events':
+        return None
+    return selected
+
+
+def convert(filename, output, format=None, columns=None, chunk_size=1000,
+            compression=None, telescopes=None, limit=0):
+    """
+    Write the events of a data file to columnar tables
+
+    Parameters
+    ----------
+    filename: str
+        simtel data file
+    output: str
+        HDF5 file, or directory of Parquet files
+    format: str,optional
+        'hdf5' or 'parquet', by default guessed from the extension
+        of output: .h5, .hdf5 or .hdf for HDF5, else Parquet
+    columns: sequence of str,optional
+        columns to write, among COLUMNS, by default DEFAULT_COLUMNS
+        (all but adc_samples). Tables of which no column is selected,
+        except the events table, are not written.
+    chunk_size: int,optional
+        number of events read and appended at a time
+    compression: str,optional
+        compression filter, by default gzip for HDF5, zstd for Parquet
+    telescopes: sequence of int,optional
+        IDs of the telescopes to write, by default all
+    limit: int,optional
+        maximum number of events, by default all
+
+    Returns
+    -------
+    number of events written
+
+    Raises
+    ------
+    HessioGeneralError
+    if a column or the format is not known, or filename can not be read
+
+    ImportError
+    if h5py or pyarrow is not installed for the format asked for
+    """
+    if columns is None:
+        columns = DEFAULT_COLUMNS
+    columns = set(columns)
+    unknown = columns.difference(COLUMNS)
+    if unknown:
+        raise(hessio.HessioGeneralError("unknown columns " + ", ".join(sorted(unknown))))
+    if format is None:
+        format = _format_of(output)
+    if format not in ('hdf5', 'parquet'):
+        raise(hessio.HessioGeneralError("unknown format " + str(format)))
+    fields = tuple(field for field in _PIXEL_COLUMNS if field in columns)
+
+    nevents = 0
+    with hessio.HessioFile(filename, telescopes=telescopes) as reader:
+        if format == 'hdf5':
+            writer = _Hdf5Writer(output, compression)
+        else:
+            writer = _ParquetWriter(output, compression)
+        try:
+            run = None
+            tel_ids = None
+            for batch in reader.iter_batches(chunk_size, fields, telescopes, limit):
+                # The reader may already be in the next run: the
+                # configuration is the one given with the batch
+                if batch['run'][0] != run or not np.array_equal(batch['tel_id'], tel_ids):
+                    run = batch['run'][0]
+                    tel_ids = batch['tel_id']
+                    table, types = _telescope_types(batch['config'], run, tel_ids)
+                    writer.append('telescopes', table)
+
+                mask = batch['mask']
+                batch['num_tel_data'] = mask.sum(axis=1, dtype=np.int32)
+                for kind, names in (('events', _EVENT_COLUMNS), ('mc_truth', _MC_COLUMNS)):
+                    selected = _select({name: batch[name] for name in _KEYS[kind] + names},
+                                       columns, kind)
+                    if selected is not None:
+                        writer.append(kind, selected)
+
+                for name, (positions, num_pixels) in types.items():
+                    event_index, tel_index = np.nonzero(mask[:, positions])
+                    if len(event_index) == 0:
+                        continue
+                    tel_index = positions[tel_index]
+                    table = {'run': batch['run'][event_index],
+                             'event_id': batch['event_id'][event_index],
+                             'tel_id': tel_ids[tel_index]}
+                    for field in fields:
+                        values = batch[field][event_index, tel_index]
+                        if field in ('adc_sums', 'adc_samples'):
+                            values = values[:, :, :num_pixels]
+                        elif field == 'timval':
+                            values = values[:, :num_pixels]
+                        table[field] = values
+                    selected = _select(table, columns, 'telescope')
+                    if selected is not None:
+                        writer.append(name, selected)
+                nevents += len(batch['event_id'])
+        finally:
+            writer.close()
+    return nevents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a simtel data file to HDF5 or Parquet tables.')
+    parser.add_argument('filename', help='simtelarray data file name')
+    parser.add_argument('output', help='HDF5 file (.h5) or directory of Parquet files')
+    parser.add_argument('--format', choices=('hdf5', 'parquet'),
+                        help='output format, by default guessed from the output extension')
+    parser.add_argument('--columns', nargs='+', choices=COLUMNS,
+                        help='columns to write, by default all but adc_samples')
+    parser.add_argument('--chunk-size', type=int, dest='chunk_size', default=1000,
+                        help='number of events read and written at a time')
+    parser.add_argument('--compression', help='compression filter (gzip/lzf for HDF5, zstd/snappy/... for Parquet)')
+    parser.add_argument('--tel', type=int, nargs='+', dest='telescopes', help='telescope ids to write')
+    parser.add_argument('--limit', type=int, default=0, help='limit number of events to write')
+    args = parser.parse_args(argv)
+    nevents = convert(args.filename, args.output, format=args.format, columns=args.columns,
+                      chunk_size=args.chunk_size, compression=args.compression,
+                      telescopes=args.telescopes, limit=args.limit)
+    print("{} events written to {}".format(nevents, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Parallel reading of many data files
+
+Worker processes read the files, one HessioFile each, and pack the
+arrays of every event into a shared memory ring buffer. The parent
+process builds numpy views onto the ring buffer and hands them to
+the user function, so event data are never pickled.
+
+The parent owns the ring buffers: it unlinks them once done, or
+when a worker replaced its ring by a larger one.
+
+Available as hessio.parallel
+"""
+import multiprocessing
+import queue
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import hessio
+
+__all__ = ['map_files']
+
+# Byte alignment of arrays inside a ring buffer slot
+_ALIGN = 64
+
+
+def _event_layout(event):
+    """
+    Returns
+    -------
+    list of (key, dtype, shape, offset) for the arrays of event
+    and the number of bytes needed to store them
+    """
+    layout = list()
+    nbytes = 0
+    for key, value in event.items():
+        if isinstance(value, np.ndarray):
+            layout.append((key, value.dtype.str, value.shape, nbytes))
+            nbytes += (value.nbytes + _ALIGN - 1) // _ALIGN * _ALIGN
+    return layout, nbytes
+
+
+def _close_ring(ring, unlink=False):
+    """
+    Close (and unlink) ring, ignoring views that are still alive
+    """
+    try:
+        ring.close()
+    except BufferError:
+        pass
+    if unlink:
+        try:
+            ring.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _ring_array(ring, offset, dtype, shape):
+    """
+    Returns read-only array at offset of ring
+    """
+    array = np.ndarray(shape, dtype, buffer=ring.buf, offset=offset)
+    array.flags.writeable = False
+    return array
+
+
+def _read_files(worker_id, tasks, messages, free_slots, filenames, what, slots):
+    """
+    Worker process: read the files whose index comes from tasks and
+    send their events to the parent through messages
+    """
+    ring = None
+    slot_bytes = 0
+    slot = 0
+    try:
+        for file_index in iter(tasks.get, None):
+            nevents = 0
+            try:
+                reader = hessio.HessioFile(filenames[file_index])
+                with reader:
+                    for run_id, event_id in reader.move_to_next_event():
+                        event = reader.get_event(what)
+                        event['run'] = run_id
+                        event['event_id'] = event_id
+                        event['glob_count'] = reader.get_global_event_count()
+                        layout, nbytes = _event_layout(event)
+
+                        if nbytes > slot_bytes:
+                            # Wait for the parent to release every slot, then
+                            # replace the ring by a larger one
+                            for loop in range(slots):
+                                free_slots.acquire()
+                            if ring is not None:
+                                _close_ring(ring)
+                            slot_bytes = max(nbytes, 2 * slot_bytes)
+                            ring = shared_memory.SharedMemory(create=True,
+                                                              size=slot_bytes * slots)
+                            resource_tracker.unregister(ring._name, 'shared_memory')
+                            messages.put(('ring', worker_id, ring.name, slot_bytes))
+                            slot = 0
+                            for loop in range(slots):
+                                free_slots.release()
+
+                        free_slots.acquire()
+                        for key, dtype, shape, offset in layout:
+                            np.ndarray(shape, dtype, buffer=ring.buf,
+                                       offset=slot * slot_bytes + offset)[...] = event.pop(key)
+                        messages.put(('event', worker_id, file_index, slot, layout, event))
+                        slot = (slot + 1) % slots
+                        nevents = nevents + 1
+            except Exception as err:
+                messages.put(('error', worker_id, file_index, str(err)))
+                continue
+            messages.put(('done', worker_id, file_index, nevents))
+    finally:
+        if ring is not None:
+            _close_ring(ring)
+
+
+def map_files(func, filenames, workers=None, what=hessio.RAWSUM_FLAG|hessio.TIME_FLAG,
+              slots=8):
+    """
+    Apply func to every event of several data files,
+    reading the files in parallel worker processes
+
+    func is called in the calling process, with one event at
+    a time, in file order for the events of one file.
+
+    Parameters
+    ----------
+    func: callable
+        called with a dictionary as returned by get_event(what),
+        plus 'run', 'event_id', 'glob_count' and 'filename'.
+        Its arrays are read-only views onto shared memory, only valid
+        during the call: copy them to keep them.
+    filenames: list of str
+    workers: int,optional
+        number of worker processes, by default one per CPU
+    what: int,optional
+        combination of RAWSUM_FLAG, RAWDATA_FLAG and TIME_FLAG
+    slots: int,optional
+        number of events each worker can read ahead
+
+    Returns
+    -------
+    list with, for each file, the list of func results of its events
+
+    Raises
+    ------
+    HessioGeneralError
+    if a file can not be read
+    """
+    filenames = list(filenames)
+    if not filenames:
+        return list()
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(filenames)))
+
+    context = multiprocessing.get_context()
+    tasks = context.Queue()
+    messages = context.Queue()
+    for file_index in range(len(filenames)):
+        tasks.put(file_index)
+    for loop in range(workers):
+        tasks.put(None)
+    free_slots = [context.Semaphore(slots) for loop in range(workers)]
+    processes = [context.Process(target=_read_files,
+                                 args=(worker_id, tasks, messages, free_slots[worker_id],
+                                       filenames, what, slots),
+                                 daemon=True)
+                 for worker_id in range(workers)]
+
+    results = [list() for filename in filenames]
+    rings = dict()
+    pending = len(filenames)
+    for process in processes:
+        process.start()
+    try:
+        while pending > 0:
+            try:
+                message = messages.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    raise(hessio.HessioGeneralError("worker processes ended unexpectedly"))
+                continue
+            kind, worker_id, payload = message[0], message[1], message[2:]
+
+            if kind == 'ring':
+                if worker_id in rings:
+                    _close_ring(rings[worker_id][0], unlink=True)
+                name, slot_bytes = payload
+                rings[worker_id] = (shared_memory.SharedMemory(name=name), slot_bytes)
+            elif kind == 'event':
+                file_index, slot, layout, event = payload
+                ring, slot_bytes = rings[worker_id]
+                event.update((key, _ring_array(ring, slot * slot_bytes + offset, dtype, shape))
+                             for key, dtype, shape, offset in layout)
+                event['filename'] = filenames[file_index]
+                try:
+                    results[file_index].append(func(event))
+                finally:
+                    event.clear()
+                    free_slots[worker_id].release()
+            elif kind == 'done':
+                pending = pending - 1
+            else:
+                file_index, error = payload
+                raise(hessio.HessioGeneralError(error))
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for ring, slot_bytes in rings.values():
+            _close_ring(ring, unlink=True)
+        # Rings announced but not attached yet
+        while True:
+            try:
+                message = messages.get(timeout=0.1)
+            except queue.Empty:
+                break
+            if message[0] == 'ring':
+                _close_ring(shared_memory.SharedMemory(name=message[2]), unlink=True)
+    return results
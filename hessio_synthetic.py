@@ -0,0 +1,114 @@
+"""
+Synthetic simtel data files
+
+A run is written with the write_hess_* functions of the hessio library,
+block by block as sim_telarray does: run and MC run headers, camera
+settings, organisation, pixel settings, software settings, tracking
+and pointing correction, monitoring (pedestals) and calibration of
+each telescope, then MC shower, MC event and event blocks, and the
+end of run statistics.
+
+- telescopes on a square grid of 100 m, pointing to azimuth 0 and
+  altitude 70 degrees, all with the same camera of hexagonal pixels
+  (pitch 5 cm, focal length 16 m)
+- gamma-ray showers from the pointing direction, energies of an E^-2
+  spectrum between 0.03 and 100 TeV, cores uniform over a disk
+- telescopes closer than 300 m to the core (at least the closest one)
+  have data: an elliptical image pointing away from the camera centre,
+  with photo-electron and electronic noise, recorded as sums or as
+  Gaussian pulses of samples, and pixel timing
+- calibrated images (get_calibrated_image) are in photo-electrons
+
+The same seed gives the same events: files differ only by the time
+of the monitoring blocks, which the library sets when writing them.
+The file is compressed as its name tells, for instance .gz for gzip,
+see fileopen.
+
+Available as hessio.synthetic, or from the command line:
+python -m hessio_synthetic run1.simtel.gz --events 1000 --tel 4 --samples 25
+"""
+import argparse
+
+import hessio
+
+__all__ = ['generate']
+
+
+def generate(filename, events=100, telescopes=4, pixels=1855, gains=2, samples=0,
+             zero_suppression=0., seed=1, run=1):
+    """
+    Write a synthetic run
+
+    Parameters
+    ----------
+    filename: str
+        output file, compressed according to its extension
+    events: int,optional
+        number of events
+    telescopes: int,optional
+        number of telescopes, with IDs 1 to telescopes
+    pixels: int,optional
+        number of pixels of the cameras
+    gains: int,optional
+        number of gains, 1 or 2 (low gain 10 times lower)
+    samples: int,optional
+        number of samples, only sums are written if 0
+    zero_suppression: float,optional
+        pixels below this number of photo-electrons are not
+        written, no zero suppression if 0
+    seed: int,optional
+        seed of the random numbers
+    run: int,optional
+        run number
+
+    Returns
+    -------
+    number of events written
+
+    Raises
+    ------
+    HessioGeneralError
+    if a dimension is larger than the hessio library supports,
+    or filename can not be written
+    """
+    limits = ((telescopes, hessio.lib.get_max_telescopes(), 'telescopes'),
+              (pixels, hessio.H_MAX_PIX, 'pixels'),
+              (gains, hessio.H_MAX_GAINS, 'gains'))
+    for value, maximum, name in limits:
+        if value < 1 or value > maximum:
+            raise(hessio.HessioGeneralError("{} must be between 1 and {}".format(name, maximum)))
+    if samples < 0 or samples > hessio.H_MAX_SLICES:
+        raise(hessio.HessioGeneralError("samples must be between 0 and {}".format(hessio.H_MAX_SLICES)))
+    if events < 0:
+        raise(hessio.HessioGeneralError("events must not be negative"))
+
+    # Calibration constants for images in p.e. with the default calib_scale
+    result = hessio.lib.write_synthetic_run(filename.encode('utf-8'), run, events, telescopes,
+                                            pixels, gains, samples, zero_suppression,
+                                            hessio.CALIB_SCALE, seed)
+    if result < 0:
+        raise(hessio.HessioGeneralError("could not write " + filename))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic simtel data file.')
+    parser.add_argument('filename', help='output file name, .gz for gzip compression')
+    parser.add_argument('--events', type=int, default=100, help='number of events')
+    parser.add_argument('--tel', type=int, dest='telescopes', default=4, help='number of telescopes')
+    parser.add_argument('--pixels', type=int, default=1855, help='number of pixels per camera')
+    parser.add_argument('--gains', type=int, default=2, choices=(1, 2), help='number of gains')
+    parser.add_argument('--samples', type=int, default=0, help='number of samples, 0 for sums only')
+    parser.add_argument('--zero-suppression', type=float, dest='zero_suppression', default=0.,
+                        help='threshold of zero suppression [p.e.], 0 for none')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the random numbers')
+    parser.add_argument('--run', type=int, default=1, help='run number')
+    args = parser.parse_args(argv)
+    nevents = generate(args.filename, events=args.events, telescopes=args.telescopes,
+                       pixels=args.pixels, gains=args.gains, samples=args.samples,
+                       zero_suppression=args.zero_suppression, seed=args.seed, run=args.run)
+    print("{} events written to {}".format(nevents, args.filename))
+
+
+if __name__ == '__main__':
+    main()
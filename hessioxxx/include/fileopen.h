@@ -46,6 +46,24 @@ int fileclose(FILE *f);
 void set_permissive_pipes(int p);
 void enable_permissive_pipes(void);
 void disable_permissive_pipes(void);
+void set_inprocess_decompression(int p);
+void set_readahead_chunks(int n);
+void set_decompression_stats(int enable);
+void get_decompression_stats(long long *values);
+void reset_decompression_stats(void);
+
+/** Where decompression of a gzip file can be resumed (see zlib's examples/zran.c). */
+struct gz_access_point
+{
+   int64_t out;      /**< Position in the decompressed data */
+   int64_t in;       /**< Position in the compressed file */
+   int bits;         /**< Bits of the byte before 'in' still to be used, -1 at the start of a gzip member */
+   unsigned window_size;         /**< Bytes used in window */
+   unsigned char window[32768];  /**< Decompressed data preceding 'out' */
+};
+
+int gz_build_access(const char *fname, int64_t span, struct gz_access_point **points);
+FILE *fileopen_at(const char *fname, int64_t offset, const struct gz_access_point *point);
 
 #ifdef __cplusplus
 }
@@ -1289,6 +1289,8 @@ int print_hess_shower(IO_BUFFER *iobuf);
 
 int write_hess_event(IO_BUFFER *iobuf, FullEvent *ev, int what);
 int read_hess_event(IO_BUFFER *iobuf, FullEvent *ev, int what);
+int read_hess_event_selected(IO_BUFFER *iobuf, FullEvent *ev, int what,
+   const uint8_t *selected);
 int print_hess_event(IO_BUFFER *iobuf);
 
 int write_hess_calib_event (IO_BUFFER *iobuf, FullEvent *ev, int what, int type);
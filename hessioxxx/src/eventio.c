@@ -4456,7 +4456,12 @@ int skip_io_block (IO_BUFFER *iobuf, IO_ITEM_HEADER *item_header)
       {
          if ( iobuf->regular == 0 )
          {
-            fstat(fileno(iobuf->input_file),&st);
+            /* Streams without file handle (in-process decompression) */
+            /* cannot be seeked and are never regular files. */
+            if ( fileno(iobuf->input_file) < 0 ||
+                 fstat(fileno(iobuf->input_file),&st) != 0 )
+               iobuf->regular = -1;
+            else
 #ifdef S_IFREG
             if ( st.st_mode & S_IFREG )
                iobuf->regular = 1;
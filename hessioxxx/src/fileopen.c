@@ -43,6 +43,16 @@
  *      @c .lzo ), @c lzma (for extension  @c .lzma ) as well as
  *      @c xz (for extension @ .xz ) and @c lz4 (for extension @c .lz4 ) are handled
  *      on the fly. No check is made if these programs are installed.
+ *  @li When compiled with @c HAVE_ZLIB, @c HAVE_BZLIB or @c HAVE_LZMA
+ *      (glibc only), local @c .gz, @c .bz2, @c .xz and @c .lzma files
+ *      are decompressed for reading inside the process, with zlib,
+ *      libbz2 or liblzma, instead of through a pipe from an external
+ *      program. The pipe is still used if in-process decompression
+ *      is not available or has been disabled with
+ *      set_inprocess_decompression(). Such files can also be opened
+ *      at a given position of their decompressed data with
+ *      fileopen_at(), for gzip files without decompressing
+ *      everything before, thanks to access points from gz_build_access().
  *  @li URIs (uniform resource identifiers) starting with @c http:,
  *      @c https:, or @c ftp: will also be opened in a pipe, with optional
  *      decompression, depending on the ending of the URI name.
@@ -65,6 +75,13 @@
  *  @version @verbatim CVS $Revision: 1.20 $ @endverbatim 
  */
 
+#if defined(HAVE_ZLIB) || defined(HAVE_BZLIB) || defined(HAVE_LZMA)
+/* Needed for fopencookie() */
+#ifndef _GNU_SOURCE
+#define _GNU_SOURCE 1
+#endif
+#endif
+
 #include "initial.h"
 #include "straux.h"
 #include "fileopen.h"
@@ -72,6 +89,23 @@
 #include <sys/types.h>
 #include <sys/stat.h>
 
+#if ( defined(HAVE_ZLIB) || defined(HAVE_BZLIB) || defined(HAVE_LZMA) ) && defined(__GLIBC__)
+#define INPROCESS_DECOMPRESSION 1
+#include <limits.h>
+#ifdef HAVE_ZLIB
+#include <zlib.h>
+#endif
+#ifdef HAVE_BZLIB
+#include <bzlib.h>
+#endif
+#ifdef HAVE_LZMA
+#include <lzma.h>
+#endif
+#ifdef _REENTRANT
+#include <pthread.h>
+#endif
+#endif
+
 /** Use to decide if open/close success/failure is reported */
 static int verbose = 0;
 
@@ -110,6 +144,17 @@ static FILE *fopenx(const char *fname, const char *mode)
    return f;
 }
 
+static int fseekx(FILE *f, int64_t offset);
+
+static int fseekx(FILE *f, int64_t offset)
+{
+#ifdef __USE_LARGEFILE64
+   return fseeko64(f,(off64_t)offset,SEEK_SET);
+#else
+   return fseeko(f,(off_t)offset,SEEK_SET);
+#endif
+}
+
 /** An element in a linked list of include paths. */
 struct incpath
 {
@@ -153,6 +198,61 @@ void disable_permissive_pipes()
    permissive_pipes = 0;
 }
 
+/** Decompress input files inside the process if this variable is non-zero. */
+
+static int inprocess_decompression = 1; /* Whenever available */
+
+/** Enable or disable in-process decompression (pipes are used instead). */
+
+void set_inprocess_decompression(int p)
+{
+   inprocess_decompression = p;
+}
+
+/** Number of decompressed chunks read ahead by a background thread. */
+
+static int readahead_chunks = 4; /* Only with _REENTRANT, 0: no thread */
+
+/** Set how many chunks of decompressed data may be read ahead
+ *  in a background thread, for files opened afterwards. Zero
+ *  disables the read-ahead thread. */
+
+void set_readahead_chunks(int n)
+{
+   readahead_chunks = (n > 0) ? n : 0;
+}
+
+/** Counters of in-process decompression, updated if enabled:
+ *  calls, compressed bytes read, decompressed bytes, nanoseconds. */
+
+static int decompression_stats_enabled = 0;
+static uint64_t decompression_stats[4];
+
+/** Enable or disable counting in-process decompression (off by default). */
+
+void set_decompression_stats(int enable)
+{
+   decompression_stats_enabled = enable;
+}
+
+/** Copy the four decompression counters to values. */
+
+void get_decompression_stats(long long *values)
+{
+   int i;
+   for ( i=0; i<4; i++ )
+      values[i] = (long long) __atomic_load_n(&decompression_stats[i], __ATOMIC_RELAXED);
+}
+
+/** Set all decompression counters to zero. */
+
+void reset_decompression_stats()
+{
+   int i;
+   for ( i=0; i<4; i++ )
+      __atomic_store_n(&decompression_stats[i], 0, __ATOMIC_RELAXED);
+}
+
 static void freepath(void);
 static void freeexepath(void);
 
@@ -658,6 +758,728 @@ static FILE *cmp_popen (const char *fname, const char *mode, int compression)
    return f;
 }
 
+#ifdef INPROCESS_DECOMPRESSION
+
+/** State of a compressed input file decompressed in-process. */
+
+struct cmp_cookie
+{
+   int compression;  /**< Same codes as used by cmp_popen() */
+   FILE *raw;        /**< Compressed input */
+   int raw_eof;      /**< End of compressed input reached */
+   int64_t pos;      /**< Position in the decompressed data */
+#ifdef HAVE_ZLIB
+   z_stream zs;
+   int zs_init;      /**< zs needs inflateEnd() */
+   int zs_raw;       /**< Raw deflate data, after starting at an access point */
+   int zs_eof;       /**< End of the last gzip member reached */
+   int64_t zs_in;    /**< Position in the compressed file */
+   int64_t span;     /**< Distance of access points, zero if none are recorded */
+   int64_t last_point;
+   struct gz_access_point *points;
+   int npoints, maxpoints;
+   unsigned char zs_inbuf[65536];
+#endif
+#ifdef HAVE_BZLIB
+   BZFILE *bz;
+   int bz_eof;
+#endif
+#ifdef HAVE_LZMA
+   lzma_stream lz;
+   int lz_eof;
+   uint8_t lz_in[65536];
+#endif
+};
+
+#ifdef HAVE_ZLIB
+/** Make sure that at least 'need' bytes of compressed input are available.
+    Returns 1 if so, 0 at end of input, -1 on error. */
+
+static int gz_fill (struct cmp_cookie *c, unsigned need)
+{
+   z_stream *s = &c->zs;
+
+   if ( s->avail_in >= need )
+      return 1;
+   if ( s->avail_in > 0 )
+      memmove(c->zs_inbuf, s->next_in, s->avail_in);
+   s->next_in = c->zs_inbuf;
+   s->avail_in += (uInt) fread(c->zs_inbuf+s->avail_in, 1,
+      sizeof(c->zs_inbuf)-s->avail_in, c->raw);
+   if ( s->avail_in >= need )
+      return 1;
+   return ferror(c->raw) ? -1 : 0;
+}
+
+/** Remember an access point at position 'out' of the decompressed data. */
+
+static void gz_add_point (struct cmp_cookie *c, int64_t out, int bits)
+{
+   struct gz_access_point *p;
+
+   if ( c->npoints == c->maxpoints )
+   {
+      int n = (c->maxpoints > 0) ? 2*c->maxpoints : 16;
+      p = (struct gz_access_point *) realloc(c->points, n*sizeof(*p));
+      if ( p == NULL )
+      {
+         c->span = -1; /* Failed, no more access points */
+         return;
+      }
+      c->points = p;
+      c->maxpoints = n;
+   }
+   p = &c->points[c->npoints++];
+   p->out = out;
+   p->in = c->zs_in;
+   p->bits = bits;
+   p->window_size = 0;
+   if ( bits >= 0 )
+   {
+      uInt n = sizeof(p->window);
+      if ( inflateGetDictionary(&c->zs, p->window, &n) == Z_OK )
+         p->window_size = n;
+   }
+   c->last_point = out;
+}
+
+/** At the end of a gzip member, skip its trailer and check if another
+    member follows. Returns 1 if so, 0 at the end of data, -1 on error. */
+
+static int gz_next_member (struct cmp_cookie *c)
+{
+   z_stream *s = &c->zs;
+   int rc;
+
+   if ( c->zs_raw )
+   {
+      /* inflate() does not see the trailer of raw deflate data. */
+      if ( gz_fill(c, 8) <= 0 )
+         return -1;
+      s->next_in += 8;
+      s->avail_in -= 8;
+      c->zs_in += 8;
+      c->zs_raw = 0;
+   }
+   /* Like gzip, ignore anything following the last member. */
+   if ( (rc = gz_fill(c, 2)) <= 0 )
+      return rc;
+   if ( s->next_in[0] != 0x1f || s->next_in[1] != 0x8b )
+      return 0;
+   if ( inflateReset2(s, 15+32) != Z_OK )
+      return -1;
+   return 1;
+}
+
+/** Read from a gzip file, which may have several concatenated members. */
+
+static ssize_t gz_cookie_read (struct cmp_cookie *c, char *buf, size_t size)
+{
+   z_stream *s = &c->zs;
+   uInt want = (size > UINT_MAX) ? UINT_MAX : (uInt) size;
+
+   s->next_out = (Bytef *) buf;
+   s->avail_out = want;
+   while ( s->avail_out > 0 && !c->zs_eof )
+   {
+      uInt avail_in;
+      int64_t out;
+      int rc;
+
+      if ( (rc = gz_fill(c, 1)) <= 0 )
+      {
+         errno = EIO; /* Truncated file */
+         return -1;
+      }
+      avail_in = s->avail_in;
+      rc = inflate(s, (c->span > 0) ? Z_BLOCK : Z_NO_FLUSH);
+      c->zs_in += avail_in - s->avail_in;
+      out = c->pos + (want - s->avail_out);
+      if ( rc == Z_STREAM_END )
+      {
+         if ( (rc = gz_next_member(c)) < 0 )
+         {
+            errno = EIO;
+            return -1;
+         }
+         if ( rc == 0 )
+            c->zs_eof = 1;
+         else if ( c->span > 0 && out - c->last_point >= c->span )
+            gz_add_point(c, out, -1);
+      }
+      else if ( rc != Z_OK && rc != Z_BUF_ERROR )
+      {
+         errno = EIO;
+         return -1;
+      }
+      /* At the end of a deflate block but not of the last one */
+      else if ( c->span > 0 && (s->data_type & 128) && !(s->data_type & 64) &&
+                out - c->last_point >= c->span )
+         gz_add_point(c, out, s->data_type & 7);
+   }
+   return (ssize_t) (want - s->avail_out);
+}
+#endif
+
+#ifdef HAVE_BZLIB
+/** Read from a bzip2 file, which may have several concatenated streams. */
+
+static ssize_t bz_cookie_read (struct cmp_cookie *c, char *buf, size_t size)
+{
+   size_t done = 0;
+   while ( done < size && !c->bz_eof )
+   {
+      int bzerror = BZ_OK;
+      int n = BZ2_bzRead(&bzerror, c->bz, buf+done,
+         (size-done > INT_MAX) ? INT_MAX : (int) (size-done));
+      if ( bzerror != BZ_OK && bzerror != BZ_STREAM_END )
+      {
+         errno = EIO;
+         return -1;
+      }
+      done += n;
+      if ( bzerror == BZ_STREAM_END )
+      {
+         char unused[BZ_MAX_UNUSED];
+         void *pending = NULL;
+         int npending = 0, ch;
+         BZ2_bzReadGetUnused(&bzerror, c->bz, &pending, &npending);
+         memcpy(unused, pending, (size_t) npending);
+         BZ2_bzReadClose(&bzerror, c->bz);
+         c->bz = NULL;
+         if ( npending == 0 )
+         {
+            if ( (ch = getc(c->raw)) == EOF )
+            {
+               c->bz_eof = 1;
+               break;
+            }
+            ungetc(ch, c->raw);
+         }
+         c->bz = BZ2_bzReadOpen(&bzerror, c->raw, 0, 0, unused, npending);
+         if ( bzerror != BZ_OK )
+         {
+            errno = EIO;
+            return -1;
+         }
+      }
+   }
+   return (ssize_t) done;
+}
+#endif
+
+#ifdef HAVE_LZMA
+/** Read from an xz or lzma file. */
+
+static ssize_t lz_cookie_read (struct cmp_cookie *c, char *buf, size_t size)
+{
+   lzma_stream *s = &c->lz;
+   s->next_out = (uint8_t *) buf;
+   s->avail_out = size;
+   while ( s->avail_out > 0 && !c->lz_eof )
+   {
+      lzma_ret ret;
+      if ( s->avail_in == 0 && !c->raw_eof )
+      {
+         s->next_in = c->lz_in;
+         s->avail_in = fread(c->lz_in, 1, sizeof(c->lz_in), c->raw);
+         if ( s->avail_in == 0 )
+         {
+            if ( ferror(c->raw) )
+               return -1;
+            c->raw_eof = 1;
+         }
+      }
+      ret = lzma_code(s, c->raw_eof ? LZMA_FINISH : LZMA_RUN);
+      if ( ret == LZMA_STREAM_END )
+         c->lz_eof = 1;
+      else if ( ret != LZMA_OK )
+      {
+         errno = EIO;
+         return -1;
+      }
+   }
+   return (ssize_t) (size - s->avail_out);
+}
+#endif
+
+static ssize_t cmp_cookie_read (void *cookie, char *buf, size_t size)
+{
+   struct cmp_cookie *c = (struct cmp_cookie *) cookie;
+   ssize_t n = -1;
+   struct timespec start = { 0, 0 };
+   int64_t raw_start = -1;
+
+   if ( decompression_stats_enabled )
+   {
+      clock_gettime(CLOCK_MONOTONIC, &start);
+      raw_start = (int64_t) ftello(c->raw);
+   }
+   errno = EINVAL;
+   switch ( c->compression )
+   {
+#ifdef HAVE_ZLIB
+      case 1:
+         n = gz_cookie_read(c, buf, size);
+         break;
+#endif
+#ifdef HAVE_BZLIB
+      case 2:
+         n = bz_cookie_read(c, buf, size);
+         break;
+#endif
+#ifdef HAVE_LZMA
+      case 4:
+      case 5:
+         n = lz_cookie_read(c, buf, size);
+         break;
+#endif
+   }
+   if ( n > 0 )
+      c->pos += n;
+   if ( decompression_stats_enabled && start.tv_sec != 0 )
+   {
+      struct timespec end;
+      int64_t raw_end = (int64_t) ftello(c->raw);
+      clock_gettime(CLOCK_MONOTONIC, &end);
+      __atomic_fetch_add(&decompression_stats[0], 1, __ATOMIC_RELAXED);
+      if ( raw_start >= 0 && raw_end >= raw_start )
+         __atomic_fetch_add(&decompression_stats[1], (uint64_t) (raw_end-raw_start), __ATOMIC_RELAXED);
+      if ( n > 0 )
+         __atomic_fetch_add(&decompression_stats[2], (uint64_t) n, __ATOMIC_RELAXED);
+      __atomic_fetch_add(&decompression_stats[3],
+         (uint64_t) ((end.tv_sec-start.tv_sec)*1000000000LL + (end.tv_nsec-start.tv_nsec)),
+         __ATOMIC_RELAXED);
+   }
+   return n;
+}
+
+/** Seeking in decompressed data, only forward by reading and discarding.
+    Enough for ftello() and for skipping data. */
+
+static int cookie_skip (void *cookie, cookie_read_function_t *rd,
+   const int64_t *pos, off64_t *offset, int whence)
+{
+   int64_t target;
+   char buf[16384];
+
+   if ( whence == SEEK_SET )
+      target = *offset;
+   else if ( whence == SEEK_CUR )
+      target = *pos + *offset;
+   else
+   {
+      errno = EINVAL;
+      return -1;
+   }
+   if ( target < *pos )
+   {
+      errno = ESPIPE;
+      return -1;
+   }
+   while ( *pos < target )
+   {
+      size_t n = (target-*pos > (int64_t) sizeof(buf)) ? sizeof(buf) : (size_t) (target-*pos);
+      if ( rd(cookie, buf, n) <= 0 )
+      {
+         errno = EINVAL;
+         return -1;
+      }
+   }
+   *offset = target;
+   return 0;
+}
+
+static int cmp_cookie_seek (void *cookie, off64_t *offset, int whence)
+{
+   struct cmp_cookie *c = (struct cmp_cookie *) cookie;
+   return cookie_skip(cookie, cmp_cookie_read, &c->pos, offset, whence);
+}
+
+static int cmp_cookie_close (void *cookie)
+{
+   struct cmp_cookie *c = (struct cmp_cookie *) cookie;
+   int rc = 0;
+
+   if ( c == NULL )
+      return -1;
+#ifdef HAVE_ZLIB
+   if ( c->zs_init )
+      inflateEnd(&c->zs);
+   free(c->points);
+#endif
+#ifdef HAVE_BZLIB
+   if ( c->bz != NULL )
+   {
+      int bzerror;
+      BZ2_bzReadClose(&bzerror, c->bz);
+   }
+#endif
+#ifdef HAVE_LZMA
+   lzma_end(&c->lz);
+#endif
+   if ( c->raw != NULL && fclose(c->raw) != 0 )
+      rc = EOF;
+   free(c);
+   return rc;
+}
+
+#ifdef _REENTRANT
+
+/** Size of chunks of decompressed data read ahead. */
+#define READAHEAD_CHUNK_SIZE (1<<20)
+
+/** Background decompression into a ring of chunks, so that
+    decompression overlaps with the processing of the data. */
+
+struct readahead
+{
+   struct cmp_cookie *c;
+   pthread_t thread;
+   pthread_mutex_t lock;
+   pthread_cond_t cond;
+   int nchunks;
+   char **chunk;
+   ssize_t *length;  /**< Bytes in each filled chunk, 0 at end of data, -1 on error */
+   int filled;       /**< Number of chunks ready for the reader */
+   int next_fill;    /**< Chunk the thread fills next */
+   int next_read;    /**< Chunk the reader consumes next */
+   size_t read_pos;  /**< Bytes already consumed from chunk next_read */
+   int64_t pos;      /**< Position of the reader in the decompressed data */
+   int done;         /**< Thread delivered end of data or an error */
+   int stop;         /**< Reader asks the thread to finish */
+};
+
+static void *readahead_thread (void *arg)
+{
+   struct readahead *ra = (struct readahead *) arg;
+   int finished = 0;
+
+   while ( !finished )
+   {
+      ssize_t n = 0, rc = 0;
+      char *chunk;
+
+      pthread_mutex_lock(&ra->lock);
+      while ( ra->filled == ra->nchunks && !ra->stop )
+         pthread_cond_wait(&ra->cond, &ra->lock);
+      if ( ra->stop )
+      {
+         pthread_mutex_unlock(&ra->lock);
+         break;
+      }
+      chunk = ra->chunk[ra->next_fill];
+      pthread_mutex_unlock(&ra->lock);
+
+      /* Decompress without holding the lock */
+      while ( n < READAHEAD_CHUNK_SIZE &&
+              (rc = cmp_cookie_read(ra->c, chunk+n, READAHEAD_CHUNK_SIZE-n)) > 0 )
+         n += rc;
+      finished = ( rc <= 0 );
+
+      pthread_mutex_lock(&ra->lock);
+      ra->length[ra->next_fill] = (rc < 0) ? -1 : n;
+      ra->next_fill = (ra->next_fill+1) % ra->nchunks;
+      ra->filled++;
+      ra->done = finished;
+      pthread_cond_broadcast(&ra->cond);
+      pthread_mutex_unlock(&ra->lock);
+   }
+   return NULL;
+}
+
+static ssize_t readahead_read (void *cookie, char *buf, size_t size)
+{
+   struct readahead *ra = (struct readahead *) cookie;
+   size_t done = 0;
+
+   pthread_mutex_lock(&ra->lock);
+   while ( done < size )
+   {
+      ssize_t length;
+      size_t n;
+
+      while ( ra->filled == 0 && !ra->done )
+         pthread_cond_wait(&ra->cond, &ra->lock);
+      if ( ra->filled == 0 )
+         break; /* End of data */
+      if ( (length = ra->length[ra->next_read]) < 0 )
+      {
+         /* Keep the failed chunk: later reads fail as well */
+         ra->pos += done;
+         pthread_mutex_unlock(&ra->lock);
+         if ( done > 0 )
+            return (ssize_t) done;
+         errno = EIO;
+         return -1;
+      }
+      n = (size_t) length - ra->read_pos;
+      if ( n > size - done )
+         n = size - done;
+      memcpy(buf+done, ra->chunk[ra->next_read]+ra->read_pos, n);
+      done += n;
+      ra->read_pos += n;
+      if ( ra->read_pos == (size_t) length )
+      {
+         /* Hand the chunk back to the thread */
+         ra->next_read = (ra->next_read+1) % ra->nchunks;
+         ra->read_pos = 0;
+         ra->filled--;
+         pthread_cond_broadcast(&ra->cond);
+      }
+      if ( ra->filled == 0 && done > 0 )
+         break; /* Rather return what we have than wait */
+   }
+   ra->pos += done;
+   pthread_mutex_unlock(&ra->lock);
+   return (ssize_t) done;
+}
+
+static int readahead_seek (void *cookie, off64_t *offset, int whence)
+{
+   struct readahead *ra = (struct readahead *) cookie;
+   return cookie_skip(cookie, readahead_read, &ra->pos, offset, whence);
+}
+
+/** Stop the read-ahead thread and free everything but the decompression state. */
+
+static void readahead_free (struct readahead *ra)
+{
+   int i;
+
+   pthread_mutex_lock(&ra->lock);
+   ra->stop = 1;
+   pthread_cond_broadcast(&ra->cond);
+   pthread_mutex_unlock(&ra->lock);
+   pthread_join(ra->thread, NULL);
+   pthread_cond_destroy(&ra->cond);
+   pthread_mutex_destroy(&ra->lock);
+   for ( i=0; i<ra->nchunks; i++ )
+      free(ra->chunk[i]);
+   free(ra->chunk);
+   free(ra->length);
+   free(ra);
+}
+
+static int readahead_close (void *cookie)
+{
+   struct readahead *ra = (struct readahead *) cookie;
+   struct cmp_cookie *c = ra->c;
+
+   readahead_free(ra);
+   return cmp_cookie_close(c);
+}
+
+/** Start a read-ahead thread on top of c. Returns NULL if not possible. */
+
+static FILE *readahead_open (struct cmp_cookie *c, int nchunks)
+{
+   cookie_io_functions_t io_funcs = { readahead_read, NULL, readahead_seek, readahead_close };
+   struct readahead *ra;
+   FILE *f;
+   int i;
+
+   if ( (ra = (struct readahead *) calloc(1, sizeof(struct readahead))) == NULL )
+      return NULL;
+   ra->c = c;
+   ra->pos = c->pos;
+   ra->nchunks = nchunks;
+   ra->chunk = (char **) calloc((size_t) nchunks, sizeof(char *));
+   ra->length = (ssize_t *) calloc((size_t) nchunks, sizeof(ssize_t));
+   if ( ra->chunk == NULL || ra->length == NULL )
+   {
+      free(ra->chunk);
+      free(ra->length);
+      free(ra);
+      return NULL;
+   }
+   for ( i=0; i<nchunks; i++ )
+   {
+      if ( (ra->chunk[i] = (char *) malloc(READAHEAD_CHUNK_SIZE)) == NULL )
+      {
+         for ( i--; i>=0; i-- )
+            free(ra->chunk[i]);
+         free(ra->chunk);
+         free(ra->length);
+         free(ra);
+         return NULL;
+      }
+   }
+   pthread_mutex_init(&ra->lock, NULL);
+   pthread_cond_init(&ra->cond, NULL);
+   if ( pthread_create(&ra->thread, NULL, readahead_thread, ra) != 0 )
+   {
+      pthread_cond_destroy(&ra->cond);
+      pthread_mutex_destroy(&ra->lock);
+      for ( i=0; i<nchunks; i++ )
+         free(ra->chunk[i]);
+      free(ra->chunk);
+      free(ra->length);
+      free(ra);
+      return NULL;
+   }
+   if ( (f = fopencookie(ra, "r", io_funcs)) == NULL )
+      readahead_free(ra);
+   return f;
+}
+
+#endif
+
+/** Stream reading decompressed data from c, with read-ahead thread if possible. */
+
+static FILE *cmp_stream (struct cmp_cookie *c)
+{
+   cookie_io_functions_t io_funcs = { cmp_cookie_read, NULL, cmp_cookie_seek, cmp_cookie_close };
+   FILE *f;
+
+#ifdef _REENTRANT
+   if ( readahead_chunks > 0 &&
+        (f = readahead_open(c, readahead_chunks)) != NULL )
+      return f;
+#endif
+   f = fopencookie(c, "r", io_funcs);
+   return f;
+}
+
+/** Set up in-process decompression of a file, for gzip optionally
+    starting at an access point. Returns NULL if not possible. */
+
+static struct cmp_cookie *cmp_cookie_open (const char *fname, int compression,
+   const struct gz_access_point *point)
+{
+   struct cmp_cookie *c;
+   int ok = 0;
+
+   switch ( compression )
+   {
+#ifdef HAVE_ZLIB
+      case 1:
+#endif
+#ifdef HAVE_BZLIB
+      case 2:
+#endif
+#ifdef HAVE_LZMA
+      case 4:
+      case 5:
+#endif
+         break;
+      default:
+         errno = EINVAL;
+         return NULL;
+   }
+
+   if ( (c = (struct cmp_cookie *) calloc(1, sizeof(struct cmp_cookie))) == NULL )
+      return NULL;
+   c->compression = compression;
+   if ( (c->raw = fopenx(fname, "r")) == NULL )
+   {
+      free(c);
+      return NULL;
+   }
+
+   switch ( compression )
+   {
+#ifdef HAVE_ZLIB
+      case 1:
+         if ( point == NULL || point->bits < 0 )
+         {
+            /* At the start of a gzip member */
+            if ( point != NULL && fseekx(c->raw, point->in) != 0 )
+               break;
+            if ( inflateInit2(&c->zs, 15+32) != Z_OK )
+               break;
+            c->zs_init = 1;
+         }
+         else
+         {
+            /* Inside deflate data, as in zlib's examples/zran.c */
+            int ch = 0;
+            if ( fseekx(c->raw, point->in - (point->bits ? 1 : 0)) != 0 )
+               break;
+            if ( point->bits && (ch = getc(c->raw)) == EOF )
+               break;
+            if ( inflateInit2(&c->zs, -15) != Z_OK )
+               break;
+            c->zs_init = 1;
+            c->zs_raw = 1;
+            if ( point->bits && inflatePrime(&c->zs, point->bits, ch >> (8-point->bits)) != Z_OK )
+               break;
+            if ( inflateSetDictionary(&c->zs, point->window, point->window_size) != Z_OK )
+               break;
+         }
+         if ( point != NULL )
+         {
+            c->pos = c->last_point = point->out;
+            c->zs_in = point->in;
+         }
+         ok = 1;
+         break;
+#endif
+#ifdef HAVE_BZLIB
+      case 2:
+      {
+         int bzerror = BZ_OK;
+         c->bz = BZ2_bzReadOpen(&bzerror, c->raw, 0, 0, NULL, 0);
+         ok = ( bzerror == BZ_OK );
+         break;
+      }
+#endif
+#ifdef HAVE_LZMA
+      case 4:
+      case 5:
+         ok = ( lzma_auto_decoder(&c->lz, UINT64_MAX, LZMA_CONCATENATED) == LZMA_OK );
+         break;
+#endif
+   }
+
+   if ( !ok )
+   {
+      int k = errno;
+      cmp_cookie_close(c);
+      errno = (k != 0) ? k : EIO;
+      return NULL;
+   }
+   return c;
+}
+
+/** Helper function for opening a compressed file with in-process decompression. */
+
+static FILE *cmp_fopen (const char *fname, int compression)
+{
+   struct cmp_cookie *c;
+   FILE *f;
+
+   if ( (c = cmp_cookie_open(fname, compression, NULL)) == NULL )
+      return NULL;
+   if ( (f = cmp_stream(c)) == NULL )
+   {
+      int k = errno;
+      cmp_cookie_close(c);
+      errno = k;
+   }
+   else if ( verbose )
+      printf("Fileopen success: in-process decompression of file '%s'\n", fname);
+
+   return f;
+}
+
+#endif
+
+/** Open a compressed file for reading, in-process if possible, else through a fifo. */
+
+static FILE *cmp_ropen (const char *fname, int compression)
+{
+#ifdef INPROCESS_DECOMPRESSION
+   if ( inprocess_decompression )
+   {
+      FILE *f = cmp_fopen(fname, compression);
+      if ( f != NULL )
+         return f;
+   }
+#endif
+   return cmp_popen(fname, "r", compression);
+}
+
 /** Helper function for opening a file with a URI (http:// etc.). */
 
 static FILE *uri_popen (const char *fname, const char *mode, int compression);
@@ -841,6 +1663,35 @@ static FILE *ssh_popen (const char *fname, const char *mode, int compression)
    return f;
 }
 
+/** Compression type (as used by cmp_popen()) following from the file name ending. */
+
+static int compression_type (const char *fname)
+{
+   size_t l;
+
+   l = strlen(fname);
+   if ( l > 3 && strcmp(fname+l-3,".gz") == 0 )
+      return 1;
+   else if ( l > 4 && strcmp(fname+l-4,".bz2") == 0 )
+      return 2;
+   else if ( l > 4 && strcmp(fname+l-4,".lzo") == 0 )
+      return 3;
+   else if ( l > 5 && strcmp(fname+l-5,".lzma") == 0 )
+      return 4;
+   else if ( l > 3 && strcmp(fname+l-3,".xz") == 0 )
+      return 5;
+   else if ( l > 4 && strcmp(fname+l-4,".lz4") == 0 )
+      return 6;
+   else if ( l > 7 && strcmp(fname+l-7,".tar.gz") == 0 )
+      return 7;
+   else if ( l > 4 && strcmp(fname+l-4,".zip") == 0 )
+      return 8;
+   else if ( l > 7 && strcmp(fname+l-7,".gz.tar") == 0 )
+      return 9;
+
+   return 0;
+}
+
 /** Search for a file in the include path list and open it if possible. */
 
 FILE *fileopen (const char *fname, const char *mode)
@@ -850,7 +1701,6 @@ FILE *fileopen (const char *fname, const char *mode)
    FILE *f = NULL;
    int nerr = 0;
    int compression = 0;
-   int l;
    
    /* The set of search paths might not be initialized yet */
    if ( path == NULL )
@@ -887,25 +1737,7 @@ FILE *fileopen (const char *fname, const char *mode)
    }
 
    /* Check if compressed files are meant. */
-   l = strlen(fname);
-   if ( l > 3 && strcmp(fname+l-3,".gz") == 0 )
-      compression = 1;
-   else if ( l > 4 && strcmp(fname+l-4,".bz2") == 0 )
-      compression = 2;
-   else if ( l > 4 && strcmp(fname+l-4,".lzo") == 0 )
-      compression = 3;
-   else if ( l > 5 && strcmp(fname+l-5,".lzma") == 0 )
-      compression = 4;
-   else if ( l > 3 && strcmp(fname+l-3,".xz") == 0 )
-      compression = 5;
-   else if ( l > 4 && strcmp(fname+l-4,".lz4") == 0 )
-      compression = 6;
-   else if ( l > 7 && strcmp(fname+l-7,".tar.gz") == 0 )
-      compression = 7;
-   else if ( l > 4 && strcmp(fname+l-4,".zip") == 0 )
-      compression = 8;
-   else if ( l > 7 && strcmp(fname+l-7,".gz.tar") == 0 )
-      compression = 9;
+   compression = compression_type(fname);
 
    if ( strchr(fname,':') != NULL )
    {
@@ -975,7 +1807,7 @@ FILE *fileopen (const char *fname, const char *mode)
          case 7: /* Create FIFO from tar unpacking uncompressed files from compressed tar package to stdout */
          case 8: /* Create FIFO from zip unpacking uncompressed files from zip archive to stdout */
          case 9: /* Create FIFO from tar unpacking compressed files from uncompressed tar package to stdout */
-            return cmp_popen(fname,mode,compression);
+            return cmp_ropen(fname,compression);
             break;
 
          default:
@@ -1038,7 +1870,7 @@ FILE *fileopen (const char *fname, const char *mode)
          case 7: /* Create FIFO from tar unpacking uncompressed files from compressed tar package to stdout */
          case 8: /* Create FIFO from zip unpacking uncompressed files from zip archive to stdout */
          case 9: /* Create FIFO from tar unpacking compressed files from uncompressed tar package to stdout */
-            if ( (f = cmp_popen(try_fname,"r",compression)) != NULL )
+            if ( (f = cmp_ropen(try_fname,compression)) != NULL )
                return f;
             break;
 
@@ -1066,6 +1898,105 @@ FILE *fileopen (const char *fname, const char *mode)
    return NULL;
 }
 
+/** @short Find access points for random access into a gzip file.
+ *
+ *  Decompresses the whole file and remembers, about every 'span' bytes
+ *  of decompressed data, where decompression can be resumed with
+ *  fileopen_at(). Returns the number of access points, with the
+ *  array in 'points' to be released with free(), or -1 on failure
+ *  (also if in-process decompression of gzip files is not available).
+ */
+
+int gz_build_access (const char *fname, int64_t span, struct gz_access_point **points)
+{
+#if defined(INPROCESS_DECOMPRESSION) && defined(HAVE_ZLIB)
+   struct cmp_cookie *c;
+   char *buf;
+   int npoints;
+
+   if ( fname == NULL || points == NULL || span <= 0 )
+      return -1;
+   if ( (buf = (char *) malloc(1<<18)) == NULL )
+      return -1;
+   if ( (c = cmp_cookie_open(fname, 1, NULL)) == NULL )
+   {
+      free(buf);
+      return -1;
+   }
+   c->span = span;
+   gz_add_point(c, 0, -1);
+   /* Access points before a truncated or corrupted end remain usable. */
+   while ( cmp_cookie_read(c, buf, 1<<18) > 0 )
+      ;
+   free(buf);
+   if ( c->span < 0 )
+   {
+      cmp_cookie_close(c);
+      return -1;
+   }
+   *points = c->points;
+   npoints = c->npoints;
+   c->points = NULL;
+   cmp_cookie_close(c);
+   return npoints;
+#else
+   errno = ENOSYS;
+   return -1;
+#endif
+}
+
+/** @short Open a file for reading, starting at 'offset' of its (decompressed) data.
+ *
+ *  No search path is used. Uncompressed files are positioned directly.
+ *  Compressed files need in-process decompression and are decompressed
+ *  from their start or, for gzip files, from the given access point
+ *  (see gz_build_access()) preceding the offset. Unlike pipes, the
+ *  stream reports positions in the decompressed data with ftello().
+ */
+
+FILE *fileopen_at (const char *fname, int64_t offset, const struct gz_access_point *point)
+{
+   int compression;
+   FILE *f;
+
+   if ( fname == NULL || offset < 0 )
+      return NULL;
+   compression = compression_type(fname);
+   if ( compression == 0 )
+   {
+      if ( (f = fopenx(fname, "r")) == NULL )
+         return NULL;
+      if ( fseekx(f, offset) != 0 )
+      {
+         fclose(f);
+         return NULL;
+      }
+      return f;
+   }
+#ifdef INPROCESS_DECOMPRESSION
+   {
+      struct cmp_cookie *c;
+      off64_t pos = offset;
+
+      if ( compression != 1 || (point != NULL && point->out > offset) )
+         point = NULL;
+      if ( (c = cmp_cookie_open(fname, compression, point)) == NULL )
+         return NULL;
+      if ( cmp_cookie_seek(c, &pos, SEEK_SET) != 0 || (f = cmp_stream(c)) == NULL )
+      {
+         int k = errno;
+         cmp_cookie_close(c);
+         errno = k;
+         return NULL;
+      }
+      return f;
+   }
+#else
+   errno = ENOSYS;
+   return NULL;
+#endif
+}
+
 /** Close a file or fifo but not if it is one of the standard streams. */
 
 int fileclose (FILE *f)
@@ -1091,6 +2022,10 @@ int fileclose (FILE *f)
    /* Check what kind of stream we have */
    if ( (fno=fileno(f)) == -1 )
    {
+#ifdef INPROCESS_DECOMPRESSION
+      /* Streams with in-process decompression have no file handle */
+      return fclose(f);
+#endif
       fprintf(stderr,"Trying to close stream: no file handle\n");
       errno = EBADF;
       return -1;
@@ -86,9 +86,18 @@ void show_hessio_max()
 static void put_time_blob (HTime *t, IO_BUFFER *iobuf);
 static void get_time_blob (HTime *t, IO_BUFFER *iobuf);
 
-static int g_tel_idx[3][H_MAX_TEL+1];
-static int g_tel_idx_init[3];
-static int g_tel_idx_ref;
+/* When compiled for multi-threaded use, every thread has its own
+   lookup tables, so that threads reading different runs do not
+   overwrite each other's telescope index mapping. */
+#ifdef _REENTRANT
+# define TEL_IDX_STATIC static __thread
+#else
+# define TEL_IDX_STATIC static
+#endif
+
+TEL_IDX_STATIC int g_tel_idx[3][H_MAX_TEL+1];
+TEL_IDX_STATIC int g_tel_idx_init[3];
+TEL_IDX_STATIC int g_tel_idx_ref;
 
 /* ----------------- set_tel_idx_ref ---------------------- */
 /** 
@@ -6082,7 +6091,10 @@ int read_hess_televent (IO_BUFFER *iobuf, TelEvent *te, int what)
 
          case IO_TYPE_HESS_TELIMAGE:
             if ( img == NULL || (what & IMAGE_FLAG) == 0 )
-               break;
+            {
+               rc = skip_subitem(iobuf);
+               continue;
+            }
       	    if ( tel_img >= te->max_image_sets )
 	    {
 	       Warning("Not enough space to read all image sets");
@@ -6638,6 +6650,22 @@ int write_hess_event (IO_BUFFER *iobuf, FullEvent *ev, int what)
 */  
 
 int read_hess_event (IO_BUFFER *iobuf, FullEvent *ev, int what)
+{
+   return read_hess_event_selected(iobuf,ev,what,NULL);
+}
+
+/* --------------------- read_hess_event_selected -------------------- */
+/**
+ *  Read the array data of one event in eventio format, but only
+ *  for telescopes with selected[itel] != 0 (itel being the index
+ *  in the run header). Tracking and telescope data of other telescopes
+ *  is skipped without being decoded: these telescopes are not known
+ *  and not in the list of telescopes with data.
+ *  With selected == NULL all telescopes are read, as read_hess_event().
+*/  
+
+int read_hess_event_selected (IO_BUFFER *iobuf, FullEvent *ev, int what,
+   const uint8_t *selected)
 {
    IO_ITEM_HEADER item_header;
    int type, tel_id, itel, id, rc, j;
@@ -6700,6 +6728,16 @@ int read_hess_event (IO_BUFFER *iobuf, FullEvent *ev, int what)
             get_item_end(iobuf,&item_header);
 	    return -1;
 	 }
+         if ( (what & TRACKDATA_FLAG) == 0 || /* Tracking data not selected */
+              (selected != NULL && !selected[itel]) )
+         {
+            if ( (rc = skip_subitem(iobuf)) < 0 )
+            {
+	       get_item_end(iobuf,&item_header);
+	       return rc;
+            }
+            continue;
+         }
       	 if ( (rc = read_hess_trackevent(iobuf,&ev->trackdata[itel])) < 0 )
 	 {
 	    get_item_end(iobuf,&item_header);
@@ -6724,6 +6762,15 @@ int read_hess_event (IO_BUFFER *iobuf, FullEvent *ev, int what)
             get_item_end(iobuf,&item_header);
 	    return -1;
 	 }
+         if ( selected != NULL && !selected[itel] ) /* Telescope not selected */
+         {
+            if ( (rc = skip_subitem(iobuf)) < 0 )
+            {
+	       get_item_end(iobuf,&item_header);
+	       return rc;
+            }
+            continue;
+         }
       	 if ( (rc = read_hess_televent(iobuf,&ev->teldata[itel],what)) < 0 )
 	 {
 	    get_item_end(iobuf,&item_header);
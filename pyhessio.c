@@ -8,1097 +8,4254 @@
 #include "io_basic.h"   
 #include "io_hess.h"
 #include "fileopen.h"
+#include "rec_tools.h"
 #include "stdio.h"
+#include <math.h>
+#include <sys/mman.h>
+#include <pthread.h>
+
+// AdcData buffer with views of it alive, see pin_buffers
+struct view_buffer
+{
+  AdcData* raw;
+  int pins;      // Views of it, and a swap in progress
+  int retired;   // No longer used by the handle, freed with its last view
+  int mapped;
+};
+
+//-----------------------------------
+// Reading state of one input file.
+// Every wrapper function works on such a handle, so that
+// several files can be read side by side.
+//-----------------------------------
+typedef struct
+{
+  AllHessData *hsdata;
+  IO_ITEM_HEADER item_header;
+  IO_BUFFER *iobuf;
+  int file_is_opened;
+  int read_what; // Parts of IO_TYPE_HESS_EVENT to decode (-1: all)
+  long serial;   // Unique number of this handle
+  char* filename; // Name given to file_open, for seek_file
+  struct gz_access_point* points; // Where gzip decompression can be resumed
+  int npoints;
+  long config_counter;             // Last configuration version given out
+  long config_version[H_MAX_TEL];  // Configuration version of each telescope
+  int tel_index[H_MAX_TEL+1];      // Index in run_header.tel_id by telescope id, -1 if none
+  int pending;          // An event was read by peek_event but not handed out yet
+  int pending_event_id;
+  int mapped_buffers;   // Telescope raw and pixtm buffers of hsdata come from map_buffer
+  int filter;           // move_to_next_event skips events failing the selection below
+  int filter_min_teltrg;
+  double filter_energy[2];          // MC shower energy range [TeV]
+  int filter_ntel;                  // One of filter_tel_ids must have triggered, if > 0
+  int filter_tel_ids[H_MAX_TEL];
+  int select_ntel;                  // Telescopes of events to decode, -1 for all
+  int select_ids[H_MAX_TEL];
+  uint8_t tel_selected[H_MAX_TEL];  // Run header index of selected telescopes
+  IO_BUFFER* copy_output;     // Skim output getting the blocks read, see set_copy_output
+  BYTE* copy_shower;          // MC shower block, until an event of it is written
+  size_t copy_shower_length;
+  size_t copy_shower_size;
+  BYTE* copy_pending;         // Per-event MC blocks waiting for their event
+  size_t copy_pending_length;
+  size_t copy_pending_size;
+  int copy_event_read;        // Event read since the last MC block: 1, 2 once written
+  int* neighbours[H_MAX_TEL];       // Pixel neighbours, see find_neighbours
+  long neighbours_version[H_MAX_TEL];
+  long generation;      // Changed whenever the event data read may change
+  pthread_mutex_t pin_lock; // Guards views, which end in any thread
+  struct view_buffer* views; // AdcData buffers with views alive
+  int nviews;
+  int views_size;
+} HessioFile;
+
+HessioFile* allocate_hessio_file(void);
+void free_hessio_file(HessioFile* file);
+
+void close_file(HessioFile* file);
+long get_generation(HessioFile* file);
+int pin_buffers(HessioFile* file, const void* data, int pin);
+IO_BUFFER* open_output_file(const char* filename);
+int close_output_file(IO_BUFFER* output);
+void set_copy_output(HessioFile* file, IO_BUFFER* output);
+int write_current_event(HessioFile* file);
+int write_synthetic_run(const char* filename, int run, int nevents, int ntel, int npix,
+                        int ngains, int nsamples, double zero_sup_pe, double calib_scale,
+                        unsigned long seed);
+int file_open(HessioFile* file, const char* filename);
+long long get_file_position(HessioFile* file);
+int seek_file(HessioFile* file, long long offset);
+int scan_blocks(HessioFile* file, long long* blocks, int max_blocks);
+int build_access_points(HessioFile* file, long long span);
+int get_access_points(HessioFile* file, long long* points, unsigned char* windows);
+int set_access_points(HessioFile* file, int npoints, const long long* points, const unsigned char* windows);
+static int read_central_event_only(HessioFile* file);
+static int copy_input_block(HessioFile* file);
+int set_read_what(HessioFile* file, int what);
+int set_telescope_selection(HessioFile* file, int ntel, const int* tel_ids);
+int fill_hsdata(HessioFile* file, int* event_id);
+int decode_hsdata(HessioFile* file, int* event_id);
+int get_adc_sample(HessioFile* file, int telescope_id, int channel, uint16_t *data );
+int get_adc_sum(HessioFile* file, int telescope_id, int channel, uint32_t *data );
+int get_num_significant(HessioFile* file, int telescope_id, int channel);
+int get_significant_adc(HessioFile* file, int telescope_id, int channel, int what,
+                        int* pixel_ids, uint32_t* sums, uint16_t* samples);
+int get_significant_layout(HessioFile* file, int channel, int ntel, const int* tel_ids,
+                           long long* indptr);
+int get_significant_event(HessioFile* file, int channel, int what, int ntel, const int* tel_ids,
+                          const long long* indptr, int max_samples,
+                          int* pixel_ids, uint32_t* sums, uint16_t* samples);
+int get_adc_layout(int* layout);
+int get_adc_sample_buffer(HessioFile* file, int telescope_id, uint16_t** data);
+int get_adc_sum_buffer(HessioFile* file, int telescope_id, uint32_t** data);
+int get_data_for_calibration(HessioFile* file, int telescope_id,double* pedestal,double* calib);
+long get_config_layout(HessioFile* file, int telescope_id, int* layout);
+int get_config(HessioFile* file, int telescope_id, double* values, double* xpix, double* ypix,
+               double* ref_shapes, double* pedestal, double* calib);
+int get_global_event_count(HessioFile* file);
+int get_mirror_area(HessioFile* file, int telescope_id,double* mirror_area);
+int get_num_channel(HessioFile* file, int telescope_id);
+int get_num_pixels(HessioFile* file, int telescope_id);
+int get_num_samples(HessioFile* file, int telescope_id);
+int get_num_teldata(HessioFile* file);
+int get_num_telescope(HessioFile* file);
+int get_pixel_timing_num_times_types(HessioFile* file, int telescope_id);
+int get_pixel_position(HessioFile* file, int telescope_id, double* xpos, double* ypos );
+int get_pixel_timing_threshold(HessioFile* file, int telescope_id, int* result);
+int get_pixel_timing_timval(HessioFile* file, int telescope_id,float *data);
+int get_pixel_timine_peak_global(HessioFile* file, int telescope_id, float* peak);
+int get_run_number(HessioFile* file);
+int get_telescope_with_data_list(HessioFile* file, int* list);
+int get_telescope_index(HessioFile* file, int telescope_id);
+int get_telescope_indices(HessioFile* file, const int* telescope_ids, int num_ids, int* indices);
+int move_to_next_event(HessioFile* file, int *event_id);
+int set_event_filter(HessioFile* file, int enable, int min_teltrg, double min_energy,
+                     double max_energy, int ntel, const int* tel_ids);
+int peek_event(HessioFile* file);
+int get_batch_layout(HessioFile* file, int ntel, const int* tel_ids, int* layout);
+int read_batch(HessioFile* file, int what, int batch_size, int ntel, const int* tel_ids, const int* layout,
+               int* event_info, uint8_t* mask, uint32_t* adc_sums, uint16_t* adc_samples,
+               float* timval, float* peak_global, double* mc_values);
+int move_to_next_mc_event(HessioFile* file, int* event_info, double* mc_values, int* teltrg_list, int max_teltrg);
+int get_max_telescopes(void);
+double get_mc_event_xcore(HessioFile* file);
+double get_mc_event_ycore(HessioFile* file);
+double get_mc_shower_energy(HessioFile* file);
+double get_mc_shower_azimuth(HessioFile* file);
+double get_mc_shower_altitude(HessioFile* file);
+uint8_t get_adc_known(HessioFile* file, int telescope_id,int channel , int pixel_id);
+double get_ref_shape(HessioFile* file, int telescope_id,int channel, int fshape );
+double get_ref_step(HessioFile* file, int telescope_id );
+double get_time_slice(HessioFile* file, int telescope_id);
+int get_tel_event_gps_time(HessioFile* file, int telescope_id, long* seconds, long* nanoseconds);
+int get_central_event_gps_time(HessioFile* file, long* seconds, long* nanoseconds);
+int get_central_event_teltrg_list(HessioFile* file, int* tel_list);
+int get_num_tel_trig(HessioFile* file);
+int get_ref_shapes(HessioFile* file, int telescope_id,int channel, double* ref_shapes );
+int get_nrefshape(HessioFile* file, int telescope_id);
+int get_lrefshape(HessioFile* file, int telescope_id);
+int get_mirror_number(HessioFile* file, int telescope_id);
+double get_optical_foclen(HessioFile* file, int telescope_id);
+int get_telescope_ids(HessioFile* file, int* list);
+int get_event_layout(HessioFile* file, int* layout);
+int get_event(HessioFile* file, int what, int* tel_info, uint32_t* adc_sums, uint16_t* adc_samples,
+              float* timval, float* peak_global, long* gps_time, double* mc_values);
+int get_neighbours(HessioFile* file, int telescope_id, int max_pixels, int* neighbours);
+int get_calibrated_image(HessioFile* file, int telescope_id, int integrator, const int* params,
+                         double calib_scale, double clip_amp, double* image, float* peak_time);
+int get_calibrated_event(HessioFile* file, int integrator, const int* params, double calib_scale,
+                         double clip_amp, int ntel, const int* tel_ids, int max_pixels,
+                         uint8_t* mask, double* images, float* peak_times);
+int get_image_parameters(HessioFile* file, int integrator, const int* params, const double* cuts,
+                         int ntel, const int* tel_ids, int max_pixels, uint8_t* mask,
+                         double* images, uint8_t* image_pixels, double* parameters,
+                         double* pointing);
+int read_calibrated_images(HessioFile* file, int batch_size, int integrator, const int* params,
+                           double calib_scale, double clip_amp, int ntel, const int* tel_ids,
+                           int max_pixels, int* event_info, uint8_t* mask, double* images,
+                           float* peak_times);
+int read_image_parameters(HessioFile* file, int batch_size, int integrator, const int* params,
+                          const double* cuts, int ntel, const int* tel_ids, int* event_info,
+                          uint8_t* mask, double* parameters, double* pointing);
+int get_array_layout(HessioFile* file, int ntel, const int* tel_ids, double* positions,
+                     double* direction);
+int reconstruct_showers(int nevents, int ntel, const uint8_t* mask, const double* parameters,
+                        const double* pointing, const double* positions, const double* reference,
+                        const double* cuts, int flag, double* showers);
+void set_stats(int enable);
+void reset_stats(void);
+int get_stats(int max_types, long long* types, long long* totals);
 
 
-void close_file(void);
-int file_open(const char* filename);
-int fill_hsdata(int* event_id);
-int get_adc_sample(int telescope_id, int channel, uint16_t *data );
-int get_adc_sum(int telescope_id, int channel, uint32_t *data );
-int get_data_for_calibration(int telescope_id,double* pedestal,double* calib);
-int get_global_event_count(void);
-int get_mirror_area(int telescope_id,double* mirror_area);
-int get_num_channel(int telescope_id);
-int get_num_pixels(int telescope_id);
-int get_num_samples(int telescope_id);
-int get_num_teldata(void);
-int get_num_telescope(void);
-int get_pixel_timing_num_times_types(int telescope_id);
-int get_pixel_position(int telescope_id, double* xpos, double* ypos );
-int get_pixel_timing_threshold(int telescope_id, int* result);
-int get_pixel_timing_timval(int telescope_id,float *data);
-int get_pixel_timine_peak_global(int telescope_id, float* peak);
-int get_run_number(void);
-int get_telescope_with_data_list(int* list);
-int get_telescope_index(int telescope_id);
-int move_to_next_event(int *event_id);
-double get_mc_event_xcore();
-double get_mc_event_ycore();
-double get_mc_shower_energy();
-double get_mc_shower_azimuth();
-double get_mc_shower_altitude();
-uint8_t get_adc_known(int telescope_id,int channel , int pixel_id);
-double get_ref_shape(int telescope_id,int channel, int fshape );
-double get_ref_step(int telescope_id );
-double get_time_slice(int telescope_id);
-int get_tel_event_gps_time(int telescope_id, long* seconds, long* nanoseconds);
-int get_central_event_gps_time(long* seconds, long* nanoseconds);
-int get_central_event_teltrg_list(int* tel_list);
-int get_num_tel_trig();
-int get_ref_shapes(int telescope_id,int channel, double* ref_shapes );
-int get_nrefshape(int telescope_id);
-int get_lrefshape(int telescope_id);
-int get_mirror_number(int telescope_id);
-double get_optical_foclen(int telescope_id);
-int get_telescope_ids(int* list);
-
-
-static AllHessData *hsdata = NULL;
-static IO_ITEM_HEADER item_header;
-static IO_BUFFER *iobuf = NULL;
-static int file_is_opened = 0;
+// Serial number of the handle whose run header filled the libhessio
+// telescope index lookup. libhessio built with _REENTRANT keeps one
+// lookup per thread, so does this.
+#ifdef _REENTRANT
+static __thread long tel_idx_owner = 0;
+#else
+static long tel_idx_owner = 0;
+#endif
+static long last_serial = 0;
 #define TEL_INDEX_NOT_VALID -2
+#define H_MAX_NB 8  // Maximum number of neighbours of a pixel, as in reconstruct.c
+
+// Map per-telescope event buffers instead of calloc()ing them
+static int compact_buffers = 1;
 
 //-----------------------------------
-// Returns array index for specific id
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+// Select how the per-telescope AdcData and PixelTiming buffers of
+// runs read afterwards are allocated. They are sized for H_MAX_PIX
+// pixels, H_MAX_GAINS gains and H_MAX_SLICES samples, but only the
+// part used by the actual camera is ever written.
+// enable = 1: mapped from the kernel, so that only the pages written
+//  count as resident memory, and given back to the system when freed.
+// enable = 0: calloc(), which clears (and so makes resident) the whole
+//  buffer when it recycles heap memory freed by a previous run.
 //-----------------------------------
+void set_compact_buffers(int enable)
+{
+  compact_buffers = enable;
+}
+
+// Reader statistics, process-wide and off by default.
+// Per block type (item_header.type, STATS_MAX_TYPES for larger ones):
+// blocks found, their bytes, blocks fully decoded, blocks skipped
+// (also events read but not selected) and nanoseconds spent decoding
+// them (also the central trigger data of events checked or scanned).
+#define STATS_MAX_TYPES 4096
+#define NUM_STATS_COUNTERS 5
+#define NUM_STATS_TOTALS 8
+static int stats_enabled = 0;
+static long long type_stats[STATS_MAX_TYPES+1][NUM_STATS_COUNTERS];
+// find_io_block calls and ns, read_io_block calls, bytes and ns,
+// skip_io_block calls, bytes and ns
+static long long io_stats[NUM_STATS_TOTALS];
 
-int get_telescope_index(int telescope_id)
+//-----------------------------------
+// Returns a monotonic time in nanoseconds
+//-----------------------------------
+static long long stats_clock(void)
 {
-  int itel=0;
-    for (itel=0; itel<hsdata->run_header.ntel; itel++)
-    {
-       if ((hsdata)->run_header.tel_id[itel] == telescope_id) return itel;
-    }
-    return TEL_INDEX_NOT_VALID;
+  struct timespec now;
+  clock_gettime(CLOCK_MONOTONIC, &now);
+  return now.tv_sec*1000000000LL + now.tv_nsec;
 }
 
-//----------------------------------
-//Read input file and fill hsdata
-// and item_header global var 
-//----------------------------------
-int file_open(const char* filename)
+//-----------------------------------
+// Add value to the counter of block type type
+//-----------------------------------
+static void count_type(long type, int counter, long long value)
 {
-  if (filename)
-  {
-    if (file_is_opened) { close_file(); }
+  if ( type < 0 || type >= STATS_MAX_TYPES ) type = STATS_MAX_TYPES;
+  __sync_fetch_and_add(&type_stats[type][counter], value);
+}
 
-    show_hessio_max();
+//-----------------------------------
+// Enable (enable = 1) or disable the reader statistics
+// of all handles, including decompression in libhessio
+//-----------------------------------
+void set_stats(int enable)
+{
+  stats_enabled = enable;
+  set_decompression_stats(enable);
+}
 
-    /* Check assumed limits with the ones compiled into the library. */
-    H_CHECK_MAX();
-   
-    if ( (iobuf = allocate_io_buffer(1000000L)) == NULL )
-    {
-     Error("Cannot allocate I/O buffer");
-     exit(1);
-    }
-    iobuf->max_length = 100000000L;
+//-----------------------------------
+// Set all reader statistics to zero
+//-----------------------------------
+void reset_stats(void)
+{
+  int type = 0, counter = 0;
+  for (type = 0; type <= STATS_MAX_TYPES; type++)
+    for (counter = 0; counter < NUM_STATS_COUNTERS; counter++)
+      __sync_fetch_and_and(&type_stats[type][counter], 0);
+  for (counter = 0; counter < NUM_STATS_TOTALS; counter++)
+    __sync_fetch_and_and(&io_stats[counter], 0);
+  reset_decompression_stats();
+}
+
+//-----------------------------------
+// Fill up to max_types rows of types with
+// type (-1 for types >= STATS_MAX_TYPES), blocks, bytes, decoded,
+// skipped and decode ns of the block types seen, and totals with
+// the io_stats counters followed by the decompression calls,
+// compressed bytes, decompressed bytes and ns.
+// Returns the number of block types seen
+//-----------------------------------
+int get_stats(int max_types, long long* types, long long* totals)
+{
+  int type = 0, counter = 0, ntypes = 0;
 
-    if ( (iobuf->input_file = fileopen(filename,READ_BINARY)) == NULL )
+  for (type = 0; type <= STATS_MAX_TYPES; type++)
+  {
+    const long long* row = type_stats[type];
+    if ( row[0] == 0 && row[2] == 0 && row[3] == 0 && row[4] == 0 ) continue;
+    if ( ntypes < max_types )
     {
-     perror(filename);
-     Error("Cannot open input file.");
-     return -1 ;
+      long long* out = types + (NUM_STATS_COUNTERS+1)*ntypes;
+      out[0] = type < STATS_MAX_TYPES ? type : -1;
+      for (counter = 0; counter < NUM_STATS_COUNTERS; counter++)
+        out[counter+1] = row[counter];
     }
-
-    fflush(stdout);
-    fprintf(stderr,"%s\n",filename);
-    printf("\nInput file '%s' has been opened.\n",filename);
-    file_is_opened = 1;
+    ntypes++;
   }
-  return 0;
+  for (counter = 0; counter < NUM_STATS_TOTALS; counter++)
+    totals[counter] = io_stats[counter];
+  get_decompression_stats(totals + NUM_STATS_TOTALS);
+  return ntypes;
 }
 
-//----------------------------------
-//Read input file and fill hsdata
-// and item_header global var 
-//----------------------------------
-int move_to_next_event(int *event_id)
+//-----------------------------------
+// find_io_block, read_io_block and skip_io_block of the handle,
+// counted if statistics are enabled
+//-----------------------------------
+static int find_block(HessioFile* file)
 {
-  if (! file_is_opened) return -1;
-
+  long long start = 0;
   int rc = 0;
-  while(  rc != IO_TYPE_HESS_EVENT )
+  if ( !stats_enabled ) return find_io_block(file->iobuf,&file->item_header);
+  start = stats_clock();
+  rc = find_io_block(file->iobuf,&file->item_header);
+  __sync_fetch_and_add(&io_stats[0], 1);
+  __sync_fetch_and_add(&io_stats[1], stats_clock() - start);
+  if ( rc == 0 )
   {
-    rc = fill_hsdata( event_id);
-    if (rc < 0) 
-    {
-    close_file(); 
-    return -1; 
-    }   
+    count_type(file->item_header.type, 0, 1);
+    count_type(file->item_header.type, 1, file->item_header.length);
   }
- return get_run_number();
+  return rc;
 }
 
-/*--------------------------------*/
-//  Cleanly close iobuf
-//----------------------------------
-void close_file()
+static int read_block(HessioFile* file)
 {
+  long long start = 0;
+  int rc = 0;
+  if ( !stats_enabled ) return read_io_block(file->iobuf,&file->item_header);
+  start = stats_clock();
+  rc = read_io_block(file->iobuf,&file->item_header);
+  __sync_fetch_and_add(&io_stats[2], 1);
+  if ( rc == 0 )
+    __sync_fetch_and_add(&io_stats[3], file->item_header.length);
+  __sync_fetch_and_add(&io_stats[4], stats_clock() - start);
+  return rc;
+}
 
-  if ( iobuf->input_file != NULL && iobuf->input_file != stdin )
+static int skip_block(HessioFile* file)
+{
+  long long start = 0;
+  int rc = 0;
+  if ( !stats_enabled ) return skip_io_block(file->iobuf,&file->item_header);
+  start = stats_clock();
+  rc = skip_io_block(file->iobuf,&file->item_header);
+  __sync_fetch_and_add(&io_stats[5], 1);
+  if ( rc >= 0 )
   {
-    fileclose(iobuf->input_file);
-    iobuf->input_file = NULL;
-    reset_io_block(iobuf);
+    __sync_fetch_and_add(&io_stats[6], file->item_header.length);
+    count_type(file->item_header.type, 3, 1);
   }
-  if (iobuf->output_file != NULL) fileclose(iobuf->output_file);
+  __sync_fetch_and_add(&io_stats[7], stats_clock() - start);
+  return rc;
 }
 
+//-----------------------------------
+// Returns a zeroed buffer of size bytes, NULL if allocation failed
+//-----------------------------------
+static void* map_buffer(size_t size)
+{
+  void* ptr = mmap(NULL, size, PROT_READ|PROT_WRITE,
+                   MAP_PRIVATE|MAP_ANONYMOUS|MAP_NORESERVE, -1, 0);
+  return ptr == MAP_FAILED ? NULL : ptr;
+}
 
+//-----------------------------------
+// Release a buffer from map_buffer (mapped != 0) or calloc()
+//-----------------------------------
+static void free_buffer(void* ptr, size_t size, int mapped)
+{
+  if ( ptr == NULL ) return;
+  if ( mapped )
+    munmap(ptr, size);
+  else
+    free(ptr);
+}
 
-//------------------------------------------
-//  return run number from last readed event
-//------------------------------------------
-int get_run_number(void)
+//-----------------------------------
+// Allocate a new reading handle
+// Returns NULL if allocation failed
+//-----------------------------------
+HessioFile* allocate_hessio_file(void)
 {
-  if ( hsdata != NULL)
+  HessioFile* file = (HessioFile *) calloc(1,sizeof(HessioFile));
+  if ( file != NULL )
   {
-    return hsdata->run_header.run;
+    int tel_id;
+    file->read_what = -1;
+    file->select_ntel = -1;
+    file->serial = __sync_add_and_fetch(&last_serial,1);
+    pthread_mutex_init(&file->pin_lock, NULL);
+    for (tel_id=0; tel_id<=H_MAX_TEL; tel_id++) file->tel_index[tel_id] = -1;
   }
-  return -1;
+  return file;
 }
 
-//------------------------------------
-// Returns number of telescopes in run.
-//------------------------------------
-int get_num_telescope(void)
+//-----------------------------------
+// Returns the entry of views holding data, NULL if there is none.
+// pin_lock must be held.
+//-----------------------------------
+static struct view_buffer* find_view(HessioFile* file, const void* data)
+{
+  int i;
+  for (i=0; i<file->nviews; i++)
+    if ( (const char*) data >= (const char*) file->views[i].raw &&
+         (const char*) data < (const char*) (file->views[i].raw + 1) )
+      return &file->views[i];
+  return NULL;
+}
+
+//-----------------------------------
+// Release the buffer of a view entry and drop the entry,
+// once it is retired and its last pin is gone.
+// pin_lock must be held.
+//-----------------------------------
+static void release_view(HessioFile* file, struct view_buffer* view)
 {
-  if ( hsdata != NULL)
+  if ( view->pins > 0 || !view->retired ) return;
+  free_buffer(view->raw, sizeof(AdcData), view->mapped);
+  *view = file->views[--file->nviews];
+}
+
+//-----------------------------------
+// Release a buffer of AdcData, or keep it until the views
+// of it are gone if some are alive
+//-----------------------------------
+static void free_adc_buffer(HessioFile* file, AdcData* raw)
+{
+  struct view_buffer* view = NULL;
+  if ( raw == NULL ) return;
+  pthread_mutex_lock(&file->pin_lock);
+  if ( (view = find_view(file, raw)) != NULL )
   {
-    return hsdata->event.num_tel;
+    view->retired = 1;
+    release_view(file, view);
+    pthread_mutex_unlock(&file->pin_lock);
+    return;
   }
-  return -1;
+  pthread_mutex_unlock(&file->pin_lock);
+  free_buffer(raw, sizeof(AdcData), file->mapped_buffers);
 }
 
-//------------------------------------------------------------
-// Returns number of telescopes for which we actually have data
-//------------------------------------------------------------
-int get_num_teldata(void)
+//-----------------------------------
+// Before an event is decoded, give a new AdcData buffer to the
+// telescopes whose buffer has views alive, so that the views (and
+// arrays taken from them) keep the data of their event.
+// shared[H_MAX_TEL] gets the buffers replaced, NULL for the others.
+//-----------------------------------
+static void unshare_adc_buffers(HessioFile* file, AdcData** shared)
 {
-  if ( hsdata != NULL)
+  int i, itel;
+  for (itel=0; itel<H_MAX_TEL; itel++) shared[itel] = NULL;
+  pthread_mutex_lock(&file->pin_lock);
+  for (i=0; i<file->nviews; i++)
   {
-    return hsdata->event.num_teldata;
+    struct view_buffer* view = &file->views[i];
+    if ( view->retired ) continue;
+    for (itel=0; itel<file->hsdata->event.num_tel; itel++)
+      if ( file->hsdata->event.teldata[itel].raw == view->raw ) break;
+    if ( itel == file->hsdata->event.num_tel ) continue;
+    AdcData* raw = (AdcData *) (view->mapped ? map_buffer(sizeof(AdcData)) :
+                                calloc(1,sizeof(AdcData)));
+    // Out of memory: overwritten, the views only see a newer event
+    if ( raw == NULL ) continue;
+    raw->tel_id = view->raw->tel_id;
+    file->hsdata->event.teldata[itel].raw = raw;
+    shared[itel] = view->raw;
+    view->retired = 1;
+    view->pins++;
   }
-  return -1;
+  pthread_mutex_unlock(&file->pin_lock);
 }
-//-------------------------------------------
-// Set list of IDs of telescopes with data
-//-------------------------------------------
-int get_telescope_with_data_list(int* list)
+
+//-----------------------------------
+// After the event is decoded: telescopes without data in it get
+// their buffer from unshare_adc_buffers() back, as if it had been
+// kept, and the new one is released.
+//-----------------------------------
+static void restore_adc_buffers(HessioFile* file, AdcData** shared)
 {
-  if ( hsdata != NULL)
+  int itel;
+  pthread_mutex_lock(&file->pin_lock);
+  for (itel=0; itel<H_MAX_TEL; itel++)
   {
-    int num_teldata = get_num_teldata();
-    int loop = 0;
-    for ( loop = 0; loop < num_teldata ; loop++)
+    struct view_buffer* view = NULL;
+    if ( shared[itel] == NULL || (view = find_view(file, shared[itel])) == NULL ) continue;
+    if ( file->hsdata != NULL && itel < file->hsdata->event.num_tel &&
+         !file->hsdata->event.teldata[itel].known )
     {
-     *list++ =hsdata->event.teldata_list[loop];
+      free_buffer(file->hsdata->event.teldata[itel].raw, sizeof(AdcData), view->mapped);
+      file->hsdata->event.teldata[itel].raw = view->raw;
+      view->retired = 0;
     }
-    return 0;
+    view->pins--;
+    release_view(file, view);
   }
-  return -1;
+  pthread_mutex_unlock(&file->pin_lock);
 }
 
-
-//-------------------------------------------
-// Get number of triggered telescope.
-//-------------------------------------------
-int get_num_tel_trig()
+//-----------------------------------
+// Free hsdata and the telescope data blocks it owns
+//-----------------------------------
+static void free_hsdata(HessioFile* file)
 {
-  if ( hsdata != NULL)
+  int itel;
+  if ( file->hsdata == NULL ) return;
+  file->generation++;
+  for (itel=0; itel<file->hsdata->run_header.ntel; itel++)
   {
-     return hsdata->event.central.num_teltrg;
+    free_adc_buffer(file, file->hsdata->event.teldata[itel].raw);
+    free_buffer(file->hsdata->event.teldata[itel].pixtm, sizeof(PixelTiming), file->mapped_buffers);
+    free(file->hsdata->event.teldata[itel].img);
+    free(file->hsdata->event.teldata[itel].pixcal);
   }
-  else return -1;
+  free(file->hsdata);
+  file->hsdata = NULL;
 }
 
-//-------------------------------------------
-// Set List of IDs of triggered telescopes.
-//-------------------------------------------
-int get_central_event_teltrg_list(int* tel_list)
+//-----------------------------------
+// Close file and release everything held by a reading handle
+//-----------------------------------
+void free_hessio_file(HessioFile* file)
 {
-  if ( hsdata != NULL)
+  int itel = 0;
+  if ( file == NULL ) return;
+  close_file(file);
+  if ( file->iobuf != NULL ) free_io_buffer(file->iobuf);
+  free_hsdata(file);
+  // Views keep their reader: none are left, unless pins were lost
+  while ( file->nviews > 0 )
   {
-    int num_teltrig = get_num_tel_trig();  
-    int loop = 0;
-    for ( loop = 0; loop < num_teltrig ; loop++)
-    {
-     *tel_list++ =hsdata->event.central.teltrg_list[loop];
-    }
-    return 0;
+    file->views[0].pins = 0;
+    file->views[0].retired = 1;
+    release_view(file, &file->views[0]);
   }
-  return -1;
+  free(file->views);
+  pthread_mutex_destroy(&file->pin_lock);
+  free(file->filename);
+  free(file->points);
+  free(file->copy_shower);
+  free(file->copy_pending);
+  for (itel = 0; itel < H_MAX_TEL; itel++) free(file->neighbours[itel]);
+  free(file);
 }
 
-//-------------------------------------------
-// Returns  Global event count
-//-------------------------------------------
-int get_global_event_count(void)
+//-----------------------------------
+// Fill tel_selected for the telescopes of the run header
+// from the telescope ids selected with set_telescope_selection
+//-----------------------------------
+static void update_telescope_selection(HessioFile* file)
 {
-  if ( hsdata != NULL)
+  int itel=0, loop=0;
+  for (itel=0; itel<file->hsdata->run_header.ntel; itel++)
   {
-     return hsdata->event.central.glob_count;
+    file->tel_selected[itel] = 0;
+    for (loop=0; loop<file->select_ntel; loop++)
+      if ( file->select_ids[loop] == file->hsdata->run_header.tel_id[itel] )
+        file->tel_selected[itel] = 1;
   }
-  return -1;
 }
 
-//-------------------------------------------
-// Set seconds and nanosecond parameter with 
-// the central trigger time
-//-------------------------------------------
-int get_central_event_gps_time(long* seconds, long* nanoseconds)
+//-----------------------------------
+// Fill the id to index table of this handle from the
+// run header, like set_tel_idx() does in libhessio
+//-----------------------------------
+static void set_telescope_index_table(HessioFile* file)
 {
-  if ( hsdata != NULL)
+  int itel=0;
+  for (itel=0; itel<=H_MAX_TEL; itel++) file->tel_index[itel] = -1;
+  for (itel=0; itel<file->hsdata->run_header.ntel; itel++)
   {
-     if (seconds != NULL ) *seconds = hsdata->event.central.gps_time.seconds;
-     if (nanoseconds != NULL ) *nanoseconds = hsdata->event.central.gps_time.nanoseconds;
-     return 0;
+    int tel_id = file->hsdata->run_header.tel_id[itel];
+    if ( tel_id >= 0 && tel_id <= H_MAX_TEL && file->tel_index[tel_id] < 0 )
+      file->tel_index[tel_id] = itel;
   }
-  return -1;
+  update_telescope_selection(file);
 }
 
-//----------------------------------------------------------------
-// Returns the number of different gains per pixel for a telscope id
+//-----------------------------------
+// Returns array index for specific id
 // Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-int get_num_channel(int telescope_id)
-{
+//-----------------------------------
 
-  if ( hsdata != NULL)
+int get_telescope_index(HessioFile* file, int telescope_id)
+{
+  int itel=0;
+  if ( telescope_id >= 0 && telescope_id <= H_MAX_TEL )
   {
-  int itel = get_telescope_index(telescope_id);
-  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    AdcData* raw = hsdata->event.teldata[itel].raw;
-    if ( raw != NULL && raw->known  )
-    {
-     return raw->num_gains;
-    }
+    itel = file->tel_index[telescope_id];
+    return itel >= 0 ? itel : TEL_INDEX_NOT_VALID;
   }
-  return -1;
+  // Ids beyond the table: search the run header
+  for (itel=0; itel<file->hsdata->run_header.ntel; itel++)
+  {
+     if (file->hsdata->run_header.tel_id[itel] == telescope_id) return itel;
+  }
+  return TEL_INDEX_NOT_VALID;
 }
 
-//----------------------------------------------------------------
-// Returns Width of readout time slice (i.e. one sample) [ns].
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-double get_time_slice(int telescope_id)
+//-----------------------------------
+// Fill indices with the array index of each of num_ids telescope ids
+// (TEL_INDEX_NOT_VALID for unknown ids)
+// Returns 0, or -1 if no run header was read
+//-----------------------------------
+int get_telescope_indices(HessioFile* file, const int* telescope_ids, int num_ids, int* indices)
 {
-  if ( hsdata != NULL)
-  {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelSetting setting = hsdata->pixel_set[itel];
-    return setting.time_slice;
-  }
-  return 0.;
+  int loop=0;
+  if ( file->hsdata == NULL ) return -1;
+  for (loop=0; loop<num_ids; loop++)
+    indices[loop] = get_telescope_index(file, telescope_ids[loop]);
+  return 0;
 }
 
-//----------------------------------------------------------------
-// Fill ref_shapes array with lrefshape values from
-// PixelSetting.refshape[channel]
-// Returns -1 if channel or fshape are not valid
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-int get_ref_shapes(int telescope_id,int channel, double* ref_shapes )
+//----------------------------------
+//Open input file for reading with this handle
+//----------------------------------
+int file_open(HessioFile* file, const char* filename)
 {
-  if ( hsdata != NULL && channel < H_MAX_GAINS && ref_shapes != NULL) 
+  if (filename)
   {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelSetting setting = hsdata->pixel_set[itel];
-    size_t i = 0;
-    for (; i <= setting.lrefshape ; ++i)
+    if (file->file_is_opened) { close_file(file); }
+
+    show_hessio_max();
+
+    /* Check assumed limits with the ones compiled into the library. */
+    H_CHECK_MAX();
+   
+    if ( file->iobuf == NULL &&
+         (file->iobuf = allocate_io_buffer(1000000L)) == NULL )
+    {
+     Error("Cannot allocate I/O buffer");
+     exit(1);
+    }
+    file->iobuf->max_length = 100000000L;
+
+    if ( (file->iobuf->input_file = fileopen(filename,READ_BINARY)) == NULL )
     {
-        ref_shapes[i] = setting.refshape[channel][i];
+     perror(filename);
+     Error("Cannot open input file.");
+     return -1 ;
     }
-    return 0;
+
+    if ( file->filename == NULL || strcmp(file->filename,filename) != 0 )
+    {
+      free(file->filename);
+      file->filename = strdup(filename);
+      free(file->points);
+      file->points = NULL;
+      file->npoints = 0;
+    }
+
+    fflush(stdout);
+    fprintf(stderr,"%s\n",filename);
+    printf("\nInput file '%s' has been opened.\n",filename);
+    file->file_is_opened = 1;
   }
-  return -1;
+  return 0;
 }
 
-
-//----------------------------------------------------------------
-// Returns  Reference pulse shape(s)
-// refshape[H_MAX_GAINS][H_MAX_FSHAPE];
-// If   channel or fshape are not valid return 0.
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-double get_ref_shape(int telescope_id,int channel, int fshape )
+//----------------------------------
+// Returns the position of the next block in the (decompressed)
+// data of the opened file, or -1 if not known, e.g. for data
+// read through a pipe
+//----------------------------------
+long long get_file_position(HessioFile* file)
 {
-  if ( hsdata != NULL && channel < H_MAX_GAINS && fshape < H_MAX_FSHAPE) 
-  {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelSetting setting = hsdata->pixel_set[itel];
-    return setting.refshape[channel][fshape];
-  }
-  return 0.;
+  if ( !file->file_is_opened || file->iobuf->input_file == NULL ) return -1;
+  return (long long) ftello(file->iobuf->input_file);
 }
 
-//----------------------------------------------------------------
-// Returns Number of following reference pulse shapes (num_gains or 0)
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-// Returns -1 if data is not accessible
-//----------------------------------------------------------------
-int get_nrefshape(int telescope_id)
+//----------------------------------
+// Reopen the file given to file_open so that the next block
+// is read at offset of its (decompressed) data. gzip files
+// resume decompression at the last access point before offset,
+// other compressed files are decompressed from their start.
+// Decoded data (run header etc.) are kept.
+// Returns 0 or -1
+//----------------------------------
+int seek_file(HessioFile* file, long long offset)
 {
-  if ( hsdata != NULL ) 
+  const struct gz_access_point* point = NULL;
+  FILE* input = NULL;
+  int lo = 0, hi = file->npoints;
+
+  if ( file->filename == NULL || file->iobuf == NULL ) return -1;
+
+  // Last access point at or before offset
+  while ( lo < hi )
   {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelSetting setting = hsdata->pixel_set[itel];
-    return setting.nrefshape;
+    int mid = (lo + hi) / 2;
+    if ( file->points[mid].out <= offset ) lo = mid + 1;
+    else hi = mid;
   }
-  return -1;
-}
-
+  if ( lo > 0 ) point = &file->points[lo-1];
 
-//----------------------------------------------------------------
-// Returns Length of following reference pulse shape(s).
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-// Returns -1 if data is not accessible
-//----------------------------------------------------------------
-//----------------------------------------------------------------
-int get_lrefshape(int telescope_id)
-{
-  if ( hsdata != NULL ) 
+  if ( (input = fileopen_at(file->filename,offset,point)) == NULL )
   {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelSetting setting = hsdata->pixel_set[itel];
-    return setting.lrefshape;
+    perror(file->filename);
+    return -1;
   }
-  return -1;
+  close_file(file);
+  file->iobuf->input_file = input;
+  file->file_is_opened = 1;
+  return 0;
 }
 
+//----------------------------------
+// Scan the opened file for an index of its top-level blocks.
+// Only run headers are decoded, and the central trigger data of
+// events for their global count; other blocks are skipped.
+// Fill up to max_blocks rows of blocks with
+// offset, length, type, ident, run, glob_count (-1 if none)
+// A truncated last block ends the scan like the end of file.
+// Returns the number of rows filled, 0 at end of file,
+// -1 if positions are not known (data read through a pipe)
+//----------------------------------
+int scan_blocks(HessioFile* file, long long* blocks, int max_blocks)
+{
+  int nblocks = 0;
+  int event_id = 0;
 
-//----------------------------------------------------------------
-// Returns  Time step between refshape entries [ns]
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-double get_ref_step(int telescope_id )
-{
-  if ( hsdata != NULL ) 
-  {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelSetting setting = hsdata->pixel_set[itel];
-    return setting.ref_step;
-  }
-  return -0.;
-}
-//----------------------------------------------------------------
-// Returns individual channel recorded information ? 
-// Bit 0: sum, 1: samples, 2: ADC was in saturation.
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-uint8_t get_adc_known(int telescope_id,int channel , int pixel_id)
-{
+  if ( !file->file_is_opened ) return 0;
 
-  if ( hsdata != NULL && channel < H_MAX_GAINS && pixel_id < H_MAX_PIX)
+  while ( nblocks < max_blocks )
   {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    AdcData* raw = hsdata->event.teldata[itel].raw;
-    if ( raw != NULL && raw->known  )
+    long long* row = blocks + 6*nblocks;
+    long long offset = get_file_position(file);
+    if ( offset < 0 ) return -1;
+
+    if ( find_block(file) != 0 )
     {
-     return raw->adc_known[channel][pixel_id];
+      close_file(file);
+      break;
+    }
+    row[0] = offset;
+    row[1] = file->item_header.length;
+    row[2] = file->item_header.type;
+    row[3] = file->item_header.ident;
+    row[5] = -1;
+
+    switch ( (int) file->item_header.type )
+    {
+      case IO_TYPE_HESS_RUNHEADER:
+        if ( read_block(file) != 0 ||
+             decode_hsdata(file, &event_id) < 0 )
+        {
+          close_file(file);
+          return nblocks;
+        }
+        break;
+
+      case IO_TYPE_HESS_EVENT:
+        if ( file->hsdata != NULL )
+        {
+          if ( read_block(file) != 0 )
+          {
+            close_file(file);
+            return nblocks;
+          }
+          if ( read_central_event_only(file) == 0 )
+            row[5] = file->hsdata->event.central.glob_count;
+          break;
+        }
+        // No run header yet: fall through and skip
+
+      default:
+        if ( skip_block(file) < 0 )
+        {
+          close_file(file);
+          return nblocks;
+        }
     }
+    row[4] = get_run_number(file);
+    nblocks++;
   }
-  return -1;
+  return nblocks;
 }
 
-//----------------------------------------------------------------
-// Returns shower altitude [rad]
-//----------------------------------------------------------------
-double get_mc_shower_altitude()
+//----------------------------------
+// Decompress the whole gzip file given to file_open and
+// remember access points about every span bytes of data,
+// for seek_file
+// Returns the number of access points or -1
+//----------------------------------
+int build_access_points(HessioFile* file, long long span)
 {
-  if ( hsdata != NULL)
-  {
-     return hsdata->mc_shower.altitude;
-  }
-  return -0.;
+  struct gz_access_point* points = NULL;
+  int npoints;
+
+  if ( file->filename == NULL ) return -1;
+  if ( (npoints = gz_build_access(file->filename,span,&points)) < 0 ) return -1;
+  free(file->points);
+  file->points = points;
+  file->npoints = npoints;
+  return npoints;
 }
-//----------------------------------------------------------------
-// Returns shower azimuth (N->E) [rad]
-//----------------------------------------------------------------
-double get_mc_shower_azimuth()
+
+//----------------------------------
+// Copy the access points of this handle into points
+// (out, in, bits, window_size for each) and windows
+// (32768 bytes for each)
+// Returns the number of access points
+//----------------------------------
+int get_access_points(HessioFile* file, long long* points, unsigned char* windows)
 {
-  if ( hsdata != NULL)
+  int ipoint;
+  for (ipoint = 0; ipoint < file->npoints; ipoint++)
   {
-     return hsdata->mc_shower.azimuth;
+    struct gz_access_point* point = &file->points[ipoint];
+    points[4*ipoint] = point->out;
+    points[4*ipoint+1] = point->in;
+    points[4*ipoint+2] = point->bits;
+    points[4*ipoint+3] = point->window_size;
+    memcpy(windows + ipoint*sizeof(point->window),point->window,sizeof(point->window));
   }
-  return -0.;
+  return file->npoints;
 }
-//----------------------------------------------------------------
-// Returns shower primary energy [TeV]
-//----------------------------------------------------------------
-double get_mc_shower_energy()
+
+//----------------------------------
+// Replace the access points of this handle,
+// given as for get_access_points
+// Returns 0 or -1
+//----------------------------------
+int set_access_points(HessioFile* file, int npoints, const long long* points, const unsigned char* windows)
 {
-  if ( hsdata != NULL)
+  struct gz_access_point* copy = NULL;
+  int ipoint;
+
+  if ( npoints > 0 &&
+       (copy = (struct gz_access_point *) calloc(npoints,sizeof(struct gz_access_point))) == NULL )
+    return -1;
+  for (ipoint = 0; ipoint < npoints; ipoint++)
   {
-     return hsdata->mc_shower.energy;
+    copy[ipoint].out = points[4*ipoint];
+    copy[ipoint].in = points[4*ipoint+1];
+    copy[ipoint].bits = (int) points[4*ipoint+2];
+    copy[ipoint].window_size = (unsigned) points[4*ipoint+3];
+    memcpy(copy[ipoint].window,windows + ipoint*sizeof(copy[ipoint].window),sizeof(copy[ipoint].window));
   }
-  return -0.;
+  free(file->points);
+  file->points = copy;
+  file->npoints = npoints;
+  return 0;
 }
-//----------------------------------------------------------------
-// Returns  x core position w.r.t. array reference point [m],
-//  x -> N
-//----------------------------------------------------------------
-double get_mc_event_xcore()
+
+//----------------------------------
+// Select the telescopes whose data is decoded by the next events:
+// the ntel telescopes of tel_ids, or all of them if ntel < 0.
+// Data of other telescopes is skipped.
+// Returns 0 or -1 if ntel is too large
+//----------------------------------
+int set_telescope_selection(HessioFile* file, int ntel, const int* tel_ids)
 {
-  if ( hsdata != NULL)
-  {
-     return hsdata->mc_event.xcore;
-  }
-  return -0.;
+  if ( ntel > H_MAX_TEL ) return -1;
+  file->select_ntel = ntel < 0 ? -1 : ntel;
+  if ( ntel > 0 )
+    memcpy(file->select_ids, tel_ids, ntel*sizeof(int));
+  if ( file->hsdata != NULL ) update_telescope_selection(file);
+  return 0;
 }
-//----------------------------------------------------------------
-// Returns  y core position w.r.t. array reference point [m],
-//  y -> W
-//----------------------------------------------------------------
-double get_mc_event_ycore()
+
+//----------------------------------
+// Select which parts of IO_TYPE_HESS_EVENT are decoded
+// by the next events, as a combination of
+// RAWDATA_FLAG, RAWSUM_FLAG, TRACKDATA_FLAG, IMAGE_FLAG,
+// TIME_FLAG ... (-1: all). Blocks not selected are skipped.
+// Returns the previous selection
+//----------------------------------
+int set_read_what(HessioFile* file, int what)
 {
-  if ( hsdata != NULL)
-  {
-     return hsdata->mc_event.ycore;
-  }
-  return -0.;
+  int previous = file->read_what;
+  file->read_what = what;
+  return previous;
 }
-//-------------------------------------------
-// Returns  PixelTiming.timval[H_MAX_PIX][H_MAX_PIX_TIMES]
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//-------------------------------------------
-int get_pixel_timing_timval(int telescope_id,float *data)
+
+//----------------------------------
+// Select the events returned by move_to_next_event (enable != 0),
+// from the central trigger data and the last MC shower only:
+//  - at least min_teltrg telescopes triggered
+//  - MC shower energy [TeV] within [min_energy, max_energy]
+//  - one of the ntel telescopes of tel_ids triggered (ntel > 0)
+// Other events are skipped before their telescope data is decoded.
+// Returns 0 or -1 if ntel is too large
+//----------------------------------
+int set_event_filter(HessioFile* file, int enable, int min_teltrg, double min_energy,
+                     double max_energy, int ntel, const int* tel_ids)
 {
-  if ( hsdata != NULL)
+  if ( ntel < 0 || ntel > H_MAX_TEL ) return -1;
+  file->filter = enable;
+  file->filter_min_teltrg = min_teltrg;
+  file->filter_energy[0] = min_energy;
+  file->filter_energy[1] = max_energy;
+  file->filter_ntel = ntel;
+  if ( ntel > 0 )
+    memcpy(file->filter_tel_ids, tel_ids, ntel*sizeof(int));
+  return 0;
+}
+
+//----------------------------------
+// Check the IO_TYPE_HESS_EVENT block in iobuf against the
+// event filter, decoding only its CentralEvent
+// Returns 1 if the event is selected, 0 if not
+//----------------------------------
+static int select_event(HessioFile* file)
+{
+  CentralEvent* central = NULL;
+  double energy = 0.;
+  int loop = 0, itrg = 0;
+
+  if ( !file->filter || file->hsdata == NULL ) return 1;
+  // Let read_hess_event() deal with events without central data
+  if ( read_central_event_only(file) != 0 ) return 1;
+
+  central = &file->hsdata->event.central;
+  if ( central->num_teltrg < file->filter_min_teltrg ) return 0;
+  energy = file->hsdata->mc_shower.energy;
+  if ( energy < file->filter_energy[0] || energy > file->filter_energy[1] ) return 0;
+  if ( file->filter_ntel == 0 ) return 1;
+  for (itrg = 0; itrg < central->num_teltrg; itrg++)
+    for (loop = 0; loop < file->filter_ntel; loop++)
+      if ( central->teltrg_list[itrg] == file->filter_tel_ids[loop] ) return 1;
+  return 0;
+}
+
+//----------------------------------
+//Read next event of this handle and fill file->hsdata
+// and file->item_header
+//----------------------------------
+int move_to_next_event(HessioFile* file, int *event_id)
+{
+  if ( file->pending )
   {
-    int itel = get_telescope_index(telescope_id);
-  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelTiming* pt = hsdata->event.teldata[itel].pixtm;
-  if ( pt != NULL )
+    file->pending = 0;
+    *event_id = file->pending_event_id;
+    return get_run_number(file);
+  }
+  if (! file->file_is_opened) return -1;
+
+  int rc = 0;
+  while(  rc != IO_TYPE_HESS_EVENT )
   {
-  //  float timval[H_MAX_PIX][H_MAX_PIX_TIMES]
-    int ipix= 0;
-    for (ipix = 0; ipix < pt->num_pixels; ipix++)
+    if ( find_block(file) != 0 ||
+         read_block(file) != 0 )
+      rc = -1;
+    else if ( file->copy_output != NULL && copy_input_block(file) < 0 )
+      rc = -1;
+    else if ( file->item_header.type == IO_TYPE_HESS_EVENT && !select_event(file) )
     {
-      int itimes = 0;
-      for (itimes = 0; itimes < pt->num_types && itimes<H_MAX_PIX_TIMES   ; itimes++)
-      {
-      *data++ = pt->timval[ipix][itimes];
-      }
-    } // end for ipix
-  } // end if pt != NULL
-  return 0;
-  } // end if hsdata
-  return -1;
+      rc = 0; // Not selected: skipped without decoding the telescope data
+      if ( stats_enabled ) count_type(IO_TYPE_HESS_EVENT, 3, 1);
+    }
+    else
+      rc = decode_hsdata(file, event_id);
+    if (rc < 0) 
+    {
+    close_file(file); 
+    return -1; 
+    }   
+  }
+ return get_run_number(file);
 }
-//----------------------------------------------------------------
-// Returns Pulses sampled
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-int get_adc_sample(int telescope_id, int channel, uint16_t *data )
+
+//----------------------------------
+// Decode only the CentralEvent sub-item
+// of the IO_TYPE_HESS_EVENT block in iobuf
+//----------------------------------
+static int read_central_event_only(HessioFile* file)
 {
-  if ( hsdata != NULL)
+  IO_ITEM_HEADER event_header;
+  int type = 0, rc = -1;
+  int itel = 0;
+  CentralEvent* central = &file->hsdata->event.central;
+  long long start = stats_enabled ? stats_clock() : 0;
+
+  file->generation++;
+
+  event_header.type = IO_TYPE_HESS_EVENT;
+  if ( get_item_begin(file->iobuf,&event_header) < 0 ) return -1;
+
+  central->glob_count = central->num_teltrg = 0;
+  while ( (type = next_subitem_type(file->iobuf)) > 0 )
   {
-  int itel = get_telescope_index(telescope_id);
+    if ( type == IO_TYPE_HESS_CENTEVENT )
+    {
+      rc = read_hess_centralevent(file->iobuf,central);
+      break;
+    }
+    if ( skip_subitem(file->iobuf) < 0 ) break;
+  }
+  get_item_end(file->iobuf,&event_header);
 
-  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-   AdcData* raw = hsdata->event.teldata[itel].raw;
-    if ( raw != NULL && raw->known  ) // If triggered telescopes
+  /* Old data only have the bit pattern of small arrays */
+  if ( rc == 0 && central->num_teltrg == 0 && central->teltrg_pattern != 0 )
+  {
+    for (itel=0; itel<file->hsdata->run_header.ntel && itel<16; itel++)
     {
-     int ipix =0.;
-     for(ipix=0.;ipix<raw->num_pixels;ipix++) //  loop over pixels
-     {
-     if(raw->significant[ipix])
-     {
-    int isamp=0.;
-    for (isamp=0.;isamp<raw->num_samples;isamp++)
-      { *data++ = raw->adc_sample[channel][ipix][isamp]; }
-     } // end if raw->significant[ipix]
-     }  // end of   loop over pixels
-    } // end if triggered telescopes
-    return 0;
+      if ( (central->teltrg_pattern & (1<<itel)) != 0 )
+        central->teltrg_list[central->num_teltrg++] = file->hsdata->run_header.tel_id[itel];
+    }
   }
-  return -1;
+  // Counted as decode time, but not as a decoded block
+  if ( stats_enabled ) count_type(IO_TYPE_HESS_EVENT, 4, stats_clock() - start);
+  return rc;
 }
 
-//----------------------------------------------------------------
-// Return adc sum for corresponding telescope and channel (HI_GAIN/LOW_GAIN)
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-int get_adc_sum(int telescope_id, int channel, uint32_t *data )
+//----------------------------------
+// Scan input file up to the next event, decoding
+// only MC shower, MC event and central trigger data.
+// All other blocks are skipped without being decoded.
+// Set event_info with event_id, glob_count, num_teltrg
+// Set mc_values with energy, xcore, ycore, altitude, azimuth
+// Set teltrg_list with up to max_teltrg triggered telescope ids
+// Returns run number or -1 at end of file
+//----------------------------------
+int move_to_next_mc_event(HessioFile* file, int* event_info, double* mc_values, int* teltrg_list, int max_teltrg)
 {
-  if ( hsdata != NULL)
+  if (! file->file_is_opened) return -1;
+
+  int rc = 0;
+  int event_id = 0;
+  while ( 1 )
   {
-  int itel = get_telescope_index(telescope_id);
-  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-   AdcData* raw = hsdata->event.teldata[itel].raw;
-    if ( raw != NULL && raw->known  ) // If triggered telescopes
+    if ( find_block(file) != 0 )
     {
-     int ipix =0.;
-     for(ipix=0.;ipix<raw->num_pixels;ipix++) //  loop over pixels
-     {
-     *data++ = raw->adc_sum[channel][ipix];
-     }  // end of   loop over pixels
-     return 0;
-    } // end if triggered telescopes
+      close_file(file);
+      return -1;
+    }
+    switch ( (int) file->item_header.type )
+    {
+      case IO_TYPE_HESS_RUNHEADER:
+      case IO_TYPE_HESS_MC_SHOWER:
+      case IO_TYPE_HESS_MC_EVENT:
+        if ( read_block(file) != 0 ||
+             decode_hsdata(file, &event_id) < 0 )
+        {
+          close_file(file);
+          return -1;
+        }
+        break;
+
+      case IO_TYPE_HESS_EVENT:
+        if ( file->hsdata == NULL || read_block(file) != 0 )
+        {
+          close_file(file);
+          return -1;
+        }
+        if ( read_central_event_only(file) < 0 ) continue;
+        {
+          CentralEvent* central = &file->hsdata->event.central;
+          int loop = 0;
+          event_info[0] = file->item_header.ident;
+          event_info[1] = central->glob_count;
+          event_info[2] = central->num_teltrg < max_teltrg ? central->num_teltrg : max_teltrg;
+          for (loop = 0; loop < event_info[2]; loop++)
+            teltrg_list[loop] = central->teltrg_list[loop];
+          mc_values[0] = file->hsdata->mc_shower.energy;
+          mc_values[1] = file->hsdata->mc_event.xcore;
+          mc_values[2] = file->hsdata->mc_event.ycore;
+          mc_values[3] = file->hsdata->mc_shower.altitude;
+          mc_values[4] = file->hsdata->mc_shower.azimuth;
+        }
+        return get_run_number(file);
+
+      default:
+        if ( (rc = skip_block(file)) < 0 )
+        {
+          close_file(file);
+          return -1;
+        }
+    }
   }
-  return -1;
 }
-//----------------------------------------------------------------
-// Returns needed informations for calibration process
-//  double pedestal[H_MAX_GAINS][H_MAX_PIX];  ///< Average pedestal on ADC sums
-//  double calib[H_MAX_GAINS][H_MAX_PIX]; /**< ADC to laser/LED p.e. conversion,
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//
-int get_data_for_calibration(int telescope_id, double* pedestal, double* calib )
-//----------------------------------------------------------------
+
+//----------------------------------
+// Version of the event data held by the handle: changed by
+// every block decoded, and when the file is closed
+//----------------------------------
+long get_generation(HessioFile* file)
+{
+  return file->generation;
+}
+
+//----------------------------------
+// Count a view of the AdcData buffer of the current event holding
+// data (pin = 1), or its end (pin = -1). A buffer with views alive
+// is not overwritten by the next event nor freed with its run, see
+// unshare_adc_buffers, so that views never read another event or
+// unmapped memory. Views may end in another thread than the one
+// reading.
+// Returns 0, -1 if data is not in an AdcData buffer of the handle
+//----------------------------------
+int pin_buffers(HessioFile* file, const void* data, int pin)
 {
-  if ( hsdata != NULL)
+  int itel, rc = 0;
+  struct view_buffer* view = NULL;
+  pthread_mutex_lock(&file->pin_lock);
+  if ( (view = find_view(file, data)) == NULL && pin > 0 && file->hsdata != NULL )
   {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-     TelMoniData monitor= hsdata->tel_moni[itel];
-     LasCalData  calibration = hsdata->tel_lascal[itel];
-     int ipix =0.;
-     int num_pixels = hsdata->camera_set[itel].num_pixels;
-     for(ipix=0.;ipix<num_pixels;ipix++) // loop over pixels
-     {
-     int igain=0, num_gain=2; // LOW and HI Gain
-     for(igain=0;igain<num_gain;igain++)
-     {
-       *pedestal++=monitor.pedestal[igain][ipix];
-       *calib++=calibration.calib[igain][ipix];
-     } // end loop gain
-     }  // end of   loop over pixels
-     return 0;
+    for (itel=0; itel<file->hsdata->event.num_tel; itel++)
+    {
+      AdcData* raw = file->hsdata->event.teldata[itel].raw;
+      if ( raw != NULL && (const char*) data >= (const char*) raw &&
+           (const char*) data < (const char*) (raw + 1) )
+        break;
+    }
+    if ( itel < file->hsdata->event.num_tel )
+    {
+      if ( file->nviews == file->views_size )
+      {
+        int size = file->views_size > 0 ? 2*file->views_size : 16;
+        struct view_buffer* views = (struct view_buffer*)
+          realloc(file->views, size*sizeof(struct view_buffer));
+        if ( views != NULL )
+        {
+          file->views = views;
+          file->views_size = size;
+        }
+      }
+      if ( file->nviews < file->views_size )
+      {
+        view = &file->views[file->nviews++];
+        view->raw = file->hsdata->event.teldata[itel].raw;
+        view->pins = 0;
+        view->retired = 0;
+        view->mapped = file->mapped_buffers;
+      }
+    }
   }
-  return -1;
+  if ( view == NULL )
+    rc = -1;
+  else
+  {
+    view->pins += pin;
+    release_view(file, view);
+  }
+  pthread_mutex_unlock(&file->pin_lock);
+  return rc;
 }
-//----------------------------------------------------------------
-// Returns pixel position information
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-// -1 if hsdata == NULL
-//----------------------------------------------------------------
-int get_pixel_position(int telescope_id, double* xpos, double* ypos )
+
+//----------------------------------
+// Returns the maximum number of telescopes
+// compiled in the library (H_MAX_TEL)
+//----------------------------------
+int get_max_telescopes(void)
 {
-  if ( hsdata != NULL)
+  return H_MAX_TEL;
+}
+
+/*--------------------------------*/
+//  Cleanly close iobuf
+//----------------------------------
+void close_file(HessioFile* file)
+{
+  file->pending = 0;
+  file->generation++;
+  if ( file->iobuf == NULL ) return;
+  file->file_is_opened = 0;
+
+  if ( file->iobuf->input_file != NULL && file->iobuf->input_file != stdin )
   {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-     int ipix =0.;
-     int num_pixels = hsdata->camera_set[itel].num_pixels;
-     for(ipix=0.;ipix<num_pixels;ipix++) // loop over pixels
-     {
-        *xpos++=hsdata->camera_set[itel].xpix[ipix];
-        *ypos++=hsdata->camera_set[itel].ypix[ipix];
-     }
-     return 0;
+    fileclose(file->iobuf->input_file);
+    file->iobuf->input_file = NULL;
+    reset_io_block(file->iobuf);
   }
-  return -1;
+  if (file->iobuf->output_file != NULL) fileclose(file->iobuf->output_file);
 }
-//----------------------------------------------------------------
-// Returns the number of pixels in the camera (as in configuration)
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-int get_num_pixels(int telescope_id)
+
+//----------------------------------
+// Open a new eventio file for writing blocks copied from input
+// files, compressed according to the file name ending
+// Returns NULL if it can not be opened
+//----------------------------------
+IO_BUFFER* open_output_file(const char* filename)
 {
-  if ( hsdata != NULL)
+  IO_BUFFER* output = allocate_io_buffer(1000000L);
+  if ( output == NULL ) return NULL;
+  output->max_length = 100000000L;
+  if ( (output->output_file = fileopen(filename,WRITE_BINARY)) == NULL )
   {
-  int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-  return hsdata->camera_set[itel].num_pixels;
+    perror(filename);
+    free_io_buffer(output);
+    return NULL;
   }
-  return -1;
+  return output;
 }
 
-//----------------------------------------------------------------
-// Returns total area of individual mirrors corrected   for inclination [m^2].
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------------------
-int get_mirror_area(int telescope_id,double* result)
+//----------------------------------
+// Close and free an output file from open_output_file
+// Returns 0 or -1 if the data could not be written completely
+//----------------------------------
+int close_output_file(IO_BUFFER* output)
 {
-  if ( hsdata != NULL && result != NULL)
+  int rc = 0;
+  if ( output == NULL ) return -1;
+  if ( output->output_file != NULL )
   {
-  int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-  *result = hsdata->camera_set[itel].mirror_area;
-  return 0;
+    if ( fflush(output->output_file) != 0 ) rc = -1;
+    if ( fileclose(output->output_file) != 0 ) rc = -1;
   }
-  return -1.;
+  free_io_buffer(output);
+  return rc;
 }
-//-----------------------------------------------------
-// Returns the number of samples (time slices) recorded
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//-----------------------------------------------------
-int get_num_samples(int telescope_id)
+
+//----------------------------------
+// Copy the top-level block in iobuf of this handle to output,
+// as it was read
+// Returns 0 or -1
+//----------------------------------
+static int copy_block(HessioFile* file, IO_BUFFER* output)
 {
-  if ( hsdata != NULL)
+  IO_ITEM_HEADER item_header;
+  int rc = 0;
+
+  item_header.type = file->item_header.type;
+  if ( get_item_begin(file->iobuf,&item_header) < 0 ) return -1;
+  rc = copy_item_to_io_block(output,file->iobuf,&item_header);
+  get_item_end(file->iobuf,&item_header);
+  return rc == 0 ? 0 : -1;
+}
+
+//----------------------------------
+// Append the block just copied to output to a buffer of held blocks
+// Returns 0 or -1 if out of memory
+//----------------------------------
+static int hold_block(IO_BUFFER* output, BYTE** buffer, size_t* length, size_t* size)
+{
+  size_t block_length = (size_t) (output->data - output->buffer);
+  if ( *length + block_length > *size )
   {
-  int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    AdcData* raw = hsdata->event.teldata[itel].raw;
-    if ( raw != NULL )//&& raw->known   )
-    {
-     return raw->num_samples;
-    }
+    size_t new_size = 2*(*length + block_length);
+    BYTE* held = (BYTE *) realloc(*buffer, new_size);
+    if ( held == NULL ) return -1;
+    *buffer = held;
+    *size = new_size;
   }
-  return -1;
+  memcpy(*buffer + *length, output->buffer, block_length);
+  *length += block_length;
+  reset_io_block(output);
+  return 0;
 }
-//-----------------------------------------------------
-// Returns the number of different types of times can we store
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//-----------------------------------------------------
-int get_pixel_timing_num_times_types(int telescope_id)
+
+//----------------------------------
+// Hand the block just read by move_to_next_event to the copy output:
+// configuration and other blocks are written at once, the MC shower
+// and the MC blocks of an array event are kept until it is known
+// whether write_current_event is called for an event of them,
+// event blocks are left for write_current_event.
+// Returns 0 or -1 if the block could not be written
+//----------------------------------
+static int copy_input_block(HessioFile* file)
 {
-  if ( hsdata != NULL)
+  IO_BUFFER* output = file->copy_output;
+
+  switch ( (int) file->item_header.type )
   {
-  int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelTiming* pt = hsdata->event.teldata[itel].pixtm;
-    if ( pt != NULL )
-    {
-     return pt->num_types;
-    }
+    case IO_TYPE_HESS_EVENT:
+      file->copy_event_read = 1;
+      return 0;
+
+    case IO_TYPE_HESS_MC_SHOWER:
+      // Next shower: MC blocks of events never written are dropped
+      file->copy_shower_length = 0;
+      file->copy_pending_length = 0;
+      file->copy_event_read = 0;
+      if ( copy_block(file, output) < 0 ) return -1;
+      return hold_block(output, &file->copy_shower, &file->copy_shower_length,
+                        &file->copy_shower_size);
+
+    case IO_TYPE_HESS_MC_EVENT:
+    case IO_TYPE_HESS_MC_PE_SUM:
+    case IO_TYPE_MC_TELARRAY:
+      if ( file->copy_event_read ) file->copy_pending_length = 0;
+      file->copy_event_read = 0;
+      if ( copy_block(file, output) < 0 ) return -1;
+      return hold_block(output, &file->copy_pending, &file->copy_pending_length,
+                        &file->copy_pending_size);
+
+    case IO_TYPE_HESS_RUNHEADER:
+      // Next run: MC blocks of events never written are dropped
+      file->copy_shower_length = 0;
+      file->copy_pending_length = 0;
+      file->copy_event_read = 0;
+      // Falls through
+
+    default:
+      if ( copy_block(file, output) < 0 ) return -1;
+      return write_io_block(output) == 0 ? 0 : -1;
   }
-  return -1;
+}
+
+//----------------------------------
+// Set the output to which the blocks read by move_to_next_event
+// are copied (see copy_input_block), NULL to stop copying
+//----------------------------------
+void set_copy_output(HessioFile* file, IO_BUFFER* output)
+{
+  file->copy_output = output;
+  file->copy_shower_length = 0;
+  file->copy_pending_length = 0;
+  file->copy_event_read = 0;
+}
+
+//----------------------------------
+// Write the event last returned by move_to_next_event to the copy
+// output, preceded by its MC shower if no event of it was written
+// yet and by its MC blocks, byte for byte as read
+// Returns 0 or -1 if there is no copy output, no such event
+// or the event was written already
+//----------------------------------
+int write_current_event(HessioFile* file)
+{
+  IO_BUFFER* output = file->copy_output;
+  if ( output == NULL || file->pending || file->iobuf == NULL ||
+       file->item_header.type != IO_TYPE_HESS_EVENT || file->copy_event_read != 1 )
+    return -1;
+  file->copy_event_read = 2;
+  if ( file->copy_shower_length > 0 )
+  {
+    if ( fwrite(file->copy_shower, 1, file->copy_shower_length,
+                output->output_file) != file->copy_shower_length )
+      return -1;
+    file->copy_shower_length = 0;
+  }
+  if ( file->copy_pending_length > 0 )
+  {
+    if ( fwrite(file->copy_pending, 1, file->copy_pending_length,
+                output->output_file) != file->copy_pending_length )
+      return -1;
+    file->copy_pending_length = 0;
+  }
+  if ( copy_block(file, output) < 0 ) return -1;
+  return write_io_block(output) == 0 ? 0 : -1;
 }
 
 //-----------------------------------------------------
-// Set the local telescope trigger time second and nanoseconds
-// to function paramameters
-// returns 0 if set, otherwise returns -1
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+// Synthetic data: deterministic random numbers (xorshift64*),
+// uniform in [0,1[ and normal
+//-----------------------------------------------------
+static double synth_uniform(uint64_t* state)
+{
+  *state ^= *state >> 12;
+  *state ^= *state << 25;
+  *state ^= *state >> 27;
+  return ((*state * 2685821657736338717ULL) >> 11) * (1.0/9007199254740992.0);
+}
+
+static double synth_normal(uint64_t* state)
+{
+  double u = 1. - synth_uniform(state), v = synth_uniform(state);
+  return sqrt(-2.*log(u)) * cos(2.*M_PI*v);
+}
+
+struct synth_pixel
+{
+  double x, y, r, phi;
+};
+
+static int compare_synth_pixels(const void* a, const void* b)
+{
+  const struct synth_pixel* pa = (const struct synth_pixel*) a;
+  const struct synth_pixel* pb = (const struct synth_pixel*) b;
+  if ( pa->r < pb->r - 1e-9 ) return -1;
+  if ( pa->r > pb->r + 1e-9 ) return 1;
+  return (pa->phi > pb->phi) - (pa->phi < pb->phi);
+}
+
+//-----------------------------------------------------
+// Fill the camera with the npix hexagonal pixels of a
+// pitch [m] lattice closest to its centre
+// Returns 0 or -1 if allocation failed
 //-----------------------------------------------------
-int get_tel_event_gps_time(int telescope_id, long* seconds, long* nanoseconds)
+static int synth_camera(CameraSettings* camset, int npix, double pitch)
 {
-  if ( hsdata != NULL && seconds != NULL && nanoseconds != NULL)
+  int nring = (int) sqrt(npix/3.) + 2, nlattice = 0, i = 0, j = 0;
+  struct synth_pixel* lattice = (struct synth_pixel*)
+    malloc((size_t)(2*nring+1)*(2*nring+1)*sizeof(struct synth_pixel));
+  if ( lattice == NULL ) return -1;
+  for (j = -nring; j <= nring; j++)
+    for (i = -nring; i <= nring; i++)
+    {
+      struct synth_pixel* pixel = lattice + nlattice++;
+      pixel->x = (i + 0.5*j) * pitch;
+      pixel->y = j * 0.5*sqrt(3.) * pitch;
+      pixel->r = sqrt(pixel->x*pixel->x + pixel->y*pixel->y);
+      pixel->phi = atan2(pixel->y, pixel->x);
+    }
+  qsort(lattice, nlattice, sizeof(struct synth_pixel), compare_synth_pixels);
+  camset->num_pixels = npix;
+  for (i = 0; i < npix; i++)
   {
-    int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    *seconds =  hsdata->event.teldata[itel].gps_time.seconds;
-    *nanoseconds =  hsdata->event.teldata[itel].gps_time.nanoseconds;
-    return 0;
+    camset->xpix[i] = lattice[i].x;
+    camset->ypix[i] = lattice[i].y;
+    camset->size[i] = pitch;
+    camset->area[i] = 0.5*sqrt(3.) * pitch*pitch;
+    camset->pixel_shape[i] = 1;
   }
-  return -1;
+  camset->common_pixel_shape = 1;
+  camset->pixels_parallel = 1;
+  free(lattice);
+  return 0;
 }
 
-//---------------------------------------------
-// Returns PixelTiming threshold:
-//  - Minimum base-to-peak raw amplitude difference applied in pixel selection
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+// Synthetic data: pixel pitch [m], focal length [m], photo-electrons to
+// high gain ADC counts, high/low gain ratio, pedestal and noise per sample
+// [ADC counts], sum mode integration window, readout window and pulse
+// width [samples], zero suppression threshold of the pixel timing [p.e.]
+#define SYNTH_PITCH 0.05
+#define SYNTH_FLEN 16.
+#define SYNTH_CONV 5.
+#define SYNTH_GAIN_RATIO 10.
+#define SYNTH_PED 20.
+#define SYNTH_NOISE 1.5
+#define SYNTH_SUM_BINS 16
+#define SYNTH_WINDOW 25
+#define SYNTH_PULSE_SIGMA 1.5
+#define SYNTH_TIMING_THRESHOLD 4.
+
+//-----------------------------------------------------
+// Fill the configuration of telescope itel of a synthetic run,
+// with calibration constants giving p.e. for calib_scale
 //-----------------------------------------------------
-int get_pixel_timing_threshold(int telescope_id,int *result)
+static int synth_telescope(AllHessData* hsdata, int itel, int npix, int ngains, int nsamples,
+                           double zero_sup_pe, double calib_scale)
 {
-  if ( hsdata != NULL && result != NULL)
+  int tel_id = hsdata->run_header.tel_id[itel], igain = 0, ipix = 0, k = 0;
+  int nped = nsamples > 0 ? nsamples : SYNTH_SUM_BINS;
+  CameraSettings* camset = &hsdata->camera_set[itel];
+  CameraOrganisation* camorg = &hsdata->camera_org[itel];
+  PixelSetting* pixset = &hsdata->pixel_set[itel];
+  CameraSoftSet* softset = &hsdata->cam_soft_set[itel];
+  TelMoniData* moni = &hsdata->tel_moni[itel];
+  LasCalData* lascal = &hsdata->tel_lascal[itel];
+
+  camset->tel_id = camorg->tel_id = pixset->tel_id = tel_id;
+  hsdata->pixel_disabled[itel].tel_id = softset->tel_id = tel_id;
+  hsdata->tracking_set[itel].tel_id = hsdata->point_cor[itel].tel_id = tel_id;
+  moni->tel_id = lascal->tel_id = tel_id;
+  if ( synth_camera(camset, npix, SYNTH_PITCH) < 0 ) return -1;
+  camset->flen = SYNTH_FLEN;
+  camset->num_mirrors = 86;
+  camset->mirror_area = 100.;
+
+  camorg->num_pixels = pixset->num_pixels = npix;
+  camorg->num_drawers = pixset->num_drawers = 1;
+  camorg->num_gains = ngains;
+
+  pixset->time_slice = 1.;
+  pixset->sum_bins = SYNTH_SUM_BINS;
+  pixset->nrefshape = ngains;
+  pixset->lrefshape = 60;
+  pixset->ref_step = 0.25;
+  for (igain = 0; igain < ngains; igain++)
+    for (k = 0; k < pixset->lrefshape; k++)
+    {
+      double t = (k - 0.5*pixset->lrefshape) * pixset->ref_step / SYNTH_PULSE_SIGMA;
+      pixset->refshape[igain][k] = exp(-0.5*t*t) / (sqrt(2.*M_PI) * SYNTH_PULSE_SIGMA);
+    }
+
+  if ( zero_sup_pe > 0. )
   {
-  int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelTiming* pt = hsdata->event.teldata[itel].pixtm;
-    if ( pt != NULL ) *result   = pt->threshold;
-    return 0;
+    softset->zero_sup_mode = 1;
+    softset->zero_sup_num_thr = 1;
+    softset->zero_sup_thresholds[0] = (int) (zero_sup_pe * SYNTH_CONV);
   }
-  return -1;
+  hsdata->tracking_set[itel].known = 1;
+  hsdata->tracking_set[itel].sign_az = hsdata->tracking_set[itel].sign_alt = 1.;
+  hsdata->tracking_set[itel].range_high_az = 2.*M_PI;
+  hsdata->tracking_set[itel].range_high_alt = 0.5*M_PI;
+
+  moni->known = moni->new_parts = 0x04; // Pedestals and noise
+  moni->num_pixels = npix;
+  moni->num_drawers = 1;
+  moni->num_gains = ngains;
+  moni->num_ped_slices = nped;
+  lascal->known = 1;
+  lascal->num_pixels = npix;
+  lascal->num_gains = ngains;
+  for (igain = 0; igain < ngains; igain++)
+  {
+    double conv = igain == HI_GAIN ? SYNTH_CONV : SYNTH_CONV / SYNTH_GAIN_RATIO;
+    for (ipix = 0; ipix < npix; ipix++)
+    {
+      moni->pedestal[igain][ipix] = SYNTH_PED * nped;
+      moni->noise[igain][ipix] = SYNTH_NOISE * sqrt((double)nped);
+      lascal->calib[igain][ipix] = 1. / (calib_scale * conv);
+    }
+    lascal->max_int_frac[igain] = lascal->max_pixtm_frac[igain] = 1.;
+  }
+  return 0;
 }
-//---------------------------------------------
-// Returns PixelTiming peak_global:
-//  Camera-wide (mean) peak position [time slices]
-// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
-//----------------------------------------------------
-int get_pixel_timing_peak_global(int telescope_id,float *result)
+
+//-----------------------------------------------------
+// Fill the raw data and the pixel timing of telescope itel with
+// an elliptical image of amplitude [p.e.], centre of gravity at
+// (cog_x, cog_y) [m], length and width [m], on pedestal and noise
+//-----------------------------------------------------
+static void synth_image(AllHessData* hsdata, int itel, uint64_t* state, double amplitude,
+                        double cog_x, double cog_y, double length, double width,
+                        int ngains, int nsamples, double zero_sup_pe)
 {
-  if ( hsdata != NULL && result != NULL)
+  CameraSettings* camset = &hsdata->camera_set[itel];
+  TelEvent* teldata = &hsdata->event.teldata[itel];
+  AdcData* raw = teldata->raw;
+  PixelTiming* pixtm = teldata->pixtm;
+  int npix = camset->num_pixels, nwindow = nsamples > 0 ? nsamples : SYNTH_WINDOW;
+  int ipix = 0, igain = 0, k = 0, ntimed = 0;
+  double r = sqrt(cog_x*cog_x + cog_y*cog_y);
+  double cos_phi = r > 0. ? cog_x / r : 1., sin_phi = r > 0. ? cog_y / r : 0.;
+  double peak_sum = 0.;
+
+  raw->known = 1;
+  raw->num_pixels = npix;
+  raw->num_gains = ngains;
+  raw->num_samples = nsamples;
+  raw->zero_sup_mode = zero_sup_pe > 0. ? 1 : 0;
+  raw->data_red_mode = raw->threshold = raw->list_known = raw->list_size = 0;
+  pixtm->known = 1;
+  pixtm->num_pixels = npix;
+  pixtm->num_gains = ngains;
+  pixtm->list_type = 1;
+  pixtm->threshold = (int) (SYNTH_TIMING_THRESHOLD * SYNTH_CONV);
+  pixtm->before_peak = pixtm->after_peak = -1;
+  pixtm->granularity = 0.25;
+  // Peak position, start at 50% and 20% of the peak, width at 50% and 20%
+  // of the peak and time over the timing threshold
+  pixtm->num_types = 6;
+  pixtm->time_type[0] = PIX_TIME_PEAKPOS_TYPE;
+  pixtm->time_type[1] = pixtm->time_type[2] = PIX_TIME_STARTPOS_REL_TYPE;
+  pixtm->time_type[3] = pixtm->time_type[4] = PIX_TIME_WIDTH_REL_TYPE;
+  pixtm->time_type[5] = PIX_TIME_WIDTH_ABS_TYPE;
+  pixtm->time_level[0] = pixtm->time_level[5] = 0.;
+  pixtm->time_level[1] = pixtm->time_level[3] = 0.5;
+  pixtm->time_level[2] = pixtm->time_level[4] = 0.2;
+
+  for (ipix = 0; ipix < npix; ipix++)
   {
-  int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-    PixelTiming* pt = hsdata->event.teldata[itel].pixtm;
-    if ( pt != NULL )
+    // Along and across the major axis, through the camera centre
+    double dx = camset->xpix[ipix] - cog_x, dy = camset->ypix[ipix] - cog_y;
+    double u = dx*cos_phi + dy*sin_phi, v = -dx*sin_phi + dy*cos_phi;
+    double pe = amplitude * camset->area[ipix] / (2.*M_PI*length*width) *
+      exp(-0.5*(u*u/(length*length) + v*v/(width*width)));
+    double peak = 0.5*nwindow + 20.*u + 0.3*synth_normal(state);
+    pe += sqrt(pe + 1.) * synth_normal(state);
+    if ( pe < 0. ) pe = 0.;
+
+    raw->significant[ipix] = ( zero_sup_pe <= 0. || pe >= zero_sup_pe );
+    for (igain = 0; igain < ngains; igain++)
     {
-     *result =  pt->peak_global;
+      double conv = igain == HI_GAIN ? SYNTH_CONV : SYNTH_CONV / SYNTH_GAIN_RATIO;
+      double sum = 0.;
+      raw->adc_known[igain][ipix] = nsamples > 0 ? 3 : 1;
+      for (k = 0; k < nsamples; k++)
+      {
+        double t = (k + 0.5 - peak) / SYNTH_PULSE_SIGMA;
+        double value = SYNTH_PED + SYNTH_NOISE*synth_normal(state) +
+          pe * conv * exp(-0.5*t*t) / (sqrt(2.*M_PI) * SYNTH_PULSE_SIGMA);
+        uint16_t sample = value < 0. ? 0 : (value > 4095. ? 4095 : (uint16_t) (value + 0.5));
+        raw->adc_sample[igain][ipix][k] = sample;
+        sum += sample;
+      }
+      if ( nsamples == 0 )
+      {
+        sum = SYNTH_PED*SYNTH_SUM_BINS + pe*conv +
+          SYNTH_NOISE*sqrt((double)SYNTH_SUM_BINS)*synth_normal(state);
+        sum = sum < 0. ? 0. : (sum > 65535. ? 65535. : floor(sum + 0.5));
+      }
+      raw->adc_sum[igain][ipix] = (uint32_t) sum;
+    }
+
+    for (k = 0; k < pixtm->num_types; k++) pixtm->timval[ipix][k] = -1.;
+    if ( pe >= SYNTH_TIMING_THRESHOLD )
+    {
+      double level = pe * SYNTH_CONV / (sqrt(2.*M_PI) * SYNTH_PULSE_SIGMA);
+      double half = SYNTH_PULSE_SIGMA * sqrt(-2.*log(0.5));
+      double fifth = SYNTH_PULSE_SIGMA * sqrt(-2.*log(0.2));
+      pixtm->pixel_list[ntimed++] = ipix;
+      pixtm->timval[ipix][0] = peak;
+      pixtm->timval[ipix][1] = peak - half;
+      pixtm->timval[ipix][2] = peak - fifth;
+      pixtm->timval[ipix][3] = 2.*half;
+      pixtm->timval[ipix][4] = 2.*fifth;
+      pixtm->timval[ipix][5] = level > pixtm->threshold ?
+        2.*SYNTH_PULSE_SIGMA * sqrt(2.*log(level / pixtm->threshold)) : 0.;
+      peak_sum += peak;
     }
-    return 0;
   }
-  return -1;
+  pixtm->list_size = ntimed;
+  pixtm->peak_global = ntimed > 0 ? peak_sum / ntimed : 0.5*nwindow;
+  teldata->readout_mode = nsamples == 0 ? 0 : (zero_sup_pe > 0. ? 2 : 1);
 }
-//--------------------------------------------------
-// fill hsdata global variable by decoding data file
-//--------------------------------------------------
- int fill_hsdata(int* event_id)//,int *header_readed)
- {
-  
-  int itel;
-  int rc = 0;
-  int ignore = 0;
 
-  int tel_id;
+//-----------------------------------------------------
+// Write a synthetic run to filename (compressed according to its
+// extension, see fileopen): ntel telescopes on a 100 m grid, each with
+// a camera of npix hexagonal pixels, ngains gains and nsamples samples
+// (sums only if 0), then nevents gamma-ray showers from the pointing
+// direction, with elliptical images in the telescopes closer than
+// 300 m to the core (at least the closest one). Pixels below
+// zero_sup_pe photo-electrons are not written if zero_sup_pe > 0.
+// Images calibrated with calib_scale are in photo-electrons.
+// The same seed gives the same events.
+// Returns the number of events written or -1
+//-----------------------------------------------------
+int write_synthetic_run(const char* filename, int run, int nevents, int ntel, int npix,
+                        int ngains, int nsamples, double zero_sup_pe, double calib_scale,
+                        unsigned long seed)
+{
+  AllHessData* hsdata = NULL;
+  IO_BUFFER* output = NULL;
+  uint64_t state = (uint64_t) seed * 0x9E3779B97F4A7C15ULL + 0x2545F4914F6CDD1DULL;
+  int ngrid = 0, itel = 0, ievt = 0, rc = 0;
+  double pointing[2] = { 0., 70.*M_PI/180. };
 
-  /* Find and read the next block of data. */
-  /* In case of problems with the data, just give up. */
-  if ( find_io_block(iobuf,&item_header) != 0 )
-   {
+  if ( ntel < 1 || ntel > H_MAX_TEL || npix < 1 || npix > H_MAX_PIX ||
+       ngains < 1 || ngains > H_MAX_GAINS || nsamples < 0 || nsamples > H_MAX_SLICES ||
+       nevents < 0 || calib_scale <= 0. )
     return -1;
-   }
-  if ( read_io_block(iobuf,&item_header) != 0 )
+  if ( (hsdata = (AllHessData *) calloc(1,sizeof(AllHessData))) == NULL ) return -1;
+  if ( (output = open_output_file(filename)) == NULL )
   {
+    free(hsdata);
     return -1;
   }
 
- // if ( ( !header_readed) && 
-  if ( hsdata == NULL &&
-    item_header.type > IO_TYPE_HESS_RUNHEADER &&
-    item_header.type < IO_TYPE_HESS_RUNHEADER + 200)
-    {
-     fprintf(stderr,"Trying to read event data before run header.\n");
-     fprintf(stderr,"Skipping this data block.\n");
-     return -1;
+  RunHeader* rh = &hsdata->run_header;
+  rh->run = run;
+  rh->time = 1500000000L;
+  rh->run_type = -1; // Simulated
+  rh->direction[0] = pointing[0];
+  rh->direction[1] = pointing[1];
+  rh->ntel = ntel;
+  rh->min_tel_trig = 1;
+  rh->target = rh->observer = "synthetic";
+  for (ngrid = 1; ngrid*ngrid < ntel; ngrid++);
+  for (itel = 0; itel < ntel; itel++)
+  {
+    rh->tel_id[itel] = itel + 1;
+    rh->tel_pos[itel][0] = 100. * (itel % ngrid - 0.5*(ngrid-1));
+    rh->tel_pos[itel][1] = 100. * (itel / ngrid - 0.5*(ngrid-1));
+  }
+  MCRunHeader* mcrh = &hsdata->mc_run_header;
+  mcrh->shower_prog_id = mcrh->detector_prog_id = 1;
+  mcrh->obsheight = 1800.;
+  mcrh->num_showers = nevents;
+  mcrh->num_use = 1;
+  mcrh->core_pos_mode = 1;
+  mcrh->core_range[1] = 50.*ngrid + 200.;
+  mcrh->az_range[0] = mcrh->az_range[1] = pointing[0];
+  mcrh->alt_range[0] = mcrh->alt_range[1] = pointing[1];
+  mcrh->E_range[0] = 0.03;
+  mcrh->E_range[1] = 100.;
+  mcrh->spectral_index = -2.;
+  mcrh->injection_height = 100000.;
+
+  rc = write_hess_runheader(output, rh);
+  tel_idx_owner = 0; // write_hess_runheader() filled the telescope index lookup
+  if ( rc == 0 ) rc = write_hess_mcrunheader(output, mcrh);
+  for (itel = 0; itel < ntel && rc == 0; itel++)
+  {
+    if ( (rc = synth_telescope(hsdata, itel, npix, ngains, nsamples, zero_sup_pe, calib_scale)) < 0 ) break;
+    if ( (rc = write_hess_camsettings(output, &hsdata->camera_set[itel])) == 0 &&
+         (rc = write_hess_camorgan(output, &hsdata->camera_org[itel])) == 0 &&
+         (rc = write_hess_pixelset(output, &hsdata->pixel_set[itel])) == 0 &&
+         (rc = write_hess_pixeldis(output, &hsdata->pixel_disabled[itel])) == 0 &&
+         (rc = write_hess_camsoftset(output, &hsdata->cam_soft_set[itel])) == 0 &&
+         (rc = write_hess_pointingcor(output, &hsdata->point_cor[itel])) == 0 )
+      rc = write_hess_trackset(output, &hsdata->tracking_set[itel]);
+  }
+  for (itel = 0; itel < ntel && rc == 0; itel++)
+    if ( (rc = write_hess_tel_monitor(output, &hsdata->tel_moni[itel], 0x04)) == 0 )
+      rc = write_hess_laser_calib(output, &hsdata->tel_lascal[itel]);
 
+  FullEvent* event = &hsdata->event;
+  event->num_tel = ntel;
+  for (itel = 0; itel < ntel && rc == 0; itel++)
+  {
+    event->teldata[itel].tel_id = event->trackdata[itel].tel_id = rh->tel_id[itel];
+    event->teldata[itel].raw = (AdcData *) map_buffer(sizeof(AdcData));
+    event->teldata[itel].pixtm = (PixelTiming *) map_buffer(sizeof(PixelTiming));
+    if ( event->teldata[itel].raw == NULL || event->teldata[itel].pixtm == NULL )
+      rc = -1;
+    else
+    {
+      event->teldata[itel].raw->tel_id = event->teldata[itel].pixtm->tel_id = rh->tel_id[itel];
+      // Raw angles only, like sim_telarray
+      event->trackdata[itel].azimuth_raw = pointing[0];
+      event->trackdata[itel].altitude_raw = pointing[1];
+      event->trackdata[itel].raw_known = 1;
     }
-    
+  }
 
+  for (ievt = 0; ievt < nevents && rc == 0; ievt++)
+  {
+    MCShower* shower = &hsdata->mc_shower;
+    MCEvent* mc_event = &hsdata->mc_event;
+    CentralEvent* central = &event->central;
+    int event_id = 100*(ievt+1), closest = 0;
+    double closest_distance = 1e30;
 
-  switch ( (int) item_header.type )
-    {
-     /* =================================================== */
-    case IO_TYPE_HESS_RUNHEADER:
+    // Energies of a E^-2 spectrum, cores uniform over a disk
+    shower->shower_num = mc_event->shower_num = ievt + 1;
+    shower->primary_id = 0;
+    shower->energy = mcrh->E_range[0] *
+      pow(mcrh->E_range[1]/mcrh->E_range[0], synth_uniform(&state));
+    shower->azimuth = pointing[0];
+    shower->altitude = pointing[1];
+    shower->xmax = 300. + 80.*log10(shower->energy/0.03);
+    shower->h_first_int = 25000. + 2000.*synth_normal(&state);
+    mc_event->event = event_id;
+    double core_r = mcrh->core_range[1] * sqrt(synth_uniform(&state));
+    double core_phi = 2.*M_PI * synth_uniform(&state);
+    mc_event->xcore = core_r * cos(core_phi);
+    mc_event->ycore = core_r * sin(core_phi);
+    if ( (rc = write_hess_mc_shower(output, shower)) != 0 ||
+         (rc = write_hess_mc_event(output, mc_event)) != 0 )
+      break;
 
-    /* Structures might be allocated from previous run */
-    if ( hsdata != NULL )
+    for (itel = 0; itel < ntel; itel++)
     {
-     /* Free memory allocated inside ... */
-     for (itel=0; itel<hsdata->run_header.ntel; itel++)
-     {
-     if ( hsdata->event.teldata[itel].raw != NULL )
-     {
-      free(hsdata->event.teldata[itel].raw);
-    hsdata->event.teldata[itel].raw = NULL;
-     }
-     if ( hsdata->event.teldata[itel].pixtm != NULL )
-     {
-    free(hsdata->event.teldata[itel].pixtm);
-    hsdata->event.teldata[itel].pixtm = NULL;
-     }
-     if ( hsdata->event.teldata[itel].img != NULL )
-     {
-    free(hsdata->event.teldata[itel].img);
-    hsdata->event.teldata[itel].img = NULL;
-     }
-     if ( hsdata->event.teldata[itel].pixcal != NULL )
-     {
-    free(hsdata->event.teldata[itel].pixcal);
-    hsdata->event.teldata[itel].pixcal = NULL;
-     }
-     }
-     /* Free main structure */
-     free(hsdata);
-     hsdata = NULL;
+      double dx = rh->tel_pos[itel][0] - mc_event->xcore, dy = rh->tel_pos[itel][1] - mc_event->ycore;
+      if ( dx*dx + dy*dy < closest_distance )
+      {
+        closest_distance = dx*dx + dy*dy;
+        closest = itel;
+      }
     }
+    central->glob_count = event_id;
+    central->cpu_time.seconds = central->gps_time.seconds = rh->time + ievt;
+    central->num_teltrg = central->num_teldata = 0;
+    for (itel = 0; itel < ntel; itel++)
+    {
+      TelEvent* teldata = &event->teldata[itel];
+      double dx = rh->tel_pos[itel][0] - mc_event->xcore, dy = rh->tel_pos[itel][1] - mc_event->ycore;
+      double distance = sqrt(dx*dx + dy*dy);
+      teldata->known = ( distance < 300. || itel == closest );
+      if ( !teldata->known ) continue;
+      // Images of showers from the camera centre point away from
+      // it, their distance growing with the impact distance
+      double cog = SYNTH_FLEN * distance / 8000.;
+      double amplitude = 2000. * shower->energy * exp(-distance/150.) + 30.;
+      synth_image(hsdata, itel, &state, amplitude,
+                  distance > 0. ? cog*dx/distance : 0., distance > 0. ? cog*dy/distance : 0.,
+                  SYNTH_FLEN * (0.003 + 0.15*distance/8000.), SYNTH_FLEN * 0.002,
+                  ngains, nsamples, zero_sup_pe);
+      teldata->loc_count = teldata->glob_count = event_id;
+      teldata->cpu_time = teldata->gps_time = central->cpu_time;
+      teldata->trg_source = 1;
+      central->teltrg_list[central->num_teltrg] = central->teldata_list[central->num_teldata] = teldata->tel_id;
+      central->teltrg_time[central->num_teltrg] = 0.;
+      central->teltrg_type_mask[central->num_teltrg] = 1;
+      central->num_teltrg++;
+      central->num_teldata++;
+    }
+    if ( ntel == 1 ) event->teldata[0].loc_count = event_id;
+    rc = write_hess_event(output, event, RAWDATA_FLAG|RAWSUM_FLAG|TIME_FLAG|TRACKDATA_FLAG);
+  }
+  if ( rc == 0 )
+  {
+    RunStat* stat = &hsdata->run_stat;
+    MCRunStat* mc_stat = &hsdata->mc_run_stat;
+    stat->run_num = mc_stat->run_num = run;
+    stat->num_tel = ntel;
+    for (itel = 0; itel < ntel; itel++) stat->tel_ids[itel] = rh->tel_id[itel];
+    stat->num_central_trig = mc_stat->num_showers = mc_stat->num_events = nevents;
+    if ( (rc = write_hess_run_stat(output, stat)) == 0 )
+      rc = write_hess_mc_run_stat(output, mc_stat);
+  }
 
+  for (itel = 0; itel < ntel; itel++)
+  {
+    free_buffer(event->teldata[itel].raw, sizeof(AdcData), 1);
+    free_buffer(event->teldata[itel].pixtm, sizeof(PixelTiming), 1);
+  }
+  free(hsdata);
+  if ( close_output_file(output) != 0 ) rc = -1;
+  return rc == 0 ? nevents : -1;
+}
 
-     hsdata = (AllHessData *) calloc(1,sizeof(AllHessData));
-     if ( (rc = read_hess_runheader(iobuf,&(hsdata)->run_header)) < 0 )
-     {
-     Warning("Reading run header failed.");
-     exit(1);
-     }
-     fprintf(stderr,"\nStarting run %d\n",(hsdata)->run_header.run);
-     for (itel=0; itel<=(hsdata)->run_header.ntel; itel++)
-     {
-
-     tel_id = (hsdata)->run_header.tel_id[itel];
-     (hsdata)->camera_set[itel].tel_id = tel_id;
-     (hsdata)->camera_org[itel].tel_id = tel_id;
-     (hsdata)->pixel_set[itel].tel_id = tel_id;
-     (hsdata)->pixel_disabled[itel].tel_id = tel_id;
-     (hsdata)->cam_soft_set[itel].tel_id = tel_id;
-     (hsdata)->tracking_set[itel].tel_id = tel_id;
-     (hsdata)->point_cor[itel].tel_id = tel_id;
-     (hsdata)->event.num_tel = (hsdata)->run_header.ntel;
-     (hsdata)->event.teldata[itel].tel_id = tel_id;
-     (hsdata)->event.trackdata[itel].tel_id = tel_id;
-     if ( ((hsdata)->event.teldata[itel].raw = 
-      (AdcData *) calloc(1,sizeof(AdcData))) == NULL )
-     {
-    Warning("Not enough memory");
-    exit(1);
-     }
-     (hsdata)->event.teldata[itel].raw->tel_id = tel_id;
-     if ( ((hsdata)->event.teldata[itel].pixtm =
-      (PixelTiming *) calloc(1,sizeof(PixelTiming))) == NULL )
-     {
-    Warning("Not enough memory");
-    exit(1);
-     }
-     (hsdata)->event.teldata[itel].pixtm->tel_id = tel_id;
-     if ( ((hsdata)->event.teldata[itel].img = 
-      (ImgData *) calloc(2,sizeof(ImgData))) == NULL )
-     {
-    Warning("Not enough memory");
-    exit(1);
-     }
-     (hsdata)->event.teldata[itel].max_image_sets = 2;
-     (hsdata)->event.teldata[itel].img[0].tel_id = tel_id;
-     (hsdata)->event.teldata[itel].img[1].tel_id = tel_id;
-     (hsdata)->tel_moni[itel].tel_id = tel_id;
-     (hsdata)->tel_lascal[itel].tel_id = tel_id;
-     }
-  
-
-     break;
-    // end case IO_TYPE_HESS_RUNHEADER:
-     /* =================================================== */
-    case IO_TYPE_HESS_MCRUNHEADER:
-     
-     rc = read_hess_mcrunheader(iobuf,&(hsdata)->mc_run_header);
-     break;
-     /* =================================================== */
-    case IO_TYPE_MC_INPUTCFG:
-     {
-     }
-     break;
-     /* =================================================== */
-    case 70: /* How sim_hessarray was run and how it was configured. */
-     break;
 
-     /* =================================================== */
-    case IO_TYPE_HESS_CAMSETTINGS:
 
-     tel_id = item_header.ident; // Telescope ID is in the header
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Camera settings for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_camsettings(iobuf,&(hsdata)->camera_set[itel]);
+//------------------------------------------
+//  return run number from last readed event
+//------------------------------------------
+int get_run_number(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+    return file->hsdata->run_header.run;
+  }
+  return -1;
+}
 
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_CAMORGAN:
+//------------------------------------
+// Returns number of telescopes in run.
+//------------------------------------
+int get_num_telescope(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+    return file->hsdata->event.num_tel;
+  }
+  return -1;
+}
 
-     tel_id = item_header.ident; // Telescope ID is in the header
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Camera organisation for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_camorgan(iobuf,&(hsdata)->camera_org[itel]);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_PIXELSET:
-     tel_id = item_header.ident; // Telescope ID is in the header
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Pixel settings for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_pixelset(iobuf,&(hsdata)->pixel_set[itel]);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_PIXELDISABLE:
-     tel_id = item_header.ident; // Telescope ID is in the header
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Pixel disable block for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_pixeldis(iobuf,&(hsdata)->pixel_disabled[itel]);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_CAMSOFTSET:
-     tel_id = item_header.ident; // Telescope ID is in the header
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Camera software settings for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_camsoftset(iobuf,&(hsdata)->cam_soft_set[itel]);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_POINTINGCOR:
-     tel_id = item_header.ident; // Telescope ID is in the header
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Pointing correction for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_pointingcor(iobuf,&(hsdata)->point_cor[itel]);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_TRACKSET:
-     tel_id = item_header.ident; // Telescope ID is in the header
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Tracking settings for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_trackset(iobuf,&(hsdata)->tracking_set[itel]);
-     break;
-     /* =================================================== */
-     /* =============   IO_TYPE_HESS_EVENT  =============== */
-     /* =================================================== */
-    case IO_TYPE_HESS_EVENT:
-     rc = read_hess_event(iobuf,&(hsdata)->event,-1);
-     *event_id = item_header.ident;
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_CALIBEVENT:
-     {
-     printf("RDLR: CALIBEVENT!\n");
-     }
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_MC_SHOWER:
-     rc = read_hess_mc_shower(iobuf,&(hsdata)->mc_shower);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_MC_EVENT:
-     rc = read_hess_mc_event(iobuf,&(hsdata)->mc_event);
+//------------------------------------------------------------
+// Returns number of telescopes for which we actually have data
+//------------------------------------------------------------
+int get_num_teldata(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+    return file->hsdata->event.num_teldata;
+  }
+  return -1;
+}
+//-------------------------------------------
+// Set list of IDs of telescopes with data
+//-------------------------------------------
+int get_telescope_with_data_list(HessioFile* file, int* list)
+{
+  if ( file->hsdata != NULL)
+  {
+    int num_teldata = get_num_teldata(file);
+    int loop = 0;
+    for ( loop = 0; loop < num_teldata ; loop++)
+    {
+     *list++ =file->hsdata->event.teldata_list[loop];
+    }
+    return 0;
+  }
+  return -1;
+}
 
-     break;
-     /* =================================================== */
-    case IO_TYPE_MC_TELARRAY:
-     if ( hsdata && (hsdata)->run_header.ntel > 0 )
-     {
-     rc = read_hess_mc_phot(iobuf,&(hsdata)->mc_event);
-     } 
-     break;
-     /* =================================================== */
-     /* With extended output option activated, the particles
-   arriving at ground level would be stored as seemingly
-   stray photon bunch block. */
-    case IO_TYPE_MC_PHOTONS:
-     break;
-     /* =================================================== */
-    case IO_TYPE_MC_RUNH:
-    case IO_TYPE_MC_EVTH:
-    case IO_TYPE_MC_EVTE:
-    case IO_TYPE_MC_RUNE:
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_MC_PE_SUM:
-     rc = read_hess_mc_pe_sum(iobuf,&(hsdata)->mc_event.mc_pesum);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_TEL_MONI:
-     // Telescope ID among others in the header
-     tel_id = (item_header.ident & 0xff) | 
-     ((item_header.ident & 0x3f000000) >> 16); 
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Telescope monitor block for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_tel_monitor(iobuf,&(hsdata)->tel_moni[itel]);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_LASCAL:
-     tel_id = item_header.ident; // Telescope ID is in the header
-     if ( (itel = find_tel_idx(tel_id)) < 0 )
-     {
-     char msg[256];
-     snprintf(msg,sizeof(msg)-1,
-     "Laser/LED calibration for unknown telescope %d.", tel_id);
-     Warning(msg);
-     exit(1);
-     }
-     rc = read_hess_laser_calib(iobuf,&hsdata->tel_lascal[itel]);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_RUNSTAT:
-     rc = read_hess_run_stat(iobuf,&hsdata->run_stat);
-     break;
-     /* =================================================== */
-    case IO_TYPE_HESS_MC_RUNSTAT:
-     rc = read_hess_mc_run_stat(iobuf,&hsdata->mc_run_stat);
-     break;
-     /* (End-of-job or DST) histograms */
-    case 100:
-     {
-     }
-     break;
-    default:
-     if ( !ignore )
-     fprintf(stderr,"WARNING: Ignoring unknown data block type %ld\n",item_header.type);
-    } // end switch item_header.type
 
-  /* What did we actually get? */
-  return (int) item_header.type;
+//-------------------------------------------
+// Get number of triggered telescope.
+//-------------------------------------------
+int get_num_tel_trig(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+     return file->hsdata->event.central.num_teltrg;
+  }
+  else return -1;
+}
+
+//-------------------------------------------
+// Set List of IDs of triggered telescopes.
+//-------------------------------------------
+int get_central_event_teltrg_list(HessioFile* file, int* tel_list)
+{
+  if ( file->hsdata != NULL)
+  {
+    int num_teltrig = get_num_tel_trig(file);  
+    int loop = 0;
+    for ( loop = 0; loop < num_teltrig ; loop++)
+    {
+     *tel_list++ =file->hsdata->event.central.teltrg_list[loop];
+    }
+    return 0;
+  }
+  return -1;
+}
+
+//-------------------------------------------
+// Returns  Global event count
+//-------------------------------------------
+int get_global_event_count(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+     return file->hsdata->event.central.glob_count;
+  }
+  return -1;
+}
+
+//-------------------------------------------
+// Set seconds and nanosecond parameter with 
+// the central trigger time
+//-------------------------------------------
+int get_central_event_gps_time(HessioFile* file, long* seconds, long* nanoseconds)
+{
+  if ( file->hsdata != NULL)
+  {
+     if (seconds != NULL ) *seconds = file->hsdata->event.central.gps_time.seconds;
+     if (nanoseconds != NULL ) *nanoseconds = file->hsdata->event.central.gps_time.nanoseconds;
+     return 0;
+  }
+  return -1;
 }
 
 //----------------------------------------------------------------
-// Returns total number of mirror tiles.
+// Returns the number of different gains per pixel for a telscope id
 // Returns TEL_INDEX_NOT_VALID if telescope index is not valid
 //----------------------------------------------------------------
-int get_mirror_number(int telescope_id)
+int get_num_channel(HessioFile* file, int telescope_id)
 {
-  if ( hsdata != NULL )
+
+  if ( file->hsdata != NULL)
   {
-  int itel = get_telescope_index(telescope_id);
-    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-   return hsdata->camera_set[itel].num_mirrors;
+  int itel = get_telescope_index(file, telescope_id);
+  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    AdcData* raw = file->hsdata->event.teldata[itel].raw;
+    if ( raw != NULL && raw->known  )
+    {
+     return raw->num_gains;
+    }
   }
-  return -1.;
+  return -1;
 }
 
 //----------------------------------------------------------------
-// Returns focal length of optics [m].
+// Returns Width of readout time slice (i.e. one sample) [ns].
 // Returns TEL_INDEX_NOT_VALID if telescope index is not valid
 //----------------------------------------------------------------
+double get_time_slice(HessioFile* file, int telescope_id)
+{
+  if ( file->hsdata != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    const PixelSetting* setting = &file->hsdata->pixel_set[itel];
+    return setting->time_slice;
+  }
+  return 0.;
+}
 
-double get_optical_foclen(int telescope_id)
+//----------------------------------------------------------------
+// Fill ref_shapes array with lrefshape values from
+// PixelSetting.refshape[channel]
+// Returns -1 if channel or fshape are not valid
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_ref_shapes(HessioFile* file, int telescope_id,int channel, double* ref_shapes )
 {
-  if ( hsdata != NULL )
+  if ( file->hsdata != NULL && channel < H_MAX_GAINS && ref_shapes != NULL) 
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    const PixelSetting* setting = &file->hsdata->pixel_set[itel];
+    size_t i = 0;
+    for (; i <= setting->lrefshape ; ++i)
     {
-      int itel = get_telescope_index(telescope_id);
-      if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
-      return hsdata->camera_set[itel].flen;
+        ref_shapes[i] = setting->refshape[channel][i];
     }
-  return -1.;
+    return 0;
+  }
+  return -1;
 }
 
-//-----------------------------------
-// Returns IDs of used telescope in the run
-//-----------------------------------
 
-int get_telescope_ids(int* list)
+//----------------------------------------------------------------
+// Returns  Reference pulse shape(s)
+// refshape[H_MAX_GAINS][H_MAX_FSHAPE];
+// If   channel or fshape are not valid return 0.
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+double get_ref_shape(HessioFile* file, int telescope_id,int channel, int fshape )
 {
-  if ( hsdata != NULL)
-    {
-      int num_tel = get_num_telescope();
-      int loop=0;
-      for (loop=0; loop < num_tel; loop++)
-	{
-	  *list++ =hsdata->run_header.tel_id[loop];
-    }
-      return 0;
-    }
+  if ( file->hsdata != NULL && channel < H_MAX_GAINS && fshape < H_MAX_FSHAPE) 
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    const PixelSetting* setting = &file->hsdata->pixel_set[itel];
+    return setting->refshape[channel][fshape];
+  }
+  return 0.;
+}
+
+//----------------------------------------------------------------
+// Returns Number of following reference pulse shapes (num_gains or 0)
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+// Returns -1 if data is not accessible
+//----------------------------------------------------------------
+int get_nrefshape(HessioFile* file, int telescope_id)
+{
+  if ( file->hsdata != NULL ) 
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    const PixelSetting* setting = &file->hsdata->pixel_set[itel];
+    return setting->nrefshape;
+  }
+  return -1;
+}
+
+
+//----------------------------------------------------------------
+// Returns Length of following reference pulse shape(s).
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+// Returns -1 if data is not accessible
+//----------------------------------------------------------------
+//----------------------------------------------------------------
+int get_lrefshape(HessioFile* file, int telescope_id)
+{
+  if ( file->hsdata != NULL ) 
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    const PixelSetting* setting = &file->hsdata->pixel_set[itel];
+    return setting->lrefshape;
+  }
   return -1;
 }
+
+
+//----------------------------------------------------------------
+// Returns  Time step between refshape entries [ns]
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+double get_ref_step(HessioFile* file, int telescope_id )
+{
+  if ( file->hsdata != NULL ) 
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    const PixelSetting* setting = &file->hsdata->pixel_set[itel];
+    return setting->ref_step;
+  }
+  return -0.;
+}
+//----------------------------------------------------------------
+// Returns individual channel recorded information ? 
+// Bit 0: sum, 1: samples, 2: ADC was in saturation.
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+uint8_t get_adc_known(HessioFile* file, int telescope_id,int channel , int pixel_id)
+{
+
+  if ( file->hsdata != NULL && channel < H_MAX_GAINS && pixel_id < H_MAX_PIX)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    AdcData* raw = file->hsdata->event.teldata[itel].raw;
+    if ( raw != NULL && raw->known  )
+    {
+     return raw->adc_known[channel][pixel_id];
+    }
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Returns shower altitude [rad]
+//----------------------------------------------------------------
+double get_mc_shower_altitude(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+     return file->hsdata->mc_shower.altitude;
+  }
+  return -0.;
+}
+//----------------------------------------------------------------
+// Returns shower azimuth (N->E) [rad]
+//----------------------------------------------------------------
+double get_mc_shower_azimuth(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+     return file->hsdata->mc_shower.azimuth;
+  }
+  return -0.;
+}
+//----------------------------------------------------------------
+// Returns shower primary energy [TeV]
+//----------------------------------------------------------------
+double get_mc_shower_energy(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+     return file->hsdata->mc_shower.energy;
+  }
+  return -0.;
+}
+//----------------------------------------------------------------
+// Returns  x core position w.r.t. array reference point [m],
+//  x -> N
+//----------------------------------------------------------------
+double get_mc_event_xcore(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+     return file->hsdata->mc_event.xcore;
+  }
+  return -0.;
+}
+//----------------------------------------------------------------
+// Returns  y core position w.r.t. array reference point [m],
+//  y -> W
+//----------------------------------------------------------------
+double get_mc_event_ycore(HessioFile* file)
+{
+  if ( file->hsdata != NULL)
+  {
+     return file->hsdata->mc_event.ycore;
+  }
+  return -0.;
+}
+//-------------------------------------------
+// Returns  PixelTiming.timval[H_MAX_PIX][H_MAX_PIX_TIMES]
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//-------------------------------------------
+int get_pixel_timing_timval(HessioFile* file, int telescope_id,float *data)
+{
+  if ( file->hsdata != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    PixelTiming* pt = file->hsdata->event.teldata[itel].pixtm;
+  if ( pt != NULL )
+  {
+  //  float timval[H_MAX_PIX][H_MAX_PIX_TIMES]
+    int ipix= 0;
+    for (ipix = 0; ipix < pt->num_pixels; ipix++)
+    {
+      int itimes = 0;
+      for (itimes = 0; itimes < pt->num_types && itimes<H_MAX_PIX_TIMES   ; itimes++)
+      {
+      *data++ = pt->timval[ipix][itimes];
+      }
+    } // end for ipix
+  } // end if pt != NULL
+  return 0;
+  } // end if hsdata
+  return -1;
+}
+//----------------------------------------------------------------
+// Returns Pulses sampled
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_adc_sample(HessioFile* file, int telescope_id, int channel, uint16_t *data )
+{
+  if ( file->hsdata != NULL)
+  {
+  int itel = get_telescope_index(file, telescope_id);
+
+  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+   AdcData* raw = file->hsdata->event.teldata[itel].raw;
+    if ( raw != NULL && raw->known  ) // If triggered telescopes
+    {
+     int ipix =0.;
+     for(ipix=0.;ipix<raw->num_pixels;ipix++) //  loop over pixels
+     {
+     if(raw->significant[ipix])
+     {
+    int isamp=0.;
+    for (isamp=0.;isamp<raw->num_samples;isamp++)
+      { *data++ = raw->adc_sample[channel][ipix][isamp]; }
+     } // end if raw->significant[ipix]
+     }  // end of   loop over pixels
+    } // end if triggered telescopes
+    return 0;
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Return adc sum for corresponding telescope and channel (HI_GAIN/LOW_GAIN)
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_adc_sum(HessioFile* file, int telescope_id, int channel, uint32_t *data )
+{
+  if ( file->hsdata != NULL)
+  {
+  int itel = get_telescope_index(file, telescope_id);
+  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+   AdcData* raw = file->hsdata->event.teldata[itel].raw;
+    if ( raw != NULL && raw->known  ) // If triggered telescopes
+    {
+     int ipix =0.;
+     for(ipix=0.;ipix<raw->num_pixels;ipix++) //  loop over pixels
+     {
+     *data++ = raw->adc_sum[channel][ipix];
+     }  // end of   loop over pixels
+     return 0;
+    } // end if triggered telescopes
+  }
+  return -1;
+}
+//----------------------------------------------------------------
+// Copy the pixels of raw recorded in channel: significant and
+// adc_known. Each of pixel_ids, sums and samples may be NULL,
+// samples are written with max_samples values per pixel.
+// Returns the number of recorded pixels
+//----------------------------------------------------------------
+static int copy_significant(const AdcData* raw, int channel, int max_samples,
+                            int* pixel_ids, uint32_t* sums, uint16_t* samples)
+{
+  int ipix = 0, count = 0;
+  int nsamples = raw->num_samples < max_samples ? raw->num_samples : max_samples;
+  for (ipix = 0; ipix < raw->num_pixels; ipix++)
+  {
+    if ( !raw->significant[ipix] || !raw->adc_known[channel][ipix] ) continue;
+    if ( pixel_ids != NULL ) pixel_ids[count] = ipix;
+    if ( sums != NULL ) sums[count] = raw->adc_sum[channel][ipix];
+    if ( samples != NULL )
+      memcpy(samples + (size_t)count*max_samples, raw->adc_sample[channel][ipix],
+             nsamples*sizeof(uint16_t));
+    count++;
+  }
+  return count;
+}
+
+//----------------------------------------------------------------
+// Returns the recorded AdcData of a telescope, NULL if the
+// telescope has no data in this event. Sets *itel, which is
+// TEL_INDEX_NOT_VALID for an unknown telescope.
+// AdcData.known is only reset when a telescope is read again, hence
+// the check against teldata_list for telescopes of previous events
+//----------------------------------------------------------------
+static AdcData* get_known_adc(HessioFile* file, int telescope_id, int channel, int* itel)
+{
+  AdcData* raw = NULL;
+  int loop = 0;
+  *itel = get_telescope_index(file, telescope_id);
+  if ( *itel == TEL_INDEX_NOT_VALID || channel < 0 || channel >= H_MAX_GAINS ) return NULL;
+  for (loop = 0; loop < file->hsdata->event.num_teldata; loop++)
+    if ( file->hsdata->event.teldata_list[loop] == telescope_id ) break;
+  if ( loop == file->hsdata->event.num_teldata ) return NULL;
+  raw = file->hsdata->event.teldata[*itel].raw;
+  if ( raw != NULL && raw->known && channel < raw->num_gains ) return raw;
+  return NULL;
+}
+
+//----------------------------------------------------------------
+// Returns the number of pixels recorded for telescope and channel
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_num_significant(HessioFile* file, int telescope_id, int channel)
+{
+  if ( file->hsdata != NULL)
+  {
+    int itel = 0;
+    AdcData* raw = get_known_adc(file, telescope_id, channel, &itel);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    if ( raw != NULL ) return copy_significant(raw, channel, 0, NULL, NULL, NULL);
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Fill pixel_ids with the pixels recorded for telescope and channel,
+// sums if what & RAWSUM_FLAG and samples (num_samples values per pixel)
+// if what & RAWDATA_FLAG, sized from get_num_significant.
+// Returns the number of pixels
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_significant_adc(HessioFile* file, int telescope_id, int channel, int what,
+                        int* pixel_ids, uint32_t* sums, uint16_t* samples)
+{
+  if ( file->hsdata != NULL)
+  {
+    int itel = 0;
+    AdcData* raw = get_known_adc(file, telescope_id, channel, &itel);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    if ( raw != NULL )
+      return copy_significant(raw, channel, raw->num_samples, pixel_ids,
+                              (what & RAWSUM_FLAG) ? sums : NULL,
+                              (what & RAWDATA_FLAG) ? samples : NULL);
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Fill indptr[ntel+1] with the CSR row offsets of the pixels recorded
+// for channel by the ntel telescopes tel_ids: the pixels of tel_ids[i]
+// are indptr[i] to indptr[i+1]. Telescopes without data have no pixel.
+// Returns the largest number of samples of these telescopes
+// Returns TEL_INDEX_NOT_VALID if a telescope index is not valid
+//----------------------------------------------------------------
+int get_significant_layout(HessioFile* file, int channel, int ntel, const int* tel_ids,
+                           long long* indptr)
+{
+  if ( file->hsdata != NULL && indptr != NULL )
+  {
+    int loop = 0, max_samples = 0;
+    indptr[0] = 0;
+    for (loop = 0; loop < ntel; loop++)
+    {
+      int itel = 0;
+      AdcData* raw = get_known_adc(file, tel_ids[loop], channel, &itel);
+      if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+      indptr[loop+1] = indptr[loop];
+      if ( raw == NULL ) continue;
+      indptr[loop+1] += copy_significant(raw, channel, 0, NULL, NULL, NULL);
+      if ( raw->num_samples > max_samples ) max_samples = raw->num_samples;
+    }
+    return max_samples;
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Fill the CSR arrays dimensioned with get_significant_layout:
+// pixel_ids[nnz], sums[nnz] if what & RAWSUM_FLAG and
+// samples[nnz][max_samples] if what & RAWDATA_FLAG, where
+// nnz = indptr[ntel]. Samples of telescopes with fewer samples
+// are left untouched.
+// Returns TEL_INDEX_NOT_VALID if a telescope index is not valid
+//----------------------------------------------------------------
+int get_significant_event(HessioFile* file, int channel, int what, int ntel, const int* tel_ids,
+                          const long long* indptr, int max_samples,
+                          int* pixel_ids, uint32_t* sums, uint16_t* samples)
+{
+  if ( file->hsdata != NULL && indptr != NULL && pixel_ids != NULL )
+  {
+    int loop = 0;
+    for (loop = 0; loop < ntel; loop++)
+    {
+      int itel = 0;
+      long long start = indptr[loop];
+      AdcData* raw = get_known_adc(file, tel_ids[loop], channel, &itel);
+      if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+      if ( raw == NULL ) continue;
+      if ( copy_significant(raw, channel, 0, NULL, NULL, NULL) != indptr[loop+1] - start )
+        return -1;
+      copy_significant(raw, channel, max_samples, pixel_ids + start,
+                       (what & RAWSUM_FLAG) ? sums + start : NULL,
+                       (what & RAWDATA_FLAG) ? samples + start*max_samples : NULL);
+    }
+    return 0;
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Fill layout with the compiled-in dimensions of AdcData arrays:
+//  layout[0] = H_MAX_GAINS, layout[1] = H_MAX_PIX, layout[2] = H_MAX_SLICES
+//----------------------------------------------------------------
+int get_adc_layout(int* layout)
+{
+  if ( layout != NULL )
+  {
+    layout[0] = H_MAX_GAINS;
+    layout[1] = H_MAX_PIX;
+    layout[2] = H_MAX_SLICES;
+    return 0;
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Set data to the address of AdcData.adc_sample[H_MAX_GAINS][H_MAX_PIX][H_MAX_SLICES]
+// No copy is done: the memory is overwritten by the next event,
+// see get_generation and pin_buffers for views of it
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_adc_sample_buffer(HessioFile* file, int telescope_id, uint16_t** data)
+{
+  if ( file->hsdata != NULL && data != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    AdcData* raw = file->hsdata->event.teldata[itel].raw;
+    if ( raw != NULL && raw->known  ) // If triggered telescopes
+    {
+      *data = &raw->adc_sample[0][0][0];
+      return 0;
+    }
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Set data to the address of AdcData.adc_sum[H_MAX_GAINS][H_MAX_PIX]
+// No copy is done: the memory is overwritten by the next event,
+// see get_generation and pin_buffers for views of it
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_adc_sum_buffer(HessioFile* file, int telescope_id, uint32_t** data)
+{
+  if ( file->hsdata != NULL && data != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    AdcData* raw = file->hsdata->event.teldata[itel].raw;
+    if ( raw != NULL && raw->known  ) // If triggered telescopes
+    {
+      *data = &raw->adc_sum[0][0];
+      return 0;
+    }
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Returns needed informations for calibration process
+//  double pedestal[H_MAX_GAINS][H_MAX_PIX];  ///< Average pedestal on ADC sums
+//  double calib[H_MAX_GAINS][H_MAX_PIX]; /**< ADC to laser/LED p.e. conversion,
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//
+int get_data_for_calibration(HessioFile* file, int telescope_id, double* pedestal, double* calib )
+//----------------------------------------------------------------
+{
+  if ( file->hsdata != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+     const TelMoniData* monitor = &file->hsdata->tel_moni[itel];
+     const LasCalData* calibration = &file->hsdata->tel_lascal[itel];
+     int ipix =0.;
+     int num_pixels = file->hsdata->camera_set[itel].num_pixels;
+     for(ipix=0.;ipix<num_pixels;ipix++) // loop over pixels
+     {
+     int igain=0, num_gain=2; // LOW and HI Gain
+     for(igain=0;igain<num_gain;igain++)
+     {
+       *pedestal++=monitor->pedestal[igain][ipix];
+       *calib++=calibration->calib[igain][ipix];
+     } // end loop gain
+     }  // end of   loop over pixels
+     return 0;
+  }
+  return -1;
+}
+//----------------------------------------------------------------
+// Dimensions of the configuration of a telescope, for get_config:
+// fill layout with num_pixels, nrefshape, lrefshape
+// Returns the configuration version of the telescope, which changes
+// with each run header and each camera settings, pixel settings,
+// monitoring or laser calibration block of the telescope
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+// -1 if hsdata == NULL
+//----------------------------------------------------------------
+long get_config_layout(HessioFile* file, int telescope_id, int* layout)
+{
+  if ( file->hsdata != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    const PixelSetting* setting = &file->hsdata->pixel_set[itel];
+    layout[0] = file->hsdata->camera_set[itel].num_pixels;
+    layout[1] = setting->nrefshape < H_MAX_GAINS ? setting->nrefshape : H_MAX_GAINS;
+    layout[2] = setting->lrefshape < H_MAX_FSHAPE ? setting->lrefshape : H_MAX_FSHAPE;
+    return file->config_version[itel];
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Copy the configuration of a telescope, dimensioned as given
+// by get_config_layout:
+//  values: mirror area, focal length, time slice, ref_step
+//  xpix, ypix: [num_pixels]
+//  ref_shapes: [nrefshape][lrefshape]
+//  pedestal, calib: [H_MAX_GAINS][num_pixels]
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+// -1 if hsdata == NULL
+//----------------------------------------------------------------
+int get_config(HessioFile* file, int telescope_id, double* values, double* xpix, double* ypix,
+               double* ref_shapes, double* pedestal, double* calib)
+{
+  if ( file->hsdata != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    const CameraSettings* camera = &file->hsdata->camera_set[itel];
+    const PixelSetting* setting = &file->hsdata->pixel_set[itel];
+    int layout[3];
+    int igain = 0;
+    get_config_layout(file, telescope_id, layout);
+    values[0] = camera->mirror_area;
+    values[1] = camera->flen;
+    values[2] = setting->time_slice;
+    values[3] = setting->ref_step;
+    memcpy(xpix, camera->xpix, layout[0]*sizeof(double));
+    memcpy(ypix, camera->ypix, layout[0]*sizeof(double));
+    for (igain = 0; igain < layout[1]; igain++)
+      memcpy(ref_shapes + igain*layout[2], setting->refshape[igain], layout[2]*sizeof(double));
+    for (igain = 0; igain < H_MAX_GAINS; igain++)
+    {
+      memcpy(pedestal + igain*layout[0], file->hsdata->tel_moni[itel].pedestal[igain],
+             layout[0]*sizeof(double));
+      memcpy(calib + igain*layout[0], file->hsdata->tel_lascal[itel].calib[igain],
+             layout[0]*sizeof(double));
+    }
+    return 0;
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Returns pixel position information
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+// -1 if hsdata == NULL
+//----------------------------------------------------------------
+int get_pixel_position(HessioFile* file, int telescope_id, double* xpos, double* ypos )
+{
+  if ( file->hsdata != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+     int ipix =0.;
+     int num_pixels = file->hsdata->camera_set[itel].num_pixels;
+     for(ipix=0.;ipix<num_pixels;ipix++) // loop over pixels
+     {
+        *xpos++=file->hsdata->camera_set[itel].xpix[ipix];
+        *ypos++=file->hsdata->camera_set[itel].ypix[ipix];
+     }
+     return 0;
+  }
+  return -1;
+}
+//----------------------------------------------------------------
+// Returns the number of pixels in the camera (as in configuration)
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_num_pixels(HessioFile* file, int telescope_id)
+{
+  if ( file->hsdata != NULL)
+  {
+  int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+  return file->hsdata->camera_set[itel].num_pixels;
+  }
+  return -1;
+}
+
+//----------------------------------------------------------------
+// Returns total area of individual mirrors corrected   for inclination [m^2].
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_mirror_area(HessioFile* file, int telescope_id,double* result)
+{
+  if ( file->hsdata != NULL && result != NULL)
+  {
+  int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+  *result = file->hsdata->camera_set[itel].mirror_area;
+  return 0;
+  }
+  return -1.;
+}
+//-----------------------------------------------------
+// Returns the number of samples (time slices) recorded
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//-----------------------------------------------------
+int get_num_samples(HessioFile* file, int telescope_id)
+{
+  if ( file->hsdata != NULL)
+  {
+  int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    AdcData* raw = file->hsdata->event.teldata[itel].raw;
+    if ( raw != NULL )//&& raw->known   )
+    {
+     return raw->num_samples;
+    }
+  }
+  return -1;
+}
+//-----------------------------------------------------
+// Returns the number of different types of times can we store
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//-----------------------------------------------------
+int get_pixel_timing_num_times_types(HessioFile* file, int telescope_id)
+{
+  if ( file->hsdata != NULL)
+  {
+  int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    PixelTiming* pt = file->hsdata->event.teldata[itel].pixtm;
+    if ( pt != NULL )
+    {
+     return pt->num_types;
+    }
+  }
+  return -1;
+}
+
+//-----------------------------------------------------
+// Set the local telescope trigger time second and nanoseconds
+// to function paramameters
+// returns 0 if set, otherwise returns -1
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//-----------------------------------------------------
+int get_tel_event_gps_time(HessioFile* file, int telescope_id, long* seconds, long* nanoseconds)
+{
+  if ( file->hsdata != NULL && seconds != NULL && nanoseconds != NULL)
+  {
+    int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    *seconds =  file->hsdata->event.teldata[itel].gps_time.seconds;
+    *nanoseconds =  file->hsdata->event.teldata[itel].gps_time.nanoseconds;
+    return 0;
+  }
+  return -1;
+}
+
+//---------------------------------------------
+// Returns PixelTiming threshold:
+//  - Minimum base-to-peak raw amplitude difference applied in pixel selection
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//-----------------------------------------------------
+int get_pixel_timing_threshold(HessioFile* file, int telescope_id,int *result)
+{
+  if ( file->hsdata != NULL && result != NULL)
+  {
+  int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    PixelTiming* pt = file->hsdata->event.teldata[itel].pixtm;
+    if ( pt != NULL ) *result   = pt->threshold;
+    return 0;
+  }
+  return -1;
+}
+//---------------------------------------------
+// Returns PixelTiming peak_global:
+//  Camera-wide (mean) peak position [time slices]
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------
+int get_pixel_timing_peak_global(HessioFile* file, int telescope_id,float *result)
+{
+  if ( file->hsdata != NULL && result != NULL)
+  {
+  int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+    PixelTiming* pt = file->hsdata->event.teldata[itel].pixtm;
+    if ( pt != NULL )
+    {
+     *result =  pt->peak_global;
+    }
+    return 0;
+  }
+  return -1;
+}
+//--------------------------------------------------
+// fill file->hsdata by decoding the next data block
+//--------------------------------------------------
+ int fill_hsdata(HessioFile* file, int* event_id)//,int *header_readed)
+ {
+  /* Find and read the next block of data. */
+  /* In case of problems with the data, just give up. */
+  if ( find_block(file) != 0 )
+   {
+    return -1;
+   }
+  if ( read_block(file) != 0 )
+  {
+    return -1;
+  }
+  return decode_hsdata(file, event_id);
+ }
+
+static int decode_block(HessioFile* file, int* event_id);
+
+//--------------------------------------------------
+// fill file->hsdata by decoding the block
+// already read in file->iobuf
+//--------------------------------------------------
+int decode_hsdata(HessioFile* file, int* event_id)
+{
+  long long start = 0;
+  int rc = 0;
+  AdcData* shared[H_MAX_TEL];
+  int event = ( file->item_header.type == IO_TYPE_HESS_EVENT && file->hsdata != NULL );
+  file->generation++;
+  if ( event ) unshare_adc_buffers(file, shared);
+  if ( stats_enabled ) start = stats_clock();
+  rc = decode_block(file, event_id);
+  if ( event ) restore_adc_buffers(file, shared);
+  if ( stats_enabled )
+  {
+    count_type(file->item_header.type, 2, 1);
+    count_type(file->item_header.type, 4, stats_clock() - start);
+  }
+  return rc;
+}
+
+//--------------------------------------------------
+// Dispatch the block in file->iobuf to its read_hess_* decoder
+//--------------------------------------------------
+static int decode_block(HessioFile* file, int* event_id)
+ {
+  
+  int itel;
+  int rc = 0;
+  int ignore = 0;
+
+  int tel_id;
+
+ // if ( ( !header_readed) && 
+  if ( file->hsdata == NULL &&
+    file->item_header.type > IO_TYPE_HESS_RUNHEADER &&
+    file->item_header.type < IO_TYPE_HESS_RUNHEADER + 200)
+    {
+     fprintf(stderr,"Trying to read event data before run header.\n");
+     fprintf(stderr,"Skipping this data block.\n");
+     return -1;
+
+    }
+    
+
+
+  // libhessio looks telescopes up in a single global table:
+  // refill it when another handle read the last run header.
+  if ( file->hsdata != NULL && tel_idx_owner != file->serial )
+  {
+    set_tel_idx(file->hsdata->run_header.ntel,file->hsdata->run_header.tel_id);
+    tel_idx_owner = file->serial;
+  }
+
+  switch ( (int) file->item_header.type )
+    {
+     /* =================================================== */
+    case IO_TYPE_HESS_RUNHEADER:
+
+    /* Structures might be allocated from previous run */
+    free_hsdata(file);
+
+     file->hsdata = (AllHessData *) calloc(1,sizeof(AllHessData));
+     if ( (rc = read_hess_runheader(file->iobuf,&file->hsdata->run_header)) < 0 )
+     {
+     Warning("Reading run header failed.");
+     exit(1);
+     }
+     tel_idx_owner = file->serial; // read_hess_runheader() filled the index lookup
+     set_telescope_index_table(file);
+     file->config_counter++; // A new run: configuration of all telescopes changes
+     for (itel=0; itel<file->hsdata->run_header.ntel; itel++)
+       file->config_version[itel] = file->config_counter;
+     fprintf(stderr,"\nStarting run %d\n",file->hsdata->run_header.run);
+     file->mapped_buffers = compact_buffers;
+     for (itel=0; itel<file->hsdata->run_header.ntel; itel++)
+     {
+
+     tel_id = file->hsdata->run_header.tel_id[itel];
+     file->hsdata->camera_set[itel].tel_id = tel_id;
+     file->hsdata->camera_org[itel].tel_id = tel_id;
+     file->hsdata->pixel_set[itel].tel_id = tel_id;
+     file->hsdata->pixel_disabled[itel].tel_id = tel_id;
+     file->hsdata->cam_soft_set[itel].tel_id = tel_id;
+     file->hsdata->tracking_set[itel].tel_id = tel_id;
+     file->hsdata->point_cor[itel].tel_id = tel_id;
+     file->hsdata->event.num_tel = file->hsdata->run_header.ntel;
+     file->hsdata->event.teldata[itel].tel_id = tel_id;
+     file->hsdata->event.trackdata[itel].tel_id = tel_id;
+     if ( (file->hsdata->event.teldata[itel].raw = (AdcData *) (compact_buffers ?
+      map_buffer(sizeof(AdcData)) : calloc(1,sizeof(AdcData)))) == NULL )
+     {
+    Warning("Not enough memory");
+    exit(1);
+     }
+     file->hsdata->event.teldata[itel].raw->tel_id = tel_id;
+     if ( (file->hsdata->event.teldata[itel].pixtm = (PixelTiming *) (compact_buffers ?
+      map_buffer(sizeof(PixelTiming)) : calloc(1,sizeof(PixelTiming)))) == NULL )
+     {
+    Warning("Not enough memory");
+    exit(1);
+     }
+     file->hsdata->event.teldata[itel].pixtm->tel_id = tel_id;
+     if ( (file->hsdata->event.teldata[itel].img = 
+      (ImgData *) calloc(2,sizeof(ImgData))) == NULL )
+     {
+    Warning("Not enough memory");
+    exit(1);
+     }
+     file->hsdata->event.teldata[itel].max_image_sets = 2;
+     file->hsdata->event.teldata[itel].img[0].tel_id = tel_id;
+     file->hsdata->event.teldata[itel].img[1].tel_id = tel_id;
+     file->hsdata->tel_moni[itel].tel_id = tel_id;
+     file->hsdata->tel_lascal[itel].tel_id = tel_id;
+     }
+  
+
+     break;
+    // end case IO_TYPE_HESS_RUNHEADER:
+     /* =================================================== */
+    case IO_TYPE_HESS_MCRUNHEADER:
+     
+     rc = read_hess_mcrunheader(file->iobuf,&file->hsdata->mc_run_header);
+     break;
+     /* =================================================== */
+    case IO_TYPE_MC_INPUTCFG:
+     {
+     }
+     break;
+     /* =================================================== */
+    case 70: /* How sim_hessarray was run and how it was configured. */
+     break;
+
+     /* =================================================== */
+    case IO_TYPE_HESS_CAMSETTINGS:
+
+     tel_id = file->item_header.ident; // Telescope ID is in the header
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Camera settings for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_camsettings(file->iobuf,&file->hsdata->camera_set[itel]);
+     file->config_version[itel] = ++file->config_counter;
+
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_CAMORGAN:
+
+     tel_id = file->item_header.ident; // Telescope ID is in the header
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Camera organisation for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_camorgan(file->iobuf,&file->hsdata->camera_org[itel]);
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_PIXELSET:
+     tel_id = file->item_header.ident; // Telescope ID is in the header
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Pixel settings for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_pixelset(file->iobuf,&file->hsdata->pixel_set[itel]);
+     file->config_version[itel] = ++file->config_counter;
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_PIXELDISABLE:
+     tel_id = file->item_header.ident; // Telescope ID is in the header
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Pixel disable block for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_pixeldis(file->iobuf,&file->hsdata->pixel_disabled[itel]);
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_CAMSOFTSET:
+     tel_id = file->item_header.ident; // Telescope ID is in the header
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Camera software settings for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_camsoftset(file->iobuf,&file->hsdata->cam_soft_set[itel]);
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_POINTINGCOR:
+     tel_id = file->item_header.ident; // Telescope ID is in the header
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Pointing correction for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_pointingcor(file->iobuf,&file->hsdata->point_cor[itel]);
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_TRACKSET:
+     tel_id = file->item_header.ident; // Telescope ID is in the header
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Tracking settings for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_trackset(file->iobuf,&file->hsdata->tracking_set[itel]);
+     break;
+     /* =================================================== */
+     /* =============   IO_TYPE_HESS_EVENT  =============== */
+     /* =================================================== */
+    case IO_TYPE_HESS_EVENT:
+     rc = read_hess_event_selected(file->iobuf,&file->hsdata->event,file->read_what,
+                                   file->select_ntel < 0 ? NULL : file->tel_selected);
+     *event_id = file->item_header.ident;
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_CALIBEVENT:
+     {
+     printf("RDLR: CALIBEVENT!\n");
+     }
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_MC_SHOWER:
+     rc = read_hess_mc_shower(file->iobuf,&file->hsdata->mc_shower);
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_MC_EVENT:
+     rc = read_hess_mc_event(file->iobuf,&file->hsdata->mc_event);
+
+     break;
+     /* =================================================== */
+    case IO_TYPE_MC_TELARRAY:
+     if ( file->hsdata && file->hsdata->run_header.ntel > 0 )
+     {
+     rc = read_hess_mc_phot(file->iobuf,&file->hsdata->mc_event);
+     } 
+     break;
+     /* =================================================== */
+     /* With extended output option activated, the particles
+   arriving at ground level would be stored as seemingly
+   stray photon bunch block. */
+    case IO_TYPE_MC_PHOTONS:
+     break;
+     /* =================================================== */
+    case IO_TYPE_MC_RUNH:
+    case IO_TYPE_MC_EVTH:
+    case IO_TYPE_MC_EVTE:
+    case IO_TYPE_MC_RUNE:
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_MC_PE_SUM:
+     rc = read_hess_mc_pe_sum(file->iobuf,&file->hsdata->mc_event.mc_pesum);
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_TEL_MONI:
+     // Telescope ID among others in the header
+     tel_id = (file->item_header.ident & 0xff) | 
+     ((file->item_header.ident & 0x3f000000) >> 16); 
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Telescope monitor block for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_tel_monitor(file->iobuf,&file->hsdata->tel_moni[itel]);
+     file->config_version[itel] = ++file->config_counter;
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_LASCAL:
+     tel_id = file->item_header.ident; // Telescope ID is in the header
+     if ( (itel = get_telescope_index(file, tel_id)) < 0 )
+     {
+     char msg[256];
+     snprintf(msg,sizeof(msg)-1,
+     "Laser/LED calibration for unknown telescope %d.", tel_id);
+     Warning(msg);
+     exit(1);
+     }
+     rc = read_hess_laser_calib(file->iobuf,&file->hsdata->tel_lascal[itel]);
+     file->config_version[itel] = ++file->config_counter;
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_RUNSTAT:
+     rc = read_hess_run_stat(file->iobuf,&file->hsdata->run_stat);
+     break;
+     /* =================================================== */
+    case IO_TYPE_HESS_MC_RUNSTAT:
+     rc = read_hess_mc_run_stat(file->iobuf,&file->hsdata->mc_run_stat);
+     break;
+     /* (End-of-job or DST) histograms */
+    case 100:
+     {
+     }
+     break;
+    default:
+     if ( !ignore )
+     fprintf(stderr,"WARNING: Ignoring unknown data block type %ld\n",file->item_header.type);
+    } // end switch item_header.type
+
+  /* What did we actually get? */
+  return (int) file->item_header.type;
+}
+
+//----------------------------------------------------------------
+// Returns total number of mirror tiles.
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+int get_mirror_number(HessioFile* file, int telescope_id)
+{
+  if ( file->hsdata != NULL )
+  {
+  int itel = get_telescope_index(file, telescope_id);
+    if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+   return file->hsdata->camera_set[itel].num_mirrors;
+  }
+  return -1.;
+}
+
+//----------------------------------------------------------------
+// Returns focal length of optics [m].
+// Returns TEL_INDEX_NOT_VALID if telescope index is not valid
+//----------------------------------------------------------------
+
+double get_optical_foclen(HessioFile* file, int telescope_id)
+{
+  if ( file->hsdata != NULL )
+    {
+      int itel = get_telescope_index(file, telescope_id);
+      if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+      return file->hsdata->camera_set[itel].flen;
+    }
+  return -1.;
+}
+
+//-----------------------------------
+// Returns IDs of used telescope in the run
+//-----------------------------------
+
+int get_telescope_ids(HessioFile* file, int* list)
+{
+  if ( file->hsdata != NULL)
+    {
+      int num_tel = get_num_telescope(file);
+      int loop=0;
+      for (loop=0; loop < num_tel; loop++)
+	{
+	  *list++ =file->hsdata->run_header.tel_id[loop];
+    }
+      return 0;
+    }
+  return -1;
+}
+
+//-----------------------------------------------------
+// Fill layout with the dimensions needed by get_event:
+//  layout[0] = number of telescopes with data
+//  layout[1] = maximum number of gains
+//  layout[2] = maximum number of pixels
+//  layout[3] = maximum number of samples
+//  layout[4] = maximum number of pixel timing types
+// Returns -1 if hsdata is not available
+//-----------------------------------------------------
+int get_event_layout(HessioFile* file, int* layout)
+{
+  if ( file->hsdata != NULL && layout != NULL )
+  {
+    int loop = 0;
+    layout[0] = file->hsdata->event.num_teldata;
+    layout[1] = layout[2] = layout[3] = layout[4] = 0;
+    for (loop = 0; loop < file->hsdata->event.num_teldata; loop++)
+    {
+      int itel = get_telescope_index(file, file->hsdata->event.teldata_list[loop]);
+      if (itel == TEL_INDEX_NOT_VALID) continue;
+      AdcData* raw = file->hsdata->event.teldata[itel].raw;
+      PixelTiming* pt = file->hsdata->event.teldata[itel].pixtm;
+      if ( file->hsdata->camera_set[itel].num_pixels > layout[2] )
+        layout[2] = file->hsdata->camera_set[itel].num_pixels;
+      if ( raw != NULL && raw->known )
+      {
+        if ( raw->num_gains > layout[1] ) layout[1] = raw->num_gains;
+        if ( raw->num_samples > layout[3] ) layout[3] = raw->num_samples;
+      }
+      if ( pt != NULL && pt->num_types > layout[4] )
+        layout[4] = pt->num_types;
+    }
+    return 0;
+  }
+  return -1;
+}
+
+//-----------------------------------------------------
+// Copy the data of telescope itel to position loop of the
+// telescope axis of arrays dimensioned with layout as for get_event,
+// and num_gains, num_pixels, num_samples, num_times to info[1..4]
+//-----------------------------------------------------
+static void copy_telescope_data(HessioFile* file, int itel, int what, const int* layout, size_t loop,
+                                int* info, uint32_t* adc_sums, uint16_t* adc_samples,
+                                float* timval, float* peak_global)
+{
+  int max_gains = layout[1], max_pixels = layout[2];
+  int max_samples = layout[3], max_times = layout[4];
+  TelEvent* teldata = &file->hsdata->event.teldata[itel];
+  AdcData* raw = teldata->raw;
+  PixelTiming* pt = teldata->pixtm;
+
+  info[2] = file->hsdata->camera_set[itel].num_pixels;
+
+  if ( raw != NULL && raw->known  ) // If triggered telescopes
+  {
+    int igain = 0, ipix = 0;
+    int npix = raw->num_pixels < max_pixels ? raw->num_pixels : max_pixels;
+    int ngains = raw->num_gains < max_gains ? raw->num_gains : max_gains;
+    int nsamples = raw->num_samples < max_samples ? raw->num_samples : max_samples;
+    info[1] = raw->num_gains;
+    info[3] = raw->num_samples;
+    for (igain = 0; igain < ngains; igain++)
+    {
+      size_t offset = (loop*max_gains + igain)*max_pixels;
+      if ( (what & RAWSUM_FLAG) && adc_sums != NULL )
+        memcpy(adc_sums + offset, raw->adc_sum[igain],
+               npix*sizeof(uint32_t));
+      if ( (what & RAWDATA_FLAG) && adc_samples != NULL )
+      {
+        for (ipix = 0; ipix < npix; ipix++)
+          memcpy(adc_samples + (offset+ipix)*max_samples,
+                 raw->adc_sample[igain][ipix],
+                 nsamples*sizeof(uint16_t));
+      }
+    }
+  }
+
+  if ( pt != NULL && (what & TIME_FLAG) && timval != NULL && peak_global != NULL )
+  {
+    int ipix = 0, itimes = 0;
+    int npix = pt->num_pixels < max_pixels ? pt->num_pixels : max_pixels;
+    int ntimes = pt->num_types < max_times ? pt->num_types : max_times;
+    info[4] = pt->num_types;
+    peak_global[loop] = pt->peak_global;
+    for (ipix = 0; ipix < npix; ipix++)
+    {
+      float* dest = timval + (loop*max_pixels + ipix)*max_times;
+      for (itimes = 0; itimes < ntimes && itimes<H_MAX_PIX_TIMES; itimes++)
+        dest[itimes] = pt->timval[ipix][itimes];
+    }
+  }
+}
+
+//-----------------------------------------------------
+// Fill in one call the data of all telescopes with data
+// for the current event. Arrays must be sized from get_event_layout
+// (ntel, max_gains, max_pixels, max_samples, max_times):
+//  tel_info[ntel][5]  : tel_id, num_gains, num_pixels, num_samples, num_times
+//  adc_sums[ntel][max_gains][max_pixels]              if what & RAWSUM_FLAG
+//  adc_samples[ntel][max_gains][max_pixels][max_samples] if what & RAWDATA_FLAG
+//  timval[ntel][max_pixels][max_times], peak_global[ntel] if what & TIME_FLAG
+//  gps_time[ntel+1][2] : central trigger time then telescope times
+//  mc_values[5] : energy, azimuth, altitude, xcore, ycore
+// Padding entries are left untouched.
+// Returns -1 if hsdata is not available
+//-----------------------------------------------------
+int get_event(HessioFile* file, int what, int* tel_info, uint32_t* adc_sums, uint16_t* adc_samples,
+              float* timval, float* peak_global, long* gps_time, double* mc_values)
+{
+  int layout[5];
+
+  if ( get_event_layout(file, layout) != 0 || tel_info == NULL || gps_time == NULL
+       || mc_values == NULL )
+    return -1;
+
+  int ntel = layout[0];
+
+  gps_time[0] = file->hsdata->event.central.gps_time.seconds;
+  gps_time[1] = file->hsdata->event.central.gps_time.nanoseconds;
+
+  mc_values[0] = file->hsdata->mc_shower.energy;
+  mc_values[1] = file->hsdata->mc_shower.azimuth;
+  mc_values[2] = file->hsdata->mc_shower.altitude;
+  mc_values[3] = file->hsdata->mc_event.xcore;
+  mc_values[4] = file->hsdata->mc_event.ycore;
+
+  int loop = 0;
+  for (loop = 0; loop < ntel; loop++)
+  {
+    int* info = tel_info + 5*loop;
+    int tel_id = file->hsdata->event.teldata_list[loop];
+    int itel = get_telescope_index(file, tel_id);
+
+    info[0] = tel_id;
+    info[1] = info[2] = info[3] = info[4] = 0;
+    if (itel == TEL_INDEX_NOT_VALID) continue;
+
+    TelEvent* teldata = &file->hsdata->event.teldata[itel];
+    gps_time[2*(loop+1)] = teldata->gps_time.seconds;
+    gps_time[2*(loop+1)+1] = teldata->gps_time.nanoseconds;
+    copy_telescope_data(file, itel, what, layout, loop, info, adc_sums, adc_samples,
+                        timval, peak_global);
+  }
+  return 0;
+}
+
+//----------------------------------
+// Read the next event, unless one is pending already, and keep
+// it pending: the next move_to_next_event or read_batch starts with it
+// Returns its run number or -1 at end of file
+//----------------------------------
+int peek_event(HessioFile* file)
+{
+  if ( !file->pending )
+  {
+    int event_id = 0;
+    if ( move_to_next_event(file, &event_id) < 0 ) return -1;
+    file->pending = 1;
+    file->pending_event_id = event_id;
+  }
+  return get_run_number(file);
+}
+
+//-----------------------------------------------------
+// Fill layout with the dimensions needed by read_batch for the
+// current event, restricted to the ntel telescopes of tel_ids:
+//  layout[0] = ntel
+//  layout[1] = maximum number of gains
+//  layout[2] = maximum number of pixels (also without data)
+//  layout[3] = maximum number of samples
+//  layout[4] = maximum number of pixel timing types
+// Returns -1 if hsdata is not available
+//-----------------------------------------------------
+int get_batch_layout(HessioFile* file, int ntel, const int* tel_ids, int* layout)
+{
+  if ( file->hsdata != NULL && layout != NULL )
+  {
+    int loop = 0;
+    layout[0] = ntel;
+    layout[1] = layout[2] = layout[3] = layout[4] = 0;
+    for (loop = 0; loop < ntel; loop++)
+    {
+      int itel = get_telescope_index(file, tel_ids[loop]);
+      if (itel == TEL_INDEX_NOT_VALID) continue;
+      AdcData* raw = file->hsdata->event.teldata[itel].raw;
+      PixelTiming* pt = file->hsdata->event.teldata[itel].pixtm;
+      if ( file->hsdata->camera_set[itel].num_pixels > layout[2] )
+        layout[2] = file->hsdata->camera_set[itel].num_pixels;
+      if ( raw != NULL && raw->known )
+      {
+        if ( raw->num_gains > layout[1] ) layout[1] = raw->num_gains;
+        if ( raw->num_samples > layout[3] ) layout[3] = raw->num_samples;
+      }
+      if ( pt != NULL && pt->num_types > layout[4] )
+        layout[4] = pt->num_types;
+    }
+    return 0;
+  }
+  return -1;
+}
+
+//-----------------------------------------------------
+// Read up to batch_size events of one run into consecutive slots
+// of arrays with a telescope axis for the ntel telescopes of
+// tel_ids, dimensioned with layout as from get_batch_layout:
+//  event_info[batch_size][4] : run, event_id, glob_count, num_tel_trig
+//  mc_values[batch_size][5] : energy, azimuth, altitude, xcore, ycore
+//  mask[batch_size][ntel] : 1 if the telescope has data
+//  adc_sums, adc_samples, timval, peak_global as for get_event,
+//  with [batch_size][ntel] in front, if selected by what
+// Slots are cleared before being filled. Reading stops before an
+// event of another run, or one that does not fit into layout,
+// which then stays pending for the next call.
+// Returns the number of events read, 0 at end of file
+//-----------------------------------------------------
+int read_batch(HessioFile* file, int what, int batch_size, int ntel, const int* tel_ids, const int* layout,
+               int* event_info, uint8_t* mask, uint32_t* adc_sums, uint16_t* adc_samples,
+               float* timval, float* peak_global, double* mc_values)
+{
+  int position[H_MAX_TEL]; // Position in tel_ids of each telescope index
+  size_t nsums = (size_t)ntel*layout[1]*layout[2];
+  size_t ntimes = (size_t)ntel*layout[2]*layout[4];
+  int nevents = 0, batch_run = -1;
+
+  while ( nevents < batch_size )
+  {
+    int needed[5], info[5];
+    int run = peek_event(file), loop = 0;
+    if ( run < 0 ) break;
+    if ( nevents > 0 && run != batch_run ) break;
+    if ( get_batch_layout(file, ntel, tel_ids, needed) != 0 ||
+         needed[1] > layout[1] || needed[2] > layout[2] ||
+         needed[3] > layout[3] || needed[4] > layout[4] ) break;
+
+    if ( nevents == 0 )
+    {
+      batch_run = run;
+      for (loop = 0; loop < H_MAX_TEL; loop++) position[loop] = -1;
+      for (loop = 0; loop < ntel; loop++)
+      {
+        int itel = get_telescope_index(file, tel_ids[loop]);
+        if ( itel != TEL_INDEX_NOT_VALID ) position[itel] = loop;
+      }
+    }
+    file->pending = 0;
+
+    event_info[4*nevents] = run;
+    event_info[4*nevents+1] = file->pending_event_id;
+    event_info[4*nevents+2] = file->hsdata->event.central.glob_count;
+    event_info[4*nevents+3] = file->hsdata->event.central.num_teltrg;
+    mc_values[5*nevents] = file->hsdata->mc_shower.energy;
+    mc_values[5*nevents+1] = file->hsdata->mc_shower.azimuth;
+    mc_values[5*nevents+2] = file->hsdata->mc_shower.altitude;
+    mc_values[5*nevents+3] = file->hsdata->mc_event.xcore;
+    mc_values[5*nevents+4] = file->hsdata->mc_event.ycore;
+    memset(mask + (size_t)nevents*ntel, 0, ntel);
+    if ( (what & RAWSUM_FLAG) && adc_sums != NULL )
+      memset(adc_sums + nevents*nsums, 0, nsums*sizeof(uint32_t));
+    if ( (what & RAWDATA_FLAG) && adc_samples != NULL )
+      memset(adc_samples + nevents*nsums*layout[3], 0, nsums*layout[3]*sizeof(uint16_t));
+    if ( (what & TIME_FLAG) && timval != NULL && peak_global != NULL )
+    {
+      memset(timval + nevents*ntimes, 0, ntimes*sizeof(float));
+      memset(peak_global + (size_t)nevents*ntel, 0, ntel*sizeof(float));
+    }
+
+    for (loop = 0; loop < file->hsdata->event.num_teldata; loop++)
+    {
+      int itel = get_telescope_index(file, file->hsdata->event.teldata_list[loop]);
+      if ( itel == TEL_INDEX_NOT_VALID || position[itel] < 0 ) continue;
+      size_t slot = (size_t)nevents*ntel + position[itel];
+      mask[slot] = 1;
+      copy_telescope_data(file, itel, what, layout, slot, info, adc_sums, adc_samples,
+                          timval, peak_global);
+    }
+    nevents++;
+  }
+  return nevents;
+}
+
+//-----------------------------------------------------
+// Neighbours of the pixels of telescope itel, found as in
+// reconstruct.c (find_neighbours): two pixels are neighbours if
+// their distance is below 0.707 times the sum of their sizes.
+// Cached until the configuration of the telescope changes.
+// Returns num_pixels rows of H_MAX_NB pixel ids padded with -1,
+// or NULL if no camera settings are available
+//-----------------------------------------------------
+static const int* find_neighbours(HessioFile* file, int itel)
+{
+  CameraSettings* camset = &file->hsdata->camera_set[itel];
+  int npix = camset->num_pixels, ipix = 0, jpix = 0;
+
+  if ( npix <= 0 ) return NULL;
+  if ( file->neighbours[itel] != NULL &&
+       file->neighbours_version[itel] == file->config_version[itel] )
+    return file->neighbours[itel];
+
+  int* list = (int*) realloc(file->neighbours[itel], (size_t)npix*H_MAX_NB*sizeof(int));
+  if ( list == NULL ) return NULL;
+  file->neighbours[itel] = list;
+  file->neighbours_version[itel] = file->config_version[itel];
+
+  for (ipix = 0; ipix < npix*H_MAX_NB; ipix++) list[ipix] = -1;
+  for (ipix = 0; ipix < npix; ipix++)
+  {
+    int* nb_i = list + ipix*H_MAX_NB;
+    for (jpix = 0; jpix < ipix; jpix++)
+    {
+      int* nb_j = list + jpix*H_MAX_NB;
+      double ds = camset->size[ipix] + camset->size[jpix];
+      double dx = camset->xpix[ipix] - camset->xpix[jpix];
+      double dy = camset->ypix[ipix] - camset->ypix[jpix];
+      int k = 0;
+      if ( dx*dx + dy*dy >= 0.5*ds*ds ) continue;
+      for (k = 0; k < H_MAX_NB && nb_i[k] >= 0; k++);
+      if ( k < H_MAX_NB ) nb_i[k] = jpix;
+      for (k = 0; k < H_MAX_NB && nb_j[k] >= 0; k++);
+      if ( k < H_MAX_NB ) nb_j[k] = ipix;
+    }
+  }
+  return list;
+}
+
+//-----------------------------------------------------
+// Copy the neighbours of the first max_pixels pixels of a telescope,
+// as used by the neighbour peak integration, to
+// neighbours[max_pixels][H_MAX_NB], padded with -1.
+// Returns the number of pixels, -1 if no camera settings are
+// available, TEL_INDEX_NOT_VALID if telescope index is not valid
+//-----------------------------------------------------
+int get_neighbours(HessioFile* file, int telescope_id, int max_pixels, int* neighbours)
+{
+  if ( file->hsdata == NULL ) return -1;
+  int itel = get_telescope_index(file, telescope_id);
+  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+  const int* list = find_neighbours(file, itel);
+  if ( list == NULL ) return -1;
+  int npix = file->hsdata->camera_set[itel].num_pixels;
+  if ( max_pixels > npix ) max_pixels = npix;
+  if ( max_pixels > 0 )
+    memcpy(neighbours, list, (size_t)max_pixels*H_MAX_NB*sizeof(int));
+  return npix;
+}
+
+//-----------------------------------------------------
+// Interpolate yval at x, as qpol() of reconstruct.c
+//-----------------------------------------------------
+static double interpolate_shape(double x, int np, const double* yval)
+{
+  int ix = (int) x;
+  if ( x < 0 || x >= (double) np || ix+1 >= np ) return 0.;
+  return yval[ix]*(ix+1-x) + yval[ix+1]*(x-ix);
+}
+
+//-----------------------------------------------------
+// Fraction of the reference pulse missed by an integration window
+// of nsum samples starting noff samples before the peak, as
+// set_integration_correction() of reconstruct.c: fills
+// correction[igain] with the factor (>= 1) to apply to the sums
+//-----------------------------------------------------
+static void integration_correction(HessioFile* file, int itel, int nsum, int noff,
+                                   double* correction)
+{
+  PixelSetting* ps = &file->hsdata->pixel_set[itel];
+  int igain = 0, ibin = 0, iphase = 0;
+
+  for (igain = 0; igain < H_MAX_GAINS; igain++)
+  {
+    double sum = 0., asum = 0., speak = 0.;
+    int ipeak = 0;
+    correction[igain] = 1.0;
+    if ( ps->nrefshape <= igain || ps->time_slice == 0. || ps->ref_step == 0. )
+      continue;
+    double st = ps->time_slice / ps->ref_step;
+
+    for (ibin = 0; ibin < ps->lrefshape; ibin++)
+    {
+      asum += ps->refshape[igain][ibin];
+      if ( ps->refshape[igain][ibin] > speak )
+      {
+        speak = ps->refshape[igain][ibin];
+        ipeak = ibin;
+      }
+    }
+    asum /= st;
+    for (iphase = 0; iphase < 5; iphase++)
+    {
+      double ti = ((iphase*0.2-0.4)-noff) * st + ipeak;
+      for (ibin = 0; ibin < nsum; ibin++)
+        sum += interpolate_shape(ibin*st + ti, ps->lrefshape, ps->refshape[igain]);
+    }
+    sum *= 0.2;
+    if ( sum > 0. && asum > 0. )
+      correction[igain] = asum/sum;
+  }
+}
+
+//-----------------------------------------------------
+// First sample at or above threshold (ADC counts above the
+// per-sample pedestal pedsamp), then the position of the
+// maximum from there on. Returns -1 if no sample is significant
+//-----------------------------------------------------
+static int find_peak(const uint16_t* samples, int nsamples, int pedsamp, int threshold)
+{
+  int isamp = 0, ipeak = -1, p = 0;
+  for (isamp = 0; isamp < nsamples; isamp++)
+  {
+    if ( samples[isamp] - pedsamp >= threshold )
+    {
+      ipeak = isamp;
+      p = samples[isamp];
+      for (isamp++; isamp < nsamples; isamp++)
+      {
+        if ( samples[isamp] > p )
+        {
+          ipeak = isamp;
+          p = samples[isamp];
+        }
+      }
+    }
+  }
+  return ipeak;
+}
+
+//-----------------------------------------------------
+// Sum nsum samples of a pixel from the peak position minus
+// nbefore (kept inside the trace), completed with the pedestal of
+// the samples not summed up and scaled by correction, as the
+// integrators of reconstruct.c do.
+//-----------------------------------------------------
+static int window_sum(AdcData* raw, TelMoniData* moni, int igain, int ipix,
+                      int peakpos, int nsum, int nbefore, double correction)
+{
+  int start = peakpos - nbefore, isamp = 0, sum = 0;
+  double pedestal = moni->pedestal[igain][ipix];
+  if ( start < 0 ) start = 0;
+  if ( start + nsum > raw->num_samples ) start = raw->num_samples - nsum;
+  for (isamp = 0; isamp < nsum; isamp++)
+    sum += raw->adc_sample[igain][ipix][isamp+start];
+  if ( nsum != raw->num_samples )
+    sum += (int) ((raw->num_samples-nsum)*pedestal/(double)raw->num_samples+0.5);
+  if ( correction > 0. )
+    sum = (int) ((sum-pedestal) * correction + pedestal + 0.5);
+  return sum;
+}
+
+//-----------------------------------------------------
+// Integrate the samples of telescope itel with one of the schemes
+// of reconstruct.c (pixel_integration), without changing raw:
+//  1: fixed window of params[0] samples after skipping params[1]
+//  2: window around the global peak of significant pixels
+//  3: window around the peak of each pixel
+//  4: window around the peak of the sum of the neighbour pixels
+//  5: as 4, with the pixel itself counted 3 times
+// params: window width, offset, high-gain and low-gain
+// significance thresholds [ADC counts], rescale (1: correct for
+// the pulse fraction outside the window).
+// Fills sums[H_MAX_GAINS][npix] and peak[npix] for the first npix
+// pixels (at most raw->num_pixels) with the peak position
+// [time slices], -1 if not known.
+// Returns 0, 1 if there are no samples to integrate, -1 on error
+//-----------------------------------------------------
+static int integrate_samples(HessioFile* file, int itel, int integrator, const int* params,
+                             int npix, int* sums, float* peak)
+{
+  TelEvent* teldata = &file->hsdata->event.teldata[itel];
+  TelMoniData* moni = &file->hsdata->tel_moni[itel];
+  AdcData* raw = teldata->raw;
+  int nsum = params[0], noff = params[1];
+  int ngains = raw->num_gains;
+  int igain = 0, ipix = 0, isamp = 0;
+  double correction[H_MAX_GAINS];
+  const int* neighbours = NULL;
+
+  if ( raw->num_samples <= 1 || !(raw->known&2) ) return 1;
+  if ( integrator < 1 || integrator > 5 ) return -1;
+  if ( ngains > H_MAX_GAINS ) ngains = H_MAX_GAINS;
+  if ( npix > raw->num_pixels ) npix = raw->num_pixels;
+
+  for (igain = 0; igain < H_MAX_GAINS; igain++) correction[igain] = 0.;
+  if ( params[4] ) integration_correction(file, itel, nsum, noff, correction);
+
+  if ( integrator == 1 )
+  {
+    // The window is fixed: nsum samples after skipping noff
+    if ( nsum + noff > raw->num_samples )
+    {
+      if ( nsum >= raw->num_samples )
+      {
+        noff = 0;
+        nsum = raw->num_samples;
+      }
+      else
+        noff = raw->num_samples - nsum;
+    }
+  }
+  else if ( nsum > raw->num_samples )
+    nsum = raw->num_samples;
+  if ( nsum <= 0 ) return -1;
+  if ( integrator >= 4 && (neighbours = find_neighbours(file, itel)) == NULL ) return -1;
+
+  for (ipix = 0; ipix < npix; ipix++)
+  {
+    for (igain = 0; igain < ngains; igain++) sums[igain*npix + ipix] = 0;
+    peak[ipix] = -1.;
+  }
+
+  // Window start shared by all pixels: fixed or global peak
+  int global_peak[H_MAX_GAINS];
+  for (igain = 0; igain < H_MAX_GAINS; igain++) global_peak[igain] = -1;
+  for (igain = 0; igain < ngains; igain++)
+  {
+    global_peak[igain] = -1;
+    if ( integrator == 1 )
+      global_peak[igain] = noff;
+    else if ( integrator == 2 )
+    {
+      double ps = 0., pjs = 0.;
+      for (ipix = 0; ipix < npix; ipix++)
+      {
+        if ( (raw->zero_sup_mode & 0x20) != 0 && (raw->significant[ipix] & 0x20) == 0 ) continue;
+        if ( !raw->significant[ipix] || !raw->adc_known[igain][ipix] ) continue;
+        int pedsamp = (int) (moni->pedestal[igain][ipix]/(double)raw->num_samples+0.5);
+        int ipeak = find_peak(raw->adc_sample[igain][ipix], raw->num_samples, pedsamp, params[2+igain]);
+        if ( ipeak < 0 ) continue;
+        ps += raw->adc_sample[igain][ipix][ipeak] - pedsamp;
+        pjs += (raw->adc_sample[igain][ipix][ipeak] - pedsamp) * (double) ipeak;
+      }
+      if ( ps > 0. )
+        global_peak[igain] = (int) (pjs/ps+0.5);
+      else if ( ps < 0. || pjs != 0. )
+        global_peak[igain] = 0;
+      // If low gain has no significant peak of its own, use the high-gain peak
+      if ( global_peak[igain] < 0 && igain > 0 )
+        global_peak[igain] = global_peak[HI_GAIN];
+    }
+  }
+
+  for (ipix = 0; ipix < npix; ipix++)
+  {
+    int peakpos[H_MAX_GAINS];
+    for (igain = 0; igain < H_MAX_GAINS; igain++)
+      peakpos[igain] = igain < ngains ? global_peak[igain] : -1;
+
+    // For zero-suppressed sample mode data check relevant bit
+    if ( (raw->zero_sup_mode & 0x20) != 0 && (raw->significant[ipix] & 0x20) == 0 ) continue;
+
+    if ( integrator == 3 )
+    {
+      for (igain = 0; igain < ngains; igain++)
+      {
+        peakpos[igain] = -1;
+        if ( !raw->significant[ipix] || !raw->adc_known[igain][ipix] ) continue;
+        int pedsamp = (int) (moni->pedestal[igain][ipix]/(double)raw->num_samples+0.5);
+        peakpos[igain] = find_peak(raw->adc_sample[igain][ipix], raw->num_samples,
+                                   pedsamp, params[2+igain]);
+      }
+      // The low gain falls back to the high-gain peak
+      for (igain = 1; igain < ngains; igain++)
+        if ( peakpos[igain] < 0 ) peakpos[igain] = peakpos[HI_GAIN];
+    }
+    else if ( integrator >= 4 )
+    {
+      int nb_samples[H_MAX_SLICES], inb = 0, knb = 0, ipeak = 0;
+      const int* nb = neighbours + ipix*H_MAX_NB;
+      int lwt = (integrator == 5 ? 3 : 0);
+      for (isamp = 0; isamp < raw->num_samples; isamp++) nb_samples[isamp] = 0;
+      for (inb = 0; inb < H_MAX_NB && nb[inb] >= 0; inb++)
+      {
+        int ipix_nb = nb[inb];
+        if ( (raw->zero_sup_mode & 0x20) != 0 && (raw->significant[ipix_nb] & 0x20) == 0 ) continue;
+        if ( !raw->significant[ipix_nb] || !raw->adc_known[HI_GAIN][ipix_nb] ) continue;
+        for (isamp = 0; isamp < raw->num_samples; isamp++)
+          nb_samples[isamp] += raw->adc_sample[HI_GAIN][ipix_nb][isamp];
+        knb++;
+      }
+      if ( lwt > 0 && raw->significant[ipix] && raw->adc_known[HI_GAIN][ipix] )
+      {
+        for (isamp = 0; isamp < raw->num_samples; isamp++)
+          nb_samples[isamp] += raw->adc_sample[HI_GAIN][ipix][isamp] * lwt;
+        knb++;
+      }
+      if ( knb == 0 ) continue;
+      for (isamp = 1; isamp < raw->num_samples; isamp++)
+        if ( nb_samples[isamp] > nb_samples[ipeak] ) ipeak = isamp;
+      for (igain = 0; igain < ngains; igain++) peakpos[igain] = ipeak;
+    }
+
+    for (igain = 0; igain < ngains; igain++)
+    {
+      if ( peakpos[igain] < 0 || !raw->significant[ipix] || !raw->adc_known[igain][ipix] ) continue;
+      // The fixed window starts at noff, the others nbefore = noff samples before the peak
+      sums[igain*npix + ipix] = window_sum(raw, moni, igain, ipix, peakpos[igain],
+                                           nsum, integrator == 1 ? 0 : noff, correction[igain]);
+    }
+    if ( peakpos[HI_GAIN] >= 0 && raw->significant[ipix] )
+    {
+      if ( integrator == 1 )
+      {
+        // Maximum within the fixed window
+        const uint16_t* samples = raw->adc_sample[HI_GAIN][ipix];
+        int ipeak = noff;
+        for (isamp = noff+1; isamp < noff+nsum; isamp++)
+          if ( samples[isamp] > samples[ipeak] ) ipeak = isamp;
+        peak[ipix] = ipeak;
+      }
+      else
+        peak[ipix] = peakpos[HI_GAIN];
+    }
+  }
+  return 0;
+}
+
+//-----------------------------------------------------
+// Calibrated image of telescope itel in units of peak p.e., as
+// calibrate_amplitude() of reconstruct.c (flag_amp_tm = 0): pedestal
+// subtracted sums times calib, high gain unless it is saturated,
+// times calib_scale and clipped at clip_amp if > 0.
+// Sums are integrated first with integrate_samples() if integrator > 0
+// and samples are available, else the recorded sums are used.
+// Without raw data, calibrated pixel data are used if available.
+// Fills image[num_pixels] and peak_time[num_pixels] (peak position
+// [time slices] from integration or pixel timing, -1 if not known).
+// Returns the number of pixels, -1 if there are no data
+//-----------------------------------------------------
+static int calibrate_telescope(HessioFile* file, int itel, int integrator, const int* params,
+                               double calib_scale, double clip_amp, double* image, float* peak_time)
+{
+  TelEvent* teldata = &file->hsdata->event.teldata[itel];
+  AdcData* raw = teldata->raw;
+  PixelTiming* pt = teldata->pixtm;
+  LasCalData* lcal = &file->hsdata->tel_lascal[itel];
+  TelMoniData* moni = &file->hsdata->tel_moni[itel];
+  int npix = file->hsdata->camera_set[itel].num_pixels, ipix = 0, igain = 0;
+
+  for (ipix = 0; ipix < npix; ipix++)
+  {
+    image[ipix] = 0.;
+    peak_time[ipix] = -1.;
+  }
+  if ( raw == NULL || !raw->known )
+  {
+    PixelCalibrated* pc = teldata->pixcal;
+    if ( pc == NULL || !pc->known ) return -1;
+    for (ipix = 0; ipix < npix && ipix < pc->num_pixels; ipix++)
+      if ( pc->significant[ipix] ) image[ipix] = pc->pixel_pe[ipix];
+    return npix;
+  }
+  if ( raw->num_pixels < npix ) npix = raw->num_pixels;
+
+  int* sums = (int*) malloc((size_t)H_MAX_GAINS*npix*sizeof(int));
+  if ( sums == NULL ) return -1;
+  int rc = 1;
+  if ( integrator > 0 )
+    rc = integrate_samples(file, itel, integrator, params, npix, sums, peak_time);
+  if ( rc < 0 )
+  {
+    free(sums);
+    return -1;
+  }
+  if ( rc > 0 ) // Recorded sums, peak times from pixel timing
+  {
+    for (igain = 0; igain < raw->num_gains && igain < H_MAX_GAINS; igain++)
+      for (ipix = 0; ipix < npix; ipix++)
+        sums[igain*npix + ipix] = (int) raw->adc_sum[igain][ipix];
+    if ( pt != NULL && pt->known && pt->num_types > 0 )
+      for (ipix = 0; ipix < npix && ipix < pt->num_pixels; ipix++)
+        peak_time[ipix] = pt->timval[ipix][0];
+  }
+
+  for (ipix = 0; ipix < npix; ipix++)
+  {
+    double npe = 0., sig_hg = 0., npe_hg = 0., npe_lg = 0.;
+    int hg_known = raw->adc_known[HI_GAIN][ipix];
+    if ( !raw->significant[ipix] ) continue;
+    if ( hg_known )
+      sig_hg = sums[ipix] - moni->pedestal[HI_GAIN][ipix];
+    npe_hg = sig_hg * lcal->calib[HI_GAIN][ipix];
+#if ( H_MAX_GAINS >= 2 )
+    if ( raw->num_gains >= 2 && raw->adc_known[LO_GAIN][ipix] )
+      npe_lg = (sums[npix + ipix] - moni->pedestal[LO_GAIN][ipix]) * lcal->calib[LO_GAIN][ipix];
+#endif
+    if ( hg_known && sig_hg < 10000 && sig_hg > -1000 )
+      npe = npe_hg;
+    else if ( raw->num_gains >= 2 )
+      npe = npe_lg;
+    else
+      npe = npe_hg;
+    if ( clip_amp > 0. && npe > clip_amp )
+      npe = clip_amp;
+    image[ipix] = calib_scale * npe;
+  }
+  free(sums);
+  return npix;
+}
+
+//-----------------------------------------------------
+// Calibrated image of one telescope of the current event,
+// see calibrate_telescope(). image and peak_time must hold
+// get_num_pixels values.
+// Returns the number of pixels, -1 if there are no data,
+// TEL_INDEX_NOT_VALID if telescope index is not valid
+//-----------------------------------------------------
+int get_calibrated_image(HessioFile* file, int telescope_id, int integrator, const int* params,
+                         double calib_scale, double clip_amp, double* image, float* peak_time)
+{
+  if ( file->hsdata == NULL ) return -1;
+  int itel = get_telescope_index(file, telescope_id);
+  if (itel == TEL_INDEX_NOT_VALID) return TEL_INDEX_NOT_VALID;
+  return calibrate_telescope(file, itel, integrator, params, calib_scale, clip_amp,
+                             image, peak_time);
+}
+
+//-----------------------------------------------------
+// Calibrated images of the ntel telescopes of tel_ids for the
+// current event, see calibrate_telescope():
+//  mask[ntel] : 1 if the telescope has data
+//  images[ntel][max_pixels], peak_times[ntel][max_pixels]
+// Rows of telescopes without data are cleared.
+// Returns the number of telescopes with data, -1 if hsdata is not available
+//-----------------------------------------------------
+int get_calibrated_event(HessioFile* file, int integrator, const int* params, double calib_scale,
+                         double clip_amp, int ntel, const int* tel_ids, int max_pixels,
+                         uint8_t* mask, double* images, float* peak_times)
+{
+  double image[H_MAX_PIX];
+  float peak_time[H_MAX_PIX];
+  int loop = 0, ipix = 0, count = 0;
+
+  if ( file->hsdata == NULL ) return -1;
+  for (loop = 0; loop < ntel; loop++)
+  {
+    double* dest_image = images + (size_t)loop*max_pixels;
+    float* dest_time = peak_times + (size_t)loop*max_pixels;
+    int itel = get_telescope_index(file, tel_ids[loop]), npix = -1, k = 0;
+    mask[loop] = 0;
+    if ( itel != TEL_INDEX_NOT_VALID )
+    {
+      // Only telescopes with data in this event
+      for (k = 0; k < file->hsdata->event.num_teldata; k++)
+        if ( file->hsdata->event.teldata_list[k] == tel_ids[loop] ) break;
+      if ( k < file->hsdata->event.num_teldata )
+        npix = calibrate_telescope(file, itel, integrator, params, calib_scale, clip_amp,
+                                   image, peak_time);
+    }
+    if ( npix > max_pixels ) npix = max_pixels;
+    for (ipix = 0; ipix < max_pixels; ipix++)
+    {
+      dest_image[ipix] = ipix < npix ? image[ipix] : 0.;
+      dest_time[ipix] = ipix < npix ? peak_time[ipix] : -1.;
+    }
+    if ( npix >= 0 )
+    {
+      mask[loop] = 1;
+      count++;
+    }
+  }
+  return count;
+}
+
+//-----------------------------------------------------
+// Read up to batch_size events of one run and fill the calibrated
+// images of the ntel telescopes of tel_ids, see get_calibrated_event():
+//  event_info[batch_size][2] : run, event_id
+//  mask[batch_size][ntel] : 1 if the telescope has data
+//  images[batch_size][ntel][max_pixels]
+//  peak_times[batch_size][ntel][max_pixels]
+// Reading stops before an event of another run, which then
+// stays pending for the next call.
+// Returns the number of events read, 0 at end of file,
+// -1 if hsdata is not available
+//-----------------------------------------------------
+int read_calibrated_images(HessioFile* file, int batch_size, int integrator, const int* params,
+                           double calib_scale, double clip_amp, int ntel, const int* tel_ids,
+                           int max_pixels, int* event_info, uint8_t* mask, double* images,
+                           float* peak_times)
+{
+  int nevents = 0, batch_run = -1;
+
+  while ( nevents < batch_size )
+  {
+    size_t offset = (size_t)nevents*ntel;
+    int run = peek_event(file);
+    if ( run < 0 ) break;
+    if ( nevents > 0 && run != batch_run ) break;
+    batch_run = run;
+    file->pending = 0;
+
+    event_info[2*nevents] = run;
+    event_info[2*nevents+1] = file->pending_event_id;
+    if ( get_calibrated_event(file, integrator, params, calib_scale, clip_amp, ntel, tel_ids,
+                              max_pixels, mask + offset, images + offset*max_pixels,
+                              peak_times + offset*max_pixels) < 0 )
+      return -1;
+    nevents++;
+  }
+  return nevents;
+}
+
+//-----------------------------------------------------
+// Dual-level tail-cut cleaning, as clean_image_tailcut() of
+// reconstruct.c: pixels above the high threshold with a neighbour
+// above the low one, and pixels above the low threshold with a
+// neighbour above the high one. If lref > 0 and minfrac > 0, pixels
+// below minfrac times the amplitude of the lref-th brightest pixel
+// of the image are dropped.
+// Fills pixel_list with the image pixels.
+// Returns the number of image pixels
+//-----------------------------------------------------
+static int clean_image_tailcut(const double* amp, int npix, const int* neighbours,
+                               double low, double high, int lref, double minfrac,
+                               int* pixel_list)
+{
+  uint8_t pass[H_MAX_PIX]; // 1: above low threshold, 2: above high threshold
+  int ipix = 0, inb = 0, numpix = 0;
+
+  for (ipix = 0; ipix < npix; ipix++)
+    pass[ipix] = amp[ipix] < low ? 0 : (amp[ipix] < high ? 1 : 2);
+
+  for (ipix = 0; ipix < npix; ipix++)
+  {
+    const int* nb = neighbours + ipix*H_MAX_NB;
+    if ( pass[ipix] == 0 ) continue;
+    for (inb = 0; inb < H_MAX_NB && nb[inb] >= 0; inb++)
+    {
+      if ( pass[nb[inb]] >= (pass[ipix] == 2 ? 1 : 2) )
+      {
+        pixel_list[numpix++] = ipix;
+        break;
+      }
+    }
+  }
+
+  // Sort by amplitude to cut at a fraction of the lref-th brightest pixel
+  if ( lref > 0 && lref < numpix && minfrac > 0. )
+  {
+    int i = 0, j = 0;
+    for (i = 0; i < numpix; i++)
+    {
+      for (j = i+1; j < numpix; j++)
+      {
+        if ( amp[pixel_list[j]] > amp[pixel_list[i]] )
+        {
+          int swap = pixel_list[i];
+          pixel_list[i] = pixel_list[j];
+          pixel_list[j] = swap;
+        }
+      }
+    }
+    double refamp = amp[pixel_list[lref-1]];
+    for (i = lref; i < numpix; i++)
+    {
+      if ( amp[pixel_list[i]] < minfrac*refamp )
+      {
+        numpix = i;
+        break;
+      }
+    }
+  }
+  return numpix;
+}
+
+//-----------------------------------------------------
+// Second moments (Hillas) parameters of the image pixels, as
+// second_moments() of reconstruct.c, filling parameters with
+// NUM_IMAGE_PARAMETERS values:
+//  amplitude [peak p.e.], number of pixels,
+//  x, y of the centre of gravity, direction phi of the major axis,
+//  width, length [rad], skewness, kurtosis
+// Returns 0, -1 with less than 2 pixels or an amplitude below 1
+//-----------------------------------------------------
+#define NUM_IMAGE_PARAMETERS 9
+static int second_moments(const CameraSettings* camset, const double* amp,
+                          const int* pixel_list, int numpix, double* parameters)
+{
+  double sx = 0., sy = 0., sxx = 0., sxy = 0., syy = 0., sA = 0.;
+  double img_scale = 1./camset->flen;
+  double b = 0., sx3 = 0., sx4 = 0., beta = 0., cb = 0., sb = 0.;
+  double width = 0., length = 0., xmean = 0., ymean = 0., direction = 0.;
+  double skewness = 0., kurtosis = 0.;
+  int j = 0;
+
+  for (j = 0; j < NUM_IMAGE_PARAMETERS; j++) parameters[j] = 0.;
+  for (j = 0; j < numpix; j++) sA += amp[pixel_list[j]];
+  parameters[0] = sA;
+  parameters[1] = numpix;
+  if ( numpix < 2 || sA < 1. ) // Minimum 2 pixels
+    return -1;
+
+  for (j = 0; j < numpix; j++)
+  {
+    int ipix = pixel_list[j];
+    double x = camset->xpix[ipix], y = camset->ypix[ipix], A = amp[ipix];
+    sx  += (A * x);
+    sxx += (A * x) * x;
+    sxy += (A * x) * y;
+    sy  += (A * y);
+    syy += (A * y) * y;
+  }
+  sx /= sA;
+  sy /= sA;
+  sxx = sxx/sA - sx*sx;
+  sxy = sxy/sA - sx*sy;
+  syy = syy/sA - sy*sy;
+
+  if ( fabs(sxy) > 1e-8*fabs(sxx) && fabs(sxy) > 1e-8*fabs(syy) )
+  {
+    double p1 = syy - sxx, p2 = sxy*sxy, q = 0., r1 = 0., r2 = 0.;
+    if ( p2 > 1e-8*(p1*p1) )
+      q = p1 + sqrt(p1*p1+4.*p2);
+    else
+      q = 2.*p2;
+    b = 0.5 * q/sxy;
+    length = (r1 = syy + 2.*p2/q) > 0. ? img_scale * sqrt(r1) : 0.;
+    width = (r2 = sxx - 2.*p2/q) > 0. ? img_scale * sqrt(r2) : 0.;
+  }
+  else
+  {
+    if ( fabs(syy) < 1e-8*fabs(sxx) )
+      syy = 0.;
+    else if ( fabs(sxx) < 1e-8*fabs(syy) )
+      sxx = 0.;
+    if ( sxx > syy && syy >= 0. )
+    {
+      length = img_scale * sqrt(sxx);
+      width = img_scale * sqrt(syy);
+      b = 0.;
+    }
+    else if ( syy >= 0. && sxx >= 0. )
+    {
+      length = img_scale * sqrt(syy);
+      width = img_scale * sqrt(sxx);
+      b = 100000.;
+    }
+    else
+    {
+      b = 0.;
+      length = width = img_scale * 0.001;
+    }
+  }
+  beta = atan(b);
+  cb = cos(beta);
+  sb = sin(beta);
+  xmean = img_scale * sx;
+  ymean = img_scale * sy;
+  direction = beta + camset->cam_rot;
+  if ( camset->cam_rot != 0. )
+  {
+    double rmean = sqrt(xmean*xmean + ymean*ymean);
+    double rphi = atan2(ymean,xmean) + camset->cam_rot;
+    xmean = rmean * cos(rphi);
+    ymean = rmean * sin(rphi);
+  }
+
+  sxx = 0.;
+  for (j = 0; j < numpix; j++)
+  {
+    int ipix = pixel_list[j];
+    double A = amp[ipix];
+    double xp = cb*(camset->xpix[ipix]-sx) + sb*(camset->ypix[ipix]-sy);
+    sxx += (A*xp) * xp;
+    sx3 += ((A*xp) * xp) * xp;
+    sx4 += (((A*xp) * xp) * xp) * xp;
+  }
+  skewness = sxx > 0. ? sx3/pow(sxx,1.5) : 0.;
+  if ( skewness < 0. )
+    direction += M_PI;
+  kurtosis = sxx > 0. ? sx4/(sxx*sxx) - 3. : 0.;
+
+  parameters[2] = xmean;
+  parameters[3] = ymean;
+  parameters[4] = direction;
+  parameters[5] = width;
+  parameters[6] = length;
+  parameters[7] = skewness;
+  parameters[8] = kurtosis;
+  return 0;
+}
+
+//-----------------------------------------------------
+// Calibrate, clean and parametrize the images of the ntel
+// telescopes of tel_ids in the current event.
+// cuts: calib_scale, clip_amp, low and high tail-cut thresholds
+// [peak p.e.], minfrac and lref (see clean_image_tailcut)
+// Fills for each telescope, if not NULL:
+//  mask[ntel] : 1 if the telescope has data
+//  images[ntel][max_pixels] : calibrated image
+//  image_pixels[ntel][max_pixels] : 1 for pixels kept by the cleaning
+//  parameters[ntel][NUM_IMAGE_PARAMETERS] : see second_moments,
+//  NaN past the number of pixels if the image is too small
+//  pointing[ntel][2] : azimuth and altitude of the telescope [rad],
+//  corrected for pointing errors if known, NaN if not known
+// Returns the number of telescopes with data
+//-----------------------------------------------------
+static int parametrize_event(HessioFile* file, int integrator, const int* params,
+                             const double* cuts, int ntel, const int* tel_ids, int max_pixels,
+                             uint8_t* mask, double* images, uint8_t* image_pixels,
+                             double* parameters, double* pointing)
+{
+  double image[H_MAX_PIX];
+  float peak_time[H_MAX_PIX];
+  int pixel_list[H_MAX_PIX];
+  int loop = 0, ipix = 0, count = 0, k = 0;
+
+  for (loop = 0; loop < ntel; loop++)
+  {
+    double* dest = parameters + (size_t)loop*NUM_IMAGE_PARAMETERS;
+    int itel = get_telescope_index(file, tel_ids[loop]), npix = -1, numpix = 0;
+    const int* neighbours = NULL;
+
+    mask[loop] = 0;
+    for (k = 0; k < NUM_IMAGE_PARAMETERS; k++) dest[k] = k < 2 ? 0. : NAN;
+    pointing[2*loop] = pointing[2*loop+1] = NAN;
+    if ( images != NULL )
+      memset(images + (size_t)loop*max_pixels, 0, max_pixels*sizeof(double));
+    if ( image_pixels != NULL )
+      memset(image_pixels + (size_t)loop*max_pixels, 0, max_pixels);
+    if ( itel == TEL_INDEX_NOT_VALID ) continue;
+
+    // Only telescopes with data in this event
+    for (k = 0; k < file->hsdata->event.num_teldata; k++)
+      if ( file->hsdata->event.teldata_list[k] == tel_ids[loop] ) break;
+    if ( k == file->hsdata->event.num_teldata ) continue;
+    TrackEvent* track = &file->hsdata->event.trackdata[itel];
+    if ( track->cor_known )
+    {
+      pointing[2*loop] = track->azimuth_cor;
+      pointing[2*loop+1] = track->altitude_cor;
+    }
+    else if ( track->raw_known )
+    {
+      pointing[2*loop] = track->azimuth_raw;
+      pointing[2*loop+1] = track->altitude_raw;
+    }
+    npix = calibrate_telescope(file, itel, integrator, params, cuts[0], cuts[1],
+                               image, peak_time);
+    if ( npix < 0 ) continue;
+    mask[loop] = 1;
+    count++;
+
+    if ( (neighbours = find_neighbours(file, itel)) != NULL )
+      numpix = clean_image_tailcut(image, npix, neighbours, cuts[2], cuts[3],
+                                   (int) cuts[5], cuts[4], pixel_list);
+    second_moments(&file->hsdata->camera_set[itel], image, pixel_list, numpix, dest);
+
+    if ( npix > max_pixels ) npix = max_pixels;
+    if ( images != NULL )
+      memcpy(images + (size_t)loop*max_pixels, image, npix*sizeof(double));
+    if ( image_pixels != NULL )
+      for (ipix = 0; ipix < numpix; ipix++)
+        if ( pixel_list[ipix] < max_pixels )
+          image_pixels[(size_t)loop*max_pixels + pixel_list[ipix]] = 1;
+  }
+  return count;
+}
+
+//-----------------------------------------------------
+// Calibrated images, their tail-cut cleaning and their second
+// moments parameters for the ntel telescopes of tel_ids in the
+// current event, see parametrize_event(). The calibration is
+// that of get_calibrated_event().
+// Returns the number of telescopes with data, -1 if hsdata is not available
+//-----------------------------------------------------
+int get_image_parameters(HessioFile* file, int integrator, const int* params, const double* cuts,
+                         int ntel, const int* tel_ids, int max_pixels, uint8_t* mask,
+                         double* images, uint8_t* image_pixels, double* parameters,
+                         double* pointing)
+{
+  if ( file->hsdata == NULL ) return -1;
+  return parametrize_event(file, integrator, params, cuts, ntel, tel_ids, max_pixels,
+                           mask, images, image_pixels, parameters, pointing);
+}
+
+//-----------------------------------------------------
+// Read up to batch_size events of one run and fill the image
+// parameters of the ntel telescopes of tel_ids, see
+// get_image_parameters():
+//  event_info[batch_size][2] : run, event_id
+//  mask[batch_size][ntel] : 1 if the telescope has data
+//  parameters[batch_size][ntel][NUM_IMAGE_PARAMETERS]
+//  pointing[batch_size][ntel][2]
+// Reading stops before an event of another run, which then
+// stays pending for the next call.
+// Returns the number of events read, 0 at end of file
+//-----------------------------------------------------
+int read_image_parameters(HessioFile* file, int batch_size, int integrator, const int* params,
+                          const double* cuts, int ntel, const int* tel_ids, int* event_info,
+                          uint8_t* mask, double* parameters, double* pointing)
+{
+  int nevents = 0, batch_run = -1;
+
+  while ( nevents < batch_size )
+  {
+    int run = peek_event(file);
+    if ( run < 0 ) break;
+    if ( nevents > 0 && run != batch_run ) break;
+    batch_run = run;
+    file->pending = 0;
+
+    event_info[2*nevents] = run;
+    event_info[2*nevents+1] = file->pending_event_id;
+    parametrize_event(file, integrator, params, cuts, ntel, tel_ids, 0,
+                      mask + (size_t)nevents*ntel, NULL, NULL,
+                      parameters + (size_t)nevents*ntel*NUM_IMAGE_PARAMETERS,
+                      pointing + (size_t)nevents*ntel*2);
+    nevents++;
+  }
+  return nevents;
+}
+
+//-----------------------------------------------------
+// Positions of the ntel telescopes of tel_ids in the array,
+// positions[ntel][3] (x, y, z [m], NaN for unknown telescopes),
+// and the nominal pointing direction of the run,
+// direction[2] (azimuth, altitude [rad])
+// Returns 0, -1 if no run header was read
+//-----------------------------------------------------
+int get_array_layout(HessioFile* file, int ntel, const int* tel_ids, double* positions,
+                     double* direction)
+{
+  int loop = 0, k = 0;
+  if ( file->hsdata == NULL ) return -1;
+  for (loop = 0; loop < ntel; loop++)
+  {
+    int itel = get_telescope_index(file, tel_ids[loop]);
+    for (k = 0; k < 3; k++)
+      positions[3*loop+k] = itel == TEL_INDEX_NOT_VALID ? NAN :
+                            file->hsdata->run_header.tel_pos[itel][k];
+  }
+  direction[0] = file->hsdata->run_header.direction[0];
+  direction[1] = file->hsdata->run_header.direction[1];
+  return 0;
+}
+
+//-----------------------------------------------------
+// Geometric reconstruction of the direction and core position
+// of nevents showers, each seen by up to ntel telescopes, from the
+// image parameters of get_image_parameters, as shower_reconstruct()
+// of reconstruct.c does with shower_geometric_reconstruction():
+//  mask[nevents][ntel] : 1 for telescopes with an image
+//  parameters[nevents][ntel][NUM_IMAGE_PARAMETERS]
+//  pointing[nevents][ntel][2] : telescope azimuth and altitude [rad]
+//  positions[ntel][3] : telescope x, y, z [m]
+//  reference[nevents][2] : nominal azimuth and altitude [rad]
+//  cuts: minimum amplitude [peak p.e.], minimum number of pixels,
+//  maximum distance of the image centre of gravity from the
+//  camera centre [rad], used to select the images
+//  flag: derive the core position with the reconstructed
+//  direction (0) or with the reference direction (1)
+// Fills showers[nevents][NUM_SHOWER_RESULTS] with
+//  azimuth, altitude [rad], core x, y [m], direction [rad] and
+//  core position [m] uncertainties, number of images used,
+//  result bits (1: direction, 2: errors, 4: core position)
+// NaN for what could not be reconstructed, uncertainties need
+// more than 2 images.
+// Returns the number of showers reconstructed
+//-----------------------------------------------------
+#define NUM_SHOWER_RESULTS 8
+int reconstruct_showers(int nevents, int ntel, const uint8_t* mask, const double* parameters,
+                        const double* pointing, const double* positions, const double* reference,
+                        const double* cuts, int flag, double* showers)
+{
+  double amp[H_MAX_TEL], ximg[H_MAX_TEL], yimg[H_MAX_TEL], phi[H_MAX_TEL], disp[H_MAX_TEL];
+  double xtel[H_MAX_TEL], ytel[H_MAX_TEL], ztel[H_MAX_TEL];
+  double az[H_MAX_TEL], alt[H_MAX_TEL], flen[H_MAX_TEL], cam_rot[H_MAX_TEL];
+  int ievent = 0, loop = 0, k = 0, count = 0;
+
+  if ( ntel > H_MAX_TEL ) return -1;
+  for (ievent = 0; ievent < nevents; ievent++)
+  {
+    double* shower = showers + (size_t)ievent*NUM_SHOWER_RESULTS;
+    double shower_az = 0., shower_alt = 0., xcore = 0., ycore = 0., var_dir = 0., var_core = 0.;
+    int nimg = 0, rc = 0;
+
+    for (k = 0; k < NUM_SHOWER_RESULTS; k++) shower[k] = NAN;
+    shower[6] = shower[7] = 0.;
+    for (loop = 0; loop < ntel; loop++)
+    {
+      size_t slot = (size_t)ievent*ntel + loop;
+      const double* img = parameters + slot*NUM_IMAGE_PARAMETERS;
+      const double* dir = pointing + slot*2;
+      // amplitude, pixels, x, y, phi, width, length (see second_moments)
+      if ( !mask[slot] || img[0] < cuts[0] || img[1] < cuts[1] ) continue;
+      if ( isnan(img[2]) || isnan(dir[0]) || isnan(positions[3*loop]) ) continue;
+      if ( sqrt(img[2]*img[2] + img[3]*img[3]) > cuts[2] ) continue;
+      amp[nimg] = img[0];
+      ximg[nimg] = img[2];
+      yimg[nimg] = img[3];
+      phi[nimg] = img[4];
+      disp[nimg] = (img[6] > 0. && img[6] > img[5]) ? 1.-img[5]/img[6] : 1e-3;
+      flen[nimg] = 1.0; // Image parameters are angles
+      cam_rot[nimg] = 0.; // and include the camera rotation
+      xtel[nimg] = positions[3*loop];
+      ytel[nimg] = positions[3*loop+1];
+      ztel[nimg] = positions[3*loop+2];
+      az[nimg] = dir[0];
+      alt[nimg] = dir[1];
+      nimg++;
+    }
+    shower[6] = nimg;
+    if ( nimg < 2 ) continue;
+
+    rc = shower_geometric_reconstruction(nimg, amp, ximg, yimg, phi, disp,
+                                         xtel, ytel, ztel, az, alt, flen, cam_rot,
+                                         reference[2*ievent], reference[2*ievent+1], flag,
+                                         &shower_az, &shower_alt, &var_dir,
+                                         &xcore, &ycore, &var_core);
+    if ( rc < 1 ) continue;
+    count++;
+    shower[0] = shower_az;
+    shower[1] = shower_alt;
+    shower[7] = 1;
+    if ( nimg > 2 )
+    {
+      // Assuming equal contributions in both coordinates
+      shower[4] = var_dir > 0. ? sqrt(var_dir/(nimg-2.)/2.) : 0.;
+      shower[7] += 2;
+    }
+    if ( rc >= 2 )
+    {
+      shower[2] = xcore;
+      shower[3] = ycore;
+      if ( nimg > 2 ) shower[5] = var_core > 0. ? sqrt(var_core/(nimg-2.)/2.) : 0.;
+      shower[7] += 4;
+    }
+  }
+  return count;
+}
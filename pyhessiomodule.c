@@ -0,0 +1,431 @@
+/** @file pyhessiomodule.c
+ *  @short CPython extension with fast paths to the pyhessio.c wrappers
+ *
+ * The functions called for every event and telescope are exposed
+ * here with METH_FASTCALL: arguments are converted without ctypes,
+ * result arrays are allocated with the NumPy C API and errors are
+ * raised directly as the exceptions of hessio.py.
+ * The first argument is always the HessioFile handle (an int) from
+ * allocate_hessio_file; the module links against pyhessio.so, so both
+ * share the same handles and libhessio state.
+ *
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
+#include <numpy/arrayobject.h>
+#include <stdint.h>
+#include <limits.h>
+#include <time.h>
+
+#define TEL_INDEX_NOT_VALID -2
+
+// Functions from pyhessio.c, on an opaque HessioFile handle
+int move_to_next_event(void* file, int *event_id);
+int get_num_teldata(void* file);
+int get_telescope_with_data_list(void* file, int* list);
+int get_num_channel(void* file, int telescope_id);
+int get_num_pixels(void* file, int telescope_id);
+int get_num_samples(void* file, int telescope_id);
+int get_pixel_timing_num_times_types(void* file, int telescope_id);
+int get_adc_sum(void* file, int telescope_id, int channel, uint32_t *data);
+int get_adc_sample(void* file, int telescope_id, int channel, uint16_t *data);
+int get_pixel_timing_timval(void* file, int telescope_id, float *data);
+int get_pixel_timing_peak_global(void* file, int telescope_id, float *result);
+
+// Exceptions of hessio.py, given by set_exceptions
+static PyObject* general_error = NULL;
+static PyObject* telescope_index_error = NULL;
+static PyObject* channel_index_error = NULL;
+
+// Statistics of the result arrays allocated here, added to the
+// allocation statistics of hessio.stats(): calls, bytes and ns.
+// Only changed with the GIL held.
+static int stats_enabled = 0;
+static long long allocation_stats[3] = {0, 0, 0};
+
+//-----------------------------------
+// PyArray_ZEROS(nd, dims, type, 0), counted in the allocation
+// statistics if they are enabled
+//-----------------------------------
+static PyObject* zeros(int nd, npy_intp* dims, int type)
+{
+  struct timespec start, end;
+  PyObject* array = NULL;
+  if ( !stats_enabled ) return PyArray_ZEROS(nd, dims, type, 0);
+  clock_gettime(CLOCK_MONOTONIC, &start);
+  array = PyArray_ZEROS(nd, dims, type, 0);
+  clock_gettime(CLOCK_MONOTONIC, &end);
+  if ( array != NULL )
+  {
+    allocation_stats[0]++;
+    allocation_stats[1] += PyArray_NBYTES((PyArrayObject*)array);
+    allocation_stats[2] += (end.tv_sec - start.tv_sec)*1000000000LL + end.tv_nsec - start.tv_nsec;
+  }
+  return array;
+}
+
+//-----------------------------------
+// Convert the handle and nint int arguments of a fast call.
+// Returns 0, or -1 with an exception set
+//-----------------------------------
+static int parse_args(const char* name, PyObject* const* args, Py_ssize_t nargs,
+                      void** file, int nint, int* values)
+{
+  int loop = 0;
+  if ( nargs != nint + 1 )
+  {
+    PyErr_Format(PyExc_TypeError, "%s() takes %d arguments (%zd given)",
+                 name, nint + 1, nargs);
+    return -1;
+  }
+  *file = PyLong_AsVoidPtr(args[0]);
+  if ( *file == NULL )
+  {
+    if ( !PyErr_Occurred() )
+      PyErr_Format(PyExc_ValueError, "%s(): no file handle", name);
+    return -1;
+  }
+  for (loop = 0; loop < nint; loop++)
+  {
+    long value = PyLong_AsLong(args[loop + 1]);
+    if ( value == -1 && PyErr_Occurred() ) return -1;
+    if ( value < INT_MIN || value > INT_MAX )
+    {
+      PyErr_Format(PyExc_OverflowError, "%s(): argument %d out of range", name, loop + 1);
+      return -1;
+    }
+    values[loop] = (int)value;
+  }
+  return 0;
+}
+
+//-----------------------------------
+// Raise HessioTelescopeIndexError or HessioGeneralError(message)
+// for the error code result. Returns NULL
+//-----------------------------------
+static PyObject* raise_error(int result, int telescope_id, const char* message)
+{
+  if ( result == TEL_INDEX_NOT_VALID )
+    PyErr_Format(telescope_index_error, "no telescope wth id %d", telescope_id);
+  else
+    PyErr_SetString(general_error, message);
+  return NULL;
+}
+
+//-----------------------------------
+// Check channel as hessio.py does: raises HessioChannelIndexError
+// if it is above the number of channels of the telescope.
+// Returns 0, or -1 with an exception set
+//-----------------------------------
+static int check_channel(void* file, int telescope_id, int channel)
+{
+  int num_channel = get_num_channel(file, telescope_id);
+  if ( num_channel < 0 )
+  {
+    raise_error(num_channel, telescope_id, " hsdata->event.teldata[itel].raw not available");
+    return -1;
+  }
+  if ( channel > num_channel - 1 )
+  {
+    PyErr_Format(channel_index_error, "telescope %d has not channel %d", telescope_id, channel);
+    return -1;
+  }
+  return 0;
+}
+
+//-----------------------------------
+// set_exceptions(general, telescope_index, channel_index)
+//-----------------------------------
+static PyObject* set_exceptions(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  int loop = 0;
+  PyObject** errors[3] = {&general_error, &telescope_index_error, &channel_index_error};
+  if ( nargs != 3 )
+  {
+    PyErr_SetString(PyExc_TypeError, "set_exceptions() takes 3 arguments");
+    return NULL;
+  }
+  for (loop = 0; loop < 3; loop++)
+  {
+    Py_INCREF(args[loop]);
+    Py_XSETREF(*errors[loop], args[loop]);
+  }
+  Py_RETURN_NONE;
+}
+
+//-----------------------------------
+// set_stats(enable): count the allocations of result arrays
+//-----------------------------------
+static PyObject* set_stats(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  if ( nargs != 1 )
+  {
+    PyErr_SetString(PyExc_TypeError, "set_stats() takes 1 argument");
+    return NULL;
+  }
+  int enable = PyObject_IsTrue(args[0]);
+  if ( enable < 0 ) return NULL;
+  stats_enabled = enable;
+  Py_RETURN_NONE;
+}
+
+//-----------------------------------
+// reset_stats(): set the allocation statistics to zero
+//-----------------------------------
+static PyObject* reset_stats(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  allocation_stats[0] = allocation_stats[1] = allocation_stats[2] = 0;
+  Py_RETURN_NONE;
+}
+
+//-----------------------------------
+// get_allocation_stats() -> (calls, bytes, ns)
+//-----------------------------------
+static PyObject* get_allocation_stats(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  return Py_BuildValue("(LLL)", allocation_stats[0], allocation_stats[1], allocation_stats[2]);
+}
+
+//-----------------------------------
+// move_to_next_event(file) -> (run, event_id), run is -1 at end of file
+//-----------------------------------
+static PyObject* fast_move_to_next_event(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  void* file = NULL;
+  int event_id = 0, run = 0;
+  if ( parse_args("move_to_next_event", args, nargs, &file, 0, NULL) != 0 ) return NULL;
+  Py_BEGIN_ALLOW_THREADS
+  run = move_to_next_event(file, &event_id);
+  Py_END_ALLOW_THREADS
+  return Py_BuildValue("(ii)", run, event_id);
+}
+
+//-----------------------------------
+// get_num_teldata(file) -> int
+//-----------------------------------
+static PyObject* fast_get_num_teldata(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  void* file = NULL;
+  if ( parse_args("get_num_teldata", args, nargs, &file, 0, NULL) != 0 ) return NULL;
+  int number = get_num_teldata(file);
+  if ( number > 0 ) return PyLong_FromLong(number);
+  PyErr_SetString(general_error, "hsdata->event.num_teldata is not available");
+  return NULL;
+}
+
+//-----------------------------------
+// get_teldata_list(file) -> int32 array
+//-----------------------------------
+static PyObject* fast_get_teldata_list(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  void* file = NULL;
+  if ( parse_args("get_teldata_list", args, nargs, &file, 0, NULL) != 0 ) return NULL;
+  int number = get_num_teldata(file);
+  if ( number <= 0 )
+  {
+    PyErr_SetString(general_error, "hsdata->event.num_teldata is not available");
+    return NULL;
+  }
+  npy_intp dims[1] = {number};
+  PyObject* array = zeros(1, dims, NPY_INT32);
+  if ( array == NULL ) return NULL;
+  get_telescope_with_data_list(file, (int*)PyArray_DATA((PyArrayObject*)array));
+  return array;
+}
+
+//-----------------------------------
+// get_telescope_with_data_list(file) -> int32 array
+//-----------------------------------
+static PyObject* fast_get_telescope_with_data_list(PyObject* module, PyObject* const* args,
+                                                   Py_ssize_t nargs)
+{
+  PyObject* array = fast_get_teldata_list(module, args, nargs);
+  if ( array == NULL && PyErr_ExceptionMatches(general_error) )
+  {
+    PyErr_Clear();
+    PyErr_SetString(general_error, "hsdata->event.teldata_list is not available");
+  }
+  return array;
+}
+
+//-----------------------------------
+// One function per int getter of a telescope, with the
+// message of hessio.py for the HessioGeneralError
+//-----------------------------------
+#define TELESCOPE_GETTER(NAME, MESSAGE) \
+static PyObject* fast_##NAME(PyObject* module, PyObject* const* args, Py_ssize_t nargs) \
+{ \
+  void* file = NULL; \
+  int telescope_id = 0; \
+  if ( parse_args(#NAME, args, nargs, &file, 1, &telescope_id) != 0 ) return NULL; \
+  int result = NAME(file, telescope_id); \
+  if ( result >= 0 ) return PyLong_FromLong(result); \
+  return raise_error(result, telescope_id, MESSAGE); \
+}
+
+TELESCOPE_GETTER(get_num_channel, " hsdata->event.teldata[itel].raw not available")
+TELESCOPE_GETTER(get_num_pixels, "hsdata->camera_set[itel].num_pixels not available")
+TELESCOPE_GETTER(get_num_samples, "ata->event.teldata[itel].raw->num->samples not available")
+TELESCOPE_GETTER(get_pixel_timing_num_times_types,
+                 "hsdata->event.teldata[itel].pixtm->num_types  not available")
+
+//-----------------------------------
+// get_adc_sum(file, telescope_id, channel) -> int32 array (num_pixels)
+//-----------------------------------
+static PyObject* fast_get_adc_sum(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  void* file = NULL;
+  int values[2];
+  if ( parse_args("get_adc_sum", args, nargs, &file, 2, values) != 0 ) return NULL;
+  int telescope_id = values[0], channel = values[1];
+  if ( check_channel(file, telescope_id, channel) != 0 ) return NULL;
+
+  int npix = get_num_pixels(file, telescope_id);
+  if ( npix < 0 )
+    return raise_error(npix, telescope_id, "hsdata->camera_set[itel].num_pixels not available");
+  npy_intp dims[1] = {npix};
+  PyObject* array = zeros(1, dims, NPY_INT32);
+  if ( array == NULL ) return NULL;
+  int result = get_adc_sum(file, telescope_id, channel,
+                           (uint32_t*)PyArray_DATA((PyArrayObject*)array));
+  if ( result == 0 ) return array;
+  Py_DECREF(array);
+  PyErr_Format(result == TEL_INDEX_NOT_VALID ? telescope_index_error : general_error,
+               result == TEL_INDEX_NOT_VALID ? "no telescope wth id %d" : "No adc_sum for telescope %d",
+               telescope_id);
+  return NULL;
+}
+
+//-----------------------------------
+// get_adc_sample(file, telescope_id, channel)
+//  -> uint16 array (num_pixels, num_samples), or an empty
+//  array if no samples were recorded
+//-----------------------------------
+static PyObject* fast_get_adc_sample(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+  void* file = NULL;
+  int values[2];
+  if ( parse_args("get_adc_sample", args, nargs, &file, 2, values) != 0 ) return NULL;
+  int telescope_id = values[0], channel = values[1];
+  if ( check_channel(file, telescope_id, channel) != 0 ) return NULL;
+
+  int npix = get_num_pixels(file, telescope_id);
+  int nsamples = npix < 0 ? npix : get_num_samples(file, telescope_id);
+  int result = nsamples < 0 ? nsamples : 0;
+  PyObject* array = NULL;
+  if ( result == 0 && nsamples == 0 )
+  {
+    npy_intp dims[1] = {0};
+    return zeros(1, dims, NPY_DOUBLE);
+  }
+  if ( result == 0 )
+  {
+    npy_intp dims[2] = {npix, nsamples};
+    array = zeros(2, dims, NPY_UINT16);
+    if ( array == NULL ) return NULL;
+    result = get_adc_sample(file, telescope_id, channel,
+                            (uint16_t*)PyArray_DATA((PyArrayObject*)array));
+    if ( result == 0 ) return array;
+    Py_DECREF(array);
+  }
+  if ( result == TEL_INDEX_NOT_VALID )
+    PyErr_Format(telescope_index_error, "no telescope wth id %d", telescope_id);
+  else
+    PyErr_Format(general_error, "adc sample not available for telescope %d and channel %d",
+                 telescope_id, channel);
+  return NULL;
+}
+
+//-----------------------------------
+// get_pixel_timing_timval(file, telescope_id)
+//  -> float32 array (num_pixels, num_times)
+//-----------------------------------
+static PyObject* fast_get_pixel_timing_timval(PyObject* module, PyObject* const* args,
+                                              Py_ssize_t nargs)
+{
+  void* file = NULL;
+  int telescope_id = 0;
+  if ( parse_args("get_pixel_timing_timval", args, nargs, &file, 1, &telescope_id) != 0 )
+    return NULL;
+  int npix = get_num_pixels(file, telescope_id);
+  if ( npix < 0 )
+    return raise_error(npix, telescope_id, "hsdata->camera_set[itel].num_pixels not available");
+  int ntimes = get_pixel_timing_num_times_types(file, telescope_id);
+  if ( ntimes < 0 )
+    return raise_error(ntimes, telescope_id,
+                       "hsdata->event.teldata[itel].pixtm->num_types  not available");
+
+  npy_intp dims[2] = {npix, ntimes};
+  PyObject* array = zeros(2, dims, NPY_FLOAT32);
+  if ( array == NULL ) return NULL;
+  int result = get_pixel_timing_timval(file, telescope_id,
+                                       (float*)PyArray_DATA((PyArrayObject*)array));
+  if ( result == 0 ) return array;
+  Py_DECREF(array);
+  if ( result == TEL_INDEX_NOT_VALID )
+    PyErr_Format(telescope_index_error, "no telescope wth id %d", telescope_id);
+  else
+    PyErr_Format(general_error, "no pixel timing timval for telescope %d", telescope_id);
+  return NULL;
+}
+
+//-----------------------------------
+// get_pixel_timing_peak_global(file, telescope_id) -> numpy.float32
+//-----------------------------------
+static PyObject* fast_get_pixel_timing_peak_global(PyObject* module, PyObject* const* args,
+                                                   Py_ssize_t nargs)
+{
+  void* file = NULL;
+  int telescope_id = 0;
+  float peak = 0.;
+  if ( parse_args("get_pixel_timing_peak_global", args, nargs, &file, 1, &telescope_id) != 0 )
+    return NULL;
+  int result = get_pixel_timing_peak_global(file, telescope_id, &peak);
+  if ( result == 0 )
+    return PyArray_Scalar(&peak, PyArray_DescrFromType(NPY_FLOAT32), NULL);
+  return raise_error(result, telescope_id, "hsdata->event.teldata[itel].pixtm; not available");
+}
+
+#define FAST_METHOD(NAME) {#NAME, (PyCFunction)(void(*)(void))fast_##NAME, METH_FASTCALL, NULL}
+
+static PyMethodDef methods[] = {
+  {"set_exceptions", (PyCFunction)(void(*)(void))set_exceptions, METH_FASTCALL,
+   "set_exceptions(general, telescope_index, channel_index): exceptions to raise"},
+  {"set_stats", (PyCFunction)(void(*)(void))set_stats, METH_FASTCALL,
+   "set_stats(enable): count the allocations of result arrays"},
+  {"reset_stats", (PyCFunction)(void(*)(void))reset_stats, METH_FASTCALL,
+   "reset_stats(): set the allocation statistics to zero"},
+  {"get_allocation_stats", (PyCFunction)(void(*)(void))get_allocation_stats, METH_FASTCALL,
+   "get_allocation_stats() -> (calls, bytes, ns) of the result arrays"},
+  FAST_METHOD(move_to_next_event),
+  FAST_METHOD(get_num_teldata),
+  FAST_METHOD(get_teldata_list),
+  FAST_METHOD(get_telescope_with_data_list),
+  FAST_METHOD(get_num_channel),
+  FAST_METHOD(get_num_pixels),
+  FAST_METHOD(get_num_samples),
+  FAST_METHOD(get_pixel_timing_num_times_types),
+  FAST_METHOD(get_adc_sum),
+  FAST_METHOD(get_adc_sample),
+  FAST_METHOD(get_pixel_timing_timval),
+  FAST_METHOD(get_pixel_timing_peak_global),
+  {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module = {
+  PyModuleDef_HEAD_INIT, "_pyhessio",
+  "Fast paths to the pyhessio C wrappers, used by hessio.py when built", -1, methods
+};
+
+PyMODINIT_FUNC PyInit__pyhessio(void)
+{
+  import_array();
+  general_error = PyExc_RuntimeError;
+  telescope_index_error = PyExc_IndexError;
+  channel_index_error = PyExc_IndexError;
+  Py_INCREF(general_error);
+  Py_INCREF(telescope_index_error);
+  Py_INCREF(channel_index_error);
+  return PyModule_Create(&module);
+}
@@ -1,6 +1,9 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 import numpy as np
-from hessio import HessioChannelIndexError
+from hessio import HessioChannelIndexError, H_MAX_GAINS, IO_TYPE_HESS_EVENT, IO_TYPE_HESS_MC_SHOWER
 
 try:
     from hessio import *
@@ -263,6 +266,966 @@ lref_shape 80
 
     close_file()
     
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), "..", "hessioxxx", "test2.simhess.gz")
+
+def test_adc_views():
+    """
+    v get_adc_sum_view(telescope_id)
+    v get_adc_sample_view(telescope_id)
+    """
+    assert file_open(TEST_FILE) == 0
+    run_id, event_id = next(move_to_next_event())
+    tel_id = get_teldata_list()[0]
+
+    view = get_adc_sum_view(tel_id)
+    assert view.shape == (get_num_channel(tel_id), get_num_pixels(tel_id))
+    assert view.flags.writeable == False
+    for channel in range(get_num_channel(tel_id)):
+        assert np.array_equal(view[channel], get_adc_sum(tel_id, channel))
+
+    samples = get_adc_sample_view(tel_id)
+    assert samples.shape == (get_num_channel(tel_id), get_num_pixels(tel_id),
+                             get_num_samples(tel_id))
+    try:
+        get_adc_sum_view(-1)
+        assert()
+    except HessioTelescopeIndexError: pass
+
+    close_file()
+
+    # Views of an event no longer current raise, their copies are kept
+    import hessio
+    with HessioFile(TEST_FILE) as reader:
+        events = reader.move_to_next_event()
+        next(events)
+        tel_id = reader.get_teldata_list()[0]
+        view = reader.get_adc_sum_view(tel_id)
+        kept = view.copy()
+        row = view[0]
+        plain, plain_view = np.asarray(view), view.view(np.ndarray)
+        assert isinstance(row, hessio.AdcView) and row.base is view.base
+        assert np.array_equal(view, kept) and view.sum() == kept.sum()
+        # Plain arrays are not checked, but keep the data of their event,
+        # also when the telescope has data again
+        for run_id, event_id in events:
+            if tel_id in reader.get_teldata_list():
+                break
+        assert not np.array_equal(reader.get_adc_sum(tel_id, 0), kept[0])
+        assert np.array_equal(plain, kept) and np.array_equal(plain_view, kept)
+        del plain, plain_view
+        for use in (lambda: view[0, :3], lambda: row[:3], lambda: view.sum(),
+                    lambda: view.max(axis=1), lambda: np.array_equal(view, kept),
+                    lambda: view + 1, lambda: view.copy(), lambda: list(row)):
+            with pytest.raises(HessioGeneralError):
+                use()
+        assert not view.is_current() and 'no longer current' in repr(row)
+        assert type(kept) is np.ndarray
+        view = reader.get_adc_sample_view(reader.get_teldata_list()[0])
+        view[0, 0]
+    with pytest.raises(HessioGeneralError):
+        view[0, 0]
+
+    # The view keeps the reader and its buffers, even once dropped
+    # or after a new run freed them
+    reader = HessioFile(TEST_FILE)
+    next(reader.move_to_next_event())
+    view = reader.get_adc_sum_view(reader.get_teldata_list()[0])
+    reader.close_file()
+    del reader
+    assert view.base.reader is not None
+    with pytest.raises(HessioGeneralError):
+        view[0, :3]
+    view.base.reader.file_open(TEST_FILE)
+    next(view.base.reader.move_to_next_event())
+    with pytest.raises(HessioGeneralError):
+        view[0, :3]
+    assert np.array_equal(np.asarray(view), kept)
+
+    # Views dropped in other threads while the reader moves on,
+    # through runs whose buffers are retired
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'runs.simtel')
+        with open(filename, 'wb') as output:
+            for run in range(1, 7):
+                part = os.path.join(tmpdir, 'run{}.simtel'.format(run))
+                hessio.synthetic.generate(part, events=5, pixels=50, run=run, seed=run)
+                with open(part, 'rb') as data:
+                    output.write(data.read())
+
+        def consume(view, expected):
+            try:
+                return np.array_equal(view, expected)
+            except HessioGeneralError:
+                return True
+
+        with HessioFile(filename) as reader, ThreadPoolExecutor(4) as pool:
+            results = list()
+            for run_id, event_id in reader.move_to_next_event():
+                for tel_id in reader.get_teldata_list():
+                    view = reader.get_adc_sum_view(tel_id)
+                    results.append(pool.submit(consume, view, view.copy()))
+                    del view
+            assert len(results) > 30 and all(result.result() for result in results)
+
+def test_get_event():
+    """
+    v get_event(what)
+    """
+    assert file_open(TEST_FILE) == 0
+    run_id, event_id = next(move_to_next_event())
+
+    event = get_event(what=RAWSUM_FLAG|TIME_FLAG)
+    assert np.array_equal(event['tel_id'], get_teldata_list())
+    for itel, tel_id in enumerate(event['tel_id']):
+        npix = event['num_pixels'][itel]
+        assert npix == get_num_pixels(tel_id)
+        for channel in range(event['num_gains'][itel]):
+            assert np.array_equal(event['adc_sums'][itel, channel, :npix],
+                                  get_adc_sum(tel_id, channel))
+        ntimes = event['num_times'][itel]
+        assert np.array_equal(event['timval'][itel, :npix, :ntimes],
+                              get_pixel_timing_timval(tel_id))
+    assert event['central_gps_time'] == get_central_event_gps_time()
+    assert event['mc_shower_energy'] == get_mc_shower_energy()
+    assert 'adc_samples' not in event
+
+    close_file()
+
+def test_read_what():
+    """
+    v file_open(filename, what)
+    v move_to_next_event(what)
+    """
+    assert file_open(TEST_FILE, what=RAWSUM_FLAG) == 0
+    run_id, event_id = next(move_to_next_event())
+    tel_id = get_teldata_list()[0]
+    assert len(get_adc_sum(tel_id, 0)) == get_num_pixels(tel_id)
+    # pixel timing was skipped
+    assert get_pixel_timing_num_times_types(tel_id) == 0
+
+    run_id, event_id = next(move_to_next_event(what=ALL_FLAGS))
+    tel_id = get_teldata_list()[0]
+    assert get_pixel_timing_num_times_types(tel_id) > 0
+
+    close_file()
+
+def test_scan_mc_truth():
+    """
+    v scan_mc_truth(limit)
+    """
+    assert file_open(TEST_FILE) == 0
+    run_id, event_id = next(move_to_next_event())
+    glob_count = get_global_event_count()
+    energy = get_mc_shower_energy()
+    xcore = get_mc_event_xcore()
+    teltrg_list = get_central_event_teltrg_list()
+    close_file()
+
+    assert file_open(TEST_FILE) == 0
+    table = scan_mc_truth(limit=2)
+    assert len(table['glob_count']) == 2
+    assert table['run'][0] == run_id
+    assert table['event_id'][0] == event_id
+    assert table['glob_count'][0] == glob_count
+    assert table['mc_shower_energy'][0] == energy
+    assert table['mc_event_xcore'][0] == xcore
+    # Same names as the exported MC truth
+    import hessio
+    mc_columns = {'mc_shower_energy', 'mc_shower_azimuth', 'mc_shower_altitude',
+                  'mc_event_xcore', 'mc_event_ycore'}
+    assert mc_columns <= set(table) and mc_columns <= set(hessio.export.COLUMNS)
+    num_tel_trig = table['num_tel_trig'][0]
+    assert np.array_equal(table['teltrg_list'][:num_tel_trig], teltrg_list)
+    assert len(table['teltrg_list']) == table['num_tel_trig'].sum()
+
+    close_file()
+
+def test_hessio_file():
+    """
+    v HessioFile: independent readers on the same file
+    """
+    assert file_open(TEST_FILE) == 0
+    run_id, event_id = next(move_to_next_event())
+    tel_id = get_telescope_with_data_list()[0]
+    adc_sum = get_adc_sum(tel_id,0)
+
+    with HessioFile(TEST_FILE) as first, HessioFile(TEST_FILE) as second:
+        first_events = first.move_to_next_event()
+        second_events = second.move_to_next_event()
+        assert next(first_events) == (run_id, event_id)
+        assert next(first_events)[1] != event_id
+        assert next(second_events) == (run_id, event_id)
+        assert np.array_equal(second.get_adc_sum(tel_id,0), adc_sum)
+        assert first.get_global_event_count() != second.get_global_event_count()
+
+    # the default reader is not disturbed by the other ones
+    assert get_global_event_count() == second.get_global_event_count()
+    assert np.array_equal(get_adc_sum(tel_id,0), adc_sum)
+    close_file()
+
+def _sum_adc_sums(filename):
+    with HessioFile(filename) as reader:
+        return [(event_id, sum(int(reader.get_adc_sum(tel_id,0).sum())
+                               for tel_id in reader.get_telescope_with_data_list()))
+                for run_id, event_id in reader.move_to_next_event()]
+
+def test_threads():
+    """
+    v HessioFile read in parallel threads
+    """
+    expected = _sum_adc_sums(TEST_FILE)
+    assert len(expected) > 0
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(_sum_adc_sums, [TEST_FILE] * 8))
+    for result in results:
+        assert result == expected
+
+def test_parallel_map_files():
+    """
+    v parallel.map_files(func, filenames, workers)
+    """
+    import hessio
+    expected = _sum_adc_sums(TEST_FILE)
+    def sum_adc_sums(event):
+        assert not event['adc_sums'].flags.writeable
+        assert event['filename'] == TEST_FILE
+        return event['event_id'], int(event['adc_sums'][:,0].sum())
+    results = hessio.parallel.map_files(sum_adc_sums, [TEST_FILE] * 3,
+                                        workers=2, slots=2)
+    assert results == [expected] * 3
+
+def test_inprocess_decompression():
+    """
+    v set_inprocess_decompression(enable)
+    """
+    expected = _sum_adc_sums(TEST_FILE)
+    set_inprocess_decompression(False)
+    try:
+        assert _sum_adc_sums(TEST_FILE) == expected
+    finally:
+        set_inprocess_decompression(True)
+
+def test_readahead_chunks():
+    """
+    v set_readahead_chunks(chunks)
+    """
+    expected = _sum_adc_sums(TEST_FILE)
+    for chunks in (0, 1):
+        set_readahead_chunks(chunks)
+        try:
+            assert _sum_adc_sums(TEST_FILE) == expected
+        finally:
+            set_readahead_chunks(4)
+
+def test_seek_event():
+    """
+    v build_index(index_filename, span)
+    v load_index(index_filename)
+    v seek_event(run, glob_count)
+    """
+    expected = dict()
+    with HessioFile(TEST_FILE) as reader:
+        for run_id, event_id in reader.move_to_next_event():
+            expected[(run_id, reader.get_global_event_count())] = \
+                (event_id, reader.get_event(RAWSUM_FLAG)['adc_sums'].copy())
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        index_filename = os.path.join(tmpdir, "test2.idx")
+        reader = HessioFile(TEST_FILE)
+        blocks = reader.build_index(index_filename, span=1 << 16)
+        assert blocks.dtype == INDEX_DTYPE
+        assert blocks['offset'][0] == 0
+        assert np.all(np.diff(blocks['offset']) > 0)
+        events = blocks[blocks['type'] == 2010]
+        assert sorted(zip(events['run'], events['glob_count'])) == sorted(expected)
+
+        # backwards, so that gzip decompression restarts every time
+        for key in sorted(expected, reverse=True):
+            event_id, adc_sums = expected[key]
+            assert reader.seek_event(*key) == (key[0], event_id)
+            assert np.array_equal(reader.get_event(RAWSUM_FLAG)['adc_sums'], adc_sums)
+
+        # saved index, reading on after the event
+        other = HessioFile(TEST_FILE)
+        assert np.array_equal(other.load_index(index_filename), blocks)
+        first, second = sorted(expected)[:2]
+        other.seek_event(*first)
+        run_id, event_id = next(other.move_to_next_event())
+        assert event_id == expected[second][0]
+        with pytest.raises(HessioGeneralError):
+            other.seek_event(first[0], -5)
+
+def test_telescope_config():
+    """
+    v get_telescope_config(telescope_id)
+    v get_run_config()
+    """
+    with HessioFile(TEST_FILE) as reader:
+        run_id, event_id = next(reader.move_to_next_event())
+        configs = reader.get_run_config()
+        assert sorted(configs) == sorted(int(tel_id) for tel_id in reader.get_telescope_ids())
+        for tel_id, config in configs.items():
+            xpos, ypos = reader.get_pixel_position(tel_id)
+            assert np.array_equal(config['pix_x'], xpos)
+            assert np.array_equal(config['pix_y'], ypos)
+            assert config['mirror_area'] == reader.get_mirror_area(tel_id)
+            assert config['optical_foclen'] == reader.get_optical_foclen(tel_id)
+            assert config['time_slice'] == reader.get_time_slice(tel_id)
+            assert config['ref_shapes'].shape == (reader.get_nrefshape(tel_id),
+                                                  reader.get_lrefshape(tel_id))
+            assert config['pedestal'].shape == (H_MAX_GAINS, len(xpos))
+            assert not config['pedestal'].flags.writeable
+            with pytest.raises(TypeError):
+                config['version'] = 0
+
+        # cached until a new configuration block arrives
+        tel_id = int(reader.get_telescope_ids()[0])
+        config = reader.get_telescope_config(tel_id)
+        assert reader.get_telescope_config(tel_id) is config
+        with pytest.raises(HessioTelescopeIndexError):
+            reader.get_telescope_config(-1)
+
+    with HessioFile(TEST_FILE) as other:
+        next(other.move_to_next_event())
+        assert other.get_telescope_config(tel_id)['version'] == config['version']
+        other.file_open(TEST_FILE)
+        next(other.move_to_next_event())
+        assert other.get_telescope_config(tel_id)['version'] != config['version']
+
+def test_telescope_indices():
+    """
+    v telescope_indices(telescope_ids)
+    """
+    with HessioFile(TEST_FILE) as reader:
+        with pytest.raises(HessioGeneralError):
+            reader.telescope_indices([1])
+        next(reader.move_to_next_event())
+        tel_ids = reader.get_telescope_ids()
+        indices = reader.telescope_indices(tel_ids)
+        assert np.array_equal(indices, np.arange(len(tel_ids)))
+        assert indices.dtype == np.int32
+        unknown = reader.telescope_indices([[tel_ids[-1], -1], [100000, tel_ids[0]]])
+        assert np.array_equal(unknown, [[len(tel_ids) - 1, TEL_INDEX_NOT_VALID],
+                                        [TEL_INDEX_NOT_VALID, 0]])
+
+
+def test_iter_batches():
+    """
+    v iter_batches(batch_size, fields, telescopes, limit)
+    """
+    expected = _sum_adc_sums(TEST_FILE)
+    with HessioFile(TEST_FILE) as reader:
+        result = list()
+        for batch in reader.iter_batches(5, fields=('adc_sums', 'timval')):
+            assert len(batch['event_id']) <= 5
+            assert batch['adc_sums'].shape[:2] == batch['mask'].shape
+            assert batch['timval'].shape[:2] == batch['mask'].shape
+            sums = batch['adc_sums'][:, :, 0].sum(axis=2, dtype=np.int64)
+            result.extend((event_id, int(sums[i][batch['mask'][i]].sum()))
+                          for i, event_id in enumerate(batch['event_id']))
+        assert result == expected
+
+        with pytest.raises(HessioGeneralError):
+            next(reader.iter_batches(4, fields=('unknown',)))
+
+    with HessioFile(TEST_FILE) as reader:
+        tel_ids = [1, 2]
+        event_ids = list()
+        for batch in reader.iter_batches(4, telescopes=tel_ids, limit=7):
+            assert np.array_equal(batch['tel_id'], tel_ids)
+            event_ids.extend(batch['event_id'])
+        assert event_ids == [event_id for event_id, total in expected[:7]]
+        # Events read ahead are not lost
+        assert [event_id for run, event_id in reader.move_to_next_event(limit=2)] == \
+            [event_id for event_id, total in expected[7:9]]
+
+def test_sparse_adc():
+    """
+    v get_adc_sum_sparse(telescope_id,channel)
+    v get_adc_sample_sparse(telescope_id,channel)
+    v get_event_sparse(what,channel,telescopes)
+    """
+    with HessioFile(TEST_FILE) as reader:
+        for run_id, event_id in reader.move_to_next_event(limit=4):
+            tel_ids = reader.get_telescope_with_data_list()
+            event = reader.get_event_sparse(RAWSUM_FLAG|RAWDATA_FLAG)
+            assert np.array_equal(event['tel_id'], tel_ids)
+            assert event['indptr'][-1] == len(event['pixel_id']) == len(event['adc_sums'])
+            assert event['adc_samples'].shape[0] == len(event['pixel_id'])
+            for i, tel_id in enumerate(tel_ids):
+                pixel_ids, sums = reader.get_adc_sum_sparse(tel_id, 0)
+                dense = reader.get_adc_sum(tel_id, 0)
+                assert len(pixel_ids) <= len(dense)
+                assert np.array_equal(sums, dense[pixel_ids])
+                pixel_ids, samples = reader.get_adc_sample_sparse(tel_id, 0)
+                assert samples.shape == (len(pixel_ids), reader.get_num_samples(tel_id))
+                row = slice(event['indptr'][i], event['indptr'][i+1])
+                assert np.array_equal(event['pixel_id'][row], pixel_ids)
+                assert np.array_equal(event['adc_sums'][row], sums)
+
+            # Telescopes without data have no pixel
+            others = [tel_id for tel_id in reader.get_telescope_ids() if tel_id not in tel_ids]
+            event = reader.get_event_sparse(telescopes=others + [tel_ids[0]])
+            assert 'adc_samples' not in event
+            assert event['indptr'][len(others)] == 0
+            assert event['indptr'][-1] == len(reader.get_adc_sum_sparse(tel_ids[0], 0)[0])
+
+        with pytest.raises(HessioTelescopeIndexError):
+            reader.get_event_sparse(telescopes=[100000])
+        with pytest.raises(HessioChannelIndexError):
+            reader.get_adc_sum_sparse(tel_ids[0], H_MAX_GAINS)
+
+
+def test_compact_buffers():
+    """
+    v set_compact_buffers(enable)
+    """
+    expected = _sum_adc_sums(TEST_FILE)
+    set_compact_buffers(False)
+    try:
+        assert _sum_adc_sums(TEST_FILE) == expected
+    finally:
+        set_compact_buffers(True)
+    assert _sum_adc_sums(TEST_FILE) == expected
+
+
+def test_event_filter():
+    """
+    v set_event_filter(filter)
+    v move_to_next_event(filter=...)
+    """
+    with HessioFile(TEST_FILE) as reader:
+        events = [(event_id, reader.get_num_tel_trig(), reader.get_mc_shower_energy(),
+                   list(reader.get_central_event_teltrg_list()))
+                  for run_id, event_id in reader.move_to_next_event()]
+    energies = sorted(energy for event_id, ntrg, energy, teltrg in events)
+    energy_range = (energies[2], energies[-3])
+    selections = [(EventFilter(min_teltrg=3), lambda ntrg, energy, teltrg: ntrg >= 3),
+                  ({'energy_range': energy_range},
+                   lambda ntrg, energy, teltrg: energy_range[0] <= energy <= energy_range[1]),
+                  ({'min_teltrg': 2, 'telescopes': [1, 2]},
+                   lambda ntrg, energy, teltrg: ntrg >= 2 and (1 in teltrg or 2 in teltrg))]
+    for selection, selected in selections:
+        expected = [event_id for event_id, ntrg, energy, teltrg in events
+                    if selected(ntrg, energy, teltrg)]
+        assert 0 < len(expected) < len(events)
+        with HessioFile(TEST_FILE) as reader:
+            result = [event_id for run_id, event_id in reader.move_to_next_event(filter=selection)]
+        assert result == expected
+
+    with HessioFile(TEST_FILE) as reader:
+        reader.set_event_filter(EventFilter(min_teltrg=3))
+        batches = [batch['event_id'].copy() for batch in reader.iter_batches(4)]
+        assert np.concatenate(batches).tolist() == [event_id for event_id, ntrg, energy, teltrg
+                                                    in events if ntrg >= 3]
+    with HessioFile(TEST_FILE) as reader:
+        reader.set_event_filter({'min_teltrg': 3})
+        reader.set_event_filter(None)
+        assert len(list(reader.move_to_next_event())) == len(events)
+
+
+def test_telescope_selection():
+    """
+    v file_open(filename,what,telescopes)
+    v set_telescope_selection(telescopes)
+    """
+    with HessioFile(TEST_FILE) as reader:
+        expected = [(event_id, {tel_id: reader.get_adc_sum(tel_id, 0)
+                                for tel_id in reader.get_telescope_with_data_list()})
+                    for run_id, event_id in reader.move_to_next_event()]
+    selected = [2, 4]
+    with HessioFile(TEST_FILE, telescopes=selected) as reader:
+        for (run_id, event_id), (expected_id, adc_sums) in zip(reader.move_to_next_event(),
+                                                               expected):
+            assert event_id == expected_id
+            tel_ids = list(reader.get_telescope_with_data_list())
+            assert tel_ids == [tel_id for tel_id in adc_sums if tel_id in selected]
+            for tel_id in tel_ids:
+                assert np.array_equal(reader.get_adc_sum(tel_id, 0), adc_sums[tel_id])
+            assert np.array_equal(reader.get_event()['tel_id'], tel_ids)
+
+        # Back to all telescopes from the next event on
+        reader.file_open(TEST_FILE)
+        run_id, event_id = next(reader.move_to_next_event())
+        assert list(reader.get_telescope_with_data_list()) == list(expected[0][1])
+        reader.set_telescope_selection([])
+        run_id, event_id = next(reader.move_to_next_event())
+        assert len(reader.get_event()['tel_id']) == 0
+
+def test_skimmer():
+    """
+    v Skimmer(filename)
+    v Skimmer.attach(reader)
+    v Skimmer.write_event(reader)
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'skim.simtel.gz')
+        expected = list()
+        with Skimmer(filename) as skimmer, HessioFile() as reader:
+            skimmer.attach(reader)
+            reader.file_open(TEST_FILE)
+            for run_id, event_id in reader.move_to_next_event():
+                if event_id % 2:
+                    skimmer.write_event(reader)
+                    expected.append((event_id, reader.get_mc_shower_energy(),
+                                     reader.get_event()['adc_sums'].copy()))
+            with pytest.raises(HessioGeneralError):
+                skimmer.write_event(reader)
+            assert skimmer.num_events == len(expected)
+            with HessioFile(TEST_FILE) as other:
+                next(other.move_to_next_event())
+                with pytest.raises(HessioGeneralError):
+                    skimmer.write_event(other)
+
+        with HessioFile(filename) as reader:
+            events = [(event_id, reader.get_mc_shower_energy(),
+                       reader.get_event()['adc_sums'].copy())
+                      for run_id, event_id in reader.move_to_next_event()]
+        assert [event[0] for event in events] == [event[0] for event in expected]
+        for event, expected_event in zip(events, expected):
+            assert event[1] == expected_event[1]
+            assert np.array_equal(event[2], expected_event[2])
+
+        # One MC shower block for each shower of which events were written
+        def showers(filename, written=None):
+            with HessioFile(filename) as reader:
+                blocks = reader.build_index(os.path.join(tmpdir, 'index'))
+            result = list()
+            for block in blocks:
+                if block['type'] == IO_TYPE_HESS_MC_SHOWER:
+                    shower = block['ident']
+                elif block['type'] == IO_TYPE_HESS_EVENT and (written is None or
+                                                              block['glob_count'] in written):
+                    result.append(shower)
+            return sorted(set(result)), int((blocks['type'] == IO_TYPE_HESS_MC_SHOWER).sum())
+        written = [event[0] for event in expected]
+        expected_showers, num_input = showers(TEST_FILE, written)
+        output_showers, num_output = showers(filename)
+        assert output_showers == expected_showers
+        assert num_output == len(expected_showers) < num_input
+
+def test_export():
+    """
+    v export.convert(filename, output, format, columns, chunk_size)
+    """
+    import hessio
+    with HessioFile(TEST_FILE) as reader:
+        expected = list()
+        for run_id, event_id in reader.move_to_next_event():
+            event = reader.get_event()
+            expected.extend((event_id, tel_id, event['mc_shower_energy'],
+                             event['adc_sums'][index].copy())
+                            for index, tel_id in enumerate(event['tel_id']))
+
+    def check(events, mc_truth, telescopes, tables):
+        assert len(tables) == 1
+        table = tables[0]
+        assert list(table['event_id']) == [row[0] for row in expected]
+        assert list(table['tel_id']) == [row[1] for row in expected]
+        for adc_sums, row in zip(table['adc_sums'], expected):
+            assert np.array_equal(np.asarray(adc_sums), row[3])
+        energy = dict(zip(mc_truth['event_id'], mc_truth['mc_shower_energy']))
+        assert [energy[row[0]] for row in expected] == [row[2] for row in expected]
+        assert sorted(telescopes['tel_id']) == [1, 2, 3, 4]
+        assert len(events['event_id']) == 12
+
+    columns = ('adc_sums', 'mc_shower_energy')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        h5py = pytest.importorskip('h5py')
+        filename = os.path.join(tmpdir, 'events.h5')
+        assert hessio.export.convert(TEST_FILE, filename, columns=columns, chunk_size=5) == 12
+        with h5py.File(filename, 'r') as output:
+            tables = [output[name] for name in output if name.startswith('tel_')]
+            assert 'timval' not in tables[0]
+            check(output['events'], output['mc_truth'], output['telescopes'],
+                  [{name: table[name][:] for name in table} for table in tables])
+
+        with pytest.raises(HessioGeneralError):
+            hessio.export.convert(TEST_FILE, filename, columns=('unknown',))
+
+        pq = pytest.importorskip('pyarrow.parquet')
+        directory = os.path.join(tmpdir, 'events')
+        hessio.export.main([TEST_FILE, directory, '--columns'] + list(columns))
+        tables = {name[:-len('.parquet')]: pq.read_table(os.path.join(directory, name)).to_pydict()
+                  for name in os.listdir(directory)}
+        check(tables['events'], tables['mc_truth'], tables['telescopes'],
+              [table for name, table in tables.items() if name.startswith('tel_')])
+
+    # Runs shorter than a chunk, with other cameras: the reader is in
+    # the next run once a batch is read
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'runs.simtel')
+        with open(filename, 'wb') as output:
+            for run, events, pixels in ((1, 3, 100), (2, 4, 400)):
+                part = os.path.join(tmpdir, 'run{}.simtel'.format(run))
+                hessio.synthetic.generate(part, events=events, pixels=pixels, run=run, seed=run)
+                with open(part, 'rb') as data:
+                    output.write(data.read())
+        with HessioFile(filename) as reader:
+            for batch in reader.iter_batches(10):
+                pixels = 100 if batch['run'][0] == 1 else 400
+                assert [len(config['pix_x']) for config in batch['config']] == [pixels] * 4
+
+        h5py = pytest.importorskip('h5py')
+        output = os.path.join(tmpdir, 'runs.h5')
+        assert hessio.export.convert(filename, output, chunk_size=10) == 7
+        with h5py.File(output, 'r') as tables:
+            telescopes = tables['telescopes']
+            assert list(telescopes['run']) == [1] * 4 + [2] * 4
+            assert list(telescopes['num_pixels']) == [100] * 4 + [400] * 4
+            assert set(tables['tel_100pix_16000mm']['run']) == {1}
+            assert set(tables['tel_400pix_16000mm']['run']) == {2}
+            assert tables['tel_400pix_16000mm']['adc_sums'].shape[1:] == (2, 400)
+
+def test_fast_paths():
+    """
+    v compiled fast paths give the same results and errors as ctypes
+    """
+    import hessio
+    if hessio._fast is None:
+        pytest.skip("_pyhessio extension module not built")
+    names = ('get_num_channel', 'get_num_pixels', 'get_num_samples',
+             'get_pixel_timing_num_times_types', 'get_pixel_timing_timval',
+             'get_pixel_timing_peak_global')
+    with HessioFile(TEST_FILE) as reader:
+        for run_id, event_id in reader.move_to_next_event():
+            tel_ids = reader.get_teldata_list()
+            assert np.array_equal(tel_ids, HessioFile.get_teldata_list.__wrapped__(reader))
+            for tel_id in tel_ids:
+                for name in names:
+                    method = getattr(HessioFile, name)
+                    assert np.array_equal(method(reader, tel_id),
+                                          method.__wrapped__(reader, tel_id))
+                adc_sum = reader.get_adc_sum(tel_id, 0)
+                assert adc_sum.dtype == np.int32
+                assert np.array_equal(adc_sum, HessioFile.get_adc_sum.__wrapped__(reader, tel_id, 0))
+                assert np.array_equal(reader.get_adc_sample(tel_id, 0),
+                                      HessioFile.get_adc_sample.__wrapped__(reader, tel_id, 0))
+                with pytest.raises(HessioChannelIndexError):
+                    reader.get_adc_sum(tel_id, H_MAX_GAINS)
+            with pytest.raises(HessioTelescopeIndexError):
+                reader.get_adc_sum(10000, 0)
+            with pytest.raises(HessioTelescopeIndexError):
+                reader.get_num_pixels(10000)
+        # Keywords take the ctypes path
+        assert reader.get_num_pixels(telescope_id=tel_ids[0]) == reader.get_num_pixels(tel_ids[0])
+
+def test_calibrated_images():
+    """
+    v get_calibrated_image, get_calibrated_images, iter_calibrated_images
+    """
+    with HessioFile(TEST_FILE) as reader:
+        expected = list()
+        for run_id, event_id in reader.move_to_next_event(limit=3):
+            tel_id = reader.get_teldata_list()[0]
+            config = reader.get_telescope_config(tel_id)
+            signal = reader.get_adc_sum(tel_id, 0) - config['pedestal'][0]
+            image, peak_time = reader.get_calibrated_image(tel_id)
+            # No samples in this file: the recorded sums are used
+            assert np.allclose(image, signal * config['calib'][0] * CALIB_SCALE)
+            assert np.array_equal(peak_time, reader.get_pixel_timing_timval(tel_id)[:, 0])
+            assert np.array_equal(reader.get_calibrated_image(tel_id, integrator='local_peak')[0],
+                                  image)
+
+            images = reader.get_calibrated_images()
+            position = list(images['tel_id']).index(tel_id)
+            assert np.array_equal(images['mask'], np.isin(images['tel_id'],
+                                                          reader.get_teldata_list()))
+            assert np.array_equal(images['image'][position, :len(image)], image)
+            expected.append((event_id, images['image'].sum()))
+
+        neighbours = reader.get_neighbours(tel_id)
+        assert neighbours.shape == (len(image), 8)
+        assert np.all(np.sum(neighbours >= 0, axis=1) >= 2)
+        assert 0 in neighbours[neighbours[0, 0]]
+
+        with pytest.raises(HessioGeneralError):
+            reader.get_calibrated_image(tel_id, integrator='unknown')
+        with pytest.raises(HessioTelescopeIndexError):
+            reader.get_calibrated_image(-1)
+
+    with HessioFile(TEST_FILE) as reader:
+        result = list()
+        for batch in reader.iter_calibrated_images(2, limit=3):
+            assert batch['image'].shape == batch['mask'].shape + (batch['image'].shape[2],)
+            result.extend(zip(batch['event_id'], batch['image'].sum(axis=(1, 2))))
+        assert [event_id for event_id, total in result] == [event_id for event_id, total in expected]
+        assert np.allclose([total for event_id, total in result], [total for event_id, total in expected])
+
+    # Batches stop at the end of a run and match the images of each event
+    import hessio
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'runs.simtel')
+        with open(filename, 'wb') as output:
+            for run, events, pixels in ((1, 3, 100), (2, 4, 400)):
+                part = os.path.join(tmpdir, 'run{}.simtel'.format(run))
+                hessio.synthetic.generate(part, events=events, pixels=pixels, run=run, seed=run)
+                with open(part, 'rb') as data:
+                    output.write(data.read())
+        with HessioFile(filename) as reader, HessioFile(filename) as same:
+            events = same.move_to_next_event()
+            sizes = list()
+            for batch in reader.iter_calibrated_images(2):
+                sizes.append((batch['run'][0], len(batch['event_id'])))
+                for index, event_id in enumerate(batch['event_id']):
+                    assert next(events) == (batch['run'][index], event_id)
+                    images = same.get_calibrated_images()
+                    npix = images['image'].shape[1]
+                    assert np.array_equal(batch['mask'][index], images['mask'])
+                    assert np.array_equal(batch['image'][index, :, :npix], images['image'])
+                    assert np.array_equal(batch['peak_time'][index, :, :npix], images['peak_time'])
+            assert sizes == [(1, 2), (1, 1), (2, 2), (2, 2)]
+
+        # A camera with fewer pixels than the raw data: the camera
+        # settings of a 100 pixel run in a run of 400 pixels
+        blocks = dict()
+        for pixels in (100, 400):
+            part = os.path.join(tmpdir, 'pixels{}.simtel'.format(pixels))
+            hessio.synthetic.generate(part, events=4, pixels=pixels, samples=10)
+            with HessioFile(part) as reader, open(part, 'rb') as data:
+                content = data.read()
+                # Block headers are 16 bytes
+                blocks[pixels] = [(row['type'], content[row['offset']:row['offset'] + row['length'] + 16])
+                                  for row in reader.build_index()]
+        cameras = [block for block_type, block in blocks[100] if block_type == 2002]
+        filename = os.path.join(tmpdir, 'camera.simtel')
+        with open(filename, 'wb') as output:
+            for block_type, block in blocks[400]:
+                output.write(cameras.pop(0) if block_type == 2002 else block)
+        with HessioFile(filename) as reader, HessioFile(os.path.join(tmpdir, 'pixels400.simtel')) as raw:
+            for event, expected in zip(reader.move_to_next_event(), raw.move_to_next_event()):
+                assert event == expected
+                for tel_id in reader.get_telescope_with_data_list():
+                    assert reader.get_num_pixels(tel_id) == 100
+                    for integrator in ('sums', 'local_peak'):
+                        image, peak_time = reader.get_calibrated_image(tel_id, integrator=integrator)
+                        full_image, full_peak_time = raw.get_calibrated_image(tel_id, integrator=integrator)
+                        assert np.array_equal(image, full_image[:100])
+                        assert np.array_equal(peak_time, full_peak_time[:100])
+
+def test_image_parameters():
+    """
+    v get_neighbour_graph, get_image_parameters, iter_image_parameters
+    """
+    pytest.importorskip('scipy')
+    with HessioFile(TEST_FILE) as reader:
+        expected = list()
+        for run_id, event_id in reader.move_to_next_event(limit=6):
+            event = reader.get_image_parameters(tailcut_low=3., tailcut_high=6.)
+            for position in np.nonzero(event['mask'])[0]:
+                tel_id = event['tel_id'][position]
+                graph = reader.get_neighbour_graph(tel_id)
+                assert reader.get_neighbour_graph(tel_id) is graph
+                image = event['image'][position, :graph.shape[0]]
+                # Tail cuts with the neighbour graph
+                low = (graph @ (image >= 3.)) > 0
+                high = (graph @ (image >= 6.)) > 0
+                kept = ((image >= 6.) & low) | ((image >= 3.) & high)
+                assert np.array_equal(event['image_pixels'][position, :graph.shape[0]], kept)
+                assert np.isclose(event['amplitude'][position], image[kept].sum())
+                assert event['num_pixels'][position] == kept.sum()
+                if kept.sum() < 2:
+                    assert np.isnan(event['width'][position])
+                    continue
+                # Moments from the weighted covariance of the pixel positions
+                config = reader.get_telescope_config(tel_id)
+                x, y, weights = config['pix_x'][kept], config['pix_y'][kept], image[kept]
+                eigenvalues = np.linalg.eigvalsh(np.cov(x, y, aweights=weights, bias=True))
+                focal_length = config['optical_foclen']
+                assert np.isclose(event['x'][position], np.average(x, weights=weights) / focal_length)
+                assert np.isclose(event['y'][position], np.average(y, weights=weights) / focal_length)
+                assert np.isclose(event['length'][position], np.sqrt(eigenvalues[1]) / focal_length)
+                assert np.isclose(event['width'][position], np.sqrt(eigenvalues[0]) / focal_length)
+            expected.append((event_id, event['amplitude'], event['width']))
+
+        with pytest.raises(HessioGeneralError):
+            reader.get_image_parameters(tailcut=3.)
+
+    with HessioFile(TEST_FILE) as reader:
+        result = list()
+        for batch in reader.iter_image_parameters(4, limit=6, tailcut_low=3., tailcut_high=6.):
+            assert batch['width'].shape == batch['mask'].shape
+            result.extend(zip(batch['event_id'], batch['amplitude'], batch['width']))
+        assert len(result) == len(expected)
+        for (event_id, amplitude, width), (other_id, other_amplitude, other_width) in zip(result, expected):
+            assert event_id == other_id
+            assert np.allclose(amplitude, other_amplitude)
+            assert np.allclose(width, other_width, equal_nan=True)
+
+def test_reconstruct_showers():
+    """
+    v reconstruct_showers, get_array_layout
+    """
+    with HessioFile(TEST_FILE) as reader:
+        images = next(reader.iter_image_parameters(12, tailcut_low=3., tailcut_high=6.))
+        layout = reader.get_array_layout()
+    with HessioFile(TEST_FILE) as reader:
+        truth = next(reader.iter_batches(12))
+    assert np.array_equal(layout['tel_id'], images['tel_id'])
+
+    showers = reconstruct_showers(images, layout['position'], layout['direction'], min_amplitude=20.)
+    used = showers['num_images'] >= 2
+    assert used.sum() > 6
+    assert np.all(showers['result_bits'][used] & 5 == 5)
+    assert np.all(np.isnan(showers['azimuth'][~used]))
+    # Direction within a degree, core within 60 m of the MC truth
+    cos_angle = (np.cos(showers['altitude']) * np.cos(truth['mc_shower_altitude']) *
+                 np.cos(showers['azimuth'] - truth['mc_shower_azimuth']) +
+                 np.sin(showers['altitude']) * np.sin(truth['mc_shower_altitude']))
+    assert np.all(np.degrees(np.arccos(np.minimum(cos_angle[used], 1.))) < 1.)
+    assert np.all(np.hypot(showers['core_x'] - truth['mc_event_xcore'],
+                           showers['core_y'] - truth['mc_event_ycore'])[used] < 60.)
+    assert np.all(np.isfinite(showers['direction_error'][showers['num_images'] > 2]))
+
+    # Same results for many events split across threads
+    many = {name: np.tile(values, (1000, 1)) for name, values in images.items()
+            if np.ndim(values) == 2}
+    threaded = reconstruct_showers(many, layout['position'], layout['direction'],
+                                   min_amplitude=20., workers=3)
+    for name, values in showers.items():
+        assert np.array_equal(threaded[name], np.tile(values, 1000), equal_nan=True)
+
+def test_stats():
+    import hessio
+
+    hessio.reset_stats()
+    hessio.set_stats(True)
+    try:
+        with hessio.HessioFile(TEST_FILE) as reader:
+            batches = list(reader.iter_batches(5, ('adc_sums',)))
+        result = hessio.stats()
+    finally:
+        hessio.set_stats(False)
+    assert result['enabled']
+    event = result['blocks'][hessio.IO_TYPE_HESS_EVENT]
+    assert event['blocks'] == event['decoded'] == 12
+    assert event['bytes'] > 0 and event['decode_ns'] > 0
+    assert result['blocks'][hessio.IO_TYPE_HESS_RUNHEADER]['decoded'] == 1
+    assert result['find_io_block']['calls'] > sum(counts['blocks']
+                                                   for counts in result['blocks'].values())
+    assert result['read_io_block']['bytes'] > 0
+    assert result['decompression']['bytes_out'] > result['decompression']['bytes_in'] > 0
+    # The buffers are allocated once and reused by all batches
+    assert result['allocation']['bytes'] >= batches[0]['adc_sums'].nbytes > 0
+
+    # Disabled statistics are kept, but not counted any more
+    with hessio.HessioFile(TEST_FILE) as reader:
+        next(reader.move_to_next_event())
+    assert hessio.stats()['blocks'] == result['blocks']
+
+    hessio.reset_stats()
+    result = hessio.stats()
+    assert not result['enabled']
+    assert result['blocks'] == {}
+    assert result['read_io_block']['calls'] == result['decompression']['calls'] == 0
+    assert result['allocation']['calls'] == 0
+
+    # The arrays of the getters of the classic event loop are counted
+    hessio.reset_stats()
+    hessio.set_stats(True)
+    try:
+        with hessio.HessioFile(TEST_FILE) as reader:
+            next(reader.move_to_next_event())
+            tel_id = reader.get_teldata_list()[0]
+            arrays = (reader.get_adc_sum(tel_id, 0), reader.get_pixel_timing_timval(tel_id),
+                      reader.get_pixel_position(tel_id)[0])
+            allocation = hessio.stats()['allocation']
+    finally:
+        hessio.set_stats(False)
+    assert allocation['calls'] >= len(arrays)
+    assert allocation['bytes'] >= sum(array.nbytes for array in arrays)
+
+def test_synthetic():
+    """
+    v synthetic.generate
+    """
+    import hessio
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'synthetic.simtel.gz')
+        assert hessio.synthetic.generate(filename, events=20, telescopes=4, pixels=400,
+                                         samples=20, zero_suppression=3., seed=7) == 20
+        other = os.path.join(directory, 'synthetic.simtel')
+        hessio.synthetic.generate(other, events=20, telescopes=4, pixels=400,
+                                  samples=20, zero_suppression=3., seed=7)
+        with HessioFile(filename) as reader, HessioFile(other) as same:
+            events = list()
+            for (run_id, event_id), expected in zip(reader.move_to_next_event(),
+                                                    same.move_to_next_event()):
+                assert (run_id, event_id) == expected
+                telescopes = reader.get_telescope_with_data_list()
+                assert set(telescopes) <= {1, 2, 3, 4}
+                assert np.array_equal(telescopes, same.get_telescope_with_data_list())
+                for tel_id in telescopes:
+                    assert reader.get_num_pixels(tel_id) == 400
+                    assert reader.get_num_channel(tel_id) == 2
+                    assert reader.get_num_samples(tel_id) == 20
+                    assert np.array_equal(reader.get_adc_sample(tel_id, 0),
+                                          same.get_adc_sample(tel_id, 0))
+                    # Zero suppression leaves out the pixels without signal
+                    pixel_ids, sums = reader.get_adc_sum_sparse(tel_id, 0)
+                    assert 0 < len(pixel_ids) < 400
+                    image, peak_time = reader.get_calibrated_image(tel_id)
+                    assert set(np.nonzero(image)[0]) <= set(pixel_ids)
+                    assert image[pixel_ids].max() > 1.
+                events.append(event_id)
+            assert len(events) == 20
+            assert reader.get_telescope_ids().tolist() == [1, 2, 3, 4]
+
+        # Showers come from the pointing direction, altitude 70 degrees
+        with HessioFile(filename) as reader:
+            images = next(reader.iter_image_parameters(20, tailcut_low=5., tailcut_high=10.))
+            layout = reader.get_array_layout()
+        showers = reconstruct_showers(images, layout['position'], layout['direction'],
+                                      min_amplitude=20.)
+        used = showers['num_images'] >= 3
+        assert used.sum() > 5
+        assert np.allclose(np.degrees(showers['altitude'][used]), 70., atol=1.)
+
+        # The calibration follows CALIB_SCALE: images stay in p.e.
+        scaled = os.path.join(directory, 'scaled.simtel')
+        calib_scale = hessio.CALIB_SCALE
+        hessio.CALIB_SCALE = 0.5
+        try:
+            hessio.synthetic.generate(scaled, events=5, pixels=400, seed=7)
+        finally:
+            hessio.CALIB_SCALE = calib_scale
+        hessio.synthetic.generate(other, events=5, pixels=400, seed=7)
+        with HessioFile(scaled) as reader, HessioFile(other) as same:
+            for event, expected in zip(reader.move_to_next_event(), same.move_to_next_event()):
+                for tel_id in reader.get_telescope_with_data_list():
+                    assert np.allclose(reader.get_calibrated_image(tel_id, calib_scale=0.5)[0],
+                                       same.get_calibrated_image(tel_id)[0])
+
+    with pytest.raises(HessioGeneralError):
+        hessio.synthetic.generate('unused.simtel', pixels=hessio.H_MAX_PIX + 1)
+
         
 if __name__ == "__main__":
     test_hessio()
+    test_adc_views()
+    test_get_event()
+    test_read_what()
+    test_scan_mc_truth()
+    test_hessio_file()
+    test_threads()
+    test_parallel_map_files()
+    test_inprocess_decompression()
+    test_readahead_chunks()
+    test_seek_event()
+    test_telescope_config()
+    test_telescope_indices()
+    test_iter_batches()
+    test_sparse_adc()
+    test_compact_buffers()
+    test_event_filter()
+    test_telescope_selection()
+    test_skimmer()
+    test_export()
+    test_fast_paths()
+    test_calibrated_images()
+    test_image_parameters()
+    test_reconstruct_showers()
+    test_stats()
+    test_synthetic()